@@ -7,6 +7,7 @@ import json
 import re
 from typing import Optional, List, Dict, Any, Tuple
 from dotenv import load_dotenv
+from .utils import json_loads
 from .data_types import (
     AgentPromptRequest,
     AgentPromptResponse,
@@ -45,9 +46,9 @@ def parse_jsonl_output(
         Tuple of (all_messages, result_message) where result_message is None if not found
     """
     try:
-        with open(output_file, "r") as f:
-            # Read all lines and parse each as JSON
-            messages = [json.loads(line) for line in f if line.strip()]
+        with open(output_file, "rb") as f:
+            # Read all lines and parse each as JSON straight from bytes
+            messages = [json_loads(line) for line in f if line.strip()]
 
             # Find the result message (should be the last one)
             result_message = None
@@ -9,6 +9,11 @@ import uuid
 from datetime import datetime
 from typing import Any, TypeVar, Type, Union
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 T = TypeVar('T')
 
 
@@ -85,6 +90,23 @@ def get_logger(adw_id: str) -> logging.Logger:
     return logging.getLogger(f"adw_{adw_id}")
 
 
+def json_loads(data: Union[bytes, str]) -> Any:
+    """Parse a JSON document from bytes or str without decoding it first.
+    
+    Uses orjson when it is installed and falls back to the standard library.
+    Both raise json.JSONDecodeError on malformed input.
+    
+    Args:
+        data: Raw JSON bytes or text
+        
+    Returns:
+        Parsed JSON value
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 def parse_json(text: str, target_type: Type[T] = None) -> Union[T, Any]:
     """Parse JSON that may be wrapped in markdown code blocks.
     
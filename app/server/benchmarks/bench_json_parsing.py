@@ -0,0 +1,74 @@
+"""
+JSON parse-throughput benchmark for the pluggable parser in core.json_parser.
+
+Parses the sample event files line by line (JSONL) or whole (JSON) with every
+installed backend and reports MB/s and documents/s as JSON.
+
+Usage (from app/server):
+    uv run python -m benchmarks.bench_json_parsing
+    uv run python -m benchmarks.bench_json_parsing --repeat 200 path/to/events.jsonl
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from core import json_parser
+
+SAMPLE_DATA_DIR = Path(__file__).resolve().parents[2] / "client" / "public" / "sample-data"
+DEFAULT_FILES = [SAMPLE_DATA_DIR / "events.jsonl", SAMPLE_DATA_DIR / "users.json"]
+
+
+def bench_file(path: Path, parser_name: str, repeat: int) -> Dict[str, Any]:
+    """
+    Parse one file `repeat` times with the given backend and measure throughput
+    """
+    content = path.read_bytes()
+    json_parser.set_parser(parser_name)
+
+    if path.suffix == ".jsonl":
+        documents = [line for line in content.split(b"\n") if line.strip()]
+    else:
+        documents = [content]
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for document in documents:
+            json_parser.loads(document)
+    elapsed = time.perf_counter() - start
+
+    total_bytes = len(content) * repeat
+    return {
+        'file': path.name,
+        'parser': parser_name,
+        'repeat': repeat,
+        'bytes': len(content),
+        'seconds': round(elapsed, 6),
+        'mb_per_s': round(total_bytes / elapsed / 1_000_000, 2),
+        'docs_per_s': round(len(documents) * repeat / elapsed, 1),
+    }
+
+
+def main(argv: List[str] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", type=Path, default=DEFAULT_FILES)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    original = json_parser.PARSER_NAME
+    results = []
+    try:
+        for path in args.files:
+            for parser_name in json_parser.available_parsers():
+                results.append(bench_file(path, parser_name, args.repeat))
+    finally:
+        json_parser.set_parser(original)
+
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
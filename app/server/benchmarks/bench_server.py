@@ -0,0 +1,368 @@
+"""
+End-to-end server benchmark with stub LLM providers.
+
+Drives /api/upload, /api/query, /api/schema and /api/insights through an
+in-process ASGI client (httpx.ASGITransport), so the numbers include routing,
+validation and serialization but no network. The OpenAI and Anthropic clients
+in core.llm_processor are replaced by stubs that sleep for a configurable
+latency and return SQL for the synthetic table, so the full generation path
+(schema selection, prompt building, response cleaning) runs without API keys.
+
+For every table size a synthetic sales table is created and each scenario
+is run with the given number of requests and concurrency:
+- upload: the table as a CSV through /api/upload (sizes up to --upload-max-rows;
+  larger tables are bulk-loaded straight into SQLite and indexed instead)
+- query: /api/query with bypass_cache, i.e. LLM stub + SQL execution every time
+- query_cached: one repeated question, served by the semantic and result caches
+- schema: /api/schema
+- insights: /api/insights for all columns
+
+Each scenario reports throughput, p50/p99/max latency, errors and the peak
+RSS of the process so far, as JSON. Runs happen in a temporary working
+directory, so the real db/database.db is never touched. Latencies of failed
+requests are not comparable, so the process exits with status 1 when any
+scenario had errors.
+
+Usage (from app/server):
+    uv run python -m benchmarks.bench_server
+    uv run python -m benchmarks.bench_server --rows 1000 1000000 50000000 --llm-latency-ms 300 --concurrency 16
+    uv run python -m benchmarks.bench_server --scenarios query schema --requests 200 --output run.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from unittest.mock import patch
+
+SCENARIOS = ["upload", "query", "query_cached", "schema", "insights"]
+DEFAULT_ROWS = [1_000, 100_000, 1_000_000]
+DEFAULT_UPLOAD_MAX_ROWS = 1_000_000
+
+CATEGORIES = [f"category_{index}" for index in range(20)]
+REGIONS = ["north", "south", "east", "west", "central"]
+COLUMNS = ["id", "category", "region", "amount", "quantity", "created_at"]
+
+# Rows inserted per executemany call when bulk-loading large tables
+LOAD_CHUNK_ROWS = 100_000
+
+
+def synthetic_rows(row_count: int, seed: int = 42) -> Iterator[Tuple[Any, ...]]:
+    """
+    Deterministic sales rows: id, category, region, amount, quantity, created_at
+    """
+    rng = random.Random(seed)
+    for row_id in range(1, row_count + 1):
+        yield (
+            row_id,
+            rng.choice(CATEGORIES),
+            rng.choice(REGIONS),
+            round(rng.uniform(1, 1000), 2),
+            rng.randint(1, 50),
+            f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        )
+
+
+def synthetic_csv(row_count: int) -> bytes:
+    buffer = io.StringIO()
+    buffer.write(",".join(COLUMNS) + "\n")
+    for row in synthetic_rows(row_count):
+        buffer.write(",".join(str(value) for value in row) + "\n")
+    return buffer.getvalue().encode()
+
+
+def bulk_load(table_name: str, row_count: int) -> None:
+    """
+    Create a large synthetic table directly in SQLite, bypassing the upload endpoint
+    """
+    from core.result_cache import invalidate_table
+    from core.schema_index import index_table
+
+    conn = sqlite3.connect("db/database.db")
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+        conn.execute(
+            f"CREATE TABLE {table_name} (id INTEGER, category TEXT, region TEXT, "
+            f"amount REAL, quantity INTEGER, created_at TEXT)"
+        )
+        rows = synthetic_rows(row_count)
+        while True:
+            chunk = [row for _, row in zip(range(LOAD_CHUNK_ROWS), rows)]
+            if not chunk:
+                break
+            conn.executemany(f"INSERT INTO {table_name} VALUES (?, ?, ?, ?, ?, ?)", chunk)
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_table(table_name)
+    index_table(table_name)
+
+
+class StubLLM:
+    """
+    Stands in for the OpenAI and Anthropic SDK clients. Every call sleeps for
+    the configured latency and returns the next SQL from sql_factory.
+    """
+
+    def __init__(self, latency_ms: float, provider: str = "openai"):
+        self.latency_ms = latency_ms
+        self.provider = provider
+        self.sql_factory: Callable[[], str] = lambda: "SELECT 1"
+        self.calls = 0
+
+    def _complete(self) -> str:
+        self.calls += 1
+        time.sleep(self.latency_ms / 1000)
+        return self.sql_factory()
+
+    # Keyword arguments (max_retries, timeout, ...) are accepted like the SDK constructors do
+    def openai_client(self, api_key: Optional[str] = None, **kwargs: Any) -> Any:
+        create = lambda **kwargs: SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self._complete()))]
+        )
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    def anthropic_client(self, api_key: Optional[str] = None, **kwargs: Any) -> Any:
+        create = lambda **kwargs: SimpleNamespace(content=[SimpleNamespace(text=self._complete())])
+        return SimpleNamespace(messages=SimpleNamespace(create=create))
+
+
+def query_sql_factory(table_name: str, row_count: int, seed: int = 7) -> Callable[[], str]:
+    """
+    Mix of aggregate, filter, top-N and point-lookup queries on the synthetic table
+    """
+    rng = random.Random(seed)
+    templates = [
+        lambda: f"SELECT category, COUNT(*) AS orders, AVG(amount) AS avg_amount FROM {table_name} GROUP BY category",
+        lambda: f"SELECT region, SUM(amount * quantity) AS revenue FROM {table_name} WHERE category = '{rng.choice(CATEGORIES)}' GROUP BY region",
+        lambda: f"SELECT * FROM {table_name} ORDER BY amount DESC LIMIT 10",
+        lambda: f"SELECT * FROM {table_name} WHERE id = {rng.randint(1, row_count)}",
+    ]
+    return lambda: rng.choice(templates)()
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of an ascending list
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(p / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def run_scenario(
+    send: Callable[[int], Any],
+    requests: int,
+    concurrency: int
+) -> Dict[str, Any]:
+    """
+    Issue `requests` calls with at most `concurrency` in flight and summarise latencies
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send(index)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200 or response.json().get('error'):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(requests / wall, 2) if wall else None,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+async def bench_table_size(
+    client: Any,
+    llm: StubLLM,
+    row_count: int,
+    scenarios: List[str],
+    requests: int,
+    concurrency: int,
+    upload_requests: int,
+    upload_max_rows: int
+) -> Dict[str, Any]:
+    table_name = f"sales_{row_count}"
+    results: Dict[str, Any] = {}
+
+    uploaded = row_count <= upload_max_rows
+    if uploaded:
+        content = synthetic_csv(row_count)
+        if "upload" not in scenarios:
+            upload_requests = 1
+
+        # Uploads replace the same table, so they run one at a time
+        async def upload(index: int):
+            return await client.post("/api/upload", files={"file": (f"{table_name}.csv", content, "text/csv")})
+
+        stats = await run_scenario(upload, upload_requests, 1)
+        stats['payload_mb'] = round(len(content) / (1024 * 1024), 2)
+        del content
+        if "upload" in scenarios:
+            results['upload'] = stats
+    else:
+        start = time.perf_counter()
+        await asyncio.to_thread(bulk_load, table_name, row_count)
+        results['bulk_load'] = {'wall_s': round(time.perf_counter() - start, 3), 'peak_rss_mb': peak_rss_mb()}
+
+    if "query" in scenarios:
+        llm.sql_factory = query_sql_factory(table_name, row_count)
+
+        async def query(index: int):
+            return await client.post("/api/query", json={
+                'query': f"benchmark question {index} about {table_name}",
+                'llm_provider': llm.provider,
+                'bypass_cache': True,
+            })
+
+        results['query'] = await run_scenario(query, requests, concurrency)
+
+    if "query_cached" in scenarios:
+        sql = f"SELECT category, COUNT(*) AS orders, AVG(amount) AS avg_amount FROM {table_name} GROUP BY category"
+        llm.sql_factory = lambda: sql
+
+        async def query_cached(index: int):
+            return await client.post("/api/query", json={
+                'query': f"orders and average amount per category in {table_name}",
+                'llm_provider': llm.provider,
+            })
+
+        results['query_cached'] = await run_scenario(query_cached, requests, concurrency)
+
+    if "schema" in scenarios:
+        results['schema'] = await run_scenario(lambda index: client.get("/api/schema"), requests, concurrency)
+
+    if "insights" in scenarios:
+        async def insights(index: int):
+            return await client.post("/api/insights", json={'table_name': table_name})
+
+        results['insights'] = await run_scenario(insights, requests, concurrency)
+
+    return {'rows': row_count, 'load': "upload" if uploaded else "bulk", 'scenarios': results}
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    # Imported after chdir: the server creates db/ relative to the working directory
+    import server
+    from core import llm_processor
+
+    # Per-request [SUCCESS] logs would swamp the report and skew timings
+    logging.disable(logging.INFO)
+
+    llm = StubLLM(args.llm_latency_ms, args.provider)
+    transport = httpx.ASGITransport(app=server.app)
+    results = []
+    with patch.object(llm_processor, "OpenAI", llm.openai_client), \
+            patch.object(llm_processor, "Anthropic", llm.anthropic_client):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for row_count in args.rows:
+                results.append(await bench_table_size(
+                    client, llm, row_count, args.scenarios, args.requests, args.concurrency,
+                    args.upload_requests, args.upload_max_rows
+                ))
+    return {
+        'config': {
+            'rows': args.rows,
+            'scenarios': args.scenarios,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'upload_requests': args.upload_requests,
+            'provider': args.provider,
+            'llm_latency_ms': args.llm_latency_ms,
+            'llm_calls': llm.calls,
+            'python': sys.version.split()[0],
+        },
+        'results': results,
+    }
+
+
+def failed_scenarios(report: Dict[str, Any]) -> List[str]:
+    """
+    "<rows>/<scenario>" for every scenario with at least one failed request
+    """
+    return [
+        f"{result['rows']}/{name}"
+        for result in report['results']
+        for name, stats in result['scenarios'].items()
+        if stats.get('errors')
+    ]
+
+
+def main(argv: List[str] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", nargs="*", type=int, default=DEFAULT_ROWS, help="table sizes to benchmark")
+    parser.add_argument("--scenarios", nargs="*", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--provider", choices=["openai", "anthropic"], default="openai")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="stub provider latency")
+    parser.add_argument("--upload-requests", type=int, default=3, help="uploads timed per table size")
+    parser.add_argument("--upload-max-rows", type=int, default=DEFAULT_UPLOAD_MAX_ROWS,
+                        help="larger tables are bulk-loaded instead of uploaded")
+    parser.add_argument("--output", type=Path, help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    # Only the stub for the chosen provider gets a key; empty values keep .env keys from loading
+    os.environ["OPENAI_API_KEY"] = "stub" if args.provider == "openai" else ""
+    os.environ["ANTHROPIC_API_KEY"] = "stub" if args.provider == "anthropic" else ""
+    os.environ["LLM_HEDGING"] = "0"
+
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench_server_") as workdir:
+        os.chdir(workdir)
+        try:
+            report = asyncio.run(run_benchmark(args))
+        finally:
+            os.chdir(previous_cwd)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text)
+
+    failed = failed_scenarios(report)
+    if failed:
+        print(f"Scenarios with errors (latencies not valid): {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Coverage, accuracy and latency evaluation for the rule-based fast path in
+core.intent_parser.
+
+Each corpus entry is a question and the SQL the parser should emit for it,
+or null when the question should go to the LLM. The harness parses every
+question against the schema and reports, as JSON:
+
+- coverage: share of questions answered without an LLM call
+- accuracy: share of answered questions whose SQL matches the expected SQL
+- wrong: answered questions with unexpected SQL (must stay 0: a wrong answer
+  returns wrong data, while a miss only costs an LLM call)
+- missed: questions with expected SQL that the parser left to the LLM
+- latency_us: p50 / p95 / max parse time per question, in microseconds
+- intents: answered questions per intent
+
+The default corpus follows the sample data (users, orders, products); pass
+questions asked against your own catalog with --corpus and --schema.
+
+Usage (from app/server):
+    uv run python -m benchmarks.eval_intent_parser
+    uv run python -m benchmarks.eval_intent_parser --corpus questions.json --schema schema.json --repeat 1000
+"""
+
+import argparse
+import json
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.intent_parser import match_intent
+
+SCHEMA_INFO = {
+    'tables': {
+        'users': {'columns': {
+            'id': 'INTEGER', 'name': 'TEXT', 'email': 'TEXT', 'signup_date': 'TEXT', 'age': 'INTEGER', 'city': 'TEXT',
+        }, 'row_count': 0},
+        'orders': {'columns': {
+            'order_id': 'INTEGER', 'customer_name': 'TEXT', 'product_category': 'TEXT', 'order_amount': 'REAL',
+            'shipping_method': 'TEXT', 'order_date': 'TEXT', 'delivery_status': 'TEXT',
+        }, 'row_count': 0},
+        'products': {'columns': {
+            'product_id': 'INTEGER', 'product_name': 'TEXT', 'category': 'TEXT', 'price': 'REAL',
+            'stock_quantity': 'INTEGER', 'last_restocked': 'TEXT',
+        }, 'row_count': 0},
+    }
+}
+
+# (question, expected SQL or None when the LLM should answer)
+DEFAULT_CORPUS: List[Tuple[str, Optional[str]]] = [
+    ("How many rows in orders?", "SELECT COUNT(*) AS count FROM [orders]"),
+    ("how many orders are there", "SELECT COUNT(*) AS count FROM [orders]"),
+    ("count the users", "SELECT COUNT(*) AS count FROM [users]"),
+    ("What is the total number of products?", "SELECT COUNT(*) AS count FROM [products]"),
+    ("number of records in users", "SELECT COUNT(*) AS count FROM [users]"),
+    ("how many products do we have", "SELECT COUNT(*) AS count FROM [products]"),
+    ("show orders", "SELECT * FROM [orders] LIMIT 100"),
+    ("Show me the products table", "SELECT * FROM [products] LIMIT 100"),
+    ("list all users", "SELECT * FROM [users] LIMIT 100"),
+    ("show first 10 users", "SELECT * FROM [users] LIMIT 10"),
+    ("list 5 rows from orders", "SELECT * FROM [orders] LIMIT 5"),
+    ("show first five products", "SELECT * FROM [products] LIMIT 5"),
+    ("top 5 products by price", "SELECT * FROM [products] ORDER BY [price] DESC LIMIT 5"),
+    ("top 10 orders by order amount", "SELECT * FROM [orders] ORDER BY [order_amount] DESC LIMIT 10"),
+    ("bottom 3 products by stock quantity", "SELECT * FROM [products] ORDER BY [stock_quantity] ASC LIMIT 3"),
+    ("show the top 3 users by age", "SELECT * FROM [users] ORDER BY [age] DESC LIMIT 3"),
+    ("average price by category",
+     "SELECT [category], AVG([price]) AS [average_price] FROM [products] GROUP BY [category] ORDER BY [category]"),
+    ("What is the average price of products by category?",
+     "SELECT [category], AVG([price]) AS [average_price] FROM [products] GROUP BY [category] ORDER BY [category]"),
+    ("average product price", "SELECT AVG([price]) AS [average_price] FROM [products]"),
+    ("average age of users", "SELECT AVG([age]) AS [average_age] FROM [users]"),
+    ("what is the mean age", "SELECT AVG([age]) AS [average_age] FROM [users]"),
+    ("total order amount", "SELECT SUM([order_amount]) AS [total_order_amount] FROM [orders]"),
+    ("total order amount by category",
+     "SELECT [product_category], SUM([order_amount]) AS [total_order_amount] FROM [orders] GROUP BY [product_category] ORDER BY [product_category]"),
+    ("sum of order amount per shipping method",
+     "SELECT [shipping_method], SUM([order_amount]) AS [total_order_amount] FROM [orders] GROUP BY [shipping_method] ORDER BY [shipping_method]"),
+    ("sum of stock quantity", "SELECT SUM([stock_quantity]) AS [total_stock_quantity] FROM [products]"),
+    ("max age", "SELECT MAX([age]) AS [max_age] FROM [users]"),
+    ("highest price per category",
+     "SELECT [category], MAX([price]) AS [max_price] FROM [products] GROUP BY [category] ORDER BY [category]"),
+    ("minimum order amount", "SELECT MIN([order_amount]) AS [min_order_amount] FROM [orders]"),
+    ("what is the maximum order date", "SELECT MAX([order_date]) AS [max_order_date] FROM [orders]"),
+    ("how many orders per shipping method",
+     "SELECT [shipping_method], COUNT(*) AS count FROM [orders] GROUP BY [shipping_method] ORDER BY count DESC"),
+    ("number of users by city",
+     "SELECT [city], COUNT(*) AS count FROM [users] GROUP BY [city] ORDER BY count DESC"),
+    ("count orders by delivery status",
+     "SELECT [delivery_status], COUNT(*) AS count FROM [orders] GROUP BY [delivery_status] ORDER BY count DESC"),
+    ("how many products in each category",
+     "SELECT [category], COUNT(*) AS count FROM [products] GROUP BY [category] ORDER BY count DESC"),
+    ("list distinct categories", "SELECT DISTINCT [category] FROM [products] ORDER BY [category] LIMIT 100"),
+    ("what are the unique cities", "SELECT DISTINCT [city] FROM [users] ORDER BY [city] LIMIT 100"),
+    ("distinct shipping methods", "SELECT DISTINCT [shipping_method] FROM [orders] ORDER BY [shipping_method] LIMIT 100"),
+    ("how many unique cities in users", "SELECT COUNT(DISTINCT [city]) AS count FROM [users]"),
+    ("how many distinct categories in products", "SELECT COUNT(DISTINCT [category]) AS count FROM [products]"),
+    # Questions with filters, joins, dates or vague terms must go to the LLM
+    ("show users in New York", None),
+    ("latest order date", None),
+    ("how many orders were delivered", None),
+    ("orders from last week", None),
+    ("top 5 customers by revenue", None),
+    ("average price of electronics products", None),
+    ("which users signed up in October", None),
+    ("list all product names", None),
+    ("total orders", None),
+    ("average name", None),
+    ("show products with low stock", None),
+    ("how many orders did Alex Thompson place", None),
+    ("what is the most popular category", None),
+    ("compare order amounts by month", None),
+    ("show orders over 100 dollars", None),
+    ("users older than 30", None),
+    ("products that need restocking", None),
+    ("count users per signup month", None),
+    ("top selling products", None),
+    ("average order amount for express shipping", None),
+    ("how many products cost more than 50", None),
+    ("list the 3 most expensive products", None),
+    # Ambiguous: products.category or orders.product_category
+    ("how many different product categories are there", None),
+]
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def evaluate(corpus: List[Tuple[str, Optional[str]]], schema_info: Dict[str, Any], repeat: int = 100) -> Dict[str, Any]:
+    """
+    Parse every question and score the answers against the expected SQL
+    """
+    answered = correct = missed = 0
+    wrong: List[Dict[str, Any]] = []
+    intents: Counter = Counter()
+    latencies_us: List[float] = []
+
+    for question, expected in corpus:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            intent = match_intent(question, schema_info)
+        latencies_us.append((time.perf_counter() - start) / repeat * 1e6)
+
+        if intent is None:
+            if expected is not None:
+                missed += 1
+            continue
+        answered += 1
+        intents[intent.name] += 1
+        if intent.sql == expected:
+            correct += 1
+        else:
+            wrong.append({'question': question, 'sql': intent.sql, 'expected': expected})
+
+    return {
+        'questions': len(corpus),
+        'coverage': round(answered / len(corpus), 3) if corpus else 0.0,
+        'accuracy': round(correct / answered, 3) if answered else 1.0,
+        'wrong': wrong,
+        'missed': missed,
+        'latency_us': {
+            'p50': round(_percentile(latencies_us, 50), 1),
+            'p95': round(_percentile(latencies_us, 95), 1),
+            'max': round(max(latencies_us), 1),
+        } if latencies_us else {},
+        'intents': dict(intents),
+    }
+
+
+def main(argv: List[str] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, help="JSON list of [question, expected_sql or null]")
+    parser.add_argument("--schema", type=Path, help="JSON schema catalog ({\"tables\": {...}}, as returned by /api/schema)")
+    parser.add_argument("--repeat", type=int, default=100, help="Parses per question for the latency figures")
+    args = parser.parse_args(argv)
+
+    corpus = DEFAULT_CORPUS
+    if args.corpus:
+        corpus = [tuple(entry) for entry in json.loads(args.corpus.read_text())]
+    schema_info = json.loads(args.schema.read_text()) if args.schema else SCHEMA_INFO
+
+    result = evaluate(corpus, schema_info, args.repeat)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Accuracy evaluation for the semantic question cache in core.semantic_cache.
+
+Each labelled pair is a cached question and a new question, marked as
+equivalent (the cached SQL answers the new question) or not. For every
+threshold the harness stores the first question, looks up the second and
+reports precision (hits that were correct), recall (equivalent pairs that
+hit) and the share of pairs that would have skipped an LLM call, as JSON.
+
+A wrong hit returns wrong data, so pick the lowest threshold whose precision
+is 1.0 on a corpus representative of your users.
+
+Usage (from app/server):
+    uv run python -m benchmarks.eval_semantic_cache
+    uv run python -m benchmarks.eval_semantic_cache --thresholds 0.7 0.8 0.9 --pairs pairs.json
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from core.semantic_cache import SemanticCache
+
+SCHEMA_INFO = {
+    'tables': {
+        'customers': {'columns': {'id': 'INTEGER', 'name': 'TEXT', 'country': 'TEXT'}, 'row_count': 0},
+        'orders': {'columns': {'id': 'INTEGER', 'customer_id': 'INTEGER', 'revenue': 'REAL', 'created_at': 'TEXT'}, 'row_count': 0},
+        'products': {'columns': {'id': 'INTEGER', 'name': 'TEXT', 'price': 'REAL', 'category': 'TEXT'}, 'row_count': 0},
+    }
+}
+
+# (cached question, new question, equivalent)
+DEFAULT_PAIRS: List[Tuple[str, str, bool]] = [
+    ("top 5 customers by revenue", "show me the 5 biggest customers by revenue", True),
+    ("top 5 customers by revenue", "Top 5 customers by revenue?", True),
+    ("top 5 customers by revenue", "give me the top 5 clients by revenue", True),
+    ("top 5 customers by revenue", "which 5 customers have the highest revenue", True),
+    ("how many orders are there", "what is the number of orders", True),
+    ("how many orders are there", "count the orders", True),
+    ("average product price", "what is the mean price of products", True),
+    ("average product price", "show the average price of a product", True),
+    ("list all products in the books category", "show me products in the books category", True),
+    ("total revenue per country", "sum of revenue for each country", True),
+    ("customers from Germany", "show customers from germany", True),
+    ("orders created after 2024-01-01", "list orders created after 2024-01-01", True),
+    ("top 5 customers by revenue", "top 10 customers by revenue", False),
+    ("top 5 customers by revenue", "bottom 5 customers by revenue", False),
+    ("top 5 customers by revenue", "5 customers with the lowest revenue", False),
+    ("how many orders are there", "how many customers are there", False),
+    ("average product price", "maximum product price", False),
+    ("average product price", "total product price", False),
+    ("customers from Germany", "customers not from Germany", False),
+    ("customers from Germany", "customers from France", False),
+    ("customers from California", "customers from Texas", False),
+    ("orders shipped with DHL", "orders shipped with UPS", False),
+    ("orders created after 2024-01-01", "orders created before 2024-01-01", False),
+    ("orders created after 2024-01-01", "orders created after 2023-01-01", False),
+    ("list all products in the books category", "list all products in the toys category", False),
+    ("total revenue per country", "total revenue per customer", False),
+    ("number of orders per customer", "number of customers per order", False),
+    ("products priced over 100", "products priced under 100", False),
+    ("newest 3 orders", "oldest 3 orders", False),
+]
+
+
+def evaluate(pairs: List[Tuple[str, str, bool]], threshold: float) -> Dict[str, Any]:
+    """
+    Score one threshold on labelled pairs
+    """
+    true_hits = false_hits = misses_equivalent = 0
+    for cached_question, question, equivalent in pairs:
+        cache = SemanticCache(threshold=threshold)
+        cache.store(cached_question, SCHEMA_INFO, "SELECT 1")
+        hit = cache.lookup(question, SCHEMA_INFO) is not None
+        if hit and equivalent:
+            true_hits += 1
+        elif hit:
+            false_hits += 1
+        elif equivalent:
+            misses_equivalent += 1
+
+    hits = true_hits + false_hits
+    equivalent_pairs = true_hits + misses_equivalent
+    return {
+        'threshold': threshold,
+        'pairs': len(pairs),
+        'precision': round(true_hits / hits, 3) if hits else 1.0,
+        'recall': round(true_hits / equivalent_pairs, 3) if equivalent_pairs else 1.0,
+        'false_hits': false_hits,
+        'llm_calls_saved': round(hits / len(pairs), 3) if pairs else 0.0,
+    }
+
+
+def main(argv: List[str] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--thresholds", nargs="*", type=float, default=[0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95])
+    parser.add_argument("--pairs", type=Path, help="JSON list of [cached_question, question, equivalent]")
+    args = parser.parse_args(argv)
+
+    pairs = DEFAULT_PAIRS
+    if args.pairs:
+        pairs = [tuple(pair) for pair in json.loads(args.pairs.read_text())]
+
+    results = [evaluate(pairs, threshold) for threshold in args.thresholds]
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
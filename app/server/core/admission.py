@@ -0,0 +1,407 @@
+"""
+Admission control for the LLM-backed endpoints.
+
+Provider calls and client requests are admitted through token buckets that
+hand out reservations: a caller that finds the bucket empty reserves the next
+free token and waits for it, so waiting callers form a FIFO queue without
+any explicit queue structure. A caller whose reservation would exceed the
+maximum queue wait, or that would make the queue longer than its maximum
+depth, is shed straight away with AdmissionRejected, which carries the time
+after which a retry can succeed. Endpoints turn it into 429 + Retry-After.
+
+- Per provider (ProviderAdmission, around every LLM call): a request rate,
+  a cap on concurrent calls, and a bounded queue in front of both. Waiting
+  happens in the worker thread that makes the call. Endpoints run those
+  calls with to_llm_thread, on an executor sized for every admitted and
+  queued call, so blocked waiters never hold the threads of asyncio's
+  default executor that the rest of the server uses.
+- Per client (AdmissionMiddleware, on LLM_ENDPOINTS): a request rate per
+  client address. The X-Client-ID header is only trusted on requests from a
+  configured proxy (CLIENT_ID_TRUSTED_PROXIES); otherwise a caller could
+  send a new id with every request to escape the limit.
+  Waiting is an asyncio sleep, so queued requests hold no thread.
+
+Queue depth, queue wait histograms and admitted/rejected counters are
+exported through /api/metrics.
+
+Configuration (environment variables):
+- LLM_RATE_PER_SECOND / LLM_BURST: provider call rate and burst (unset: no rate limit)
+- LLM_MAX_CONCURRENT: concurrent calls per provider
+- LLM_MAX_QUEUE_WAIT_MS / LLM_MAX_QUEUE_DEPTH: provider queue bounds
+- CLIENT_RATE_PER_SECOND / CLIENT_BURST: request rate per client (unset: no limit)
+- CLIENT_MAX_QUEUE_WAIT_MS: longest a client request is held before it is shed
+- CLIENT_ID_TRUSTED_PROXIES: comma-separated proxy addresses whose X-Client-ID
+  header names the client (unset: the header is ignored)
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .metrics import LatencyHistogram
+
+DEFAULT_MAX_CONCURRENT = 16
+DEFAULT_MAX_QUEUE_WAIT_MS = 5000
+DEFAULT_MAX_QUEUE_DEPTH = 64
+DEFAULT_CLIENT_MAX_QUEUE_WAIT_MS = 2000
+
+# Queue wait histogram bucket upper bounds in milliseconds
+WAIT_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+# Client buckets kept (least recently seen clients are forgotten first)
+MAX_TRACKED_CLIENTS = 10000
+
+CLIENT_HEADER = b"x-client-id"
+
+# Routes whose requests end in LLM calls
+LLM_ENDPOINTS = frozenset({
+    "/api/query",
+    "/api/query/stream",
+    "/api/query/batch",
+    "/api/generate-random-query",
+})
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; retry_after is in seconds"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """
+    Token bucket with reservations. Not thread-safe; callers hold a lock.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, max_wait: float, now: Optional[float] = None) -> Optional[float]:
+        """
+        Take a token, possibly one that only becomes free in the future.
+        Returns the seconds to wait before using it, or None (nothing
+        reserved) if that would be longer than max_wait.
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def time_until_available(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class ProviderAdmission:
+    """
+    Rate, concurrency and queue limits for the calls to one LLM provider
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        max_queue_wait_ms: float = DEFAULT_MAX_QUEUE_WAIT_MS,
+        max_queue_depth: int = DEFAULT_MAX_QUEUE_DEPTH
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst or max(1.0, rate)) if rate else None
+        self.max_concurrent = max_concurrent
+        self.max_queue_wait = max_queue_wait_ms / 1000
+        self.max_queue_depth = max_queue_depth
+        self.queued = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_histogram = LatencyHistogram(WAIT_BUCKETS_MS)
+        self._slots = threading.Semaphore(max_concurrent)
+        self._lock = threading.Lock()
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionRejected:
+        self.rejected += 1
+        return AdmissionRejected(f"{self.name} is overloaded ({reason}); retry later", retry_after)
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        """
+        Hold one call slot for the duration of the block
+
+        Raises:
+            AdmissionRejected: If the call cannot start within the maximum queue wait
+        """
+        start = time.monotonic()
+        with self._lock:
+            if self.queued >= self.max_queue_depth:
+                raise self._reject("queue full", self.max_queue_wait)
+            wait = 0.0
+            if self.bucket is not None:
+                wait = self.bucket.reserve(self.max_queue_wait, start)
+                if wait is None:
+                    raise self._reject("rate limit", self.bucket.time_until_available(start))
+            self.queued += 1
+
+        try:
+            if wait:
+                time.sleep(wait)
+            acquired = self._slots.acquire(timeout=max(0.0, start + self.max_queue_wait - time.monotonic()))
+        finally:
+            with self._lock:
+                self.queued -= 1
+
+        waited_ms = (time.monotonic() - start) * 1000
+        self.wait_histogram.record(waited_ms)
+        if not acquired:
+            with self._lock:
+                # A slot frees up when some call in flight finishes; the queue wait is the best estimate
+                raise self._reject("all call slots busy", self.max_queue_wait)
+        with self._lock:
+            self.admitted += 1
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'queued': self.queued,
+                'in_flight': self.in_flight,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'max_concurrent': self.max_concurrent,
+                'wait': self.wait_histogram.snapshot(),
+            }
+
+
+_providers: Dict[str, ProviderAdmission] = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider_admission(provider: str) -> ProviderAdmission:
+    with _providers_lock:
+        admission = _providers.get(provider)
+        if admission is None:
+            admission = _providers[provider] = ProviderAdmission(
+                provider,
+                rate=_env_float("LLM_RATE_PER_SECOND"),
+                burst=_env_float("LLM_BURST"),
+                max_concurrent=_env_int("LLM_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT),
+                max_queue_wait_ms=_env_int("LLM_MAX_QUEUE_WAIT_MS", DEFAULT_MAX_QUEUE_WAIT_MS),
+                max_queue_depth=_env_int("LLM_MAX_QUEUE_DEPTH", DEFAULT_MAX_QUEUE_DEPTH)
+            )
+        return admission
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def llm_executor() -> ThreadPoolExecutor:
+    """
+    Executor for blocking work that makes LLM calls. One thread per call a
+    provider can have in flight or queued, so a thread waiting in
+    ProviderAdmission.admit is always either admitted or shed within the
+    queue wait, and never waits behind other waiters for a thread.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            size = _env_int("LLM_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT) + \
+                _env_int("LLM_MAX_QUEUE_DEPTH", DEFAULT_MAX_QUEUE_DEPTH)
+            _executor = ThreadPoolExecutor(max_workers=max(1, size), thread_name_prefix="llm-call")
+        return _executor
+
+
+async def to_llm_thread(func: Callable, *args: Any) -> Any:
+    """
+    asyncio.to_thread for functions that make LLM calls: runs func on
+    llm_executor() with the caller's context variables (tenant, trace)
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(llm_executor(), functools.partial(context.run, func, *args))
+
+
+class ClientAdmission:
+    """
+    Per-client request rate with a bounded asynchronous queue
+    """
+
+    def __init__(self, rate: Optional[float], burst: Optional[float], max_queue_wait_ms: float = DEFAULT_CLIENT_MAX_QUEUE_WAIT_MS):
+        self.rate = rate
+        self.burst = burst or (max(1.0, rate) if rate else None)
+        self.max_queue_wait = max_queue_wait_ms / 1000
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_histogram = LatencyHistogram(WAIT_BUCKETS_MS)
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def admit(self, client: str) -> None:
+        """
+        Raises:
+            AdmissionRejected: If the client's next token is further away than the maximum queue wait
+        """
+        if not self.rate:
+            return
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+                while len(self._buckets) > MAX_TRACKED_CLIENTS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+            wait = bucket.reserve(self.max_queue_wait)
+            if wait is None:
+                self.rejected += 1
+                raise AdmissionRejected("Too many requests from this client", bucket.time_until_available())
+            self.queued += 1
+        try:
+            if wait:
+                await asyncio.sleep(wait)
+        finally:
+            with self._lock:
+                self.queued -= 1
+        with self._lock:
+            self.admitted += 1
+        self.wait_histogram.record(wait * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'queued': self.queued,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'clients': len(self._buckets),
+                'wait': self.wait_histogram.snapshot(),
+            }
+
+
+_clients: Optional[ClientAdmission] = None
+_clients_lock = threading.Lock()
+
+
+def get_client_admission() -> ClientAdmission:
+    global _clients
+    with _clients_lock:
+        if _clients is None:
+            _clients = ClientAdmission(
+                _env_float("CLIENT_RATE_PER_SECOND"),
+                _env_float("CLIENT_BURST"),
+                _env_int("CLIENT_MAX_QUEUE_WAIT_MS", DEFAULT_CLIENT_MAX_QUEUE_WAIT_MS)
+            )
+        return _clients
+
+
+def admission_snapshot() -> Dict[str, Any]:
+    with _providers_lock:
+        providers = list(_providers.items())
+    return {
+        'providers': {name: admission.stats() for name, admission in providers},
+        'clients': get_client_admission().stats(),
+    }
+
+
+def reset_admission() -> None:
+    global _clients, _executor
+    with _providers_lock:
+        _providers.clear()
+    with _clients_lock:
+        _clients = None
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = None
+
+
+def trusted_proxies() -> frozenset:
+    value = os.environ.get("CLIENT_ID_TRUSTED_PROXIES")
+    return frozenset(address.strip() for address in value.split(',') if address.strip()) if value else frozenset()
+
+
+def client_key(scope) -> str:
+    """
+    Rate limit key of a request: the client address, or the X-Client-ID
+    header when the request comes from a trusted proxy
+    """
+    address = scope["client"][0] if scope.get("client") else "unknown"
+    if address in trusted_proxies():
+        header = dict(scope["headers"]).get(CLIENT_HEADER)
+        if header:
+            return header.decode("latin-1").strip()
+    return address
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying the per-client rate to LLM_ENDPOINTS. Over-rate
+    requests wait up to CLIENT_MAX_QUEUE_WAIT_MS, then get a 429.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in LLM_ENDPOINTS:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await get_client_admission().admit(client_key(scope))
+        except AdmissionRejected as e:
+            body = json.dumps({"detail": str(e)}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", e.retry_after_header.encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,116 @@
+"""
+Batch processing of natural language queries.
+
+A batch shares one schema fetch, answers each distinct question once, runs
+SQL generation with bounded concurrency and executes every generated query
+on its own read-only connection as soon as its SQL is ready.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .admission import to_llm_thread
+from .constants import BATCH_QUERY_CONCURRENCY
+from .data_models import BatchQueryItem, QueryRequest
+from .llm_processor import generate_sql_with_source, remember_sql
+from .sql_processor import execute_sql_safely
+
+
+def normalize_question(query: str) -> str:
+    """
+    Key under which identical questions are deduplicated
+    """
+    return " ".join(query.split()).casefold()
+
+
+def batch_concurrency(max_concurrency: Optional[int] = None) -> int:
+    if max_concurrency:
+        return max_concurrency
+    value = os.environ.get("BATCH_QUERY_CONCURRENCY")
+    return int(value) if value else BATCH_QUERY_CONCURRENCY
+
+
+async def _answer_query(
+    query: str,
+    llm_provider: str,
+    schema_info: Dict[str, Any],
+    generation_limit: asyncio.Semaphore,
+    use_cache: bool
+) -> BatchQueryItem:
+    """
+    Generate and execute SQL for one question, recording per-stage timings
+    """
+    sql = ""
+    generation_time = 0.0
+    execution_time = 0.0
+    try:
+        async with generation_limit:
+            start = time.perf_counter()
+            request = QueryRequest(query=query, llm_provider=llm_provider)
+            sql, source = await to_llm_thread(generate_sql_with_source, request, schema_info)
+            generation_time = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        result = await asyncio.to_thread(execute_sql_safely, sql, True, use_cache)
+        execution_time = (time.perf_counter() - start) * 1000
+        if not result['error']:
+            remember_sql(request, schema_info, sql, source)
+    except Exception as e:
+        result = {'results': [], 'columns': [], 'error': str(e)}
+
+    return BatchQueryItem(
+        query=query,
+        sql=sql,
+        results=result['results'],
+        columns=result['columns'],
+        row_count=len(result['results']),
+        generation_time_ms=generation_time,
+        execution_time_ms=execution_time,
+        error=result['error']
+    )
+
+
+async def run_batch_queries(
+    queries: List[str],
+    schema_info: Dict[str, Any],
+    llm_provider: str = "openai",
+    max_concurrency: Optional[int] = None,
+    use_cache: bool = True
+) -> Tuple[List[BatchQueryItem], int]:
+    """
+    Answer a batch of natural language questions concurrently.
+
+    Args:
+        queries: Questions in request order
+        schema_info: Schema fetched once for the whole batch
+        llm_provider: Preferred provider (see generate_sql routing)
+        max_concurrency: Maximum concurrent LLM generations (BATCH_QUERY_CONCURRENCY)
+        use_cache: Whether execution may use the result cache
+
+    Returns:
+        Tuple of (one item per question in request order, number of distinct questions)
+    """
+    generation_limit = asyncio.Semaphore(batch_concurrency(max_concurrency))
+
+    unique: Dict[str, str] = {}
+    for query in queries:
+        unique.setdefault(normalize_question(query), query)
+
+    answers = await asyncio.gather(*(
+        _answer_query(query, llm_provider, schema_info, generation_limit, use_cache)
+        for query in unique.values()
+    ))
+    by_key = dict(zip(unique, answers))
+
+    items = []
+    answered = set()
+    for query in queries:
+        key = normalize_question(query)
+        if key in answered:
+            items.append(by_key[key].model_copy(update={'query': query, 'deduplicated': True}))
+        else:
+            answered.add(key)
+            items.append(by_key[key])
+    return items, len(unique)
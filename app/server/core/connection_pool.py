@@ -0,0 +1,385 @@
+"""
+Long-lived SQLite connections with statement-cache accounting.
+
+Opening a fresh connection per call throws away sqlite3's prepared-statement
+cache, so every repeated query, insights query and PRAGMA lookup is compiled
+again. Pools keep connections open per database path (and read-only flag)
+with a larger cached_statements size.
+
+Each pooled connection measures its statement cache with two SQLite hooks:
+the authorizer only runs while a statement is being compiled, and the trace
+callback runs on every execution. An execution without authorizer calls was
+served by a cached prepared statement. Counts are aggregated per SQL text
+in a process-wide registry of hot statements. The text is the statement as
+executed, with placeholders: the trace callback only sees it with the bound
+values expanded, so connections record it themselves (StatementConnection).
+
+The authorizer also records the tables each statement reads, which the
+result cache uses for invalidation (see PooledConnection.last_tables).
+
+Pools are kept in an LRU of at most SQLITE_MAX_POOLS databases (one per
+tenant and mode, see core.tenancy); evicted pools close their idle
+connections, and connections still checked out are closed on release.
+
+Configuration (environment variables):
+- SQLITE_POOL_SIZE: idle connections kept per database (0 disables pooling)
+- SQLITE_CACHED_STATEMENTS: prepared statements cached per connection
+- SQLITE_MAX_POOLS: databases with an open pool
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, FrozenSet, Iterator, Optional, Set
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_CACHED_STATEMENTS = 256
+DEFAULT_MAX_POOLS = 64
+
+# Distinct SQL texts tracked by the hot statement registry
+MAX_TRACKED_STATEMENTS = 1000
+
+
+class StatementRegistry:
+    """
+    Cross-request execution and compile counts per SQL text
+    """
+
+    def __init__(self, max_statements: int = MAX_TRACKED_STATEMENTS):
+        self.max_statements = max_statements
+        self.statements: "OrderedDict[str, list[int]]" = OrderedDict()
+        self.executions = 0
+        self.compiles = 0
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, compiled: bool) -> None:
+        with self._lock:
+            self.executions += 1
+            self.compiles += compiled
+            counts = self.statements.get(sql)
+            if counts is None:
+                counts = self.statements[sql] = [0, 0]
+                while len(self.statements) > self.max_statements:
+                    self.statements.popitem(last=False)
+            else:
+                self.statements.move_to_end(sql)
+            counts[0] += 1
+            counts[1] += compiled
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        """
+        Overall statement cache hit rate and the most executed statements
+        """
+        with self._lock:
+            hot = sorted(self.statements.items(), key=lambda item: item[1][0], reverse=True)[:top]
+            executions, compiles = self.executions, self.compiles
+        return {
+            'executions': executions,
+            'compiles': compiles,
+            'hit_rate': round(1 - compiles / executions, 4) if executions else None,
+            'hot_statements': [
+                {
+                    'sql': sql,
+                    'executions': counts[0],
+                    'compiles': counts[1],
+                    'hit_rate': round(1 - counts[1] / counts[0], 4),
+                }
+                for sql, counts in hot
+            ],
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self.statements.clear()
+            self.executions = 0
+            self.compiles = 0
+
+
+_registry = StatementRegistry()
+
+
+def get_statement_registry() -> StatementRegistry:
+    return _registry
+
+
+class StatementCursor(sqlite3.Cursor):
+    """
+    Cursor that records the statement it executes on its connection
+    """
+
+    def execute(self, sql: str, parameters: Any = ()) -> sqlite3.Cursor:
+        self.connection.executing = sql
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.executing = None
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> sqlite3.Cursor:
+        self.connection.executing = sql
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.executing = None
+
+
+class StatementConnection(sqlite3.Connection):
+    """
+    sqlite3 connection that knows the text of the statement being executed
+    """
+
+    executing: Optional[str] = None
+
+    def cursor(self, factory: Any = StatementCursor) -> sqlite3.Cursor:
+        return super().cursor(factory)
+
+    # The built-in shortcuts would bypass StatementCursor
+    def execute(self, sql: str, parameters: Any = ()) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class PooledConnection:
+    """
+    A sqlite3 connection instrumented for statement cache accounting
+    """
+
+    def __init__(self, conn: sqlite3.Connection, cached_statements: int):
+        self.conn = conn
+        self.cached_statements = cached_statements
+        self.last_tables: Optional[FrozenSet[str]] = None
+        self._compiling = False
+        self._compiling_transaction = False
+        self._pending_tables: Set[str] = set()
+        # Tables read per cached statement, mirroring sqlite3's LRU statement cache
+        self._statement_tables: "OrderedDict[str, FrozenSet[str]]" = OrderedDict()
+        conn.set_authorizer(self._authorize)
+        conn.set_trace_callback(self._trace)
+
+    def _authorize(self, action, arg1, arg2, db_name, trigger):
+        if action == sqlite3.SQLITE_TRANSACTION:
+            # May be the implicit BEGIN, compiled while a write is being executed
+            self._compiling_transaction = True
+        else:
+            self._compiling = True
+        if action == sqlite3.SQLITE_READ and arg1 and not arg1.startswith('sqlite_'):
+            self._pending_tables.add(arg1)
+        return sqlite3.SQLITE_OK
+
+    def _trace(self, sql: str) -> None:
+        executing = getattr(self.conn, 'executing', None)
+        if executing is not None:
+            if sql == "BEGIN " + (self.conn.isolation_level or ""):
+                # sqlite3 begins a transaction before a write, between compiling and running it
+                self._compiling_transaction = False
+                _registry.record(sql, True)
+                return
+            # Key on the statement text, not the expanded SQL with its bound values
+            sql = executing
+        compiled = self._compiling or self._compiling_transaction
+        if compiled:
+            tables = frozenset(self._pending_tables)
+            self._statement_tables[sql] = tables
+            self._statement_tables.move_to_end(sql)
+            while len(self._statement_tables) > self.cached_statements:
+                self._statement_tables.popitem(last=False)
+        else:
+            tables = self._statement_tables.get(sql)
+        self._compiling = False
+        self._compiling_transaction = False
+        self._pending_tables = set()
+        self.last_tables = tables
+        _registry.record(sql, compiled)
+
+    def cursor(self, row_factory: Any = None) -> sqlite3.Cursor:
+        """
+        New cursor; resets last_tables so it describes the next statement only
+        """
+        self.last_tables = None
+        self._compiling = False
+        self._compiling_transaction = False
+        self._pending_tables = set()
+        cursor = self.conn.cursor()
+        if row_factory is not None:
+            cursor.row_factory = row_factory
+        return cursor
+
+    def reset(self) -> None:
+        """
+        End any open transaction before the connection is reused
+        """
+        if self.conn.in_transaction:
+            self.conn.rollback()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of connections to one database
+    """
+
+    def __init__(
+        self,
+        database: str,
+        read_only: bool = False,
+        size: int = DEFAULT_POOL_SIZE,
+        cached_statements: int = DEFAULT_CACHED_STATEMENTS,
+        immutable: bool = False
+    ):
+        self.database = database
+        # Immutable files (published snapshots) are opened without any locking
+        self.immutable = immutable
+        self.read_only = read_only or immutable
+        self.size = size
+        self.cached_statements = cached_statements
+        self.created = 0
+        self.reused = 0
+        self._idle: "queue.LifoQueue[PooledConnection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self) -> PooledConnection:
+        if self.read_only:
+            conn = sqlite3.connect(
+                f"file:{self.database}?mode=ro" + ("&immutable=1" if self.immutable else ""),
+                uri=True,
+                check_same_thread=False,
+                cached_statements=self.cached_statements,
+                factory=StatementConnection
+            )
+        else:
+            conn = sqlite3.connect(
+                self.database,
+                check_same_thread=False,
+                cached_statements=self.cached_statements,
+                factory=StatementConnection
+            )
+        with self._lock:
+            self.created += 1
+        return PooledConnection(conn, self.cached_statements)
+
+    def acquire(self) -> PooledConnection:
+        """
+        Check out a connection. Never blocks: when every pooled connection is
+        busy an extra one is opened and closed again on release.
+        """
+        try:
+            pooled = self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+        with self._lock:
+            self.reused += 1
+        return pooled
+
+    def release(self, pooled: PooledConnection) -> None:
+        """
+        Return a connection to the pool (or close it if the pool is full or closed)
+        """
+        try:
+            pooled.reset()
+            keep = not self._closed and self._idle.qsize() < self.size
+        except sqlite3.Error:
+            keep = False
+        if keep:
+            self._idle.put(pooled)
+        else:
+            pooled.conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledConnection]:
+        """
+        Check out a connection for the duration of a with block
+        """
+        pooled = self.acquire()
+        try:
+            yield pooled
+        finally:
+            self.release(pooled)
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().conn.close()
+            except queue.Empty:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'database': self.database,
+                'read_only': self.read_only,
+                'immutable': self.immutable,
+                'idle': self._idle.qsize(),
+                'size': self.size,
+                'created': self.created,
+                'reused': self.reused,
+            }
+
+
+_pools: "OrderedDict[tuple[str, bool, bool], ConnectionPool]" = OrderedDict()
+_pools_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def get_pool(database: str = "db/database.db", read_only: bool = False, immutable: bool = False) -> ConnectionPool:
+    """
+    Process-wide pool for a database path
+    """
+    key = (database, read_only or immutable, immutable)
+    evicted = []
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                database,
+                read_only,
+                size=_env_int("SQLITE_POOL_SIZE", DEFAULT_POOL_SIZE),
+                cached_statements=_env_int("SQLITE_CACHED_STATEMENTS", DEFAULT_CACHED_STATEMENTS),
+                immutable=immutable
+            )
+            while len(_pools) > max(1, _env_int("SQLITE_MAX_POOLS", DEFAULT_MAX_POOLS)):
+                evicted.append(_pools.popitem(last=False)[1])
+        else:
+            _pools.move_to_end(key)
+    for old_pool in evicted:
+        old_pool.close()
+    return pool
+
+
+def close_all_pools() -> None:
+    """
+    Close every pooled connection (tests, shutdown, or after replacing the database file)
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def close_pool(database: str) -> None:
+    """
+    Close the pools of one database file (e.g. a superseded snapshot)
+    """
+    with _pools_lock:
+        keys = [key for key in _pools if key[0] == database]
+        pools = [_pools.pop(key) for key in keys]
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats() -> Dict[str, Any]:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {
+        'pools': [pool.stats() for pool in pools],
+        'statements': _registry.stats(),
+    }
@@ -12,10 +12,46 @@ Examples:
 - Nested object {"user": {"profile": {"name": "John"}}} becomes "user__profile__name"
 - Array field {"items": ["a", "b"]} becomes "items_0" and "items_1"
 - Complex structure {"tags": [{"name": "tag1"}, {"name": "tag2"}]} becomes "tags_0__name", "tags_1__name"
+- Lists longer than MAX_LIST_FANOUT are not exploded; {"ids": [1, 2, ..., 10000]}
+  becomes a single "ids" column holding the JSON text of the list. In a JSONL
+  file the choice is made per field: once "ids" is too long in one row, it is
+  JSON text in every row
 """
 
 # Delimiter for nested object fields
 NESTED_DELIMITER = "__"
 
 # Delimiter for list/array indices
-LIST_INDEX_DELIMITER = "_"
\ No newline at end of file
+LIST_INDEX_DELIMITER = "_"
+
+# Lists with more elements than this are stored as JSON text instead of one column per index
+MAX_LIST_FANOUT = 50
+
+# Upper bound on memoized key paths kept per flatten key cache
+FLATTEN_KEY_CACHE_SIZE = 100_000
+
+# JSONL storage modes: explode every nested key into a column, or keep nested
+# structures as JSON text columns queried with SQLite's json_extract
+JSONL_STORAGE_FLATTEN = "flatten"
+JSONL_STORAGE_JSON = "json"
+JSONL_STORAGE_MODES = (JSONL_STORAGE_FLATTEN, JSONL_STORAGE_JSON)
+
+# Maximum JSON paths described per JSON column in schema info and LLM prompts
+JSON_PATHS_PER_COLUMN = 25
+
+# Streaming JSON array ingestion: bytes read per chunk and objects per batched insert
+JSON_STREAM_CHUNK_SIZE = 1 << 20
+JSON_INSERT_BATCH_SIZE = 5000
+
+# Representative text values kept per column in schema info (used for schema retrieval)
+SAMPLE_VALUES_PER_COLUMN = 3
+SAMPLE_VALUE_MAX_LENGTH = 64
+
+# Tables whose sampled JSON paths and values are kept between schema describes
+SAMPLE_DESCRIPTION_CACHE_SIZE = 1024
+
+# Rows fetched and sent per batch when streaming query results
+STREAM_ROW_BATCH_SIZE = 500
+
+# Concurrent LLM generations per /api/query/batch request (overridable with BATCH_QUERY_CONCURRENCY)
+BATCH_QUERY_CONCURRENCY = 8
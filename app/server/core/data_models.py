@@ -19,6 +19,7 @@ class QueryRequest(BaseModel):
     query: str = Field(..., description="Natural language query")
     llm_provider: Literal["openai", "anthropic"] = "openai"
     table_name: Optional[str] = None  # If querying specific table
+    bypass_cache: bool = False  # Skip cached SQL and cached results
 
 class QueryResponse(BaseModel):
     sql: str
@@ -28,6 +29,30 @@ class QueryResponse(BaseModel):
     execution_time_ms: float
     error: Optional[str] = None
 
+# Batch Query Models
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=100, description="Natural language queries")
+    llm_provider: Literal["openai", "anthropic"] = "openai"
+    max_concurrency: Optional[int] = Field(None, ge=1, le=32)  # Defaults to BATCH_QUERY_CONCURRENCY
+    bypass_cache: bool = False
+
+class BatchQueryItem(BaseModel):
+    query: str
+    sql: str
+    results: List[Dict[str, Any]]
+    columns: List[str]
+    row_count: int
+    generation_time_ms: float
+    execution_time_ms: float
+    deduplicated: bool = False  # True if this answer was shared with an identical earlier question
+    error: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryItem]
+    unique_queries: int
+    total_time_ms: float
+    error: Optional[str] = None
+
 # Database Schema Models
 class ColumnInfo(BaseModel):
     name: str
@@ -79,6 +104,25 @@ class RandomQueryResponse(BaseModel):
     error: Optional[str] = None
 
 # Health Check Models
+# Profiling Models
+class ProfileWindowRequest(BaseModel):
+    seconds: float = Field(10.0, gt=0, le=300)
+    interval_ms: Optional[float] = Field(None, ge=1, le=1000)  # Defaults to PROFILE_INTERVAL_MS
+
+class ProfileWindowResponse(BaseModel):
+    profile_id: str
+    seconds: float
+    folded_path: str
+
+class ProfileListResponse(BaseModel):
+    profiles: List[Dict[str, Any]]
+
+class SnapshotResponse(BaseModel):
+    mode: Literal["off", "writer", "reader"]
+    version: Optional[int] = None
+    published_at: Optional[str] = None
+    database: Optional[str] = None
+
 class HealthCheckRequest(BaseModel):
     pass
 
@@ -87,4 +131,5 @@ class HealthCheckResponse(BaseModel):
     database_connected: bool
     tables_count: int
     version: str = "1.0.0"
-    uptime_seconds: float
\ No newline at end of file
+    uptime_seconds: float
+    worker_pid: Optional[int] = None
\ No newline at end of file
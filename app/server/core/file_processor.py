@@ -3,16 +3,43 @@ import pandas as pd
 import sqlite3
 import io
 import re
-from typing import Dict, Any, Set
+from typing import Dict, Any, Set, Iterable, List, Optional, Tuple, Union, BinaryIO
 from .sql_security import (
     execute_query_safely,
+    escape_identifier,
     validate_identifier,
     SQLSecurityError
 )
-from .constants import NESTED_DELIMITER, LIST_INDEX_DELIMITER
+from . import json_parser
+from .tenancy import tenant_path
+from .constants import (
+    NESTED_DELIMITER,
+    LIST_INDEX_DELIMITER,
+    MAX_LIST_FANOUT,
+    FLATTEN_KEY_CACHE_SIZE,
+    JSONL_STORAGE_FLATTEN,
+    JSONL_STORAGE_JSON,
+    JSONL_STORAGE_MODES,
+    JSON_INSERT_BATCH_SIZE
+)
 
 # Database path - can be overridden for testing
-DATABASE_PATH = "db/database.db"
+DATABASE_PATH = "db/database.db"  # Default tenant; see core.tenancy
+
+# Allowed segment in an indexed JSON path such as "user.profile.name" or "tags.0.name"
+JSON_PATH_SEGMENT_PATTERN = re.compile(r'^(?:[A-Za-z_][A-Za-z0-9_]*|[0-9]+)$')
+
+# Arrow type id -> SQLite column affinity for columnar (Parquet/Arrow) ingestion
+ARROW_SQLITE_TYPES = {
+    'int': 'INTEGER',
+    'bool': 'INTEGER',
+    'float': 'REAL',
+    'decimal': 'REAL',
+    'string': 'TEXT',
+    'temporal': 'TEXT',
+    'binary': 'BLOB',
+    'nested': 'TEXT',
+}
 
 def sanitize_table_name(table_name: str) -> str:
     """
@@ -58,7 +85,7 @@ def convert_csv_to_sqlite(csv_content: bytes, table_name: str) -> Dict[str, Any]
         df.columns = [col.lower().replace(' ', '_').replace('-', '_') for col in df.columns]
         
         # Connect to SQLite database
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = sqlite3.connect(tenant_path(DATABASE_PATH, create=True))
         
         # Write DataFrame to SQLite
         df.to_sql(table_name, conn, if_exists='replace', index=False)
@@ -105,105 +132,373 @@ def convert_csv_to_sqlite(csv_content: bytes, table_name: str) -> Dict[str, Any]
     except Exception as e:
         raise Exception(f"Error converting CSV to SQLite: {str(e)}")
 
-def convert_json_to_sqlite(json_content: bytes, table_name: str) -> Dict[str, Any]:
+def _append_json_batch(
+    conn: sqlite3.Connection,
+    table_name: str,
+    batch: List[Dict[str, Any]],
+    known_columns: List[str]
+) -> None:
     """
-    Convert JSON file content to SQLite table
+    Insert one batch of JSON objects, creating the table on the first batch
+    and adding any columns that first appear in later batches.
     """
-    try:
-        # Sanitize table name
-        table_name = sanitize_table_name(table_name)
-        
-        # Parse JSON
-        data = json.loads(json_content.decode('utf-8'))
-        
-        # Ensure it's a list of objects
-        if not isinstance(data, list):
-            raise ValueError("JSON must be an array of objects")
-        
-        if not data:
-            raise ValueError("JSON array is empty")
-        
-        # Convert to pandas DataFrame
-        df = pd.DataFrame(data)
-        
-        # Clean column names
-        df.columns = [col.lower().replace(' ', '_').replace('-', '_') for col in df.columns]
-        
-        # Connect to SQLite database
-        conn = sqlite3.connect(DATABASE_PATH)
-        
-        # Write DataFrame to SQLite
+    df = pd.DataFrame(batch)
+    
+    # Clean column names
+    df.columns = [col.lower().replace(' ', '_').replace('-', '_') for col in df.columns]
+    
+    if not known_columns:
         df.to_sql(table_name, conn, if_exists='replace', index=False)
-        
-        # Get schema information using safe query execution
-        cursor_info = execute_query_safely(
-            conn,
-            "PRAGMA table_info({table})",
-            identifier_params={'table': table_name}
-        )
-        columns_info = cursor_info.fetchall()
-        
-        schema = {}
-        for col in columns_info:
-            schema[col[1]] = col[2]  # column_name: data_type
-        
-        # Get sample data using safe query execution
-        cursor_sample = execute_query_safely(
-            conn,
-            "SELECT * FROM {table} LIMIT 5",
-            identifier_params={'table': table_name}
-        )
-        sample_rows = cursor_sample.fetchall()
-        column_names = [col[1] for col in columns_info]
-        sample_data = [dict(zip(column_names, row)) for row in sample_rows]
-        
-        # Get row count using safe query execution
-        cursor_count = execute_query_safely(
+        known_columns.extend(df.columns)
+        return
+    
+    for column in df.columns:
+        if column in known_columns:
+            continue
+        kind = df[column].dtype.kind
+        column_type = 'INTEGER' if kind in 'iub' else 'REAL' if kind == 'f' else 'TEXT'
+        execute_query_safely(
             conn,
-            "SELECT COUNT(*) FROM {table}",
-            identifier_params={'table': table_name}
+            f"ALTER TABLE {{table}} ADD COLUMN {_quote_column(column)} {column_type}",
+            identifier_params={'table': table_name},
+            allow_ddl=True
         )
-        row_count = cursor_count.fetchone()[0]
+        known_columns.append(column)
+    
+    df.to_sql(table_name, conn, if_exists='append', index=False)
+
+def convert_json_to_sqlite(
+    json_content: Union[bytes, BinaryIO],
+    table_name: str,
+    batch_size: int = JSON_INSERT_BATCH_SIZE
+) -> Dict[str, Any]:
+    """
+    Convert JSON file content to SQLite table.
+    
+    The top-level array is parsed incrementally and inserted in batches, so
+    memory is bounded by batch_size rather than by the size of the file.
+    
+    Args:
+        json_content: The raw JSON content, or a binary file object to stream from
+        table_name: Name for the SQLite table
+        batch_size: Number of objects per batched insert
         
-        conn.close()
+    Returns:
+        Dict containing table info, schema, row count, and sample data
+    """
+    try:
+        # Sanitize table name
+        table_name = sanitize_table_name(table_name)
         
-        return {
-            'table_name': table_name,
-            'schema': schema,
-            'row_count': row_count,
-            'sample_data': sample_data
-        }
+        stream = io.BytesIO(json_content) if isinstance(json_content, (bytes, bytearray)) else json_content
+        
+        # Rows land in a staging table; the existing table is replaced only
+        # once the whole array has parsed
+        staging_table = f"{table_name}__staging"
+        conn = None
+        try:
+            known_columns = []
+            batch = []
+            for obj in json_parser.iter_json_array(stream):
+                # Ensure it's a list of objects
+                if not isinstance(obj, dict):
+                    raise ValueError("JSON must be an array of objects")
+                batch.append(obj)
+                if len(batch) >= batch_size:
+                    # Connect once the first batch has parsed successfully
+                    conn = conn or _connect_for_staging(staging_table)
+                    _append_json_batch(conn, staging_table, batch, known_columns)
+                    batch = []
+            if batch:
+                conn = conn or _connect_for_staging(staging_table)
+                _append_json_batch(conn, staging_table, batch, known_columns)
+            
+            if not known_columns:
+                raise ValueError("JSON array is empty")
+            
+            _swap_in_staging_table(conn, staging_table, table_name)
+            return _collect_table_info(conn, table_name)
+        except Exception:
+            if conn is not None:
+                _discard_staging_table(conn, staging_table)
+            raise
+        finally:
+            if conn is not None:
+                conn.close()
         
     except Exception as e:
         raise Exception(f"Error converting JSON to SQLite: {str(e)}")
 
-def flatten_json_object(obj: Any, prefix: str = "") -> Dict[str, Any]:
+def _connect_for_staging(staging_table: str) -> sqlite3.Connection:
+    """
+    Connection to the tenant database with no staging table left over from an earlier failed load
+    """
+    conn = sqlite3.connect(tenant_path(DATABASE_PATH, create=True))
+    execute_query_safely(conn, "DROP TABLE IF EXISTS {table}", identifier_params={'table': staging_table}, allow_ddl=True)
+    conn.commit()
+    return conn
+
+def _discard_staging_table(conn: sqlite3.Connection, staging_table: str) -> None:
+    """
+    Drop a partly loaded staging table after a failed load, leaving the existing table as it was
+    """
+    conn.rollback()
+    execute_query_safely(conn, "DROP TABLE IF EXISTS {table}", identifier_params={'table': staging_table}, allow_ddl=True)
+    conn.commit()
+
+def _swap_in_staging_table(conn: sqlite3.Connection, staging_table: str, table_name: str) -> None:
+    """
+    Replace table_name with the fully loaded staging table in one transaction
+    """
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        execute_query_safely(conn, "DROP TABLE IF EXISTS {table}", identifier_params={'table': table_name}, allow_ddl=True)
+        execute_query_safely(
+            conn,
+            "ALTER TABLE {staging} RENAME TO {table}",
+            identifier_params={'staging': staging_table, 'table': table_name},
+            allow_ddl=True
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def _child_path(path: str, key: Any, key_cache: Dict[Tuple[str, Any], str]) -> str:
+    """
+    Flattened path of a dict key (str) or list index (int) below path, memoized in key_cache
+    """
+    child_path = key_cache.get((path, key))
+    if child_path is None:
+        if isinstance(key, int):
+            child_path = f"{path}{LIST_INDEX_DELIMITER}{key}"
+        else:
+            child_path = f"{path}{NESTED_DELIMITER}{key}" if path else key
+        if len(key_cache) < FLATTEN_KEY_CACHE_SIZE:
+            key_cache[(path, key)] = child_path
+    return child_path
+
+def find_wide_lists(
+    documents: Iterable[Any],
+    key_cache: Optional[Dict[Tuple[str, Any], str]] = None
+) -> Set[str]:
+    """
+    Paths of the lists longer than MAX_LIST_FANOUT in any of the documents.
+
+    Passed to flatten_json_object as json_lists, so a list that is too long
+    in one document is stored as JSON text in every document, and its field
+    gets one representation across the file.
+
+    Args:
+        documents: Parsed JSON documents
+        key_cache: Optional memo of flattened paths (see flatten_json_object)
+
+    Returns:
+        Set of flattened list paths
+    """
+    if key_cache is None:
+        key_cache = {}
+
+    wide_lists = set()
+    for document in documents:
+        stack = [("", document)]
+        while stack:
+            path, value = stack.pop()
+            if isinstance(value, list) and len(value) > MAX_LIST_FANOUT:
+                wide_lists.add(path)
+                continue
+            children = value.items() if isinstance(value, dict) else enumerate(value) if isinstance(value, list) else ()
+            for key, child in children:
+                # Only containers can hold lists
+                if isinstance(child, (dict, list)):
+                    stack.append((_child_path(path, key, key_cache), child))
+    return wide_lists
+
+def flatten_json_object(
+    obj: Any,
+    prefix: str = "",
+    key_cache: Optional[Dict[Tuple[str, Any], str]] = None,
+    json_lists: Optional[Set[str]] = None
+) -> Dict[str, Any]:
     """
     Flatten a nested JSON object using delimiter constants.
-    
+
+    Walks the document with an explicit stack and writes every leaf into a
+    single output dict, so deeply nested documents cannot hit the recursion
+    limit and no intermediate dicts are built per level. Lists longer than
+    MAX_LIST_FANOUT, and lists at the json_lists paths, are stored as JSON
+    text under their own key.
+
     Args:
         obj: The object to flatten (can be dict, list, or primitive)
         prefix: The current prefix for nested keys
-        
+        key_cache: Optional memo of (parent_path, key) -> flattened path,
+            shared across documents so repeated key paths are built once
+        json_lists: Paths of lists to store as JSON text whatever their
+            length; see find_wide_lists
+
     Returns:
         Dict with flattened key-value pairs
     """
+    if key_cache is None:
+        key_cache = {}
+
     result = {}
-    
-    if isinstance(obj, dict):
-        for key, value in obj.items():
-            new_key = f"{prefix}{NESTED_DELIMITER}{key}" if prefix else key
-            result.update(flatten_json_object(value, new_key))
-    elif isinstance(obj, list):
-        for i, value in enumerate(obj):
-            new_key = f"{prefix}{LIST_INDEX_DELIMITER}{i}"
-            result.update(flatten_json_object(value, new_key))
-    else:
-        # Primitive value (string, number, boolean, null)
-        result[prefix] = obj
-    
+    stack = [(prefix, obj)]
+
+    while stack:
+        path, value = stack.pop()
+
+        if isinstance(value, dict):
+            children = []
+            for key, child in value.items():
+                child_path = key_cache.get((path, key))
+                if child_path is None:
+                    child_path = f"{path}{NESTED_DELIMITER}{key}" if path else key
+                    if len(key_cache) < FLATTEN_KEY_CACHE_SIZE:
+                        key_cache[(path, key)] = child_path
+                children.append((child_path, child))
+            # Reverse so keys are emitted in document order
+            stack.extend(reversed(children))
+        elif isinstance(value, list):
+            if len(value) > MAX_LIST_FANOUT or (json_lists and path in json_lists):
+                result[path] = json_parser.dumps(value)
+                continue
+            children = []
+            for i, child in enumerate(value):
+                child_path = key_cache.get((path, i))
+                if child_path is None:
+                    child_path = f"{path}{LIST_INDEX_DELIMITER}{i}"
+                    if len(key_cache) < FLATTEN_KEY_CACHE_SIZE:
+                        key_cache[(path, i)] = child_path
+                children.append((child_path, child))
+            stack.extend(reversed(children))
+        else:
+            # Primitive value (string, number, boolean, null)
+            result[path] = value
+
     return result
 
+def split_json_object(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Keep top-level scalar fields as-is and serialize nested objects and lists
+    to JSON text, for the JSON1 storage mode.
+
+    Keys are cleaned into column names here (lowercased, spaces and hyphens
+    replaced), so they match the source column of an indexed path (see
+    parse_json_index_path) and keys differing only in case share one column
+    instead of producing duplicate columns.
+
+    Args:
+        obj: A top-level JSON object
+
+    Returns:
+        Dict mapping each column name to a scalar or JSON text
+
+    Raises:
+        ValueError: If two keys of the object clean to the same column name
+    """
+    row = {
+        key.lower().replace(' ', '_').replace('-', '_'):
+            json_parser.dumps(value) if isinstance(value, (dict, list)) else value
+        for key, value in obj.items()
+    }
+    if len(row) < len(obj):
+        keys_by_column: Dict[str, List[str]] = {}
+        for key in obj:
+            keys_by_column.setdefault(key.lower().replace(' ', '_').replace('-', '_'), []).append(key)
+        raise ValueError(
+            "Keys collide after normalization: "
+            + "; ".join(", ".join(repr(key) for key in keys) for keys in keys_by_column.values() if len(keys) > 1)
+        )
+    return row
+
+def parse_json_index_path(path: str) -> Tuple[str, str, str]:
+    """
+    Parse a dotted JSON path used for a generated column.
+
+    The first segment names the JSON column, the remaining segments address
+    a value inside it; numeric segments are array indices.
+
+    Args:
+        path: Dotted path such as "user.profile.name" or "tags.0.name"
+
+    Returns:
+        Tuple of (source column, SQLite JSON path, generated column name)
+    """
+    segments = [segment.strip() for segment in path.strip().split('.')]
+    if len(segments) < 2:
+        raise ValueError(f"Indexed path '{path}' must include a column and at least one nested key")
+    for segment in segments:
+        if not JSON_PATH_SEGMENT_PATTERN.match(segment):
+            raise ValueError(f"Invalid segment '{segment}' in indexed path '{path}'")
+    if segments[0].isdigit():
+        raise ValueError(f"Indexed path '{path}' must start with a column name")
+
+    source_column = segments[0].lower()
+    json_path = "$"
+    column_name = source_column
+    for segment in segments[1:]:
+        if segment.isdigit():
+            json_path += f"[{segment}]"
+            column_name += f"{LIST_INDEX_DELIMITER}{segment}"
+        else:
+            json_path += f".{segment}"
+            column_name += f"{NESTED_DELIMITER}{segment.lower()}"
+
+    return source_column, json_path, column_name
+
+def add_json_path_indexes(conn: sqlite3.Connection, table_name: str, indexed_paths: List[str]) -> List[str]:
+    """
+    Add a virtual generated column plus an index for each hot JSON path.
+
+    Args:
+        conn: SQLite connection object
+        table_name: Table holding the JSON text columns
+        indexed_paths: Dotted paths such as "user.profile.name"
+
+    Returns:
+        List of generated column names
+    """
+    cursor_info = execute_query_safely(
+        conn,
+        "PRAGMA table_info({table})",
+        identifier_params={'table': table_name}
+    )
+    existing_columns = {col[1] for col in cursor_info.fetchall()}
+
+    generated_columns = []
+    for path in indexed_paths:
+        source_column, json_path, column_name = parse_json_index_path(path)
+        if source_column not in existing_columns:
+            raise ValueError(f"Indexed path '{path}' does not refer to a column of '{table_name}'")
+        if column_name in existing_columns or column_name in generated_columns:
+            continue
+
+        # json_path is built only from validated segments, so it is safe to inline
+        execute_query_safely(
+            conn,
+            f"ALTER TABLE {{table}} ADD COLUMN {{column}} "
+            f"GENERATED ALWAYS AS (json_extract({{source}}, '{json_path}')) VIRTUAL",
+            identifier_params={'table': table_name, 'column': column_name, 'source': source_column},
+            allow_ddl=True
+        )
+        execute_query_safely(
+            conn,
+            "CREATE INDEX IF NOT EXISTS {index} ON {table} ({column})",
+            identifier_params={
+                'index': f"idx_{table_name}_{column_name}",
+                'table': table_name,
+                'column': column_name
+            },
+            allow_ddl=True
+        )
+        generated_columns.append(column_name)
+
+    conn.commit()
+    return generated_columns
+
 def discover_jsonl_fields(jsonl_content: bytes) -> Set[str]:
     """
     Discover all possible field names by scanning the entire JSONL file.
@@ -214,35 +509,58 @@ def discover_jsonl_fields(jsonl_content: bytes) -> Set[str]:
     Returns:
         Set of all flattened field names found in the file
     """
-    all_fields = set()
+    key_cache = {}
+    documents = [json_obj for _, json_obj in _parse_jsonl_lines(jsonl_content)]
+    json_lists = find_wide_lists(documents, key_cache)
     
-    try:
-        content = jsonl_content.decode('utf-8')
-        lines = content.strip().split('\n')
-        
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line:
-                continue
-                
-            try:
-                json_obj = json.loads(line)
-                flattened = flatten_json_object(json_obj)
-                all_fields.update(flattened.keys())
-            except json.JSONDecodeError as e:
-                raise ValueError(f"Invalid JSON on line {line_num}: {str(e)}")
-    except UnicodeDecodeError:
-        raise ValueError("File is not valid UTF-8 encoded text")
+    all_fields = set()
+    for json_obj in documents:
+        flattened = flatten_json_object(json_obj, key_cache=key_cache, json_lists=json_lists)
+        all_fields.update(flattened.keys())
     
     return all_fields
 
-def convert_jsonl_to_sqlite(jsonl_content: bytes, table_name: str) -> Dict[str, Any]:
+def _parse_jsonl_lines(jsonl_content: bytes) -> List[Tuple[int, Any]]:
+    """
+    Parse every non-empty line of a JSONL file into (line number, document) pairs
+    """
+    documents = []
+    
+    # Lines are parsed as bytes; the parser validates UTF-8 itself
+    lines = jsonl_content.strip().split(b'\n')
+    
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+            
+        try:
+            documents.append((line_num, json_parser.loads(line)))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_num}: {str(e)}")
+    
+    return documents
+
+def convert_jsonl_to_sqlite(
+    jsonl_content: bytes,
+    table_name: str,
+    storage_mode: str = JSONL_STORAGE_FLATTEN,
+    indexed_paths: Optional[List[str]] = None
+) -> Dict[str, Any]:
     """
-    Convert JSONL file content to SQLite table with flattened structure.
+    Convert JSONL file content to SQLite table.
+    
+    In "flatten" mode every nested key and list index becomes its own column.
+    In "json" mode top-level scalars become columns and nested objects/lists
+    are stored as JSON text for querying with json_extract; indexed_paths
+    then adds a virtual generated column and index per hot path.
     
     Args:
         jsonl_content: The raw JSONL file content
         table_name: Name for the SQLite table
+        storage_mode: One of JSONL_STORAGE_MODES
+        indexed_paths: Dotted JSON paths to expose as indexed generated
+            columns (json mode only), e.g. ["user.profile.name"]
         
     Returns:
         Dict containing table info, schema, row count, and sample data
@@ -251,34 +569,48 @@ def convert_jsonl_to_sqlite(jsonl_content: bytes, table_name: str) -> Dict[str,
         # Sanitize table name
         table_name = sanitize_table_name(table_name)
         
-        # First pass: discover all possible fields
-        all_fields = discover_jsonl_fields(jsonl_content)
+        if storage_mode not in JSONL_STORAGE_MODES:
+            raise ValueError(
+                f"Unknown storage mode '{storage_mode}', expected one of: {', '.join(JSONL_STORAGE_MODES)}"
+            )
+        if indexed_paths and storage_mode != JSONL_STORAGE_JSON:
+            raise ValueError("Indexed JSON paths require the 'json' storage mode")
+        
+        # Parse each line once, as bytes
+        documents = _parse_jsonl_lines(jsonl_content)
+        
+        # Lists too long to explode in any row are stored as JSON text in every row
+        key_cache = {}
+        json_lists = None
+        if storage_mode == JSONL_STORAGE_FLATTEN:
+            json_lists = find_wide_lists((json_obj for _, json_obj in documents), key_cache)
+        
+        # Flatten each document once and collect every field seen
+        all_fields = set()
+        flattened_rows = []
+        for line_num, json_obj in documents:
+            if storage_mode == JSONL_STORAGE_JSON:
+                if not isinstance(json_obj, dict):
+                    raise ValueError(f"Line {line_num} is not a JSON object")
+                try:
+                    flattened = split_json_object(json_obj)
+                except ValueError as e:
+                    raise ValueError(f"Line {line_num}: {str(e)}")
+            else:
+                flattened = flatten_json_object(json_obj, key_cache=key_cache, json_lists=json_lists)
+            all_fields.update(flattened.keys())
+            flattened_rows.append(flattened)
         
         if not all_fields:
             raise ValueError("No valid JSON objects found in JSONL file")
         
-        # Second pass: process each line and create consistent records
-        content = jsonl_content.decode('utf-8')
-        lines = content.strip().split('\n')
-        
+        # Create records with all fields, filling missing ones with None
         records = []
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line:
-                continue
-                
-            try:
-                json_obj = json.loads(line)
-                flattened = flatten_json_object(json_obj)
-                
-                # Create record with all fields, filling missing ones with None
-                record = {}
-                for field in all_fields:
-                    record[field] = flattened.get(field, None)
-                
-                records.append(record)
-            except json.JSONDecodeError as e:
-                raise ValueError(f"Invalid JSON on line {line_num}: {str(e)}")
+        for flattened in flattened_rows:
+            record = {}
+            for field in all_fields:
+                record[field] = flattened.get(field, None)
+            records.append(record)
         
         if not records:
             raise ValueError("No valid records found in JSONL file")
@@ -290,49 +622,273 @@ def convert_jsonl_to_sqlite(jsonl_content: bytes, table_name: str) -> Dict[str,
         df.columns = [col.lower().replace(' ', '_').replace('-', '_') for col in df.columns]
         
         # Connect to SQLite database
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = sqlite3.connect(tenant_path(DATABASE_PATH, create=True))
         
         # Write DataFrame to SQLite
         df.to_sql(table_name, conn, if_exists='replace', index=False)
         
-        # Get schema information using safe query execution
-        cursor_info = execute_query_safely(
-            conn,
-            "PRAGMA table_info({table})",
-            identifier_params={'table': table_name}
-        )
-        columns_info = cursor_info.fetchall()
+        # Expose hot JSON paths as indexed generated columns
+        if indexed_paths:
+            add_json_path_indexes(conn, table_name, indexed_paths)
         
-        schema = {}
-        for col in columns_info:
-            schema[col[1]] = col[2]  # column_name: data_type
-        
-        # Get sample data using safe query execution
-        cursor_sample = execute_query_safely(
-            conn,
-            "SELECT * FROM {table} LIMIT 5",
-            identifier_params={'table': table_name}
-        )
-        sample_rows = cursor_sample.fetchall()
-        column_names = [col[1] for col in columns_info]
-        sample_data = [dict(zip(column_names, row)) for row in sample_rows]
-        
-        # Get row count using safe query execution
-        cursor_count = execute_query_safely(
-            conn,
-            "SELECT COUNT(*) FROM {table}",
-            identifier_params={'table': table_name}
-        )
-        row_count = cursor_count.fetchone()[0]
+        result = _collect_table_info(conn, table_name)
         
         conn.close()
         
-        return {
-            'table_name': table_name,
-            'schema': schema,
-            'row_count': row_count,
-            'sample_data': sample_data
-        }
+        return result
         
     except Exception as e:
-        raise Exception(f"Error converting JSONL to SQLite: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error converting JSONL to SQLite: {str(e)}")
+
+def _import_pyarrow():
+    """
+    Import pyarrow lazily so the server runs without the optional dependency
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+        import pyarrow.compute  # noqa: F401
+    except ImportError:
+        raise ValueError(
+            "Parquet and Arrow uploads require the optional 'pyarrow' package "
+            "(install with the 'arrow' extra)"
+        )
+    return pyarrow
+
+
+def _quote_column(column_name: str) -> str:
+    """
+    Quote a column name for DDL/DML, matching how pandas.to_sql quotes columns
+    """
+    return '"' + column_name.replace('"', '""') + '"'
+
+
+def _arrow_type_category(pa, arrow_type) -> str:
+    """
+    Map an Arrow data type onto one of the ARROW_SQLITE_TYPES categories
+    """
+    types = pa.types
+    if types.is_dictionary(arrow_type):
+        return _arrow_type_category(pa, arrow_type.value_type)
+    if types.is_boolean(arrow_type):
+        return 'bool'
+    if types.is_integer(arrow_type):
+        return 'int'
+    if types.is_floating(arrow_type):
+        return 'float'
+    if types.is_decimal(arrow_type):
+        return 'decimal'
+    if types.is_string(arrow_type) or types.is_large_string(arrow_type):
+        return 'string'
+    if types.is_temporal(arrow_type):
+        return 'temporal'
+    if types.is_binary(arrow_type) or types.is_large_binary(arrow_type) or types.is_fixed_size_binary(arrow_type):
+        return 'binary'
+    return 'nested'
+
+
+def _arrow_column_to_values(pa, column, category: str) -> List[Any]:
+    """
+    Convert one Arrow column of a record batch into SQLite-bindable Python values
+    """
+    if pa.types.is_dictionary(column.type):
+        column = column.dictionary_decode()
+    if category == 'temporal':
+        column = pa.compute.cast(column, pa.string())
+    elif category == 'decimal':
+        column = pa.compute.cast(column, pa.float64())
+    elif category == 'nested':
+        return [None if value is None else json.dumps(value, default=str) for value in column.to_pylist()]
+    return column.to_pylist()
+
+
+def _arrow_column_names(arrow_schema) -> List[str]:
+    """
+    Clean Arrow field names like the other converters do
+
+    Raises:
+        ValueError: If two fields clean to the same column name (SQLite
+            column names are case-insensitive)
+    """
+    column_names = [name.lower().replace(' ', '_').replace('-', '_') for name in arrow_schema.names]
+    fields_by_column: Dict[str, List[str]] = {}
+    for field_name, column_name in zip(arrow_schema.names, column_names):
+        fields_by_column.setdefault(column_name, []).append(field_name)
+    collisions = [fields for fields in fields_by_column.values() if len(fields) > 1]
+    if collisions:
+        raise ValueError(
+            "Column names collide after normalization: "
+            + "; ".join(", ".join(repr(name) for name in fields) for fields in collisions)
+        )
+    return column_names
+
+
+def _load_arrow_batches(table_name: str, arrow_schema, batches: Iterable) -> Dict[str, Any]:
+    """
+    Load record batches into a staging table and swap it in for table_name,
+    so a failure part way through leaves the existing table untouched.
+
+    Returns:
+        Dict containing table info, schema, row count, and sample data
+    """
+    staging_table = f"{table_name}__staging"
+    column_names = _arrow_column_names(arrow_schema)
+    conn = _connect_for_staging(staging_table)
+    try:
+        _write_arrow_batches(conn, staging_table, column_names, arrow_schema, batches)
+        _swap_in_staging_table(conn, staging_table, table_name)
+        return _collect_table_info(conn, table_name)
+    except Exception:
+        _discard_staging_table(conn, staging_table)
+        raise
+    finally:
+        conn.close()
+
+
+def _write_arrow_batches(
+    conn: sqlite3.Connection,
+    table_name: str,
+    column_names: List[str],
+    arrow_schema,
+    batches: Iterable
+) -> None:
+    """
+    Create the table from an Arrow schema and insert record batches with executemany.
+
+    Each batch is converted column by column and zipped into rows, so no
+    intermediate DataFrame or text representation is built.
+    """
+    pa = _import_pyarrow()
+
+    categories = [_arrow_type_category(pa, field.type) for field in arrow_schema]
+
+    column_defs = ", ".join(
+        f"{_quote_column(name)} {ARROW_SQLITE_TYPES[category]}"
+        for name, category in zip(column_names, categories)
+    )
+    execute_query_safely(
+        conn,
+        f"CREATE TABLE {{table}} ({column_defs})",
+        identifier_params={'table': table_name},
+        allow_ddl=True
+    )
+
+    placeholders = ", ".join("?" for _ in column_names)
+    insert_sql = f"INSERT INTO {escape_identifier(table_name)} VALUES ({placeholders})"
+
+    cursor = conn.cursor()
+    for batch in batches:
+        if batch.num_rows == 0:
+            continue
+        columns = [
+            _arrow_column_to_values(pa, batch.column(i), category)
+            for i, category in enumerate(categories)
+        ]
+        cursor.executemany(insert_sql, zip(*columns))
+    conn.commit()
+
+
+def _collect_table_info(conn: sqlite3.Connection, table_name: str) -> Dict[str, Any]:
+    """
+    Build the upload result (schema, sample data and row count) for a table
+    """
+    # table_xinfo also lists generated columns (hidden = 2 or 3), which SELECT * returns
+    cursor_info = execute_query_safely(
+        conn,
+        "PRAGMA table_xinfo({table})",
+        identifier_params={'table': table_name}
+    )
+    columns_info = [col for col in cursor_info.fetchall() if col[6] != 1]
+
+    schema = {}
+    for col in columns_info:
+        schema[col[1]] = col[2]  # column_name: data_type
+
+    cursor_sample = execute_query_safely(
+        conn,
+        "SELECT * FROM {table} LIMIT 5",
+        identifier_params={'table': table_name}
+    )
+    sample_rows = cursor_sample.fetchall()
+    column_names = [col[1] for col in columns_info]
+    sample_data = [dict(zip(column_names, row)) for row in sample_rows]
+
+    cursor_count = execute_query_safely(
+        conn,
+        "SELECT COUNT(*) FROM {table}",
+        identifier_params={'table': table_name}
+    )
+    row_count = cursor_count.fetchone()[0]
+
+    return {
+        'table_name': table_name,
+        'schema': schema,
+        'row_count': row_count,
+        'sample_data': sample_data
+    }
+
+
+def convert_parquet_to_sqlite(parquet_content: bytes, table_name: str) -> Dict[str, Any]:
+    """
+    Convert Parquet file content to SQLite table.
+
+    The file is read one row group at a time and each row group is inserted
+    from its column batches, so native column types are preserved and no
+    text parsing happens.
+
+    Args:
+        parquet_content: The raw Parquet file content
+        table_name: Name for the SQLite table
+
+    Returns:
+        Dict containing table info, schema, row count, and sample data
+    """
+    try:
+        pa = _import_pyarrow()
+
+        # Sanitize table name
+        table_name = sanitize_table_name(table_name)
+
+        parquet_file = pa.parquet.ParquetFile(pa.BufferReader(parquet_content))
+
+        def iter_row_group_batches():
+            for row_group in range(parquet_file.num_row_groups):
+                yield from parquet_file.read_row_group(row_group).to_batches()
+
+        return _load_arrow_batches(table_name, parquet_file.schema_arrow, iter_row_group_batches())
+
+    except Exception as e:
+        raise Exception(f"Error converting Parquet to SQLite: {str(e)}")
+
+
+def convert_arrow_to_sqlite(arrow_content: bytes, table_name: str) -> Dict[str, Any]:
+    """
+    Convert Arrow IPC (file/Feather v2 or stream format) content to SQLite table.
+
+    Args:
+        arrow_content: The raw Arrow IPC content
+        table_name: Name for the SQLite table
+
+    Returns:
+        Dict containing table info, schema, row count, and sample data
+    """
+    try:
+        pa = _import_pyarrow()
+
+        # Sanitize table name
+        table_name = sanitize_table_name(table_name)
+
+        try:
+            reader = pa.ipc.open_file(pa.BufferReader(arrow_content))
+            schema = reader.schema
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            # Not the random-access file format, fall back to the stream format
+            reader = pa.ipc.open_stream(pa.BufferReader(arrow_content))
+            schema = reader.schema
+            batches = iter(reader)
+
+        return _load_arrow_batches(table_name, schema, batches)
+
+    except Exception as e:
+        raise Exception(f"Error converting Arrow to SQLite: {str(e)}")
@@ -0,0 +1,290 @@
+"""
+Rule-based SQL for common questions, without an LLM call.
+
+Many questions follow a handful of shapes: "how many rows in orders", "show
+first 10 customers", "average price by category", "top 5 products by price".
+match_intent recognises these shapes and resolves the tables and columns
+they mention against the schema catalog, comparing the same lightly stemmed
+tokens the schema selector uses, so "order items" finds order_items and
+"categories" finds category. It emits SQL in microseconds.
+
+The parser only answers when it is sure: the whole question must fit one
+shape, every table and column phrase must resolve to exactly one schema
+object, and sums and averages need a numeric column. Anything else returns
+None and goes to the LLM. benchmarks/eval_intent_parser.py measures coverage,
+accuracy and latency on a question corpus.
+
+Supported shapes:
+- count: "how many orders", "number of rows in orders", "count customers"
+- grouped count: "how many orders per shipping method", "number of users by city"
+- rows: "show customers", "show first 10 customers", "list 5 rows from orders"
+- ranking: "top 5 products by price", "bottom 3 orders by order amount"
+- aggregates: "average price of products", "total order amount by category",
+  "max age", "highest price per category"
+- distinct values: "list distinct categories", "how many unique cities in users"
+
+Configuration (environment variables):
+- INTENT_PARSER: "1" to answer recognised questions without the LLM (always
+  on as the first tier of the cascade, LLM_CASCADE=1; see core.sql_cascade)
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+
+from .schema_selector import tokenize
+from .sql_security import SQLSecurityError, escape_identifier
+
+# Row limit of "show X" answers, as the LLM prompt asks for large result sets
+SHOW_LIMIT = 100
+
+# Largest LIMIT taken from a question; bigger numbers are probably not row counts
+MAX_QUESTION_LIMIT = 1000
+
+FILLER_WORDS = {'a', 'an', 'the', 'please', 'me', 'us', 'all', 'our', 'we'}
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+    'eight': 8, 'nine': 9, 'ten': 10, 'fifteen': 15, 'twenty': 20, 'fifty': 50, 'hundred': 100,
+}
+
+AGGREGATES = {
+    'average': ('AVG', 'average'), 'avg': ('AVG', 'average'), 'mean': ('AVG', 'average'),
+    'sum': ('SUM', 'total'), 'total': ('SUM', 'total'),
+    'minimum': ('MIN', 'min'), 'min': ('MIN', 'min'), 'lowest': ('MIN', 'min'), 'smallest': ('MIN', 'min'),
+    'maximum': ('MAX', 'max'), 'max': ('MAX', 'max'), 'highest': ('MAX', 'max'), 'largest': ('MAX', 'max'),
+}
+
+# Column types SUM and AVG make sense on
+NUMERIC_TYPE_PATTERN = re.compile(r'INT|REAL|FLOA|DOUB|NUM|DEC', re.IGNORECASE)
+
+_PHRASE = r"[\w ]+?"
+_QUESTION = r"(?:(?:what|whats|tell|give|find|get|show|calculate|compute)(?: is| are)? )?"
+_ROWS = r"(?:rows|records|entries)"
+_GROUP = rf"(?: (?:per|by|for each|in each|grouped by) (?P<group>{_PHRASE}))"
+_IN_TABLE = rf"(?: (?:of|in|for|from|across) (?P<table>{_PHRASE}))"
+_NUMBER = r"(?P<n>\d+|" + "|".join(NUMBER_WORDS) + r")"
+_AGGREGATE = r"(?P<agg>" + "|".join(AGGREGATES) + r")"
+
+
+@dataclass(frozen=True)
+class Intent:
+    """A recognised question: the shape that matched and the SQL for it"""
+    name: str
+    sql: str
+    table: str
+
+
+def intent_parser_enabled() -> bool:
+    return os.environ.get("INTENT_PARSER", "").lower() in ("1", "true", "yes")
+
+
+def normalize_question(question: str) -> str:
+    words = re.sub(r"[^\w]+", " ", question.lower()).split()
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+
+def _strip_table_suffix(phrase: str) -> str:
+    return re.sub(r" table$", "", phrase.strip())
+
+
+def resolve_table(phrase: str, schema_info: Dict[str, Any]) -> Optional[str]:
+    """
+    The one table whose name matches the phrase, or None
+    """
+    tokens = tokenize(_strip_table_suffix(phrase))
+    if not tokens:
+        return None
+    matches = [name for name in schema_info.get('tables', {}) if tokenize(name) == tokens]
+    return matches[0] if len(matches) == 1 else None
+
+
+def resolve_column(phrase: str, schema_info: Dict[str, Any], table: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """
+    The one (table, column) the phrase names, or None
+
+    A phrase matches a column by its own tokens ("order amount" ->
+    order_amount), with the table name in front ("product price" ->
+    products.price), or with the table name implied ("name" of products ->
+    product_name). Without a table, the column must exist in a single table.
+    Within a known table, a phrase may also name a column by its last words
+    ("category" -> product_category) when no column matches fully.
+    """
+    tokens = tokenize(phrase)
+    if not tokens:
+        return None
+    tables = schema_info.get('tables', {})
+    candidates = set()
+    suffix_candidates = set()
+    for table_name in ([table] if table else tables):
+        table_tokens = tokenize(table_name)
+        for column in tables[table_name].get('columns', {}):
+            column_tokens = tokenize(column)
+            forms = [column_tokens, table_tokens + column_tokens]
+            if column_tokens[:len(table_tokens)] == table_tokens:
+                forms.append(column_tokens[len(table_tokens):])
+            if tokens in forms:
+                candidates.add((table_name, column))
+            elif table and column_tokens[-len(tokens):] == tokens:
+                suffix_candidates.add((table_name, column))
+    if not candidates:
+        candidates = suffix_candidates
+    return candidates.pop() if len(candidates) == 1 else None
+
+
+def _is_numeric(schema_info: Dict[str, Any], table: str, column: str) -> bool:
+    column_type = schema_info['tables'][table]['columns'][column]
+    return bool(NUMERIC_TYPE_PATTERN.search(str(column_type)))
+
+
+def _number(text: str) -> Optional[int]:
+    value = NUMBER_WORDS.get(text) or (int(text) if text.isdigit() else None)
+    return value if value and value <= MAX_QUESTION_LIMIT else None
+
+
+def _column_in(match: "re.Match", schema_info: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """
+    Resolve the column phrase, within the table named in the question if there is one
+    """
+    table = None
+    if match.group('table'):
+        table = resolve_table(match.group('table'), schema_info)
+        if table is None:
+            return None
+    return resolve_column(match.group('column'), schema_info, table)
+
+
+def _count(match: "re.Match", schema_info: Dict[str, Any]) -> Optional[Intent]:
+    table = resolve_table(match.group('table'), schema_info)
+    if table is None:
+        return None
+    return Intent('count', f"SELECT COUNT(*) AS count FROM {escape_identifier(table)}", table)
+
+
+def _grouped_count(match: "re.Match", schema_info: Dict[str, Any]) -> Optional[Intent]:
+    table = resolve_table(match.group('table'), schema_info)
+    group = resolve_column(match.group('group'), schema_info, table) if table else None
+    if group is None:
+        return None
+    column = escape_identifier(group[1])
+    return Intent(
+        'grouped_count',
+        f"SELECT {column}, COUNT(*) AS count FROM {escape_identifier(table)} GROUP BY {column} ORDER BY count DESC",
+        table
+    )
+
+
+def _rows(match: "re.Match", schema_info: Dict[str, Any]) -> Optional[Intent]:
+    table = resolve_table(match.group('table'), schema_info)
+    limit = _number(match.group('n')) if match.groupdict().get('n') else SHOW_LIMIT
+    if table is None or limit is None:
+        return None
+    return Intent('rows', f"SELECT * FROM {escape_identifier(table)} LIMIT {limit}", table)
+
+
+def _ranking(match: "re.Match", schema_info: Dict[str, Any]) -> Optional[Intent]:
+    table = resolve_table(match.group('table'), schema_info)
+    limit = _number(match.group('n'))
+    column = resolve_column(match.group('column'), schema_info, table) if table else None
+    if column is None or limit is None:
+        return None
+    direction = "DESC" if match.group('dir') == 'top' else "ASC"
+    return Intent(
+        'ranking',
+        f"SELECT * FROM {escape_identifier(table)} ORDER BY {escape_identifier(column[1])} {direction} LIMIT {limit}",
+        table
+    )
+
+
+def _aggregate(match: "re.Match", schema_info: Dict[str, Any]) -> Optional[Intent]:
+    resolved = _column_in(match, schema_info)
+    if resolved is None:
+        return None
+    table, column = resolved
+    function, label = AGGREGATES[match.group('agg')]
+    if function in ('AVG', 'SUM') and not _is_numeric(schema_info, table, column):
+        return None
+    value = f"{function}({escape_identifier(column)}) AS {escape_identifier(f'{label}_{column}')}"
+
+    if match.group('group'):
+        group = resolve_column(match.group('group'), schema_info, table)
+        if group is None or group[1] == column:
+            return None
+        group_column = escape_identifier(group[1])
+        return Intent(
+            'grouped_aggregate',
+            f"SELECT {group_column}, {value} FROM {escape_identifier(table)} GROUP BY {group_column} ORDER BY {group_column}",
+            table
+        )
+    return Intent('aggregate', f"SELECT {value} FROM {escape_identifier(table)}", table)
+
+
+def _distinct(match: "re.Match", schema_info: Dict[str, Any]) -> Optional[Intent]:
+    resolved = _column_in(match, schema_info)
+    if resolved is None:
+        return None
+    table, column = resolved
+    column_sql = escape_identifier(column)
+    return Intent(
+        'distinct',
+        f"SELECT DISTINCT {column_sql} FROM {escape_identifier(table)} ORDER BY {column_sql} LIMIT {SHOW_LIMIT}",
+        table
+    )
+
+
+def _distinct_count(match: "re.Match", schema_info: Dict[str, Any]) -> Optional[Intent]:
+    resolved = _column_in(match, schema_info)
+    if resolved is None:
+        return None
+    table, column = resolved
+    return Intent(
+        'distinct_count',
+        f"SELECT COUNT(DISTINCT {escape_identifier(column)}) AS count FROM {escape_identifier(table)}",
+        table
+    )
+
+
+# Tried in order; the first shape whose names all resolve wins
+_INTENTS: List[Tuple[Pattern, Callable[["re.Match", Dict[str, Any]], Optional[Intent]]]] = [(re.compile(pattern), build) for pattern, build in [
+    (rf"^(?:how many|number of|count of|count) (?:distinct|unique|different) (?P<column>{_PHRASE}){_IN_TABLE}?(?: are there)?$", _distinct_count),
+    (rf"^(?:how many|{_QUESTION}(?:total )?number of|count of|count) (?:{_ROWS} (?:in|of|from) )?(?P<table>{_PHRASE}){_GROUP}$", _grouped_count),
+    (rf"^{_QUESTION}(?:total )?(?:number of|count of|count) (?:{_ROWS} (?:in|of|from) )?(?P<table>{_PHRASE})$", _count),
+    (rf"^how many {_ROWS} (?:are )?(?:there )?(?:in|of) (?P<table>{_PHRASE})$", _count),
+    (rf"^how many (?P<table>{_PHRASE})(?: (?:are there|do have|exist|are stored|in total))?$", _count),
+    (rf"^(?:show|list|display|get|give|find|select)? ?(?P<dir>top|bottom) {_NUMBER} (?P<table>{_PHRASE}) (?:by|ordered by|sorted by) (?P<column>{_PHRASE})$", _ranking),
+    (rf"^(?:show|list|display|get|give|select|return)(?: first)?(?: {_NUMBER})?(?: {_ROWS} (?:in|of|from))? (?P<table>{_PHRASE})$", _rows),
+    (rf"^(?:{_QUESTION}|list )(?:distinct|unique|different) (?P<column>{_PHRASE}){_IN_TABLE}?$", _distinct),
+    (rf"^{_QUESTION}{_AGGREGATE}(?: of)? (?P<column>{_PHRASE}){_IN_TABLE}?{_GROUP}?$", _aggregate),
+]]
+
+
+def match_intent(question: str, schema_info: Dict[str, Any]) -> Optional[Intent]:
+    """
+    The recognised intent of a question, or None when the question needs an LLM
+
+    Args:
+        question: The natural language question
+        schema_info: Schema catalog ({'tables': {name: {'columns': {name: type}}}})
+    """
+    text = normalize_question(question)
+    for pattern, build in _INTENTS:
+        match = pattern.match(text)
+        if match is None:
+            continue
+        try:
+            intent = build(match, schema_info)
+        except SQLSecurityError:
+            # Names that cannot be quoted safely are left to the LLM path's validation
+            return None
+        if intent is not None:
+            return intent
+    return None
+
+
+def parse_intent(question: str, schema_info: Dict[str, Any]) -> Optional[str]:
+    """
+    SQL for a recognised question, or None when the question needs an LLM
+    """
+    intent = match_intent(question, schema_info)
+    return intent.sql if intent is not None else None
@@ -0,0 +1,330 @@
+"""
+Pluggable JSON parsing backend.
+
+Parses bytes directly (no intermediate str decode) with the fastest parser
+available: orjson, then pysimdjson, then the standard library. The backend
+can be forced with the JSON_PARSER environment variable ("orjson",
+"simdjson" or "stdlib").
+
+All backends raise json.JSONDecodeError on malformed input, so callers can
+keep catching the standard library exception.
+
+iter_json_array streams the elements of a top-level JSON array from a binary
+file object, so memory is bounded by the chunk size and the largest element
+rather than the file.
+"""
+
+import codecs
+import json
+import os
+import re
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, Tuple, Union
+
+from .constants import JSON_STREAM_CHUNK_SIZE
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:  # pragma: no cover - optional dependency
+    simdjson = None
+
+
+def _stdlib_loads(data: Union[bytes, str]) -> Any:
+    try:
+        return json.loads(data)
+    except UnicodeDecodeError as e:
+        raise json.JSONDecodeError(f"Invalid UTF-8 encoded text: {e.reason}", "", e.start)
+
+
+def _stdlib_dumps(obj: Any) -> str:
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def _orjson_loads(data: Union[bytes, str]) -> Any:
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError
+    return orjson.loads(data)
+
+
+def _orjson_dumps(obj: Any) -> str:
+    try:
+        return orjson.dumps(obj).decode('utf-8')
+    except TypeError:
+        # e.g. integers wider than 64 bits
+        return _stdlib_dumps(obj)
+
+
+def _simdjson_loads(data: Union[bytes, str]) -> Any:
+    try:
+        return simdjson.loads(data)
+    except ValueError as e:
+        if isinstance(e, json.JSONDecodeError):
+            raise
+        raise json.JSONDecodeError(str(e), "", 0)
+
+
+_BACKENDS: Dict[str, Dict[str, Callable]] = {
+    'stdlib': {'loads': _stdlib_loads, 'dumps': _stdlib_dumps},
+}
+if orjson is not None:
+    _BACKENDS['orjson'] = {'loads': _orjson_loads, 'dumps': _orjson_dumps}
+if simdjson is not None:
+    _BACKENDS['simdjson'] = {'loads': _simdjson_loads, 'dumps': _stdlib_dumps}
+
+
+def available_parsers() -> list:
+    """
+    Names of the installed JSON backends, fastest first
+    """
+    return [name for name in ('orjson', 'simdjson', 'stdlib') if name in _BACKENDS]
+
+
+def _select_backend(name: str = None) -> str:
+    requested = name or os.environ.get("JSON_PARSER")
+    if requested:
+        if requested not in _BACKENDS:
+            raise ValueError(
+                f"JSON parser '{requested}' is not available (installed: {', '.join(available_parsers())})"
+            )
+        return requested
+    return available_parsers()[0]
+
+
+PARSER_NAME = _select_backend()
+_loads = _BACKENDS[PARSER_NAME]['loads']
+_dumps = _BACKENDS[PARSER_NAME]['dumps']
+
+
+def set_parser(name: str) -> None:
+    """
+    Switch the active JSON backend (used by benchmarks and tests)
+    """
+    global PARSER_NAME, _loads, _dumps
+    PARSER_NAME = _select_backend(name)
+    _loads = _BACKENDS[PARSER_NAME]['loads']
+    _dumps = _BACKENDS[PARSER_NAME]['dumps']
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Parse a JSON document from bytes or str.
+
+    Raises:
+        json.JSONDecodeError: If the document is malformed or not valid UTF-8
+    """
+    return _loads(data)
+
+
+def dumps(obj: Any) -> str:
+    """
+    Serialize an object to compact JSON text
+    """
+    return _dumps(obj)
+
+
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+_TEXT_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# A closing brace followed by a comma: where the elements of an array of objects end
+_OBJECT_END = re.compile(rb'\}[ \t\n\r]*,')
+
+# Failed batch parses per read before parsing one element at a time
+_MAX_BATCH_ATTEMPTS = 4
+
+# Bytes decoded at first when an element is parsed on its own (doubled as needed)
+_ELEMENT_WINDOW = 4096
+
+# Longest bare token ("-Infinity"): an error this close to the end of the
+# buffer may be a literal, number or escape cut off by the chunk boundary
+_MAX_TOKEN_LENGTH = 9
+
+
+def _may_be_truncated(text: str, error: json.JSONDecodeError) -> bool:
+    """
+    Whether a decode error could go away once more of the stream is read
+    """
+    # Strings report their opening quote, so "unterminated" can mean "cut off"
+    if error.msg.startswith("Unterminated string"):
+        return True
+    return len(text) - error.pos <= _MAX_TOKEN_LENGTH
+
+
+def _parse_batch(buffer: bytes, pos: int) -> Optional[Tuple[list, int, bool]]:
+    """
+    Parse the complete elements starting at pos in one backend call: either
+    the rest of the buffer, when it closes the array, or everything up to the
+    last "}," whose prefix parses. A cut inside an element or a string leaves
+    a bracket or the string open, so the parse only succeeds at a real
+    element boundary.
+
+    Returns:
+        (elements, position after them, whether the array was closed), or
+        None when no batch parses
+    """
+    end = len(buffer)
+    while end > pos and buffer[end - 1] in b' \t\n\r':
+        end -= 1
+    if end > pos and buffer[end - 1:end] == b']':
+        try:
+            elements = _loads(b'[' + buffer[pos:end])
+        except json.JSONDecodeError:
+            elements = None
+        # "[]" here would be a trailing comma
+        if elements:
+            return elements, end, True
+
+    attempts = 0
+    brace = len(buffer)
+    while attempts < _MAX_BATCH_ATTEMPTS:
+        brace = buffer.rfind(b'}', pos, brace)
+        if brace < 0:
+            return None
+        boundary = _OBJECT_END.match(buffer, brace)
+        if boundary is None:
+            continue
+        attempts += 1
+        try:
+            return _loads(b'[' + buffer[pos:brace + 1] + b']'), boundary.end(), False
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def _decode_element(decoder: json.JSONDecoder, buffer: bytes, pos: int, final: bool,
+                    offset: int) -> Optional[Tuple[Any, int]]:
+    """
+    Parse the single element at pos with JSONDecoder.raw_decode, decoding
+    only as much of the buffer as the element needs.
+
+    Returns:
+        (element, position after it), or None when it may continue past the buffer
+
+    Raises:
+        ValueError: If the element is malformed
+    """
+    window = _ELEMENT_WINDOW
+    while True:
+        limit = min(len(buffer), pos + window)
+        at_end = limit == len(buffer)
+        last = final and at_end
+        try:
+            text, _ = codecs.utf_8_decode(buffer[pos:limit], 'strict', last)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Invalid UTF-8 at byte {offset + pos + e.start}")
+        try:
+            value, end = decoder.raw_decode(text)
+        except json.JSONDecodeError as e:
+            if last or not _may_be_truncated(text, e):
+                error_pos = offset + pos + len(text[:e.pos].encode('utf-8'))
+                raise ValueError(f"Invalid JSON at byte {error_pos}: {e.msg}")
+            complete = False
+        else:
+            # The element is only complete once the separator after it is in
+            # the text ("-12.5" or "-12.5e" may continue as "-12.5e3")
+            following = _TEXT_WHITESPACE.match(text, end).end()
+            complete = last or (following < len(text) and (
+                text[following] in ',]' or len(text) - end > _MAX_TOKEN_LENGTH))
+        if complete:
+            return value, pos + len(text[:end].encode('utf-8'))
+        if at_end:
+            return None
+        window *= 2
+
+
+def iter_json_array(stream: BinaryIO, chunk_size: int = JSON_STREAM_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Incrementally parse a top-level JSON array and yield its elements one at a time.
+
+    The stream is read in chunks of bytes. The complete elements of each
+    chunk are parsed together in one call to the active backend (see loads),
+    so every element is parsed once, from bytes. Elements a batch cannot
+    cover (one larger than the buffer, the elements around a malformed one)
+    are parsed one at a time with JSONDecoder.raw_decode, so a malformed
+    element fails as soon as it is in the buffer instead of reading on to
+    the end of the file.
+
+    Args:
+        stream: Binary file object positioned at the start of the document
+        chunk_size: Bytes read per chunk
+
+    Yields:
+        Each element of the array
+
+    Raises:
+        ValueError: If the document is not a JSON array or is malformed
+    """
+    decoder = json.JSONDecoder()
+    buffer = b''
+    pos = 0
+    consumed = 0  # bytes discarded from the front of the buffer
+    eof = False
+    need_more = False
+    batch = True  # False once a batch failed, until more is read
+    bom_checked = False
+    state = 'start'
+
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+
+        # Read more when the buffer is exhausted, or when the next value is
+        # incomplete or may be cut off at the end of the buffer
+        if pos >= len(buffer) or need_more:
+            if eof:
+                if state == 'done':
+                    return
+                if state == 'start':
+                    raise ValueError("JSON must be an array of objects")
+                raise ValueError(f"Unexpected end of JSON array at byte {consumed + pos}")
+            chunk = stream.read(max(chunk_size, len(buffer) - pos))
+            eof = not chunk
+            consumed += pos
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            need_more = False
+            batch = True
+            if not bom_checked:
+                if not eof and len(buffer) < len(codecs.BOM_UTF8) and codecs.BOM_UTF8.startswith(buffer):
+                    need_more = True
+                    continue
+                if buffer.startswith(codecs.BOM_UTF8):
+                    pos = len(codecs.BOM_UTF8)
+                bom_checked = True
+            continue
+
+        char = buffer[pos:pos + 1]
+        if state == 'start':
+            if char != b'[':
+                raise ValueError("JSON must be an array of objects")
+            pos += 1
+            state = 'first'
+        elif state == 'first' and char == b']':
+            pos += 1
+            state = 'done'
+        elif state in ('first', 'value'):
+            parsed = _parse_batch(buffer, pos) if batch else None
+            if parsed is not None:
+                elements, pos, closed = parsed
+                state = 'done' if closed else 'value'
+                yield from elements
+                continue
+            batch = False
+            decoded = _decode_element(decoder, buffer, pos, eof, consumed)
+            if decoded is None:
+                need_more = True
+                continue
+            value, pos = decoded
+            state = 'separator'
+            yield value
+        elif state == 'separator':
+            if char == b',':
+                state = 'value'
+            elif char == b']':
+                state = 'done'
+            else:
+                raise ValueError(f"Expected ',' or ']' at byte {consumed + pos}")
+            pos += 1
+        else:
+            raise ValueError(f"Unexpected data after JSON array at byte {consumed + pos}")
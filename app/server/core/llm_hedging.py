@@ -0,0 +1,185 @@
+"""
+Hedged NL-to-SQL generation across LLM providers.
+
+The primary provider is called first. If it has not answered within a delay
+derived from its observed p95 latency, the secondary provider is called as
+well and the first SQL that passes validate_sql_query wins. The losing call
+is cancelled if it has not started yet; a call already in flight cannot be
+interrupted, so its result is discarded when it finishes.
+
+Per-provider latency histograms are fed by every provider call (hedged or
+not), so the hedge delay tracks real provider behaviour.
+
+Configuration (environment variables):
+- LLM_HEDGING: "1" to enable hedging when both provider keys are set
+- LLM_HEDGE_DEFAULT_DELAY_MS: delay used until enough samples exist
+- LLM_HEDGE_MIN_DELAY_MS / LLM_HEDGE_MAX_DELAY_MS: clamp for the p95 delay
+"""
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import LatencyHistogram
+from .sql_security import validate_sql_query
+
+# Provider latency histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = [
+    50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 7500, 10000, 15000, 30000, 60000
+]
+
+# Samples needed before the p95 is trusted over the default delay
+MIN_HEDGE_SAMPLES = 20
+
+DEFAULT_HEDGE_DELAY_MS = 2000
+DEFAULT_MIN_HEDGE_DELAY_MS = 200
+DEFAULT_MAX_HEDGE_DELAY_MS = 10000
+
+# Threads shared by all hedged requests
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def get_latency_histogram(provider: str) -> LatencyHistogram:
+    with _histograms_lock:
+        histogram = _histograms.get(provider)
+        if histogram is None:
+            histogram = _histograms[provider] = LatencyHistogram(LATENCY_BUCKETS_MS)
+        return histogram
+
+
+def provider_latency_snapshot() -> Dict[str, Dict[str, Any]]:
+    with _histograms_lock:
+        providers = list(_histograms.items())
+    return {provider: histogram.snapshot() for provider, histogram in providers}
+
+
+def reset_latency_histograms() -> None:
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def timed_call(provider: str, fn: Callable[..., str], *args: Any) -> str:
+    """
+    Call a provider function once its circuit breaker (core.llm_resilience)
+    and admission control (core.admission) let it through, and record its
+    latency, without the queue wait, when it succeeds
+    """
+    # Imported here: both modules build on this one
+    from .admission import get_provider_admission
+    from .llm_resilience import get_circuit_breaker
+
+    breaker = get_circuit_breaker(provider)
+    breaker.before_call()
+    try:
+        with get_provider_admission(provider).admit():
+            start = time.perf_counter()
+            result = fn(*args)
+    except Exception as e:
+        breaker.record_failure(e)
+        raise
+    breaker.record_success()
+    get_latency_histogram(provider).record((time.perf_counter() - start) * 1000)
+    return result
+
+
+def _env_ms(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def hedge_delay_seconds(provider: str) -> float:
+    """
+    How long to wait for the primary before hedging: its p95 latency, clamped
+    """
+    histogram = get_latency_histogram(provider)
+    if histogram.count < MIN_HEDGE_SAMPLES:
+        delay_ms = _env_ms("LLM_HEDGE_DEFAULT_DELAY_MS", DEFAULT_HEDGE_DELAY_MS)
+    else:
+        delay_ms = histogram.percentile(95)
+    delay_ms = max(_env_ms("LLM_HEDGE_MIN_DELAY_MS", DEFAULT_MIN_HEDGE_DELAY_MS), delay_ms)
+    delay_ms = min(_env_ms("LLM_HEDGE_MAX_DELAY_MS", DEFAULT_MAX_HEDGE_DELAY_MS), delay_ms)
+    return delay_ms / 1000
+
+
+def hedging_enabled() -> bool:
+    return os.environ.get("LLM_HEDGING", "").lower() in ("1", "true", "yes")
+
+
+def _checked_sql(future: Future) -> str:
+    """
+    Result of a provider call, raising if the call failed or the SQL is not valid
+    """
+    sql = future.result()
+    if not sql or not sql.strip():
+        raise ValueError("Provider returned an empty SQL query")
+    validate_sql_query(sql)
+    return sql
+
+
+def generate_sql_hedged(
+    query_text: str,
+    schema_info: Dict[str, Any],
+    providers: Dict[str, Callable[[str, Dict[str, Any]], str]],
+    primary: str,
+    delay_seconds: Optional[float] = None
+) -> str:
+    """
+    Generate SQL with a hedged request across two providers.
+
+    Args:
+        query_text: The natural language question
+        schema_info: Schema passed to the providers
+        providers: Provider name -> generate function (query_text, schema_info) -> SQL
+        primary: Name of the provider tried first
+        delay_seconds: Override for the hedge delay (defaults to the primary's p95)
+
+    Returns:
+        The first valid SQL returned by either provider
+
+    Raises:
+        Exception: The last provider error if no provider returned valid SQL
+    """
+    secondary = next((name for name in providers if name != primary), None)
+    if delay_seconds is None:
+        delay_seconds = hedge_delay_seconds(primary)
+
+    # Each call runs in a copy of the caller's context, so the tenant (schema
+    # index, caches) and the trace carry over to the provider threads
+    futures: Dict[Future, str] = {
+        _executor.submit(
+            contextvars.copy_context().run, timed_call, primary, providers[primary], query_text, schema_info
+        ): primary
+    }
+    hedged = secondary is None
+    last_error: Optional[BaseException] = None
+
+    try:
+        done, _ = wait(futures, timeout=delay_seconds)
+        while True:
+            for future in done:
+                futures.pop(future)
+                try:
+                    return _checked_sql(future)
+                except Exception as e:
+                    last_error = e
+
+            # Hedge after the delay, or straight away if the primary failed
+            if not hedged:
+                hedged = True
+                futures[_executor.submit(
+                    contextvars.copy_context().run, timed_call, secondary, providers[secondary], query_text, schema_info
+                )] = secondary
+
+            if not futures:
+                raise last_error
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+    finally:
+        # Cancel the loser; a call already running finishes in the background
+        for future in futures:
+            future.cancel()
@@ -1,26 +1,41 @@
 import os
-from typing import Dict, Any
+from functools import partial
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 from openai import OpenAI
 from anthropic import Anthropic
+from core.admission import get_provider_admission
 from core.data_models import QueryRequest
-
-def generate_sql_with_openai(query_text: str, schema_info: Dict[str, Any]) -> str:
+from core.intent_parser import intent_parser_enabled, parse_intent
+from core.schema_selector import render_table, select_schema_for_prompt
+from core.schema_index import rank_tables_with_index
+from core.llm_hedging import generate_sql_hedged, hedging_enabled, timed_call
+from core.llm_resilience import generate_with_failover, get_circuit_breaker, llm_timeout_seconds, stream_call
+from core.semantic_cache import get_semantic_cache, semantic_cache_enabled
+from core.sql_cascade import (
+    SEMANTIC_CACHE_SOURCE,
+    TIER_LARGE,
+    TIER_RULES,
+    TIER_SMALL,
+    cascade_enabled,
+    large_model,
+    run_cascade
+)
+from core.sql_processor import explain_sql
+from core.sql_security import validate_sql_query, SQLSecurityError
+from core.tenancy import current_tenant
+from core.tracing import span
+
+SQL_SYSTEM_PROMPT = "You are a SQL expert. Convert natural language to SQL queries."
+
+def build_sql_prompt(query_text: str, schema_info: Dict[str, Any]) -> str:
     """
-    Generate SQL query using OpenAI API
+    Build the NL-to-SQL prompt shared by all providers
     """
-    try:
-        # Get API key from environment
-        api_key = os.environ.get("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable not set")
-        
-        client = OpenAI(api_key=api_key)
-        
-        # Format schema for prompt
-        schema_description = format_schema_for_prompt(schema_info)
-        
-        # Create prompt
-        prompt = f"""Given the following database schema:
+    # Format the schema slice relevant to the question
+    schema_description = format_schema_for_prompt(schema_info, query_text)
+    
+    # Create prompt
+    return f"""Given the following database schema:
 
 {schema_description}
 
@@ -37,12 +52,40 @@ Rules:
 - When joining tables, use meaningful relationships between tables
 
 SQL Query:"""
+
+def clean_sql_response(sql: str) -> str:
+    """
+    Strip whitespace and markdown code fences from a model response
+    """
+    sql = sql.strip()
+    if sql.startswith("```sql"):
+        sql = sql[6:]
+    if sql.startswith("```"):
+        sql = sql[3:]
+    if sql.endswith("```"):
+        sql = sql[:-3]
+    return sql.strip()
+
+def generate_sql_with_openai(query_text: str, schema_info: Dict[str, Any], model: str = "gpt-4.1-mini") -> str:
+    """
+    Generate SQL query using OpenAI API
+    """
+    try:
+        # Get API key from environment
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable not set")
+        
+        # Retries are done by core.llm_resilience, across providers
+        client = OpenAI(api_key=api_key, max_retries=0, timeout=llm_timeout_seconds())
+        
+        prompt = build_sql_prompt(query_text, schema_info)
         
         # Call OpenAI API
         response = client.chat.completions.create(
-            model="gpt-4.1-mini",
+            model=model,
             messages=[
-                {"role": "system", "content": "You are a SQL expert. Convert natural language to SQL queries."},
+                {"role": "system", "content": SQL_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.1,
@@ -51,20 +94,12 @@ SQL Query:"""
         
         sql = response.choices[0].message.content.strip()
         
-        # Clean up the SQL (remove markdown if present)
-        if sql.startswith("```sql"):
-            sql = sql[6:]
-        if sql.startswith("```"):
-            sql = sql[3:]
-        if sql.endswith("```"):
-            sql = sql[:-3]
-        
-        return sql.strip()
+        return clean_sql_response(sql)
         
     except Exception as e:
         raise Exception(f"Error generating SQL with OpenAI: {str(e)}")
 
-def generate_sql_with_anthropic(query_text: str, schema_info: Dict[str, Any]) -> str:
+def generate_sql_with_anthropic(query_text: str, schema_info: Dict[str, Any], model: str = "claude-3-haiku-20240307") -> str:
     """
     Generate SQL query using Anthropic API
     """
@@ -74,33 +109,14 @@ def generate_sql_with_anthropic(query_text: str, schema_info: Dict[str, Any]) ->
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable not set")
         
-        client = Anthropic(api_key=api_key)
-        
-        # Format schema for prompt
-        schema_description = format_schema_for_prompt(schema_info)
+        # Retries are done by core.llm_resilience, across providers
+        client = Anthropic(api_key=api_key, max_retries=0, timeout=llm_timeout_seconds())
         
-        # Create prompt
-        prompt = f"""Given the following database schema:
-
-{schema_description}
-
-Convert this natural language query to SQL: "{query_text}"
-
-Rules:
-- Return ONLY the SQL query, no explanations
-- Use proper SQLite syntax
-- Handle date/time queries appropriately (e.g., "last week" = date('now', '-7 days'))
-- Be careful with column names and table names
-- If the query is ambiguous, make reasonable assumptions
-- For multi-table queries, use proper JOIN conditions to avoid Cartesian products
-- Limit results to reasonable amounts (e.g., add LIMIT 100 for large result sets)
-- When joining tables, use meaningful relationships between tables
-
-SQL Query:"""
+        prompt = build_sql_prompt(query_text, schema_info)
         
         # Call Anthropic API
         response = client.messages.create(
-            model="claude-3-haiku-20240307",
+            model=model,
             max_tokens=500,
             temperature=0.1,
             messages=[
@@ -110,56 +126,253 @@ SQL Query:"""
         
         sql = response.content[0].text.strip()
         
-        # Clean up the SQL (remove markdown if present)
-        if sql.startswith("```sql"):
-            sql = sql[6:]
-        if sql.startswith("```"):
-            sql = sql[3:]
-        if sql.endswith("```"):
-            sql = sql[:-3]
-        
-        return sql.strip()
+        return clean_sql_response(sql)
         
     except Exception as e:
         raise Exception(f"Error generating SQL with Anthropic: {str(e)}")
 
-def format_schema_for_prompt(schema_info: Dict[str, Any]) -> str:
+def format_schema_for_prompt(schema_info: Dict[str, Any], query_text: Optional[str] = None) -> str:
     """
-    Format database schema for LLM prompt
+    Format database schema for LLM prompt.
+    When a question is given, large schemas are compacted to the tables and
+    columns relevant to it (see core.schema_selector), ranked with the
+    persisted schema index when it covers the schema.
     """
-    lines = []
-    
-    for table_name, table_info in schema_info.get('tables', {}).items():
-        lines.append(f"Table: {table_name}")
-        lines.append("Columns:")
-        
-        for col_name, col_type in table_info['columns'].items():
-            lines.append(f"  - {col_name} ({col_type})")
-        
-        lines.append(f"Row count: {table_info['row_count']}")
-        lines.append("")
+    if query_text is not None:
+        return select_schema_for_prompt(schema_info, query_text, ranker=rank_tables_with_index)
     
-    return "\n".join(lines)
+    return "\n".join(
+        render_table(table_name, table_info)
+        for table_name, table_info in schema_info.get('tables', {}).items()
+    )
 
 def generate_sql(request: QueryRequest, schema_info: Dict[str, Any]) -> str:
+    """
+    Generate SQL for a question, reusing the SQL of a near-duplicate earlier
+    question against the same schema (core.semantic_cache) when possible.
+    New SQL is not cached here; see remember_sql.
+    """
+    return generate_sql_with_source(request, schema_info)[0]
+
+def generate_sql_with_source(request: QueryRequest, schema_info: Dict[str, Any], escalate: bool = False) -> Tuple[str, str]:
+    """
+    Generate SQL for a question, returning it with its source: the semantic
+    cache, or the cascade tier that produced it (core.sql_cascade; "small"
+    when the cascade is disabled).
+    With escalate=True, because SQL generated earlier failed, the question
+    goes straight to the large tier, bypassing the semantic cache.
+    With INTENT_PARSER=1 and no cascade, recognised questions are still
+    answered by the rules tier (core.intent_parser) without an LLM call.
+    """
+    use_semantic_cache = semantic_cache_enabled()
+    if use_semantic_cache and not request.bypass_cache and not escalate:
+        with span("semantic_cache"):
+            match = get_semantic_cache().lookup(request.query, schema_info, scope=current_tenant())
+        if match is not None:
+            return match.sql, SEMANTIC_CACHE_SOURCE
+
+    with span("llm_generation"):
+        if cascade_enabled() or intent_parser_enabled():
+            tiers = [] if escalate else [
+                (TIER_RULES, lambda: parse_intent(request.query, schema_info)),
+                (TIER_SMALL, lambda: route_generate_sql(request, schema_info)),
+            ]
+            if cascade_enabled():
+                tiers.append((TIER_LARGE, lambda: route_generate_sql(request, schema_info, TIER_LARGE)))
+            sql, source = run_cascade(tiers, explain_sql)
+        else:
+            sql, source = route_generate_sql(request, schema_info), TIER_SMALL
+
+    return sql, source
+
+def remember_sql(request: QueryRequest, schema_info: Dict[str, Any], sql: str, source: str) -> None:
+    """
+    Store generated SQL in the semantic cache for near-duplicate questions.
+    Call only after the SQL executed successfully, so SQL that fails (or that
+    validation rejects) is never served to a later question.
+    """
+    # Rule-based SQL is as cheap to produce again as to look up
+    if not semantic_cache_enabled() or source in (TIER_RULES, SEMANTIC_CACHE_SOURCE):
+        return
+    try:
+        with span("validation"):
+            validate_sql_query(sql)
+        get_semantic_cache().store(request.query, schema_info, sql, scope=current_tenant())
+    except SQLSecurityError:
+        # Never reuse SQL that execution would reject
+        pass
+
+def _providers_with_keys(functions: Dict[str, Callable]) -> List[Tuple[str, Callable]]:
+    """
+    (name, function) pairs for the providers with an API key, OpenAI first
+    """
+    return [
+        (name, functions[name]) for name, key in (('openai', "OPENAI_API_KEY"), ('anthropic', "ANTHROPIC_API_KEY"))
+        if os.environ.get(key)
+    ]
+
+def route_generate_sql(request: QueryRequest, schema_info: Dict[str, Any], tier: str = TIER_SMALL) -> str:
     """
     Route to appropriate LLM provider based on API key availability and request preference.
     Priority: 1) OpenAI API key exists, 2) Anthropic API key exists, 3) request.llm_provider
+
+    Transient errors are retried, and when both keys exist a failing provider
+    (or one whose circuit breaker is open) fails over to the other one.
+    The large tier (core.sql_cascade) uses each provider's large model.
     """
-    openai_key = os.environ.get("OPENAI_API_KEY")
-    anthropic_key = os.environ.get("ANTHROPIC_API_KEY")
+    functions = {'openai': generate_sql_with_openai, 'anthropic': generate_sql_with_anthropic}
+    if tier == TIER_LARGE:
+        functions = {name: partial(fn, model=large_model(name)) for name, fn in functions.items()}
 
-    # Check API key availability first (OpenAI priority)
-    if openai_key:
-        return generate_sql_with_openai(request.query, schema_info)
-    elif anthropic_key:
-        return generate_sql_with_anthropic(request.query, schema_info)
+    providers = _providers_with_keys(functions)
+
+    # Hedged mode: race the other provider if the primary is slower than its p95
+    if len(providers) == 2 and hedging_enabled():
+        primary = next((name for name, _ in providers if get_circuit_breaker(name).allows_call()), 'openai')
+        return generate_sql_hedged(request.query, schema_info, dict(providers), primary=primary)
+
+    if providers:
+        return generate_with_failover(providers, request.query, schema_info)
 
-    # Fall back to request preference if both keys available or neither available
+    # No key available: the request preference decides which error is reported
     if request.llm_provider == "openai":
-        return generate_sql_with_openai(request.query, schema_info)
+        return timed_call('openai', functions['openai'], request.query, schema_info)
     else:
-        return generate_sql_with_anthropic(request.query, schema_info)
+        return timed_call('anthropic', functions['anthropic'], request.query, schema_info)
+
+def find_statement_end(text: str) -> Optional[int]:
+    """
+    Position just past the first complete SQL statement in a partial model response,
+    or None while the statement may still be growing.
+
+    A statement is complete at a top-level semicolon (outside quotes and comments)
+    or at a closing markdown fence.
+    """
+    start = 0
+    fenced = text.lstrip().startswith("```")
+    if fenced:
+        start = text.index("```") + 3
+    i = start
+    quote = None
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"', '`', '['):
+            if fenced and text.startswith("```", i):
+                return i
+            quote = ']' if char == '[' else char
+        elif text.startswith("--", i):
+            newline = text.find("\n", i)
+            if newline == -1:
+                return None
+            i = newline
+        elif char == ';':
+            return i + 1
+        i += 1
+    return None
+
+def stream_sql_with_openai(query_text: str, schema_info: Dict[str, Any]) -> Iterator[str]:
+    """
+    Stream SQL tokens from the OpenAI API as they are generated
+    """
+    try:
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable not set")
+        
+        # Retries are done by core.llm_resilience, across providers
+        client = OpenAI(api_key=api_key, max_retries=0, timeout=llm_timeout_seconds())
+        stream = client.chat.completions.create(
+            model="gpt-4.1-mini",
+            messages=[
+                {"role": "system", "content": SQL_SYSTEM_PROMPT},
+                {"role": "user", "content": build_sql_prompt(query_text, schema_info)}
+            ],
+            temperature=0.1,
+            max_tokens=500,
+            stream=True
+        )
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Stop generation when the consumer stops early
+            stream.close()
+    
+    except Exception as e:
+        raise Exception(f"Error generating SQL with OpenAI: {str(e)}")
+
+def stream_sql_with_anthropic(query_text: str, schema_info: Dict[str, Any]) -> Iterator[str]:
+    """
+    Stream SQL tokens from the Anthropic API as they are generated
+    """
+    try:
+        api_key = os.environ.get("ANTHROPIC_API_KEY")
+        if not api_key:
+            raise ValueError("ANTHROPIC_API_KEY environment variable not set")
+        
+        # Retries are done by core.llm_resilience, across providers
+        client = Anthropic(api_key=api_key, max_retries=0, timeout=llm_timeout_seconds())
+        stream = client.messages.create(
+            model="claude-3-haiku-20240307",
+            max_tokens=500,
+            temperature=0.1,
+            messages=[
+                {"role": "user", "content": build_sql_prompt(query_text, schema_info)}
+            ],
+            stream=True
+        )
+        try:
+            for event in stream:
+                if event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                    yield event.delta.text
+        finally:
+            stream.close()
+    
+    except Exception as e:
+        raise Exception(f"Error generating SQL with Anthropic: {str(e)}")
+
+def _single_token(sql: str) -> Iterator[str]:
+    yield sql
+
+def open_sql_stream(request: QueryRequest, schema_info: Dict[str, Any]) -> Tuple[Iterator[str], str]:
+    """
+    Streaming counterpart of generate_sql_with_source: the SQL as an
+    iterator of tokens, with its source.
+
+    Semantic cache hits and rule-based SQL (INTENT_PARSER=1) come back as a
+    single token, and so does cascade SQL (SQL_CASCADE=1), which is checked
+    before it is used. Otherwise the tokens are streamed from the providers
+    with the same retries and failover as route_generate_sql (not hedged).
+    The stream has produced its first token when this returns, so admission
+    and circuit breaker errors are raised here, before any output.
+    """
+    if cascade_enabled():
+        sql, source = generate_sql_with_source(request, schema_info)
+        return _single_token(sql), source
+
+    if semantic_cache_enabled() and not request.bypass_cache:
+        with span("semantic_cache"):
+            match = get_semantic_cache().lookup(request.query, schema_info, scope=current_tenant())
+        if match is not None:
+            return _single_token(match.sql), SEMANTIC_CACHE_SOURCE
+
+    if intent_parser_enabled():
+        sql = parse_intent(request.query, schema_info)
+        if sql is not None:
+            return _single_token(sql), TIER_RULES
+
+    functions = {'openai': stream_sql_with_openai, 'anthropic': stream_sql_with_anthropic}
+    providers = _providers_with_keys(functions)
+    if providers:
+        return generate_with_failover(providers, request.query, schema_info, call=stream_call), TIER_SMALL
+
+    # No key available: the request preference decides which error is reported
+    provider = 'openai' if request.llm_provider == "openai" else 'anthropic'
+    return stream_call(provider, functions[provider], request.query, schema_info), TIER_SMALL
 
 def generate_random_query_with_openai(schema_info: Dict[str, Any]) -> str:
     """
@@ -299,8 +512,10 @@ def generate_random_query(schema_info: Dict[str, Any]) -> str:
 
     # Check API key availability first (OpenAI priority)
     if openai_key:
-        return generate_random_query_with_openai(schema_info)
+        with get_provider_admission('openai').admit():
+            return generate_random_query_with_openai(schema_info)
     elif anthropic_key:
-        return generate_random_query_with_anthropic(schema_info)
+        with get_provider_admission('anthropic').admit():
+            return generate_random_query_with_anthropic(schema_info)
     else:
         raise Exception("No LLM API keys available. Please set OPENAI_API_KEY or ANTHROPIC_API_KEY.")
\ No newline at end of file
@@ -0,0 +1,371 @@
+"""
+Retries, circuit breakers and failover for LLM provider calls.
+
+- Retries: a call that fails with a transient error (connection error,
+  timeout, 408/409/429/5xx) is retried up to LLM_RETRIES times with full
+  jitter exponential backoff: a random delay up to LLM_RETRY_BASE_MS * 2^n,
+  capped at LLM_RETRY_MAX_MS. A Retry-After header from the provider is
+  respected within the same cap. The SDK clients are created with
+  max_retries=0 so retries are not multiplied.
+- Circuit breakers: every provider call (core.llm_hedging.timed_call)
+  reports to the provider's breaker. After LLM_BREAKER_FAILURES consecutive
+  failures the breaker opens and calls fail fast with CircuitOpenError for
+  LLM_BREAKER_RESET_SECONDS. Then one trial call is let through (half-open):
+  success closes the breaker, failure opens it again. Request errors that are
+  the caller's fault (400, 404, 422) do not count.
+- Failover: generate_with_failover tries the providers in order, skipping
+  those with an open breaker, and moves on to the next provider when one
+  fails after its retries.
+- Streaming: with call=stream_call, the same retries and failover apply to
+  starting a streamed response, up to its first token. Once tokens have
+  been produced the stream is not retried.
+
+Configuration (environment variables):
+- LLM_RETRIES, LLM_RETRY_BASE_MS, LLM_RETRY_MAX_MS: retry policy
+- LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS: circuit breaker policy
+- LLM_TIMEOUT_SECONDS: timeout of one provider request
+"""
+
+import logging
+import math
+import os
+import random
+import threading
+import time
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .admission import AdmissionRejected, get_provider_admission
+from .llm_hedging import timed_call
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRIES = 2
+DEFAULT_RETRY_BASE_MS = 200
+DEFAULT_RETRY_MAX_MS = 2000
+DEFAULT_BREAKER_FAILURES = 5
+DEFAULT_BREAKER_RESET_SECONDS = 30
+DEFAULT_TIMEOUT_SECONDS = 30
+
+TRANSIENT_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+# Errors caused by the request itself; another attempt or provider health says nothing about them
+CLIENT_ERROR_STATUS_CODES = frozenset({400, 404, 413, 422})
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def _env_number(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def llm_timeout_seconds() -> float:
+    return _env_number("LLM_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open"""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} is unavailable (circuit open); retry in {retry_after:.0f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def _error_chain(error: BaseException):
+    """
+    The error and its causes; provider functions wrap SDK errors in a plain Exception
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    for item in _error_chain(error):
+        code = getattr(item, 'status_code', None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether another attempt at the same request may succeed
+    """
+    code = status_code(error)
+    if code is not None:
+        return code in TRANSIENT_STATUS_CODES
+    for item in _error_chain(error):
+        # openai/anthropic APIConnectionError and APITimeoutError, raw socket errors
+        if isinstance(item, (ConnectionError, TimeoutError)) or type(item).__name__ in ("APIConnectionError", "APITimeoutError"):
+            return True
+    return False
+
+
+def retry_after_hint(error: BaseException) -> Optional[float]:
+    """
+    Seconds from a Retry-After header on the provider's response, if any
+    """
+    for item in _error_chain(error):
+        response = getattr(item, 'response', None)
+        headers = getattr(response, 'headers', None)
+        if headers is not None:
+            value = headers.get('retry-after')
+            try:
+                return float(value) if value is not None else None
+            except ValueError:
+                return None
+    return None
+
+
+def counts_as_provider_failure(error: BaseException) -> bool:
+    return status_code(error) not in CLIENT_ERROR_STATUS_CODES
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one provider
+    """
+
+    def __init__(self, provider: str, failure_threshold: int = DEFAULT_BREAKER_FAILURES, reset_seconds: float = DEFAULT_BREAKER_RESET_SECONDS):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def allows_call(self) -> bool:
+        """
+        Whether a call would be let through right now (does not claim the half-open trial)
+        """
+        with self._lock:
+            if self.state == OPEN:
+                return self.retry_after() == 0
+            return not (self.state == HALF_OPEN and self.trial_in_flight)
+
+    def before_call(self) -> None:
+        """
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with its trial call running
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if self.retry_after() > 0:
+                    raise CircuitOpenError(self.provider, self.retry_after())
+                self.state = HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == HALF_OPEN:
+                if self.trial_in_flight:
+                    raise CircuitOpenError(self.provider, self.reset_seconds)
+                self.trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("[SUCCESS] Circuit closed for %s", self.provider)
+            self.state = CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self, error: BaseException) -> None:
+        with self._lock:
+            self.trial_in_flight = False
+            if isinstance(error, AdmissionRejected):
+                # Shed before reaching the provider
+                return
+            if not counts_as_provider_failure(error):
+                if self.state == HALF_OPEN:
+                    # The trial reached the provider, which answered
+                    self.state = CLOSED
+                    self.failures = 0
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                    logger.warning(
+                        "[WARNING] Circuit opened for %s after %d failures: %s",
+                        self.provider, self.failures, str(error)
+                    )
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'times_opened': self.times_opened,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_counters = {'retries': {}, 'failovers': {}}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = _breakers[provider] = CircuitBreaker(
+                provider,
+                int(_env_number("LLM_BREAKER_FAILURES", DEFAULT_BREAKER_FAILURES)),
+                _env_number("LLM_BREAKER_RESET_SECONDS", DEFAULT_BREAKER_RESET_SECONDS)
+            )
+        return breaker
+
+
+def _count(counter: str, provider: str) -> None:
+    with _breakers_lock:
+        counts = _counters[counter]
+        counts[provider] = counts.get(provider, 0) + 1
+
+
+def resilience_snapshot() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        breakers = list(_breakers.items())
+        retries = dict(_counters['retries'])
+        failovers = dict(_counters['failovers'])
+    return {
+        provider: {**breaker.stats(), 'retries': retries.get(provider, 0), 'failovers': failovers.get(provider, 0)}
+        for provider, breaker in breakers
+    }
+
+
+def reset_resilience() -> None:
+    with _breakers_lock:
+        _breakers.clear()
+        for counts in _counters.values():
+            counts.clear()
+
+
+def backoff_delay(attempt: int, error: Optional[BaseException] = None) -> float:
+    """
+    Full-jitter delay in seconds before retry number `attempt` (0-based)
+    """
+    base = _env_number("LLM_RETRY_BASE_MS", DEFAULT_RETRY_BASE_MS) / 1000
+    cap = _env_number("LLM_RETRY_MAX_MS", DEFAULT_RETRY_MAX_MS) / 1000
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    hint = retry_after_hint(error) if error is not None else None
+    if hint is not None:
+        delay = max(delay, min(cap, hint))
+    return delay
+
+
+def _admitted_stream(provider: str, fn: Callable[..., Iterator[str]], *args: Any) -> Iterator[str]:
+    breaker = get_circuit_breaker(provider)
+    breaker.before_call()
+    with ExitStack() as stack:
+        try:
+            stack.enter_context(get_provider_admission(provider).admit())
+            tokens = fn(*args)
+            stack.callback(tokens.close)
+            first = next(tokens, None)
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+        breaker.record_success()
+        # Primed: stream_call returns the generator here
+        yield None
+        if first is not None:
+            yield first
+        try:
+            yield from tokens
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+
+
+def stream_call(provider: str, fn: Callable[..., Iterator[str]], *args: Any) -> Iterator[str]:
+    """
+    Streaming counterpart of core.llm_hedging.timed_call: start a provider
+    stream once its circuit breaker and admission control let it through,
+    and return when its first token has arrived, so errors before any
+    output can be retried or failed over. The provider's call slot is held
+    until the returned iterator is exhausted or closed.
+    """
+    tokens = _admitted_stream(provider, fn, *args)
+    next(tokens)
+    return tokens
+
+
+def call_with_retries(provider: str, fn: Callable[..., str], *args: Any, call: Optional[Callable[..., Any]] = None) -> Any:
+    """
+    Call a provider, retrying transient errors with jittered backoff.
+    The call goes through core.llm_hedging.timed_call, or through the given
+    call function (e.g. stream_call).
+
+    Raises:
+        CircuitOpenError: If the provider's breaker is (or becomes) open
+        AdmissionRejected: If the call is shed by admission control
+        Exception: The provider error after the last attempt
+    """
+    call = call or timed_call
+    retries = int(_env_number("LLM_RETRIES", DEFAULT_RETRIES))
+    attempt = 0
+    while True:
+        try:
+            return call(provider, fn, *args)
+        except (CircuitOpenError, AdmissionRejected):
+            raise
+        except Exception as e:
+            if attempt >= retries or not is_transient(e):
+                raise
+            delay = backoff_delay(attempt, e)
+            logger.warning(
+                "[WARNING] %s call failed (%s), retry %d/%d in %.0fms",
+                provider, str(e), attempt + 1, retries, delay * 1000
+            )
+            _count('retries', provider)
+            time.sleep(delay)
+            attempt += 1
+
+
+def generate_with_failover(providers: List[Tuple[str, Callable[..., str]]], *args: Any, call: Optional[Callable[..., Any]] = None) -> Any:
+    """
+    Call the first available provider, failing over to the next one when it
+    fails. Providers with an open breaker are skipped while another one is
+    available.
+
+    Args:
+        providers: (name, function) pairs in order of preference
+        args: Arguments passed to the provider function
+        call: How each attempt calls the provider (see call_with_retries)
+
+    Raises:
+        Exception: The last error if every provider failed
+    """
+    available = [(name, fn) for name, fn in providers if get_circuit_breaker(name).allows_call()]
+    if not available:
+        # Every breaker is open: fail fast with the one that reopens first
+        name = min(providers, key=lambda provider: get_circuit_breaker(provider[0]).retry_after())[0]
+        raise CircuitOpenError(name, get_circuit_breaker(name).retry_after())
+
+    last_error: Optional[BaseException] = None
+    for index, (name, fn) in enumerate(available):
+        try:
+            return call_with_retries(name, fn, *args, call=call)
+        except Exception as e:
+            last_error = e
+            if index + 1 < len(available):
+                logger.warning("[WARNING] %s failed (%s), failing over to %s", name, str(e), available[index + 1][0])
+                _count('failovers', name)
+    raise last_error
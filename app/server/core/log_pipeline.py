@@ -0,0 +1,216 @@
+"""
+Queue-based structured logging.
+
+Request handlers only put LogRecords on a bounded queue (QueueHandler); a
+background QueueListener thread formats them and writes to stdout. Records
+are enqueued unformatted, so %-style arguments and tracebacks are rendered
+off the request path. Callers must therefore pass immutable values (strings,
+numbers) as log arguments, not objects that change after the call.
+
+Output is one JSON object per line with the message, level, logger, any
+`extra` fields and the traceback, each cut to a bounded size. Below WARNING,
+records are rate-limited per call site: beyond LOG_SAMPLE_PER_SECOND records
+in one second the rest are dropped, and the next record emitted from that
+call site reports how many were skipped in `sampled_out`. Warnings and
+errors are never sampled. When the queue is full, records are dropped and
+counted rather than blocking the request.
+
+Configuration (environment variables):
+- LOG_FORMAT: "json" (default) or "text" for plain messages
+- LOG_SAMPLE_PER_SECOND: records per second per call site below WARNING (0 disables sampling)
+- LOG_MAX_FIELD_CHARS: longest message or field value
+- LOG_MAX_TRACEBACK_CHARS: longest traceback (the end is kept)
+- LOG_QUEUE_SIZE: records waiting for the writer thread
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, TextIO, Tuple
+
+DEFAULT_SAMPLE_PER_SECOND = 20
+DEFAULT_MAX_FIELD_CHARS = 1000
+DEFAULT_MAX_TRACEBACK_CHARS = 4000
+DEFAULT_QUEUE_SIZE = 10000
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {'message', 'asctime'}
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}...[{len(text) - limit} more chars]"
+
+
+def truncate_tail(text: str, limit: int) -> str:
+    """
+    Keep the end of a traceback, where the exception is
+    """
+    if len(text) <= limit:
+        return text
+    return f"[{len(text) - limit} chars omitted]...{text[-limit:]}"
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record with bounded field sizes
+    """
+
+    def __init__(self, max_field_chars: int = DEFAULT_MAX_FIELD_CHARS, max_traceback_chars: int = DEFAULT_MAX_TRACEBACK_CHARS):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+        self.max_traceback_chars = max_traceback_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': truncate(record.getMessage(), self.max_field_chars),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                if not isinstance(value, (int, float, bool)) and value is not None:
+                    value = truncate(str(value), self.max_field_chars)
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = truncate_tail(self.formatException(record.exc_info), self.max_traceback_chars)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    The plain message (the pre-JSON output), with the same size bounds
+    """
+
+    def __init__(self, max_field_chars: int = DEFAULT_MAX_FIELD_CHARS, max_traceback_chars: int = DEFAULT_MAX_TRACEBACK_CHARS):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+        self.max_traceback_chars = max_traceback_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = truncate(record.getMessage(), self.max_field_chars)
+        sampled_out = getattr(record, 'sampled_out', None)
+        if sampled_out:
+            text += f" ({sampled_out} similar messages sampled out)"
+        if record.exc_info:
+            text += "\n" + truncate_tail(self.formatException(record.exc_info), self.max_traceback_chars)
+        return text
+
+
+class CallSiteSampler(logging.Filter):
+    """
+    Rate-limit records below WARNING to `per_second` per call site
+    """
+
+    def __init__(self, per_second: int = DEFAULT_SAMPLE_PER_SECOND):
+        super().__init__()
+        self.per_second = per_second
+        self.dropped_total = 0
+        self._windows: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.per_second <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        second = int(time.monotonic())
+        with self._lock:
+            # [window second, records emitted in it, records dropped since the last emitted one]
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = [second, 0, 0]
+            elif window[0] != second:
+                window[0], window[1] = second, 0
+            if window[1] >= self.per_second:
+                window[2] += 1
+                self.dropped_total += 1
+                return False
+            window[1] += 1
+            if window[2]:
+                record.sampled_out = window[2]
+                window[2] = 0
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread and drops
+    records instead of blocking when the queue is full
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The default prepare() formats the message and traceback in the caller
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[LazyQueueHandler] = None
+
+
+def configure_logging(stream: TextIO = None, level: int = logging.INFO) -> LazyQueueHandler:
+    """
+    Route root logging through the queue to a background writer.
+    Safe to call again: the previous pipeline is stopped first.
+    """
+    global _listener, _handler
+    shutdown_logging()
+
+    max_field_chars = _env_int("LOG_MAX_FIELD_CHARS", DEFAULT_MAX_FIELD_CHARS)
+    max_traceback_chars = _env_int("LOG_MAX_TRACEBACK_CHARS", DEFAULT_MAX_TRACEBACK_CHARS)
+    formatter_class = TextFormatter if os.environ.get("LOG_FORMAT") == "text" else JsonFormatter
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(formatter_class(max_field_chars, max_traceback_chars))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=_env_int("LOG_QUEUE_SIZE", DEFAULT_QUEUE_SIZE))
+    handler = LazyQueueHandler(log_queue)
+    handler.addFilter(CallSiteSampler(_env_int("LOG_SAMPLE_PER_SECOND", DEFAULT_SAMPLE_PER_SECOND)))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, output)
+    _listener.start()
+    _handler = handler
+    return handler
+
+
+def shutdown_logging() -> None:
+    """
+    Flush queued records and stop the writer thread
+    """
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger().removeHandler(_handler)
+        _listener = None
+        _handler = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,56 @@
+"""
+Latency histograms shared by the modules that export metrics: provider call
+latency (core.llm_hedging), request stages (core.tracing) and admission
+queue waits (core.admission).
+"""
+
+import bisect
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class LatencyHistogram:
+    """
+    Thread-safe fixed-bucket latency histogram
+    """
+
+    def __init__(self, buckets_ms: List[float]):
+        self.buckets_ms = list(buckets_ms)
+        # One extra bucket for values above the last bound
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float) -> None:
+        index = bisect.bisect_left(self.buckets_ms, latency_ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ms += latency_ms
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Upper bound of the bucket holding the p-th percentile (None when empty)
+        """
+        with self._lock:
+            if not self.count:
+                return None
+            target = p / 100 * self.count
+            seen = 0
+            for index, bucket_count in enumerate(self.counts):
+                seen += bucket_count
+                if seen >= target:
+                    break
+        if index < len(self.buckets_ms):
+            return float(self.buckets_ms[index])
+        return float(self.buckets_ms[-1])
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'buckets_ms': list(self.buckets_ms),
+                'counts': list(self.counts),
+                'count': self.count,
+                'sum_ms': self.total_ms,
+            }
@@ -0,0 +1,286 @@
+"""
+Opt-in sampling CPU profiler for slow requests.
+
+A background thread samples the stack of every other thread at a fixed
+interval (sys._current_frames) and counts identical stacks. The result is
+written to db/profiles/ as:
+- <id>.folded: collapsed stacks ("frame;frame;frame count"), the input format
+  of flamegraph.pl, speedscope and inferno
+- <id>.json: metadata, the hottest functions by self samples and the share of
+  samples spent in the core modules (file_processor, insights, llm_processor,
+  sql_processor, ...)
+
+Profiles are captured either for a single request, when the request carries
+an "X-Profile: 1" header (ProfilingMiddleware), or for a time window started
+with start_window_profile(). Only one profile runs at a time, because all
+threads are sampled; requests asking for a profile while another one runs are
+served normally without profiling.
+
+Configuration (environment variables):
+- PROFILING: "1" enables the header trigger and the admin endpoints
+- PROFILE_INTERVAL_MS: sampling interval
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = "db/profiles"
+DEFAULT_INTERVAL_MS = 5
+MAX_WINDOW_SECONDS = 300
+PROFILE_HEADER = b"x-profile"
+
+# Frames deeper than this are cut off (recursive JSON flattening can get deep)
+MAX_STACK_DEPTH = 128
+
+SERVER_ROOT = str(Path(__file__).resolve().parents[1]) + os.sep
+
+_CORE_MODULE_PATTERN = re.compile(r"^core/(\w+)\.py:")
+
+# Leaf frames of threads that are blocked waiting (idle executor workers, the
+# event loop selector); their samples are counted but left out of the stacks
+IDLE_FRAMES = frozenset({
+    "threading.py:Condition.wait",
+    "threading.py:Event.wait",
+    "threading.py:Thread._wait_for_tstate_lock",
+    "concurrent/futures/thread.py:_worker",
+    "selectors.py:EpollSelector.select",
+    "selectors.py:KqueueSelector.select",
+    "selectors.py:PollSelector.select",
+    "selectors.py:SelectSelector.select",
+})
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get("PROFILING") == "1"
+
+
+def sampling_interval_ms() -> float:
+    value = os.environ.get("PROFILE_INTERVAL_MS")
+    return float(value) if value else DEFAULT_INTERVAL_MS
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(SERVER_ROOT):
+        filename = filename[len(SERVER_ROOT):]
+    else:
+        # Library frames: keep the path from the package directory on
+        parts = filename.replace(os.sep, "/").split("/site-packages/")
+        filename = parts[-1] if len(parts) > 1 else os.path.basename(filename)
+    return f"{filename}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads except its own until stopped
+    """
+
+    def __init__(self, interval_ms: float = DEFAULT_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.started_at: Optional[float] = None
+        self.duration_s = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration_s = time.perf_counter() - self.started_at
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                labels = [_frame_label(frame)]
+                if labels[0] in IDLE_FRAMES:
+                    self.idle_samples += 1
+                    continue
+                frame = frame.f_back
+                while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.reverse()
+                self.stacks[";".join(labels)] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        """
+        Collapsed stacks, one "root;...;leaf count" line per distinct stack
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top: int = 20) -> Dict[str, Any]:
+        """
+        Hottest functions by self samples and sample share per core module.
+        A sample belongs to the innermost core module on its stack, so
+        wrappers like the tracing middleware do not claim their callees' time.
+        """
+        self_counts: Counter = Counter()
+        module_counts: Counter = Counter()
+        total = sum(self.stacks.values())
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += count
+            for frame in reversed(frames):
+                match = _CORE_MODULE_PATTERN.match(frame)
+                if match:
+                    module_counts[match.group(1)] += count
+                    break
+        return {
+            'samples': self.samples,
+            'stack_samples': total,
+            'idle_samples': self.idle_samples,
+            'duration_s': round(self.duration_s, 3),
+            'interval_ms': self.interval * 1000,
+            'top_functions': [
+                {'function': function, 'self_samples': count, 'share': round(count / total, 4)}
+                for function, count in self_counts.most_common(top)
+            ],
+            'core_modules': {
+                module: round(count / total, 4) for module, count in module_counts.most_common()
+            } if total else {},
+        }
+
+
+# Only one profile at a time: the sampler already covers every thread
+_active_lock = threading.Lock()
+
+
+def new_profile_id(label: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_") or "profile"
+    return f"{datetime.now().strftime('%Y%m%dT%H%M%S')}_{slug}_{uuid.uuid4().hex[:6]}"
+
+
+def write_profile(profile_id: str, profiler: SamplingProfiler, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Store the collapsed stacks and the summary under PROFILE_DIR
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    folded_path = os.path.join(PROFILE_DIR, f"{profile_id}.folded")
+    with open(folded_path, "w") as f:
+        f.write(profiler.folded())
+
+    summary = {'profile_id': profile_id, 'folded_path': folded_path, **metadata, **profiler.summary()}
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    logger.info("[SUCCESS] Profile written: %s (%d samples)", folded_path, profiler.samples)
+    return summary
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """
+    Summaries of stored profiles, newest first
+    """
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if name.endswith(".json"):
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                summary = json.load(f)
+            profiles.append({
+                key: summary.get(key)
+                for key in ('profile_id', 'trigger', 'endpoint', 'folded_path', 'samples', 'duration_s', 'core_modules')
+            })
+    return profiles
+
+
+def start_window_profile(seconds: float, interval_ms: Optional[float] = None) -> Optional[str]:
+    """
+    Profile the whole process for `seconds` in the background.
+    Returns the profile id, or None if another profile is running.
+    """
+    if not _active_lock.acquire(blocking=False):
+        return None
+    seconds = min(seconds, MAX_WINDOW_SECONDS)
+    profile_id = new_profile_id("window")
+    profiler = SamplingProfiler(interval_ms or sampling_interval_ms())
+
+    def run() -> None:
+        try:
+            profiler.start()
+            time.sleep(seconds)
+            profiler.stop()
+            write_profile(profile_id, profiler, {'trigger': "window", 'window_s': seconds})
+        except Exception as e:
+            logger.error("[ERROR] Window profile failed: %s", str(e))
+        finally:
+            _active_lock.release()
+
+    threading.Thread(target=run, name="profile-window", daemon=True).start()
+    return profile_id
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling single requests that send "X-Profile: 1".
+    The response carries the profile id in an X-Profile-Id header; the
+    artifact is written once the response body has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not profiling_enabled()
+            or dict(scope["headers"]).get(PROFILE_HEADER) not in (b"1", b"true")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if not _active_lock.acquire(blocking=False):
+            logger.warning("[WARNING] Profile requested for %s while another profile is running", scope['path'])
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = new_profile_id(scope["path"])
+        profiler = SamplingProfiler(sampling_interval_ms())
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        try:
+            profiler.start()
+            try:
+                await self.app(scope, receive, send_with_profile_id)
+            finally:
+                profiler.stop()
+            try:
+                write_profile(profile_id, profiler, {
+                    'trigger': "request",
+                    'endpoint': scope["path"],
+                    'method': scope["method"],
+                })
+            except Exception as e:
+                # The response is already sent; a failed artifact must not surface as a request error
+                logger.error("[ERROR] Writing profile %s failed: %s", profile_id, str(e))
+        finally:
+            _active_lock.release()
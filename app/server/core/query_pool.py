@@ -0,0 +1,204 @@
+"""
+Pool of pre-generated random query suggestions.
+
+/api/generate-random-query used to call the LLM on every click. The pool
+keeps suggestions generated ahead of time for the current schema version,
+so a click is a deque pop. When the pool drops below the low watermark, a
+background worker refills it up to the target size. Pools are keyed by
+schema fingerprint: a table upload or delete changes the fingerprint, drops
+the old suggestions and stops refills still running for the old schema.
+Each tenant (see core.tenancy) has its own pool; pools of the
+TENANT_CACHE_SIZE most recently used tenants are kept.
+
+Configuration (environment variables):
+- RANDOM_QUERY_POOL_SIZE: suggestions kept per schema (0 disables the pool)
+- RANDOM_QUERY_POOL_LOW_WATERMARK: refill when fewer suggestions remain
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+from .llm_processor import generate_random_query
+from .schema_selector import schema_fingerprint
+from .tenancy import current_tenant, tenant_cache_size
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_LOW_WATERMARK = 3
+
+# Failed generations (errors, empty or duplicate suggestions) after which a
+# refill gives up until the next click
+MAX_REFILL_FAILURES = 3
+
+
+class RandomQueryPool:
+    """
+    Thread-safe pool of suggestions for one schema version at a time
+    """
+
+    def __init__(
+        self,
+        generator: Callable[[Dict[str, Any]], str] = generate_random_query,
+        size: int = DEFAULT_POOL_SIZE,
+        low_watermark: int = DEFAULT_LOW_WATERMARK
+    ):
+        self.generator = generator
+        self.size = size
+        self.low_watermark = low_watermark
+        self.fingerprint: Optional[str] = None
+        self.queries: Deque[str] = deque()
+        self.hits = 0
+        self.misses = 0
+        self._refill: Optional[Future] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="random-query-pool")
+
+    def _switch_schema(self, fingerprint: str) -> None:
+        if fingerprint != self.fingerprint:
+            self.fingerprint = fingerprint
+            self.queries.clear()
+
+    def take(self, schema_info: Dict[str, Any]) -> Optional[str]:
+        """
+        Pop a suggestion for this schema, scheduling a refill when running low.
+        Returns None when the pool is empty (e.g. right after a schema change).
+        """
+        fingerprint = schema_fingerprint(schema_info)
+        with self._lock:
+            self._switch_schema(fingerprint)
+            query = self.queries.popleft() if self.queries else None
+            if query is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            if len(self.queries) < self.low_watermark:
+                self._schedule_refill(schema_info, fingerprint)
+        return query
+
+    def warm(self, schema_info: Dict[str, Any]) -> None:
+        """
+        Start filling the pool for a new schema version
+        """
+        fingerprint = schema_fingerprint(schema_info)
+        with self._lock:
+            self._switch_schema(fingerprint)
+            self._schedule_refill(schema_info, fingerprint)
+
+    def invalidate(self) -> None:
+        """
+        Drop all suggestions; running refills stop at their next step
+        """
+        with self._lock:
+            self.fingerprint = None
+            self.queries.clear()
+
+    def _schedule_refill(self, schema_info: Dict[str, Any], fingerprint: str) -> None:
+        # Caller holds the lock
+        if not schema_info.get('tables') or (self._refill is not None and not self._refill.done()):
+            return
+        self._refill = self._executor.submit(self._fill, schema_info, fingerprint)
+
+    def _fill(self, schema_info: Dict[str, Any], fingerprint: str) -> None:
+        failures = 0
+        while failures < MAX_REFILL_FAILURES:
+            with self._lock:
+                if self.fingerprint != fingerprint or len(self.queries) >= self.size:
+                    return
+            try:
+                query = self.generator(schema_info)
+            except Exception as e:
+                failures += 1
+                logger.warning("[WARNING] Random query pool refill failed: %s", str(e))
+                continue
+            with self._lock:
+                # Discard suggestions for a schema that changed meanwhile
+                if self.fingerprint != fingerprint:
+                    return
+                if query and query not in self.queries:
+                    self.queries.append(query)
+                    continue
+            # A generator that keeps repeating itself must not be called forever
+            failures += 1
+
+    def wait_idle(self, timeout: Optional[float] = None) -> None:
+        """
+        Block until any running refill finishes (used by tests and benchmarks)
+        """
+        with self._lock:
+            refill = self._refill
+        if refill is not None:
+            refill.result(timeout=timeout)
+
+    def close(self) -> None:
+        """
+        Drop all suggestions and stop the refill worker
+        """
+        self.invalidate()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'available': len(self.queries),
+                'size': self.size,
+                'low_watermark': self.low_watermark,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+_pools: "OrderedDict[str, RandomQueryPool]" = OrderedDict()
+_pool_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def get_random_query_pool() -> RandomQueryPool:
+    """
+    The current tenant's pool
+    """
+    tenant = current_tenant()
+    evicted = []
+    with _pool_lock:
+        pool = _pools.get(tenant)
+        if pool is None:
+            pool = _pools[tenant] = RandomQueryPool(
+                size=_env_int("RANDOM_QUERY_POOL_SIZE", DEFAULT_POOL_SIZE),
+                low_watermark=_env_int("RANDOM_QUERY_POOL_LOW_WATERMARK", DEFAULT_LOW_WATERMARK)
+            )
+            while len(_pools) > tenant_cache_size():
+                evicted.append(_pools.popitem(last=False)[1])
+        else:
+            _pools.move_to_end(tenant)
+    for old_pool in evicted:
+        old_pool.close()
+    return pool
+
+
+def reset_random_query_pool() -> None:
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def get_random_query(schema_info: Dict[str, Any]) -> str:
+    """
+    Serve a random query suggestion from the pool, generating one directly
+    only when the pool is empty or disabled
+    """
+    pool = get_random_query_pool()
+    if pool.size > 0 and schema_info.get('tables'):
+        query = pool.take(schema_info)
+        if query is not None:
+            return query
+    return generate_random_query(schema_info)
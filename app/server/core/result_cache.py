@@ -0,0 +1,192 @@
+"""
+In-memory cache of SQL execution results.
+
+Entries are keyed by normalized SQL text and remember the data version of
+every table the query read. The tables are recorded exactly by SQLite's
+authorizer while the statement is prepared (see core.connection_pool), so
+views, subqueries and CTEs are covered. Table versions are bumped on upload
+and delete; an entry is only served while all of its tables are still at the
+recorded versions.
+
+Entries and table versions are scoped by tenant, so tenants with tables of
+the same name (see core.tenancy) never see each other's results.
+
+The cache holds at most RESULT_CACHE_MAX_BYTES of (estimated) result data
+and evicts least recently used entries beyond that.
+"""
+
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .tenancy import current_tenant
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Queries whose result changes without any table changing are never cached
+NON_DETERMINISTIC_PATTERN = re.compile(
+    r"\b(random|randomblob|changes|last_insert_rowid|total_changes|current_date|current_time|current_timestamp)\b"
+    r"|'now'",
+    re.IGNORECASE
+)
+
+# String literals, quoted identifiers and runs of whitespace
+_SQL_TOKEN_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Collapse whitespace outside quoted text and drop a trailing semicolon
+    """
+    normalized = _SQL_TOKEN_PATTERN.sub(
+        lambda match: ' ' if match.group(0).isspace() else match.group(0), sql
+    ).strip()
+    return normalized.rstrip(';').rstrip()
+
+
+def is_cacheable(sql: str) -> bool:
+    return not NON_DETERMINISTIC_PATTERN.search(sql)
+
+
+def estimate_size(results: List[Dict[str, Any]], columns: List[str]) -> int:
+    """
+    Rough memory footprint of a result set in bytes
+    """
+    size = sys.getsizeof(results) + sum(sys.getsizeof(column) for column in columns)
+    for row in results:
+        size += sys.getsizeof(row)
+        for value in row.values():
+            size += sys.getsizeof(value)
+    return size
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of query results bounded by a memory budget
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.table_versions: Dict[Tuple[str, str], int] = {}
+        self.entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def table_version_snapshot(self, scope: str = "") -> Dict[str, int]:
+        """
+        Current table versions of one tenant, taken before executing a
+        query so that concurrent uploads invalidate the entry it produces
+        """
+        with self._lock:
+            return {
+                table: version
+                for (table_scope, table), version in self.table_versions.items()
+                if table_scope == scope
+            }
+
+    def bump_table_version(self, table_name: str, scope: str = "") -> None:
+        key = (scope, table_name)
+        with self._lock:
+            self.table_versions[key] = self.table_versions.get(key, 0) + 1
+
+    def get(self, sql: str, scope: str = "") -> Optional[Dict[str, Any]]:
+        key = (scope, normalize_sql(sql))
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and all(
+                self.table_versions.get((scope, table), 0) == version
+                for table, version in entry['versions'].items()
+            ):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry['result']
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, sql: str, result: Dict[str, Any], tables: Set[str], versions: Dict[str, int], scope: str = "") -> bool:
+        """
+        Store a successful result; returns False if it is larger than the whole budget
+        """
+        size = estimate_size(result['results'], result['columns'])
+        if size > self.max_bytes:
+            return False
+
+        key = (scope, normalize_sql(sql))
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = {
+                'result': result,
+                'versions': {table: versions.get(table, 0) for table in tables},
+                'size': size,
+            }
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry['size']
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Process-wide result cache sized by RESULT_CACHE_MAX_BYTES, shared
+    between worker processes when SHARED_CACHE=1
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            value = os.environ.get("RESULT_CACHE_MAX_BYTES")
+            max_bytes = int(value) if value else DEFAULT_MAX_BYTES
+            # Imported here: core.shared_cache subclasses ResultCache
+            from .shared_cache import SharedResultCache, get_shared_store, shared_cache_enabled
+            if shared_cache_enabled():
+                _cache = SharedResultCache(get_shared_store(), max_bytes)
+            else:
+                _cache = ResultCache(max_bytes)
+        return _cache
+
+
+def reset_result_cache() -> None:
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def invalidate_table(table_name: str) -> None:
+    """
+    Mark a table of the current tenant as changed (called on upload and delete)
+    """
+    get_result_cache().bump_table_version(table_name, current_tenant())
@@ -0,0 +1,346 @@
+"""
+Persisted BM25 index over table and column metadata.
+
+Each table is indexed as one document made of its name (weighted), column
+names, column types, JSON paths and representative sample values. The index
+is updated by the upload path, shrunk on delete, saved next to the database
+as JSON and reloaded on startup, so schema retrieval never has to rebuild
+anything from sqlite_master. Everything runs locally on CPU.
+
+The index also keeps each table's description, so get_indexed_schema can
+serve the schema catalog for /api/query without re-running PRAGMA and
+COUNT(*) for every table on every request. Each description is stored with
+the table's CREATE statement from sqlite_master, so a table altered or
+recreated outside the upload path is described again on the next sync.
+
+Every tenant (see core.tenancy) has its own index file next to its
+database; loaded indexes are kept in an LRU of TENANT_CACHE_SIZE tenants.
+Readers (see core.snapshots) use the index published with the current
+snapshot and never write it back. Other worker processes may save the file
+too, so a loaded index is reloaded when the file on disk changes.
+"""
+
+import itertools
+import json
+import math
+import os
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .connection_pool import get_pool
+from .schema_selector import VersionedSchema, tokenize
+from .snapshots import read_target
+from .sql_processor import describe_table
+from .sql_security import SQLSecurityError
+from .tenancy import tenant_cache_size, tenant_path
+
+# Default tenant's database and index locations - can be overridden for testing
+DATABASE_PATH = "db/database.db"
+SCHEMA_INDEX_PATH = "db/schema_index.json"
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Term frequency given to each token of the table name
+TABLE_NAME_WEIGHT = 3
+
+
+def table_signatures(conn: sqlite3.Connection) -> Dict[str, str]:
+    """
+    CREATE statement of every user table, keyed by table name
+    """
+    cursor = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+    )
+    return {name: sql or "" for name, sql in cursor.fetchall()}
+
+
+def table_terms(table_name: str, table_info: Dict[str, Any]) -> Counter:
+    """
+    Bag of terms describing one table
+    """
+    terms = Counter()
+    for token in tokenize(table_name):
+        terms[token] += TABLE_NAME_WEIGHT
+    for col_name, col_type in table_info['columns'].items():
+        terms.update(tokenize(col_name))
+        terms.update(tokenize(col_type))
+    for paths in (table_info.get('json_columns') or {}).values():
+        for path in paths:
+            terms.update(tokenize(path))
+    for values in (table_info.get('sample_values') or {}).values():
+        for value in values:
+            terms.update(tokenize(value))
+    return terms
+
+
+# Distinguishes the versions of different SchemaIndex objects (tenants, reloads)
+_instance_ids = itertools.count(1)
+
+
+class SchemaIndex:
+    """
+    Incrementally maintained BM25 index of table documents
+    """
+
+    def __init__(self, path: Optional[str] = SCHEMA_INDEX_PATH):
+        self.path = path
+        self.version = 0
+        self.instance_id = next(_instance_ids)
+        # Catalog of the current version, shared by every caller until the next change
+        self._schema: Optional[VersionedSchema] = None
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        # sqlite_master.sql of each table when it was described
+        self.signatures: Dict[str, str] = {}
+        self.term_freqs: Dict[str, Dict[str, int]] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        # Identity of the file this index was loaded from or saved to
+        self.file_stamp: Optional[Tuple[int, int]] = None
+        self._lock = threading.RLock()
+
+    def _add_postings(self, table_name: str, terms: Dict[str, int]) -> None:
+        self.term_freqs[table_name] = dict(terms)
+        self.doc_lengths[table_name] = sum(terms.values())
+        self.total_length += self.doc_lengths[table_name]
+        for term, freq in terms.items():
+            self.postings.setdefault(term, {})[table_name] = freq
+
+    def _remove_postings(self, table_name: str) -> None:
+        terms = self.term_freqs.pop(table_name, None)
+        if not terms:
+            return
+        self.total_length -= self.doc_lengths.pop(table_name)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(table_name, None)
+                if not posting:
+                    del self.postings[term]
+
+    def update_table(self, table_name: str, table_info: Dict[str, Any], signature: Optional[str] = None) -> None:
+        """
+        Add or replace a table document
+        """
+        with self._lock:
+            self._remove_postings(table_name)
+            self.tables[table_name] = table_info
+            if signature is None:
+                self.signatures.pop(table_name, None)
+            else:
+                self.signatures[table_name] = signature
+            self._add_postings(table_name, table_terms(table_name, table_info))
+            self.version += 1
+
+    def remove_table(self, table_name: str) -> bool:
+        """
+        Remove a table document; returns False if it was not indexed
+        """
+        with self._lock:
+            if table_name not in self.tables:
+                return False
+            self._remove_postings(table_name)
+            del self.tables[table_name]
+            self.signatures.pop(table_name, None)
+            self.version += 1
+            return True
+
+    def search(self, terms: Set[str], table_names: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """
+        BM25-score tables against query terms.
+
+        Args:
+            terms: Query terms (see schema_selector.question_terms)
+            table_names: Restrict and order results to these tables (all indexed tables when None)
+
+        Returns:
+            List of (table_name, score), best first; ties keep the given order
+        """
+        with self._lock:
+            candidates = list(self.tables) if table_names is None else table_names
+            doc_count = len(self.tables)
+            if not doc_count:
+                return [(name, 0.0) for name in candidates]
+            avg_length = self.total_length / doc_count
+
+            scores = dict.fromkeys(candidates, 0.0)
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for table_name, freq in posting.items():
+                    if table_name not in scores:
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[table_name] / avg_length)
+                    scores[table_name] += idf * freq * (BM25_K1 + 1) / (freq + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    def rank(self, terms: Set[str], table_names: List[str]) -> Optional[List[Tuple[str, float]]]:
+        """
+        TableRanker for schema_selector; None when the index does not cover every table
+        """
+        with self._lock:
+            if any(name not in self.tables for name in table_names):
+                return None
+        return self.search(terms, table_names)
+
+    def schema(self) -> Dict[str, Any]:
+        """
+        Catalog of the indexed tables, keyed by this index's version for schema_fingerprint
+        """
+        with self._lock:
+            version_key = f"index-{self.instance_id}.{self.version}"
+            if self._schema is None or self._schema.version_key != version_key:
+                self._schema = VersionedSchema(dict(self.tables), version_key)
+            return self._schema
+
+    def sync(self, conn: sqlite3.Connection) -> bool:
+        """
+        Reconcile the indexed tables with the database: drop removed tables and
+        describe new ones and those whose CREATE statement changed.
+        Returns True if anything changed.
+        """
+        current = table_signatures(conn)
+        changed = False
+        with self._lock:
+            for table_name in list(self.tables):
+                if table_name not in current:
+                    changed = self.remove_table(table_name) or changed
+            for table_name in sorted(current):
+                if table_name in self.tables and self.signatures.get(table_name) == current[table_name]:
+                    continue
+                try:
+                    self.update_table(table_name, describe_table(conn, table_name), current[table_name])
+                    changed = True
+                except SQLSecurityError:
+                    # Skip tables with invalid names, as get_database_schema does
+                    continue
+        return changed
+
+    def save(self) -> None:
+        """
+        Persist the index atomically
+        """
+        if not self.path:
+            return
+        with self._lock:
+            payload = {
+                'version': self.version,
+                'tables': self.tables,
+                'signatures': self.signatures,
+                'term_freqs': self.term_freqs,
+            }
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(payload, f, default=str)
+            os.replace(tmp_path, self.path)
+            self.file_stamp = _file_stamp(self.path)
+
+    @classmethod
+    def load(cls, path: str = SCHEMA_INDEX_PATH) -> "SchemaIndex":
+        """
+        Load a persisted index, or return an empty one if it is missing or unreadable
+        """
+        index = cls(path)
+        index.file_stamp = _file_stamp(path)
+        try:
+            with open(path) as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return index
+
+        index.version = payload.get('version', 0)
+        index.tables = payload.get('tables', {})
+        index.signatures = {
+            name: signature for name, signature in payload.get('signatures', {}).items() if name in index.tables
+        }
+        for table_name, terms in payload.get('term_freqs', {}).items():
+            if table_name in index.tables:
+                index._add_postings(table_name, terms)
+        return index
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+_indexes: "OrderedDict[str, SchemaIndex]" = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def get_schema_index() -> SchemaIndex:
+    """
+    The current tenant's index, loaded from disk on first use and again
+    whenever another process saved a newer file
+    """
+    snapshot = read_target(tenant_path(DATABASE_PATH)).snapshot
+    path = snapshot.schema_index if snapshot is not None else tenant_path(SCHEMA_INDEX_PATH)
+    with _index_lock:
+        index = _indexes.get(path)
+        if index is None or index.file_stamp != _file_stamp(path):
+            index = _indexes[path] = SchemaIndex.load(path)
+            while len(_indexes) > tenant_cache_size():
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(path)
+        return index
+
+
+def reset_schema_index() -> None:
+    with _index_lock:
+        _indexes.clear()
+
+
+def index_table(table_name: str) -> None:
+    """
+    (Re)index one table after it was uploaded
+    """
+    index = get_schema_index()
+    with get_pool(tenant_path(DATABASE_PATH)).connection() as pooled:
+        signature = table_signatures(pooled.conn).get(table_name)
+        index.update_table(table_name, describe_table(pooled.conn, table_name), signature)
+    index.save()
+
+
+def remove_table_from_index(table_name: str) -> None:
+    """
+    Drop a deleted table from the index
+    """
+    index = get_schema_index()
+    if index.remove_table(table_name):
+        index.save()
+
+
+def rank_tables_with_index(terms: Set[str], table_names: List[str]) -> Optional[List[Tuple[str, float]]]:
+    """
+    TableRanker backed by the persisted index
+    """
+    return get_schema_index().rank(terms, table_names)
+
+
+def get_indexed_schema() -> Dict[str, Any]:
+    """
+    Schema catalog served from the index, reconciled against sqlite_master
+    (a single cheap query) so tables created or dropped elsewhere are picked up.
+    """
+    try:
+        index = get_schema_index()
+        target = read_target(tenant_path(DATABASE_PATH))
+        with target.pool().connection() as pooled:
+            changed = index.sync(pooled.conn)
+        # Published snapshot indexes stay as the writer wrote them
+        if changed and target.snapshot is None:
+            index.save()
+        return index.schema()
+    except Exception as e:
+        return {'tables': {}, 'error': str(e)}
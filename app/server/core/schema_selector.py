@@ -0,0 +1,326 @@
+"""
+Schema selection for LLM prompts.
+
+Listing every column of every table makes the prompt (and time-to-first-token)
+grow with the whole catalog. select_schema_for_prompt ranks tables and columns
+by lexical relevance to the question, matching question terms against table
+names, column names, JSON paths and representative sample values, and renders
+only the top-k under a token budget. Small schemas that already fit the budget
+are rendered in full.
+
+Parsed catalogs (token sets and full table renderings) are cached per schema
+version, so repeated questions against an unchanged database only pay for
+scoring. Catalogs served by the schema index (core.schema_index) carry their
+version, so finding the cached entry costs nothing; any other schema dict is
+hashed.
+
+Configuration (environment variables):
+- SCHEMA_PROMPT_TOKEN_BUDGET: approximate token budget for the schema section
+- SCHEMA_PROMPT_TOP_K_TABLES: maximum number of tables sent
+- SCHEMA_PROMPT_MAX_COLUMNS: maximum columns listed per table
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+DEFAULT_TOKEN_BUDGET = 4000
+DEFAULT_TOP_K_TABLES = 8
+DEFAULT_MAX_COLUMNS = 40
+
+# Rough characters-per-token ratio used to estimate prompt size
+CHARS_PER_TOKEN = 4
+
+# Number of parsed schema versions kept in memory
+CATALOG_CACHE_SIZE = 16
+
+# Columns always kept when a wide table is trimmed, since joins and lookups need them
+KEY_COLUMN_PATTERN = re.compile(r'^(id|name)$|_id$')
+
+# (question terms, table names) -> [(table_name, score), ...] best first, or None if unable to rank
+TableRanker = Callable[[Set[str], List[str]], Optional[List[Tuple[str, float]]]]
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+STOPWORDS = {
+    'a', 'all', 'an', 'and', 'are', 'by', 'each', 'find', 'for', 'from', 'get',
+    'give', 'how', 'i', 'in', 'is', 'list', 'many', 'me', 'of', 'on', 'or',
+    'per', 'show', 'the', 'their', 'to', 'top', 'what', 'which', 'who', 'with',
+}
+
+
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text (including snake_case identifiers) into lowercase, lightly stemmed tokens
+    """
+    return [_stem(token) for token in _TOKEN_PATTERN.findall(str(text).lower())]
+
+
+def question_terms(query_text: str) -> Set[str]:
+    """
+    Tokens of a natural language question with stopwords removed
+    """
+    return {token for token in tokenize(query_text) if token not in STOPWORDS}
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class VersionedSchema(dict):
+    """
+    Schema catalog ({'tables': ...}) tagged by its producer with a key that
+    identifies this version of it; treat it as read-only
+    """
+
+    def __init__(self, tables: Dict[str, Any], version_key: str):
+        super().__init__(tables=tables)
+        self.version_key = version_key
+
+
+def schema_fingerprint(schema_info: Dict[str, Any]) -> str:
+    """
+    Stable hash identifying a schema version (the version key of a VersionedSchema)
+    """
+    if isinstance(schema_info, VersionedSchema):
+        return schema_info.version_key
+    payload = json.dumps(schema_info.get('tables', {}), sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def render_table(table_name: str, table_info: Dict[str, Any], columns: Optional[List[str]] = None) -> str:
+    """
+    Render one table for the LLM prompt.
+
+    Args:
+        table_name: Name of the table
+        table_info: Table entry from get_database_schema
+        columns: Subset of columns to list (all columns when None)
+
+    Returns:
+        Table block ending with a newline
+    """
+    all_columns = table_info['columns']
+    selected = list(all_columns) if columns is None else columns
+
+    lines = [f"Table: {table_name}", "Columns:"]
+    for col_name in selected:
+        lines.append(f"  - {col_name} ({all_columns[col_name]})")
+    omitted = len(all_columns) - len(selected)
+    if omitted > 0:
+        lines.append(f"  - ... {omitted} more columns not shown")
+
+    json_columns = {
+        col_name: paths
+        for col_name, paths in (table_info.get('json_columns') or {}).items()
+        if col_name in selected
+    }
+    if json_columns:
+        lines.append("JSON paths (query with json_extract(column, '$.path'); [*] marks array elements, expand them with json_each):")
+        for col_name, paths in json_columns.items():
+            lines.append(f"  - {col_name}: {', '.join(paths)}")
+
+    lines.append(f"Row count: {table_info['row_count']}")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def _matches(terms: Set[str], tokens: Set[str]) -> int:
+    """
+    Count question terms found in a token set, allowing prefix matches for longer words
+    """
+    count = 0
+    for term in terms:
+        if term in tokens:
+            count += 1
+        elif len(term) >= 4 and any(
+            len(token) >= 4 and (token.startswith(term) or term.startswith(token)) for token in tokens
+        ):
+            count += 1
+    return count
+
+
+class SchemaCatalog:
+    """
+    Tokenized and pre-rendered view of one schema version
+    """
+
+    def __init__(self, schema_info: Dict[str, Any]):
+        self.tables: Dict[str, Dict[str, Any]] = schema_info.get('tables', {})
+        self.table_blocks: Dict[str, str] = {}
+        self.table_tokens: Dict[str, Set[str]] = {}
+        self.column_tokens: Dict[str, Dict[str, Set[str]]] = {}
+
+        for table_name, table_info in self.tables.items():
+            self.table_blocks[table_name] = render_table(table_name, table_info)
+            self.table_tokens[table_name] = set(tokenize(table_name))
+
+            json_columns = table_info.get('json_columns') or {}
+            sample_values = table_info.get('sample_values') or {}
+            columns = {}
+            for col_name in table_info['columns']:
+                tokens = set(tokenize(col_name))
+                for path in json_columns.get(col_name, ()):
+                    tokens.update(tokenize(path))
+                for value in sample_values.get(col_name, ()):
+                    tokens.update(tokenize(value))
+                columns[col_name] = tokens
+            self.column_tokens[table_name] = columns
+
+        self.full_text = "\n".join(self.table_blocks.values())
+
+    def score_columns(self, table_name: str, terms: Set[str]) -> Dict[str, int]:
+        return {
+            col_name: _matches(terms, tokens)
+            for col_name, tokens in self.column_tokens[table_name].items()
+        }
+
+    def rank_tables(self, terms: Set[str]) -> List[Tuple[str, float]]:
+        """
+        Rank tables by relevance: table-name matches weigh most, then the best matching columns
+        """
+        ranked = []
+        for table_name in self.tables:
+            column_scores = self.score_columns(table_name, terms)
+            best_columns = sorted(column_scores.values(), reverse=True)[:3]
+            score = 3 * _matches(terms, self.table_tokens[table_name]) + sum(best_columns)
+            ranked.append((table_name, score))
+        # Stable sort keeps catalog order for ties
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked
+
+    def render_selected(self, table_name: str, terms: Set[str], max_columns: int) -> str:
+        """
+        Render a table, trimming wide tables to key columns plus the most relevant ones
+        """
+        columns = list(self.tables[table_name]['columns'])
+        if len(columns) <= max_columns:
+            return self.table_blocks[table_name]
+
+        column_scores = self.score_columns(table_name, terms)
+        keep = [col for col in columns if KEY_COLUMN_PATTERN.search(col)][:max_columns]
+        relevant = sorted(
+            (col for col in columns if column_scores.get(col, 0) > 0 and col not in keep),
+            key=lambda col: column_scores[col],
+            reverse=True
+        )
+        keep.extend(relevant[:max_columns - len(keep)])
+        for col in columns:
+            if len(keep) >= max_columns:
+                break
+            if col not in keep:
+                keep.append(col)
+
+        kept = set(keep)
+        return render_table(table_name, self.tables[table_name], [col for col in columns if col in kept])
+
+
+_catalog_cache: "OrderedDict[str, SchemaCatalog]" = OrderedDict()
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(schema_info: Dict[str, Any]) -> SchemaCatalog:
+    """
+    Return the parsed catalog for this schema version, building it on first use
+    """
+    fingerprint = schema_fingerprint(schema_info)
+    with _catalog_lock:
+        catalog = _catalog_cache.get(fingerprint)
+        if catalog is not None:
+            _catalog_cache.move_to_end(fingerprint)
+            return catalog
+
+    catalog = SchemaCatalog(schema_info)
+    with _catalog_lock:
+        _catalog_cache[fingerprint] = catalog
+        while len(_catalog_cache) > CATALOG_CACHE_SIZE:
+            _catalog_cache.popitem(last=False)
+    return catalog
+
+
+def clear_catalog_cache() -> None:
+    with _catalog_lock:
+        _catalog_cache.clear()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def select_tables(
+    catalog: SchemaCatalog,
+    terms: Set[str],
+    token_budget: int,
+    top_k: int,
+    max_columns: int,
+    ranker: Optional[TableRanker] = None
+) -> List[str]:
+    """
+    Pick rendered table blocks in relevance order until top_k or the token budget is reached
+    """
+    ranked = ranker(terms, list(catalog.tables)) if ranker else None
+    if ranked is None:
+        ranked = catalog.rank_tables(terms)
+    candidates = [item for item in ranked if item[1] > 0] or ranked
+
+    blocks = []
+    used = 0
+    for table_name, _ in candidates[:top_k]:
+        block = catalog.render_selected(table_name, terms, max_columns)
+        cost = estimate_tokens(block)
+        if blocks and used + cost > token_budget:
+            continue
+        blocks.append(block)
+        used += cost
+    return blocks
+
+
+def select_schema_for_prompt(
+    schema_info: Dict[str, Any],
+    query_text: str,
+    token_budget: Optional[int] = None,
+    top_k: Optional[int] = None,
+    max_columns: Optional[int] = None,
+    ranker: Optional[TableRanker] = None
+) -> str:
+    """
+    Render the part of the schema relevant to a question within a token budget.
+
+    Args:
+        schema_info: Schema from get_database_schema
+        query_text: The natural language question
+        token_budget: Approximate token budget (SCHEMA_PROMPT_TOKEN_BUDGET)
+        top_k: Maximum number of tables (SCHEMA_PROMPT_TOP_K_TABLES)
+        max_columns: Maximum columns per table (SCHEMA_PROMPT_MAX_COLUMNS)
+        ranker: Optional table ranker (e.g. the persisted schema index);
+            returning None falls back to the catalog's lexical ranking
+
+    Returns:
+        Schema description for the prompt
+    """
+    token_budget = token_budget or _env_int("SCHEMA_PROMPT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)
+    top_k = top_k or _env_int("SCHEMA_PROMPT_TOP_K_TABLES", DEFAULT_TOP_K_TABLES)
+    max_columns = max_columns or _env_int("SCHEMA_PROMPT_MAX_COLUMNS", DEFAULT_MAX_COLUMNS)
+
+    catalog = get_catalog(schema_info)
+    if estimate_tokens(catalog.full_text) <= token_budget:
+        return catalog.full_text
+
+    blocks = select_tables(catalog, question_terms(query_text), token_budget, top_k, max_columns, ranker)
+    omitted = len(catalog.tables) - len(blocks)
+    if omitted > 0:
+        blocks.append(f"({omitted} other tables omitted as not relevant to this question)\n")
+    return "\n".join(blocks)
@@ -0,0 +1,335 @@
+"""
+Similarity-based cache of generated SQL for near-duplicate questions.
+
+Questions are normalized into canonical terms: lowercased, lightly stemmed,
+filler words dropped and common synonyms folded ("biggest", "largest" and
+"highest" all become "top"). Two questions match when the weighted mix of
+term Jaccard similarity and character-trigram cosine similarity reaches the
+threshold, and their guard terms (numbers, negations, sort direction) are
+identical, so "top 5" never reuses the SQL for "top 10". Every other term
+that is not a table or column name of the schema is treated as a literal
+(a filter value such as "california" or "dhl") and must match exactly too:
+only wording and schema vocabulary may differ between a question and the
+cached one it reuses. Word order matters as well: the table and column names
+must appear in the same order, so "number of orders per customer" never
+reuses the SQL for "number of customers per order", and the trigrams are
+taken over the terms as asked.
+
+Entries are scoped to the tenant (core.tenancy) and a structure-only schema
+fingerprint (table and column names and types), so uploading more rows keeps
+cached SQL valid while any schema change starts from an empty scope, and one
+tenant never reuses SQL written for another tenant's questions.
+
+A wrong hit returns wrong data, so the cache is opt-in.
+
+Configuration (environment variables):
+- SEMANTIC_CACHE: "1" to enable the cache
+- SEMANTIC_CACHE_THRESHOLD: minimum similarity for a hit (0-1)
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from .schema_selector import tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.85
+
+# Cached questions kept per schema structure
+MAX_ENTRIES_PER_SCHEMA = 2000
+
+# Number of schema structures kept
+MAX_SCHEMAS = 16
+
+# Weight of term overlap vs character trigram similarity
+TERM_WEIGHT = 0.7
+
+FILLER_WORDS = {
+    'a', 'all', 'an', 'and', 'are', 'by', 'can', 'display', 'do', 'find', 'for',
+    'get', 'give', 'has', 'have', 'how', 'i', 'in', 'is', 'let', 'list', 'me', 'of',
+    'on', 'please', 'return', 'see', 'show', 'tell', 'that', 'the', 'their', 'there',
+    'to', 'u', 'want', 'we', 'what', 'which', 'with', 'you',
+}
+
+SYNONYMS = {
+    'biggest': 'top', 'largest': 'top', 'highest': 'top', 'greatest': 'top',
+    'best': 'top', 'most': 'top', 'maximum': 'top', 'max': 'top',
+    'smallest': 'bottom', 'lowest': 'bottom', 'least': 'bottom', 'worst': 'bottom',
+    'fewest': 'bottom', 'minimum': 'bottom', 'min': 'bottom',
+    'total': 'sum', 'number': 'count', 'many': 'count',
+    'average': 'avg', 'mean': 'avg',
+    'client': 'customer', 'buyer': 'customer',
+    'sale': 'revenue', 'income': 'revenue',
+    'each': 'per', 'every': 'all',
+}
+
+# Terms that change the meaning of a question even when everything else matches
+GUARD_WORDS = {
+    'not', 'no', 'without', 'except', 'excluding', 'exclude', 'never', 'top', 'bottom',
+    'asc', 'ascending', 'desc', 'descending', 'before', 'after', 'above', 'below',
+    'over', 'under', 'more', 'less', 'first', 'last', 'oldest', 'newest', 'latest',
+    'earliest', 'avg', 'sum', 'count', 'distinct', 'unique',
+}
+
+_NUMBER_PATTERN = re.compile(r'^\d+$')
+
+
+def question_key_terms(question: str) -> List[str]:
+    """
+    Canonical terms of a question, in order
+    """
+    terms = []
+    for token in tokenize(question):
+        token = SYNONYMS.get(token, token)
+        if token not in FILLER_WORDS:
+            terms.append(token)
+    return terms
+
+
+def guard_terms(terms: List[str]) -> FrozenSet[str]:
+    return frozenset(term for term in terms if term in GUARD_WORDS or _NUMBER_PATTERN.match(term))
+
+
+def schema_identifier_terms(schema_info: Dict[str, Any]) -> FrozenSet[str]:
+    """
+    Canonical terms of the schema's table and column names
+    """
+    terms = set()
+    for table_name, table_info in schema_info.get('tables', {}).items():
+        terms.update(question_key_terms(table_name))
+        for column_name in table_info.get('columns', {}):
+            terms.update(question_key_terms(column_name))
+    return frozenset(terms)
+
+
+def trigrams(terms: List[str]) -> Counter:
+    text = f" {' '.join(terms)} "
+    return Counter(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[gram] for gram, count in a.items() if gram in b)
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+def schema_structure_fingerprint(schema_info: Dict[str, Any]) -> str:
+    """
+    Hash of table and column definitions only (row counts and samples excluded)
+    """
+    structure = {
+        table_name: table_info.get('columns', {})
+        for table_name, table_info in schema_info.get('tables', {}).items()
+    }
+    payload = json.dumps(structure, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def scope_key(scope: str, fingerprint: str) -> str:
+    """
+    Key of the entries of one tenant scope and schema structure
+    """
+    return f"{scope}:{fingerprint}" if scope else fingerprint
+
+
+@dataclass
+class CachedQuestion:
+    question: str
+    sql: str
+    terms: Set[str]
+    # Canonical terms in question order
+    sequence: Tuple[str, ...]
+    guards: FrozenSet[str]
+    grams: Counter
+    hits: int = 0
+
+
+@dataclass
+class SemanticMatch:
+    question: str
+    sql: str
+    similarity: float
+
+
+@dataclass
+class _SchemaScope:
+    entries: "OrderedDict[str, CachedQuestion]" = field(default_factory=OrderedDict)
+    # term -> keys of entries containing it, to avoid scoring every entry
+    postings: Dict[str, Set[str]] = field(default_factory=dict)
+
+
+def question_key(entry: CachedQuestion) -> str:
+    return " ".join(entry.sequence)
+
+
+def identifier_sequence(entry: CachedQuestion, identifiers: FrozenSet[str]) -> Tuple[str, ...]:
+    """
+    Schema terms of a question in the order they were asked
+    """
+    return tuple(term for term in entry.sequence if term in identifiers)
+
+
+def similarity(a: CachedQuestion, b: CachedQuestion, identifiers: FrozenSet[str] = frozenset()) -> float:
+    """
+    Similarity of two questions in [0, 1]; 0 when their guard terms, their
+    literal terms (anything not in identifiers) or the order of their schema
+    terms differ
+    """
+    if a.guards != b.guards or a.terms - identifiers != b.terms - identifiers:
+        return 0.0
+    if identifier_sequence(a, identifiers) != identifier_sequence(b, identifiers):
+        return 0.0
+    union = a.terms | b.terms
+    jaccard = len(a.terms & b.terms) / len(union) if union else 1.0
+    return TERM_WEIGHT * jaccard + (1 - TERM_WEIGHT) * _cosine(a.grams, b.grams)
+
+
+def make_entry(question: str, sql: str = "") -> CachedQuestion:
+    terms = question_key_terms(question)
+    return CachedQuestion(
+        question=question,
+        sql=sql,
+        terms=set(terms),
+        sequence=tuple(terms),
+        guards=guard_terms(terms),
+        grams=trigrams(terms),
+    )
+
+
+class SemanticCache:
+    """
+    Thread-safe cache of question -> SQL, scoped by tenant and schema structure
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, max_entries: int = MAX_ENTRIES_PER_SCHEMA):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.scopes: "OrderedDict[str, _SchemaScope]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _scope(self, key: str) -> _SchemaScope:
+        scope = self.scopes.get(key)
+        if scope is None:
+            scope = self.scopes[key] = _SchemaScope()
+            while len(self.scopes) > MAX_SCHEMAS:
+                self.scopes.popitem(last=False)
+        else:
+            self.scopes.move_to_end(key)
+        return scope
+
+    def lookup(self, question: str, schema_info: Dict[str, Any], scope: str = "") -> Optional[SemanticMatch]:
+        """
+        Best cached question at or above the threshold for this scope (tenant) and schema, if any
+        """
+        probe = make_entry(question)
+        key = question_key(probe)
+        schema_key = scope_key(scope, schema_structure_fingerprint(schema_info))
+        identifiers = schema_identifier_terms(schema_info)
+
+        with self._lock:
+            schema_scope = self._scope(schema_key)
+            candidates = set()
+            for term in probe.terms:
+                candidates |= schema_scope.postings.get(term, set())
+            if key in schema_scope.entries:
+                candidates.add(key)
+
+            best, best_score = None, 0.0
+            for candidate_key in candidates:
+                entry = schema_scope.entries[candidate_key]
+                score = similarity(probe, entry, identifiers)
+                if score > best_score:
+                    best, best_score = entry, score
+
+            if best is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            best.hits += 1
+            self.hits += 1
+            schema_scope.entries.move_to_end(question_key(best))
+
+        logger.info(
+            "[CACHE] Semantic cache hit: similarity=%.3f, question=%r, cached_question=%r",
+            best_score, question, best.question
+        )
+        return SemanticMatch(question=best.question, sql=best.sql, similarity=best_score)
+
+    def store(self, question: str, schema_info: Dict[str, Any], sql: str, scope: str = "") -> None:
+        self._store_entry(scope_key(scope, schema_structure_fingerprint(schema_info)), make_entry(question, sql))
+
+    def _store_entry(self, schema_key: str, entry: CachedQuestion) -> None:
+        key = question_key(entry)
+        with self._lock:
+            scope = self._scope(schema_key)
+            if key in scope.entries:
+                self._remove(scope, key)
+            scope.entries[key] = entry
+            for term in entry.terms:
+                scope.postings.setdefault(term, set()).add(key)
+            while len(scope.entries) > self.max_entries:
+                self._remove(scope, next(iter(scope.entries)))
+
+    @staticmethod
+    def _remove(scope: _SchemaScope, key: str) -> None:
+        entry = scope.entries.pop(key)
+        for term in entry.terms:
+            keys = scope.postings.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del scope.postings[term]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'schemas': len(self.scopes),
+                'entries': sum(len(scope.entries) for scope in self.scopes.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'threshold': self.threshold,
+            }
+
+
+_cache: Optional[SemanticCache] = None
+_cache_lock = threading.Lock()
+
+
+def semantic_cache_enabled() -> bool:
+    return os.environ.get("SEMANTIC_CACHE", "0").lower() in ("1", "true", "yes")
+
+
+def get_semantic_cache() -> SemanticCache:
+    """
+    Process-wide semantic cache using SEMANTIC_CACHE_THRESHOLD, shared
+    between worker processes when SHARED_CACHE=1
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            value = os.environ.get("SEMANTIC_CACHE_THRESHOLD")
+            threshold = float(value) if value else DEFAULT_THRESHOLD
+            # Imported here: core.shared_cache subclasses SemanticCache
+            from .shared_cache import SharedSemanticCache, get_shared_store, shared_cache_enabled
+            if shared_cache_enabled():
+                _cache = SharedSemanticCache(get_shared_store(), threshold)
+            else:
+                _cache = SemanticCache(threshold)
+        return _cache
+
+
+def reset_semantic_cache() -> None:
+    global _cache
+    with _cache_lock:
+        _cache = None
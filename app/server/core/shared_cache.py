@@ -0,0 +1,327 @@
+"""
+Caches shared by the worker processes of one host.
+
+Each uvicorn worker is a separate process. With in-process caches every
+worker warms its own copy, so the hit rate falls with the number of workers,
+and an upload handled by one worker only invalidates that worker's results.
+With SHARED_CACHE=1 the result cache and the semantic cache live in one
+SQLite file (WAL mode, so readers never wait for the writer) that all
+workers on the host use:
+
+- SharedResultCache: results are stored as JSON together with the table
+  versions they were computed at. Table versions live in the same file, so
+  an upload in any worker invalidates the entry for all of them.
+- SharedSemanticCache: questions and their SQL are appended to a log table,
+  keyed by tenant scope and schema fingerprint. Every worker keeps its
+  in-memory similarity index and, before a lookup, pulls the rows it has not
+  seen yet (one primary key range query).
+
+The schema catalog needs no extra store: workers reload the persisted schema
+index (core.schema_index) when its file changes. When the cache file is busy
+beyond the connection timeout, a result lookup counts as a miss and a store
+is skipped, and the semantic cache answers from (and stores into) its local
+index only, so the caches never fail a query.
+
+Configuration (environment variables):
+- SHARED_CACHE: "1" to share the caches between processes (server.py sets it
+  when started with WORKERS > 1)
+- SHARED_CACHE_PATH: location of the cache file
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from . import json_parser
+from .result_cache import ResultCache, normalize_sql
+from .semantic_cache import MAX_SCHEMAS, SemanticCache, make_entry, schema_structure_fingerprint, scope_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "db/shared_cache.db"
+
+# Hits refresh an entry's LRU timestamp at most this often, so hot entries do not
+# turn every read into a write
+TOUCH_INTERVAL_SECONDS = 10
+
+# Every TRIM_EVERY inserts, the question log is cut back to what the local indexes can hold
+TRIM_EVERY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    scope TEXT NOT NULL,
+    sql TEXT NOT NULL,
+    result TEXT NOT NULL,
+    versions TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (scope, sql)
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+CREATE TABLE IF NOT EXISTS table_versions (
+    scope TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (scope, table_name)
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    -- scope_key(tenant, schema fingerprint)
+    fingerprint TEXT NOT NULL,
+    question TEXT NOT NULL,
+    sql TEXT NOT NULL
+);
+"""
+
+
+def shared_cache_enabled() -> bool:
+    return os.environ.get("SHARED_CACHE") == "1"
+
+
+class SharedStore:
+    """
+    The shared cache file, with one connection per thread
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self.connection()
+        conn.executescript(_SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit; multi-statement updates open their own transaction
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class SharedResultCache(ResultCache):
+    """
+    ResultCache stored in the shared file. Hit and miss counters stay per process.
+    """
+
+    def __init__(self, store: SharedStore, max_bytes: int):
+        super().__init__(max_bytes)
+        self.shared = store
+        # (entries, bytes) from the last stats() that could read the file
+        self._shared_size = (0, 0)
+
+    def table_version_snapshot(self, scope: str = "") -> Optional[Dict[str, int]]:
+        """Table versions of the scope, or None if the cache file is unavailable"""
+        try:
+            rows = self.shared.connection().execute(
+                "SELECT table_name, version FROM table_versions WHERE scope = ?", (scope,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("[WARNING] Shared result cache unavailable: %s", str(e))
+            return None
+        return dict(rows)
+
+    def bump_table_version(self, table_name: str, scope: str = "") -> None:
+        self.shared.connection().execute(
+            "INSERT INTO table_versions (scope, table_name, version) VALUES (?, ?, 1) "
+            "ON CONFLICT (scope, table_name) DO UPDATE SET version = version + 1",
+            (scope, table_name)
+        )
+
+    def get(self, sql: str, scope: str = "") -> Optional[Dict[str, Any]]:
+        try:
+            result = self._lookup(normalize_sql(sql), scope)
+        except sqlite3.Error as e:
+            logger.warning("[WARNING] Shared result cache unavailable: %s", str(e))
+            result = None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def _lookup(self, key: str, scope: str) -> Optional[Dict[str, Any]]:
+        conn = self.shared.connection()
+        row = conn.execute(
+            "SELECT result, versions, used FROM results WHERE scope = ? AND sql = ?", (scope, key)
+        ).fetchone()
+        if row is None:
+            return None
+        versions = json.loads(row[1])
+        current = dict(conn.execute(
+            "SELECT table_name, version FROM table_versions WHERE scope = ?", (scope,)
+        ).fetchall())
+        if all(current.get(table, 0) == version for table, version in versions.items()):
+            now = time.time()
+            if now - row[2] > TOUCH_INTERVAL_SECONDS:
+                conn.execute("UPDATE results SET used = ? WHERE scope = ? AND sql = ?", (now, scope, key))
+            return json_parser.loads(row[0])
+        conn.execute("DELETE FROM results WHERE scope = ? AND sql = ?", (scope, key))
+        return None
+
+    def put(self, sql: str, result: Dict[str, Any], tables: Set[str], versions: Optional[Dict[str, int]], scope: str = "") -> bool:
+        """
+        Store a successful result; returns False if it is larger than the
+        whole budget, not JSON-serializable (BLOB values), or the cache file
+        is unavailable
+        """
+        if versions is None:
+            return False
+        try:
+            payload = json_parser.dumps(result)
+        except (TypeError, ValueError):
+            return False
+        size = len(payload)
+        if size > self.max_bytes:
+            return False
+
+        try:
+            evicted = self._store(normalize_sql(sql), payload, size,
+                                  {table: versions.get(table, 0) for table in tables}, scope)
+        except sqlite3.Error as e:
+            logger.warning("[WARNING] Shared result cache store skipped: %s", str(e))
+            return False
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+        return True
+
+    def _store(self, key: str, payload: str, size: int, versions: Dict[str, int], scope: str) -> int:
+        """Insert one entry and evict the least recently used ones over budget; returns the evictions"""
+        conn = self.shared.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (scope, sql, result, versions, size, used) VALUES (?, ?, ?, ?, ?, ?)",
+                (scope, key, payload, json.dumps(versions), size, time.time())
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            evicted = 0
+            while total > self.max_bytes:
+                rowid, entry_size = conn.execute("SELECT rowid, size FROM results ORDER BY used LIMIT 1").fetchone()
+                conn.execute("DELETE FROM results WHERE rowid = ?", (rowid,))
+                total -= entry_size
+                evicted += 1
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return evicted
+
+    def clear(self) -> None:
+        self.shared.connection().execute("DELETE FROM results")
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            self._shared_size = self.shared.connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("[WARNING] Shared result cache unavailable: %s", str(e))
+        entries, total = self._shared_size
+        with self._lock:
+            return {
+                'entries': entries,
+                'bytes': total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'shared': True,
+            }
+
+
+class SharedSemanticCache(SemanticCache):
+    """
+    SemanticCache whose entries are replicated to every process through the
+    question log of the shared file
+    """
+
+    def __init__(self, store: SharedStore, threshold: float):
+        super().__init__(threshold)
+        self.shared = store
+        self.last_id = 0
+        self._pull_lock = threading.Lock()
+
+    def _pull(self) -> None:
+        """
+        Add questions stored by any process since the last pull to the local index
+        """
+        with self._pull_lock:
+            try:
+                rows = self.shared.connection().execute(
+                    "SELECT id, fingerprint, question, sql FROM questions WHERE id > ? ORDER BY id", (self.last_id,)
+                ).fetchall()
+            except sqlite3.Error as e:
+                # Answer from what this process already has; the next pull catches up
+                logger.warning("[WARNING] Shared semantic cache unavailable: %s", str(e))
+                return
+            for row_id, schema_key, question, sql in rows:
+                self._store_entry(schema_key, make_entry(question, sql))
+                self.last_id = row_id
+
+    def lookup(self, question: str, schema_info: Dict[str, Any], scope: str = ""):
+        self._pull()
+        return super().lookup(question, schema_info, scope)
+
+    def store(self, question: str, schema_info: Dict[str, Any], sql: str, scope: str = "") -> None:
+        schema_key = scope_key(scope, schema_structure_fingerprint(schema_info))
+        try:
+            conn = self.shared.connection()
+            row_id = conn.execute(
+                "INSERT INTO questions (fingerprint, question, sql) VALUES (?, ?, ?)", (schema_key, question, sql)
+            ).lastrowid
+            if row_id % TRIM_EVERY == 0:
+                conn.execute("DELETE FROM questions WHERE id <= ?", (row_id - MAX_SCHEMAS * self.max_entries,))
+        except sqlite3.Error as e:
+            logger.warning("[WARNING] Shared semantic cache store kept local: %s", str(e))
+            self._store_entry(schema_key, make_entry(question, sql))
+            return
+        self._pull()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), 'shared': True}
+
+
+_store: Optional[SharedStore] = None
+_store_lock = threading.Lock()
+
+
+def get_shared_store() -> SharedStore:
+    """
+    Process-wide handle on the file at SHARED_CACHE_PATH
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SharedStore(os.environ.get("SHARED_CACHE_PATH") or DEFAULT_PATH)
+        return _store
+
+
+def reset_shared_store() -> None:
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+        _store = None
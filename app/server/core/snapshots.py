@@ -0,0 +1,319 @@
+"""
+Read replicas through published database snapshots.
+
+One server process runs as the writer (SNAPSHOT_MODE=writer): it owns the
+SQLite file, takes uploads and deletes, and after every change publishes a
+consistent copy of the database (sqlite3 backup API) and of its schema index
+into a snapshots/ directory next to the database. A small CURRENT pointer
+file names the newest snapshot and is swapped atomically (os.replace), so a
+reader never sees a half-written snapshot.
+
+Any number of reader processes (SNAPSHOT_MODE=reader), on the same host or on
+hosts sharing the snapshots directory, serve /api/query, /api/schema and
+/api/insights from the snapshot named by CURRENT. Snapshot files are never
+modified after publication, so readers open them read-only with immutable=1:
+SQLite takes no locks and does no change detection on them, and every reader
+scales independently of the writer. Readers re-check the pointer at most
+every SNAPSHOT_POLL_SECONDS; result cache entries are scoped by snapshot
+version, so they never outlive the data they were computed from. Until a
+first snapshot exists, readers read the primary file read-only.
+
+Snapshots are per tenant (see core.tenancy): each tenant's database has its
+own snapshots/ directory and pointer. Publication holds an exclusive lock on
+a PUBLISH.lock file in that directory, so writers in different worker
+processes never pick the same version or overwrite each other's pointer.
+
+A reader may keep using a pointer for up to one poll interval after it
+changed, so the writer removes a snapshot beyond SNAPSHOT_RETAIN only once it
+has been superseded for SNAPSHOT_PRUNE_GRACE_SECONDS (never less than the
+poll interval).
+
+Configuration (environment variables):
+- SNAPSHOT_MODE: "off" (default, single process), "writer" or "reader"
+- SNAPSHOT_POLL_SECONDS: how often a reader looks for a newer snapshot
+- SNAPSHOT_RETAIN: snapshots the writer keeps on disk
+- SNAPSHOT_PRUNE_GRACE_SECONDS: how long a superseded snapshot outlives its
+  successor before it may be removed
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .connection_pool import ConnectionPool, close_pool, get_pool
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: publication is only serialized per process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR_NAME = "snapshots"
+POINTER_NAME = "CURRENT"
+LOCK_NAME = "PUBLISH.lock"
+DEFAULT_POLL_SECONDS = 1.0
+DEFAULT_RETAIN = 3
+DEFAULT_PRUNE_GRACE_SECONDS = 30.0
+
+_SNAPSHOT_FILE_PATTERN = re.compile(r"^(\d{8})\.")
+
+
+class SnapshotError(Exception):
+    """Raised for writes on a reader or a failed snapshot publication"""
+    pass
+
+
+def snapshot_mode() -> str:
+    mode = os.environ.get("SNAPSHOT_MODE", "off").strip().lower()
+    return mode if mode in ("writer", "reader") else "off"
+
+
+def is_reader() -> bool:
+    return snapshot_mode() == "reader"
+
+
+def is_writer() -> bool:
+    return snapshot_mode() == "writer"
+
+
+def _poll_seconds() -> float:
+    value = os.environ.get("SNAPSHOT_POLL_SECONDS")
+    return float(value) if value else DEFAULT_POLL_SECONDS
+
+
+def _retain() -> int:
+    value = os.environ.get("SNAPSHOT_RETAIN")
+    return max(1, int(value)) if value else DEFAULT_RETAIN
+
+
+def _prune_grace_seconds() -> float:
+    value = os.environ.get("SNAPSHOT_PRUNE_GRACE_SECONDS")
+    grace = float(value) if value else DEFAULT_PRUNE_GRACE_SECONDS
+    return max(grace, _poll_seconds())
+
+
+def snapshot_dir(database_path: str) -> str:
+    return os.path.join(os.path.dirname(database_path) or ".", SNAPSHOT_DIR_NAME)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int
+    database: str
+    schema_index: str
+    published_at: str
+
+
+def _read_pointer(directory: str) -> Optional[Snapshot]:
+    try:
+        with open(os.path.join(directory, POINTER_NAME)) as f:
+            pointer = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return Snapshot(
+        version=pointer['version'],
+        database=os.path.join(directory, pointer['database']),
+        schema_index=os.path.join(directory, pointer['schema_index']),
+        published_at=pointer.get('published_at', ""),
+    )
+
+
+_publish_lock = threading.Lock()
+
+
+@contextmanager
+def _publication_lock(directory: str) -> Iterator[None]:
+    """Serialize publication between the threads of this process and between processes"""
+    with _publish_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(directory, LOCK_NAME), "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def publish_snapshot(database_path: str, schema_index_path: str) -> Snapshot:
+    """
+    Copy the database and its schema index into a new snapshot and point
+    CURRENT at it. Older snapshots beyond SNAPSHOT_RETAIN are removed.
+
+    Raises:
+        SnapshotError: If the database cannot be copied
+    """
+    directory = snapshot_dir(database_path)
+    os.makedirs(directory, exist_ok=True)
+    with _publication_lock(directory):
+        previous = _read_pointer(directory)
+        version = previous.version + 1 if previous else 1
+        database_name = f"{version:08d}.db"
+        index_name = f"{version:08d}.schema_index.json"
+
+        # The backup API copies a consistent state even while other connections write
+        tmp_database = os.path.join(directory, f"{database_name}.tmp")
+        try:
+            source = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+            try:
+                target = sqlite3.connect(tmp_database)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+            finally:
+                source.close()
+        except sqlite3.Error as e:
+            if os.path.exists(tmp_database):
+                os.remove(tmp_database)
+            raise SnapshotError(f"Snapshot of {database_path} failed: {str(e)}")
+        os.replace(tmp_database, os.path.join(directory, database_name))
+
+        if os.path.exists(schema_index_path):
+            shutil.copyfile(schema_index_path, os.path.join(directory, index_name))
+
+        pointer = {
+            'version': version,
+            'database': database_name,
+            'schema_index': index_name,
+            'published_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        tmp_pointer = os.path.join(directory, f"{POINTER_NAME}.tmp")
+        with open(tmp_pointer, "w") as f:
+            json.dump(pointer, f)
+        os.replace(tmp_pointer, os.path.join(directory, POINTER_NAME))
+
+        _prune_snapshots(directory, version - _retain())
+    logger.info("[SUCCESS] Published snapshot %d of %s", version, database_path)
+    return _read_pointer(directory)
+
+
+def _prune_snapshots(directory: str, oldest_removed: int) -> None:
+    """
+    Remove the files of snapshots up to oldest_removed that were superseded
+    more than the grace period ago; younger ones are left for a later publication
+    """
+    files: Dict[int, List[str]] = {}
+    for name in os.listdir(directory):
+        match = _SNAPSHOT_FILE_PATTERN.match(name)
+        if match:
+            files.setdefault(int(match.group(1)), []).append(name)
+
+    # A snapshot was superseded when the next one on disk was published
+    published = {}
+    for version in files:
+        try:
+            published[version] = os.stat(os.path.join(directory, f"{version:08d}.db")).st_mtime
+        except OSError:
+            continue
+    now = time.time()
+    grace = _prune_grace_seconds()
+    versions = sorted(files)
+    for position, version in enumerate(versions):
+        if version > oldest_removed:
+            break
+        successor = next((published[later] for later in versions[position + 1:] if later in published), None)
+        if successor is None or now - successor < grace:
+            continue
+        for name in files[version]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                # A reader on a filesystem without unlink-while-open semantics; retry next time
+                pass
+
+
+# Pointer path -> (last checked, pointer file identity, snapshot)
+_pointer_cache: Dict[str, Tuple[float, Optional[Tuple[int, int]], Optional[Snapshot]]] = {}
+_pointer_lock = threading.Lock()
+
+
+def current_snapshot(database_path: str) -> Optional[Snapshot]:
+    """
+    Newest published snapshot of a database, re-read from disk at most every
+    SNAPSHOT_POLL_SECONDS and only when the pointer file changed
+    """
+    directory = snapshot_dir(database_path)
+    pointer_path = os.path.join(directory, POINTER_NAME)
+    now = time.monotonic()
+    with _pointer_lock:
+        cached = _pointer_cache.get(pointer_path)
+        if cached is not None and now - cached[0] < _poll_seconds():
+            return cached[2]
+        try:
+            stat = os.stat(pointer_path)
+            identity = (stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            identity = None
+        if cached is not None and cached[1] == identity:
+            _pointer_cache[pointer_path] = (now, identity, cached[2])
+            return cached[2]
+        snapshot = _read_pointer(directory) if identity is not None else None
+        _pointer_cache[pointer_path] = (now, identity, snapshot)
+
+    previous = cached[2] if cached is not None else None
+    if previous is not None and (snapshot is None or snapshot.version != previous.version):
+        # In-flight queries keep their connection; it is closed when released
+        close_pool(previous.database)
+        logger.info("[SUCCESS] Switched to snapshot %s of %s", snapshot.version if snapshot else None, database_path)
+    return snapshot
+
+
+def reset_snapshot_state() -> None:
+    with _pointer_lock:
+        _pointer_cache.clear()
+
+
+@dataclass(frozen=True)
+class ReadTarget:
+    """
+    Where a read is served from: a published snapshot (readers) or the
+    primary database file
+    """
+    database: str
+    snapshot: Optional[Snapshot] = None
+    read_only: bool = False
+
+    def pool(self, read_only: bool = False) -> ConnectionPool:
+        if self.snapshot is not None:
+            return get_pool(self.database, read_only=True, immutable=True)
+        return get_pool(self.database, read_only or self.read_only)
+
+    def cache_scope(self, tenant: str) -> str:
+        """
+        Result cache scope; snapshot results are valid for the snapshot's lifetime
+        """
+        return f"{tenant}@{self.snapshot.version}" if self.snapshot is not None else tenant
+
+
+def read_target(database_path: str) -> ReadTarget:
+    """
+    The file reads should use: the current snapshot in reader mode, the
+    primary database otherwise (and on readers before the first publication)
+    """
+    if is_reader():
+        snapshot = current_snapshot(database_path)
+        if snapshot is not None:
+            return ReadTarget(snapshot.database, snapshot)
+        return ReadTarget(database_path, read_only=True)
+    return ReadTarget(database_path)
+
+
+def reject_writes_on_reader() -> None:
+    """
+    Raises:
+        SnapshotError: If this process serves read-only snapshots
+    """
+    if is_reader():
+        raise SnapshotError("This server serves read-only snapshots (SNAPSHOT_MODE=reader); send uploads and deletes to the writer")
@@ -0,0 +1,122 @@
+"""
+Cheap-first cascade for SQL generation.
+
+With LLM_CASCADE=1 a question is answered by the cheapest tier whose SQL
+holds up:
+
+1. rules: core.intent_parser, for trivial questions ("how many orders",
+   "show customers"); no model call
+2. small: the fast default models (gpt-4.1-mini, claude-3-haiku)
+3. large: stronger models (LLM_LARGE_OPENAI_MODEL, LLM_LARGE_ANTHROPIC_MODEL)
+
+SQL from a tier is accepted when it passes validation and SQLite can prepare
+it against the current database (EXPLAIN), which catches unknown tables and
+columns and syntax errors without running the query. Otherwise the next tier
+is asked. /api/query also escalates once to the large tier when accepted SQL
+fails at execution.
+
+Per-tier attempts, accepted and rejected SQL are exported through
+/api/metrics, so the share of questions each tier answers is visible.
+
+Configuration (environment variables):
+- LLM_CASCADE: "1" to enable the cascade (otherwise every question goes to the small tier)
+- LLM_LARGE_OPENAI_MODEL / LLM_LARGE_ANTHROPIC_MODEL: models of the large tier
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .sql_security import SQLSecurityError
+
+logger = logging.getLogger(__name__)
+
+TIER_RULES = "rules"
+TIER_SMALL = "small"
+TIER_LARGE = "large"
+TIERS = (TIER_RULES, TIER_SMALL, TIER_LARGE)
+
+# Source reported for SQL reused from the semantic cache
+SEMANTIC_CACHE_SOURCE = "semantic_cache"
+
+DEFAULT_LARGE_MODELS = {
+    'openai': "gpt-4.1",
+    'anthropic': "claude-sonnet-4-20250514",
+}
+
+
+def cascade_enabled() -> bool:
+    return os.environ.get("LLM_CASCADE", "").lower() in ("1", "true", "yes")
+
+
+def large_model(provider: str) -> str:
+    return os.environ.get(f"LLM_LARGE_{provider.upper()}_MODEL") or DEFAULT_LARGE_MODELS[provider]
+
+
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def _record(tier: str, outcome: str) -> None:
+    with _stats_lock:
+        counts = _stats.setdefault(tier, {'attempts': 0, 'accepted': 0, 'rejected': 0, 'execution_failures': 0})
+        counts[outcome] += 1
+
+
+def record_execution_failure(source: str) -> None:
+    """
+    Count accepted SQL that then failed at execution (the request escalates)
+    """
+    _record(source, 'execution_failures')
+
+
+def cascade_snapshot() -> Dict[str, Dict[str, int]]:
+    with _stats_lock:
+        return {tier: dict(counts) for tier, counts in _stats.items()}
+
+
+def reset_cascade_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def run_cascade(
+    tiers: List[Tuple[str, Callable[[], Optional[str]]]],
+    check: Callable[[str], None]
+) -> Tuple[str, str]:
+    """
+    Ask each tier in turn until one returns SQL that passes the check
+
+    Args:
+        tiers: (tier name, generate function) pairs, cheapest first; a generate
+            function returns None when its tier cannot answer the question
+        check: Raises SQLSecurityError or sqlite3.Error for unusable SQL
+
+    Returns:
+        (sql, tier) of the first accepted SQL; if no SQL is accepted, the last
+        SQL produced, so execution reports its error
+
+    Raises:
+        Exception: Errors of the generate functions (provider failures) are not escalated
+    """
+    produced: Optional[Tuple[str, str]] = None
+    for tier, generate in tiers:
+        _record(tier, 'attempts')
+        sql = generate()
+        if sql is None:
+            continue
+        produced = (sql, tier)
+        try:
+            check(sql)
+        except (SQLSecurityError, sqlite3.Error) as e:
+            _record(tier, 'rejected')
+            logger.warning("[WARNING] SQL from %s tier rejected (%s), escalating", tier, str(e))
+            continue
+        _record(tier, 'accepted')
+        return sql, tier
+
+    if produced is None:
+        raise ValueError("No cascade tier produced SQL")
+    return produced
@@ -1,49 +1,94 @@
 import sqlite3
-from typing import Dict, Any
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Tuple
 from .sql_security import (
     execute_query_safely, 
     validate_sql_query, 
     SQLSecurityError
 )
+from . import json_parser
+from .result_cache import estimate_size, get_result_cache, is_cacheable
+from .snapshots import read_target
+from .tenancy import current_tenant, tenant_path
+from .tracing import span
+from .constants import (
+    JSON_PATHS_PER_COLUMN,
+    SAMPLE_DESCRIPTION_CACHE_SIZE,
+    SAMPLE_VALUES_PER_COLUMN,
+    SAMPLE_VALUE_MAX_LENGTH,
+    STREAM_ROW_BATCH_SIZE
+)
+
+# Default tenant's database; see core.tenancy
+DATABASE_PATH = "db/database.db"
 
-def execute_sql_safely(sql_query: str) -> Dict[str, Any]:
+def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a result down to its rows (values are immutable SQLite scalars), so callers never share cache entries"""
+    return {
+        **result,
+        'results': [dict(row) for row in result['results']],
+        'columns': list(result['columns'])
+    }
+
+def execute_sql_safely(sql_query: str, read_only: bool = False, use_cache: bool = True) -> Dict[str, Any]:
     """
-    Execute SQL query with safety checks
+    Execute SQL query with safety checks.
+    With read_only=True the query runs on a read-only connection, so many
+    queries can execute concurrently without taking write locks.
+    Successful results are served from and stored in the result cache
+    (core.result_cache) unless use_cache is False.
+    Readers (SNAPSHOT_MODE=reader) query the current snapshot; see core.snapshots.
     """
     try:
         # Validate the SQL query for dangerous operations
-        validate_sql_query(sql_query)
+        with span("validation"):
+            validate_sql_query(sql_query)
+        
+        tenant = current_tenant()
+        target = read_target(tenant_path(DATABASE_PATH, tenant))
+        scope = target.cache_scope(tenant)
         
-        # Connect to database
-        conn = sqlite3.connect("db/database.db")
-        conn.row_factory = sqlite3.Row  # Enable column access by name
+        # Serve repeated queries against unchanged tables without touching SQLite
+        cache = get_result_cache() if use_cache and is_cacheable(sql_query) else None
+        if cache is not None:
+            with span("result_cache"):
+                cached = cache.get(sql_query, scope=scope)
+            if cached is not None:
+                return _copy_result(cached)
+            versions = cache.table_version_snapshot(scope)
         
-        # Execute query safely
+        # Execute query safely on a pooled connection (keeps prepared statements cached)
         # Note: Since this is a user-provided complete SQL query,
         # we can't use parameterization. The validate_sql_query
         # function provides protection against dangerous operations.
-        cursor = conn.cursor()
-        cursor.execute(sql_query)
-        
-        # Get results
-        rows = cursor.fetchall()
+        with span("sql_execution"), target.pool(read_only).connection() as pooled:
+            cursor = pooled.cursor(row_factory=sqlite3.Row)  # Enable column access by name
+            cursor.execute(sql_query)
+            
+            # Get results
+            rows = cursor.fetchall()
+            tables_read = pooled.last_tables
         
         # Convert rows to dictionaries
         results = []
         columns = []
         
-        if rows:
-            columns = list(rows[0].keys())
-            for row in rows:
-                results.append(dict(row))
+        with span("serialization"):
+            if rows:
+                columns = list(rows[0].keys())
+                for row in rows:
+                    results.append(dict(row))
         
-        conn.close()
-        
-        return {
+        result = {
             'results': results,
             'columns': columns,
             'error': None
         }
+        # Only cache when the tables the statement read are known
+        if cache is not None and tables_read is not None:
+            cache.put(sql_query, _copy_result(result), tables_read, versions, scope=scope)
+        return result
     
     except SQLSecurityError as e:
         return {
@@ -58,58 +103,268 @@ def execute_sql_safely(sql_query: str) -> Dict[str, Any]:
             'error': str(e)
         }
 
+def explain_sql(sql_query: str) -> None:
+    """
+    Validate SQL and have SQLite prepare it against the current database without running it.
+
+    Raises:
+        SQLSecurityError: If the query fails validation
+        sqlite3.Error: If SQLite cannot prepare the statement (syntax error, unknown table or column)
+    """
+    validate_sql_query(sql_query)
+
+    with read_target(tenant_path(DATABASE_PATH)).pool(read_only=True).connection() as pooled:
+        cursor = pooled.cursor()
+        try:
+            cursor.execute(f"EXPLAIN {sql_query}")
+        finally:
+            cursor.close()
+
+def stream_sql_rows(sql_query: str, batch_size: int = STREAM_ROW_BATCH_SIZE, use_cache: bool = True) -> Iterator[Tuple[List[str], List[Dict[str, Any]]]]:
+    """
+    Execute SQL query with safety checks and yield results in batches as they are fetched.
+    Results are served from the result cache (core.result_cache) unless
+    use_cache is False; a result read to the end is stored there when it
+    fits the cache.
+
+    Args:
+        sql_query: The SQL query to execute
+        batch_size: Rows fetched per batch
+        use_cache: Whether to use the result cache
+
+    Yields:
+        (columns, rows) tuples; a query without results yields its columns once with no rows
+
+    Raises:
+        SQLSecurityError: If the query fails validation
+        sqlite3.Error: If execution fails
+    """
+    validate_sql_query(sql_query)
+    
+    tenant = current_tenant()
+    target = read_target(tenant_path(DATABASE_PATH, tenant))
+    scope = target.cache_scope(tenant)
+    
+    cache = get_result_cache() if use_cache and is_cacheable(sql_query) else None
+    if cache is not None:
+        cached = cache.get(sql_query, scope=scope)
+        if cached is not None:
+            cached = _copy_result(cached)
+            rows = cached['results']
+            for start in range(0, len(rows), batch_size):
+                yield cached['columns'], rows[start:start + batch_size]
+            if not rows:
+                yield cached['columns'], []
+            return
+        versions = cache.table_version_snapshot(scope)
+    
+    with target.pool().connection() as pooled:
+        cursor = pooled.cursor()
+        try:
+            cursor.execute(sql_query)
+            tables_read = pooled.last_tables
+            columns = [description[0] for description in cursor.description or []]
+            
+            # Rows kept for the result cache, until they outgrow it
+            kept = [] if cache is not None and tables_read is not None else None
+            kept_size = 0
+            sent = False
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                sent = True
+                batch = [dict(zip(columns, row)) for row in rows]
+                if kept is not None:
+                    kept_size += estimate_size(batch, columns)
+                    if kept_size > cache.max_bytes:
+                        kept = None
+                    else:
+                        kept.extend(batch)
+                yield columns, batch
+            if not sent:
+                yield columns, []
+        finally:
+            # Release the statement even if the consumer stopped early
+            cursor.close()
+    
+    if kept is not None:
+        result = {'results': kept, 'columns': columns, 'error': None}
+        cache.put(sql_query, _copy_result(result), tables_read, versions, scope=scope)
+
+def collect_json_paths(documents: List[Any], max_paths: int = JSON_PATHS_PER_COLUMN) -> List[str]:
+    """
+    Collect the distinct leaf JSON paths found in sample documents.
+
+    Array elements are written as [*], e.g. "$.tags[*].name".
+    """
+    paths = []
+    seen = set()
+    stack = [("$", document) for document in reversed(documents)]
+
+    while stack and len(paths) < max_paths:
+        path, value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend((f"{path}.{key}", child) for key, child in reversed(list(value.items())))
+        elif isinstance(value, list):
+            stack.extend((f"{path}[*]", child) for child in reversed(value))
+        elif path != "$" and path not in seen:
+            seen.add(path)
+            paths.append(path)
+
+    return paths
+
+def _describe_sample_rows(conn: sqlite3.Connection, table_name: str) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """
+    Describe a table from a small sample of rows: TEXT columns holding JSON
+    objects/arrays are described by their paths, other short text values are
+    kept as representative sample values.
+
+    Returns:
+        Tuple of (json_columns, sample_values), both keyed by column name
+    """
+    cursor_sample = execute_query_safely(
+        conn,
+        "SELECT * FROM {table} LIMIT 5",
+        identifier_params={'table': table_name}
+    )
+    sample_rows = cursor_sample.fetchall()
+    column_names = [description[0] for description in cursor_sample.description]
+
+    json_columns = {}
+    sample_values = {}
+    for index, column_name in enumerate(column_names):
+        documents = []
+        values = []
+        for row in sample_rows:
+            value = row[index]
+            if not isinstance(value, str):
+                continue
+            if value[:1] in ('{', '['):
+                try:
+                    documents.append(json_parser.loads(value))
+                    continue
+                except ValueError:
+                    pass
+            if value and len(value) <= SAMPLE_VALUE_MAX_LENGTH and value not in values \
+                    and len(values) < SAMPLE_VALUES_PER_COLUMN:
+                values.append(value)
+        if documents:
+            paths = collect_json_paths(documents)
+            if paths:
+                json_columns[column_name] = paths
+        elif values:
+            sample_values[column_name] = values
+
+    return json_columns, sample_values
+
+_sample_descriptions: "OrderedDict[Tuple[str, str, int, int], Tuple[Dict[str, List[str]], Dict[str, List[str]]]]" = OrderedDict()
+_sample_descriptions_lock = threading.Lock()
+
+def _cached_sample_description(conn: sqlite3.Connection, table_name: str, row_count: int) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """
+    _describe_sample_rows, reused while the database's schema version and the
+    table's row count are unchanged (uploads replace tables, which bumps the
+    schema version)
+    """
+    database = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not database:
+        # In-memory and temporary databases have no identity to key on
+        return _describe_sample_rows(conn, table_name)
+    key = (database, table_name, conn.execute("PRAGMA schema_version").fetchone()[0], row_count)
+    
+    with _sample_descriptions_lock:
+        description = _sample_descriptions.get(key)
+        if description is not None:
+            _sample_descriptions.move_to_end(key)
+    if description is None:
+        description = _describe_sample_rows(conn, table_name)
+        with _sample_descriptions_lock:
+            _sample_descriptions[key] = description
+            while len(_sample_descriptions) > SAMPLE_DESCRIPTION_CACHE_SIZE:
+                _sample_descriptions.popitem(last=False)
+    
+    # Callers get their own lists
+    json_columns, sample_values = description
+    return (
+        {column: list(paths) for column, paths in json_columns.items()},
+        {column: list(values) for column, values in sample_values.items()}
+    )
+
+def clear_sample_description_cache() -> None:
+    with _sample_descriptions_lock:
+        _sample_descriptions.clear()
+
+def describe_table(conn: sqlite3.Connection, table_name: str) -> Dict[str, Any]:
+    """
+    Describe one table: columns, row count, JSON paths and sample values
+
+    Raises:
+        SQLSecurityError: If the table name is not a valid identifier
+    """
+    # Get columns using safe query execution
+    # table_xinfo includes generated columns; skip virtual-table hidden ones
+    cursor_info = execute_query_safely(
+        conn,
+        "PRAGMA table_xinfo({table})",
+        identifier_params={'table': table_name}
+    )
+    columns_info = [col for col in cursor_info.fetchall() if col[6] != 1]
+    
+    columns = {}
+    for col in columns_info:
+        columns[col[1]] = col[2]  # column_name: data_type
+    
+    # Get row count safely
+    cursor_count = execute_query_safely(
+        conn,
+        "SELECT COUNT(*) FROM {table}",
+        identifier_params={'table': table_name}
+    )
+    row_count = cursor_count.fetchone()[0]
+    
+    table_info = {
+        'columns': columns,
+        'row_count': row_count
+    }
+    
+    # Describe JSON text columns (JSON1 storage mode) by their paths
+    # and keep a few representative values for schema retrieval
+    json_columns, sample_values = _cached_sample_description(conn, table_name, row_count)
+    if json_columns:
+        table_info['json_columns'] = json_columns
+    if sample_values:
+        table_info['sample_values'] = sample_values
+    
+    return table_info
+
 def get_database_schema() -> Dict[str, Any]:
     """
     Get complete database schema information
     """
     try:
-        conn = sqlite3.connect("db/database.db")
-        cursor = conn.cursor()
-        
-        # Get all tables safely
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = cursor.fetchall()
-        
-        schema = {'tables': {}}
-        
-        for table in tables:
-            table_name = table[0]
+        with read_target(tenant_path(DATABASE_PATH)).pool().connection() as pooled:
+            conn = pooled.conn
+            cursor = conn.cursor()
             
-            # Skip system tables
-            if table_name.startswith('sqlite_'):
-                continue
+            # Get all tables safely
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            tables = cursor.fetchall()
             
-            try:
-                # Get columns for each table using safe query execution
-                cursor_info = execute_query_safely(
-                    conn,
-                    "PRAGMA table_info({table})",
-                    identifier_params={'table': table_name}
-                )
-                columns_info = cursor_info.fetchall()
-                
-                columns = {}
-                for col in columns_info:
-                    columns[col[1]] = col[2]  # column_name: data_type
-                
-                # Get row count safely
-                cursor_count = execute_query_safely(
-                    conn,
-                    "SELECT COUNT(*) FROM {table}",
-                    identifier_params={'table': table_name}
-                )
-                row_count = cursor_count.fetchone()[0]
+            schema = {'tables': {}}
+            
+            for table in tables:
+                table_name = table[0]
                 
-                schema['tables'][table_name] = {
-                    'columns': columns,
-                    'row_count': row_count
-                }
+                # Skip system tables
+                if table_name.startswith('sqlite_'):
+                    continue
                 
-            except SQLSecurityError:
-                # Skip tables with invalid names
-                continue
-        
-        conn.close()
+                try:
+                    schema['tables'][table_name] = describe_table(conn, table_name)
+                except SQLSecurityError:
+                    # Skip tables with invalid names
+                    continue
         
         return schema
         
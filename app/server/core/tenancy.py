@@ -0,0 +1,168 @@
+"""
+Tenant-scoped databases.
+
+Each tenant gets its own SQLite file and schema index under
+db/tenants/<tenant>/, so uploads of different teams no longer share one
+writer lock or one schema. The tenant of a request comes from the
+X-Tenant-ID header or a /t/<tenant>/ path prefix (stripped before routing,
+so /t/sales/api/query is served by /api/query). Requests without either
+use the default tenant, whose files stay at db/database.db and
+db/schema_index.json.
+
+A tenant's directory is created by its first upload. Other requests for a
+tenant without one get a 404, so reads never create files. Which tenants may
+exist is decided by TENANT_IDS. When it is unset, only tenants whose
+directory is already present (provisioned by an operator) are accepted.
+
+The tenant lives in a context variable, so code running in asyncio.to_thread
+or Starlette's thread pool resolves the same tenant. Modules resolve their
+file locations with tenant_path(), and key their pools and caches by the
+resolved path. Those per-tenant structures are kept in bounded LRUs
+(TENANT_CACHE_SIZE) so idle tenants do not hold connections forever.
+
+Configuration (environment variables):
+- TENANT_IDS: comma-separated allowlist, or "*" to accept any valid tenant id
+  (unset: only the default tenant and existing tenant directories)
+- TENANT_CACHE_SIZE: tenants whose pools and schema indexes stay open
+"""
+
+import json
+import os
+import re
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+DEFAULT_TENANT = "default"
+TENANTS_DIR = "db/tenants"
+DEFAULT_TENANT_CACHE_SIZE = 32
+
+TENANT_HEADER = b"x-tenant-id"
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+_PATH_PREFIX_PATTERN = re.compile(r"^/t/([^/]+)(/.*)$")
+
+_current_tenant: ContextVar[str] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+
+class TenantError(Exception):
+    """Raised for malformed or unknown tenant ids"""
+    pass
+
+
+def tenant_cache_size() -> int:
+    value = os.environ.get("TENANT_CACHE_SIZE")
+    return int(value) if value else DEFAULT_TENANT_CACHE_SIZE
+
+
+def validate_tenant(tenant: str) -> str:
+    """
+    Check a tenant id against the allowed format and the TENANT_IDS allowlist
+    (without one, against the existing tenant directories)
+
+    Raises:
+        TenantError: If the tenant id is malformed or not allowed
+    """
+    if not TENANT_ID_PATTERN.match(tenant):
+        raise TenantError(f"Invalid tenant id: {tenant[:64]!r}")
+    if tenant == DEFAULT_TENANT:
+        return tenant
+    allowed = os.environ.get("TENANT_IDS")
+    if allowed:
+        if allowed.strip() != "*" and tenant not in {t.strip() for t in allowed.split(',')}:
+            raise TenantError(f"Unknown tenant: {tenant}")
+    elif not tenant_exists(tenant):
+        raise TenantError(f"Unknown tenant: {tenant}")
+    return tenant
+
+
+def tenant_exists(tenant: Optional[str] = None) -> bool:
+    """
+    Whether a tenant has storage yet; the default tenant always does
+    """
+    tenant = tenant or current_tenant()
+    return tenant == DEFAULT_TENANT or os.path.isdir(os.path.join(TENANTS_DIR, tenant))
+
+
+def current_tenant() -> str:
+    return _current_tenant.get()
+
+
+def set_current_tenant(tenant: str):
+    """
+    Switch the current tenant; returns a token for reset_current_tenant
+    """
+    return _current_tenant.set(validate_tenant(tenant))
+
+
+def reset_current_tenant(token) -> None:
+    _current_tenant.reset(token)
+
+
+def tenant_path(default_path: str, tenant: Optional[str] = None, create: bool = False) -> str:
+    """
+    Location of a per-tenant file. The default tenant keeps default_path;
+    other tenants get a file of the same name under db/tenants/<tenant>/.
+    Writers pass create=True to create that directory; readers never do.
+    """
+    tenant = tenant or current_tenant()
+    if tenant == DEFAULT_TENANT:
+        return default_path
+    directory = os.path.join(TENANTS_DIR, tenant)
+    if create:
+        os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, os.path.basename(default_path))
+
+
+async def _send_error(send, status: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class TenantMiddleware:
+    """
+    ASGI middleware selecting the tenant from the X-Tenant-ID header or a
+    /t/<tenant>/ path prefix. Malformed or unknown tenants get a 400; allowed
+    tenants without storage get a 404 except on create_paths (uploads).
+    """
+
+    def __init__(self, app, create_paths: Iterable[str] = ()):
+        self.app = app
+        self.create_paths = frozenset(create_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tenant = None
+        match = _PATH_PREFIX_PATTERN.match(scope["path"])
+        if match:
+            tenant, path = match.groups()
+            prefix_length = len(scope["path"]) - len(path)
+            scope = {**scope, "path": path, "raw_path": scope.get("raw_path", b"")[prefix_length:] or path.encode()}
+        else:
+            header = dict(scope["headers"]).get(TENANT_HEADER)
+            if header:
+                tenant = header.decode("latin-1").strip()
+
+        if tenant is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            token = set_current_tenant(tenant)
+        except TenantError as e:
+            await _send_error(send, 400, str(e))
+            return
+        if scope["path"] not in self.create_paths and not tenant_exists(tenant):
+            reset_current_tenant(token)
+            await _send_error(send, 404, f"Unknown tenant: {tenant}")
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_current_tenant(token)
@@ -0,0 +1,340 @@
+"""
+Request tracing and per-stage latency metrics.
+
+An ASGI middleware opens a trace per request. Code in server.py and core/*
+wraps its stages in span("stage") blocks, which time themselves with
+perf_counter_ns and append to the current trace. When the request finishes,
+every span and the whole request (stage "request") are added to a latency
+histogram keyed by endpoint route and stage. render_metrics() exposes the
+histograms, plus the cache and pool counters, in Prometheus text format.
+
+The trace lives in a context variable, so spans inside asyncio.to_thread
+calls belong to the request that started them. Spans outside a request (or
+in executor threads that do not copy the context) are no-ops.
+
+When tracing is disabled the middleware passes requests straight through
+and span() returns a shared no-op context manager.
+
+Configuration (environment variables):
+- TRACING: "0" disables tracing and the per-stage histograms
+"""
+
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from .llm_hedging import provider_latency_snapshot
+from .metrics import LatencyHistogram
+
+# Histogram bucket upper bounds in milliseconds; stages range from sub-millisecond
+# cache lookups to multi-second LLM calls
+STAGE_BUCKETS_MS = [
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000
+]
+
+METRIC_PREFIX = "nlsql"
+
+
+def tracing_enabled() -> bool:
+    return os.environ.get("TRACING", "1") != "0"
+
+
+class Trace:
+    """
+    Spans recorded during one request as (stage, duration_ns) pairs
+    """
+
+    __slots__ = ('spans',)
+
+    def __init__(self):
+        self.spans: List[Tuple[str, int]] = []
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+class _Span:
+    __slots__ = ('trace', 'stage', 'start')
+
+    def __init__(self, trace: Trace, stage: str):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.trace.spans.append((self.stage, time.perf_counter_ns() - self.start))
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(stage: str):
+    """
+    Context manager timing one stage of the current request
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, stage)
+
+
+def record_span(stage: str, duration_ns: int) -> None:
+    """
+    Add an already measured stage to the current request (for generators,
+    where a with block cannot cover the stage)
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append((stage, duration_ns))
+
+
+_histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def get_stage_histogram(endpoint: str, stage: str) -> LatencyHistogram:
+    key = (endpoint, stage)
+    with _histograms_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = LatencyHistogram(STAGE_BUCKETS_MS)
+        return histogram
+
+
+def stage_latency_snapshot() -> Dict[Tuple[str, str], Dict[str, Any]]:
+    with _histograms_lock:
+        histograms = list(_histograms.items())
+    return {key: histogram.snapshot() for key, histogram in histograms}
+
+
+def reset_stage_histograms() -> None:
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def finish_trace(endpoint: str, trace: Trace, total_ns: int) -> None:
+    """
+    Fold a finished request into the per-endpoint stage histograms
+    """
+    for stage, duration_ns in trace.spans:
+        get_stage_histogram(endpoint, stage).record(duration_ns / 1e6)
+    get_stage_histogram(endpoint, "request").record(total_ns / 1e6)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a trace for every HTTP request. The endpoint
+    label is the matched route template (e.g. /api/table/{table_name}), so
+    path parameters do not create new series; unmatched paths are not recorded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracing_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = _current_trace.set(trace)
+        start = time.perf_counter_ns()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            total_ns = time.perf_counter_ns() - start
+            _current_trace.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                finish_trace(route.path, trace, total_ns)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    return ",".join(f'{name}="{_escape_label(str(value))}"' for name, value in labels.items())
+
+
+def _histogram_lines(name: str, labels: Dict[str, str], snapshot: Dict[str, Any]) -> List[str]:
+    """
+    Prometheus histogram series (cumulative buckets in seconds) for one snapshot
+    """
+    label_text = _format_labels(labels)
+    prefix = f"{label_text}," if label_text else ""
+    lines = []
+    cumulative = 0
+    for bound_ms, bucket_count in zip(snapshot['buckets_ms'], snapshot['counts']):
+        cumulative += bucket_count
+        lines.append(f'{name}_bucket{{{prefix}le="{bound_ms / 1000:g}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {snapshot["count"]}')
+    lines.append(f"{name}_sum{{{label_text}}} {snapshot['sum_ms'] / 1000:.6f}")
+    lines.append(f"{name}_count{{{label_text}}} {snapshot['count']}")
+    return lines
+
+
+def _counter_lines(name: str, metric_type: str, help_text: str, values: List[Tuple[Dict[str, str], Any]]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in values:
+        label_text = _format_labels(labels)
+        series = f"{name}{{{label_text}}}" if label_text else name
+        lines.append(f"{series} {value}")
+    return lines
+
+
+def render_metrics() -> str:
+    """
+    All metrics in the Prometheus text exposition format (version 0.0.4)
+    """
+    # Imported here: some of these modules import span() from this module
+    from .admission import admission_snapshot
+    from .connection_pool import pool_stats
+    from .llm_resilience import resilience_snapshot
+    from .query_pool import get_random_query_pool
+    from .result_cache import get_result_cache
+    from .semantic_cache import get_semantic_cache
+    from .sql_cascade import cascade_snapshot
+
+    lines = []
+
+    name = f"{METRIC_PREFIX}_stage_duration_seconds"
+    lines += [
+        f"# HELP {name} Latency of request stages per endpoint (stage=\"request\" is the whole request)",
+        f"# TYPE {name} histogram",
+    ]
+    for (endpoint, stage), snapshot in sorted(stage_latency_snapshot().items()):
+        lines += _histogram_lines(name, {'endpoint': endpoint, 'stage': stage}, snapshot)
+
+    name = f"{METRIC_PREFIX}_llm_provider_duration_seconds"
+    lines += [
+        f"# HELP {name} Latency of successful LLM provider calls",
+        f"# TYPE {name} histogram",
+    ]
+    for provider, snapshot in sorted(provider_latency_snapshot().items()):
+        lines += _histogram_lines(name, {'provider': provider}, snapshot)
+
+    result_cache = get_result_cache().stats()
+    semantic_cache = get_semantic_cache().stats()
+    random_queries = get_random_query_pool().stats()
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_cache_hits_total", "counter", "Cache hits",
+        [({'cache': 'result'}, result_cache['hits']),
+         ({'cache': 'semantic'}, semantic_cache['hits']),
+         ({'cache': 'random_query'}, random_queries['hits'])]
+    )
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_cache_misses_total", "counter", "Cache misses",
+        [({'cache': 'result'}, result_cache['misses']),
+         ({'cache': 'semantic'}, semantic_cache['misses']),
+         ({'cache': 'random_query'}, random_queries['misses'])]
+    )
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_result_cache_evictions_total", "counter", "Result cache entries evicted for memory",
+        [({}, result_cache['evictions'])]
+    )
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_result_cache_bytes", "gauge", "Estimated size of cached results",
+        [({}, result_cache['bytes'])]
+    )
+
+    admission = admission_snapshot()
+    providers = sorted(admission['providers'].items())
+    clients = admission['clients']
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_admission_queue_depth", "gauge", "Requests waiting for admission",
+        [({'scope': 'provider', 'provider': name}, stats['queued']) for name, stats in providers]
+        + [({'scope': 'client'}, clients['queued'])]
+    )
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_admission_in_flight", "gauge", "LLM provider calls in progress",
+        [({'provider': name}, stats['in_flight']) for name, stats in providers]
+    )
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_admission_admitted_total", "counter", "Requests admitted",
+        [({'scope': 'provider', 'provider': name}, stats['admitted']) for name, stats in providers]
+        + [({'scope': 'client'}, clients['admitted'])]
+    )
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_admission_rejected_total", "counter", "Requests shed with 429",
+        [({'scope': 'provider', 'provider': name}, stats['rejected']) for name, stats in providers]
+        + [({'scope': 'client'}, clients['rejected'])]
+    )
+    name = f"{METRIC_PREFIX}_admission_wait_seconds"
+    lines += [
+        f"# HELP {name} Time spent queued before admission",
+        f"# TYPE {name} histogram",
+    ]
+    for provider, stats in providers:
+        lines += _histogram_lines(name, {'scope': 'provider', 'provider': provider}, stats['wait'])
+    lines += _histogram_lines(name, {'scope': 'client'}, clients['wait'])
+
+    breakers = sorted(resilience_snapshot().items())
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_llm_circuit_open", "gauge", "1 while the provider's circuit breaker is open or half-open",
+        [({'provider': name}, int(stats['state'] != 'closed')) for name, stats in breakers]
+    )
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_llm_circuit_opened_total", "counter", "Times the provider's circuit breaker opened",
+        [({'provider': name}, stats['times_opened']) for name, stats in breakers]
+    )
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_llm_retries_total", "counter", "LLM provider calls retried after a transient error",
+        [({'provider': name}, stats['retries']) for name, stats in breakers]
+    )
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_llm_failovers_total", "counter", "Requests failed over from the provider to the next one",
+        [({'provider': name}, stats['failovers']) for name, stats in breakers]
+    )
+
+    tiers = sorted(cascade_snapshot().items())
+    for outcome, help_text in (
+        ('attempts', "Questions that reached the SQL generation tier"),
+        ('accepted', "SQL from the tier that passed validation and EXPLAIN"),
+        ('rejected', "SQL from the tier that failed validation or EXPLAIN (escalated)"),
+        ('execution_failures', "Accepted SQL from the source that failed at execution (escalated)"),
+    ):
+        lines += _counter_lines(
+            f"{METRIC_PREFIX}_cascade_{outcome}_total", "counter", help_text,
+            [({'tier': tier}, counts[outcome]) for tier, counts in tiers]
+        )
+
+    pools = pool_stats()
+    statements = pools['statements']
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_sqlite_statement_executions_total", "counter", "SQL statements executed on pooled connections",
+        [({}, statements['executions'])]
+    )
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_sqlite_statement_compiles_total", "counter", "SQL statements compiled (prepared statement cache misses)",
+        [({}, statements['compiles'])]
+    )
+    pool_labels = [
+        {'database': pool['database'], 'mode': 'ro' if pool['read_only'] else 'rw'}
+        for pool in pools['pools']
+    ]
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_sqlite_connections_opened_total", "counter", "SQLite connections opened by the pool",
+        [(labels, pool['created']) for labels, pool in zip(pool_labels, pools['pools'])]
+    )
+    lines += _counter_lines(
+        f"{METRIC_PREFIX}_sqlite_connections_idle", "gauge", "Idle pooled SQLite connections",
+        [(labels, pool['idle']) for labels, pool in zip(pool_labels, pools['pools'])]
+    )
+
+    return "\n".join(lines) + "\n"
@@ -1,29 +1,77 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+import asyncio
+import json
 import os
 import sqlite3
-import traceback
 from dotenv import load_dotenv
 import logging
-import sys
+import time
 
 from core.data_models import (
     FileUploadResponse,
     QueryRequest,
     QueryResponse,
+    BatchQueryRequest,
+    BatchQueryResponse,
     DatabaseSchemaResponse,
     InsightsRequest,
     InsightsResponse,
     HealthCheckResponse,
+    ProfileWindowRequest,
+    ProfileWindowResponse,
+    ProfileListResponse,
     RandomQueryResponse,
+    SnapshotResponse,
     TableSchema,
     ColumnInfo
 )
-from core.file_processor import convert_csv_to_sqlite, convert_json_to_sqlite, convert_jsonl_to_sqlite
-from core.llm_processor import generate_sql, generate_random_query
-from core.sql_processor import execute_sql_safely, get_database_schema
+from core.file_processor import (
+    convert_csv_to_sqlite,
+    convert_json_to_sqlite,
+    convert_jsonl_to_sqlite,
+    convert_parquet_to_sqlite,
+    convert_arrow_to_sqlite
+)
+from core.llm_processor import (
+    generate_sql_with_source,
+    remember_sql,
+    open_sql_stream,
+    find_statement_end,
+    clean_sql_response
+)
+from core.sql_processor import execute_sql_safely, get_database_schema, stream_sql_rows
 from core.insights import generate_insights
+from core.batch_processor import run_batch_queries
+from core.schema_index import SCHEMA_INDEX_PATH, index_table, remove_table_from_index, get_indexed_schema
+from core.result_cache import invalidate_table
+from core.query_pool import get_random_query, get_random_query_pool
+from core.connection_pool import pool_stats
+from core.admission import AdmissionMiddleware, AdmissionRejected, to_llm_thread
+from core.llm_resilience import CircuitOpenError
+from core.sql_cascade import TIER_LARGE, cascade_enabled, record_execution_failure
+from core.log_pipeline import configure_logging
+from core.snapshots import (
+    SnapshotError,
+    current_snapshot,
+    is_writer,
+    publish_snapshot,
+    read_target,
+    reject_writes_on_reader,
+    snapshot_mode
+)
+from core.tenancy import TenantMiddleware, tenant_path
+from core.tracing import TracingMiddleware, record_span, render_metrics, span
+from core.profiler import (
+    PROFILE_DIR,
+    ProfilingMiddleware,
+    list_profiles,
+    profiling_enabled,
+    start_window_profile
+)
 from core.sql_security import (
     execute_query_safely,
     validate_identifier,
@@ -34,14 +82,8 @@ from core.sql_security import (
 # Load .env file from server directory
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Configure logging: records are queued and written as JSON by a background thread
+configure_logging()
 
 # Create logger for this module
 logger = logging.getLogger(__name__)
@@ -61,33 +103,99 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global app state
+# Per-client rate limit with a bounded queue for the LLM endpoints (429 + Retry-After beyond it)
+app.add_middleware(AdmissionMiddleware)
+
+# Per-request spans feeding the /api/metrics latency histograms (TRACING=0 disables)
+app.add_middleware(TracingMiddleware)
+
+# Sampling profiles of requests sent with "X-Profile: 1" (only when PROFILING=1)
+app.add_middleware(ProfilingMiddleware)
+
+# Tenant from X-Tenant-ID or a /t/<tenant>/ prefix; outermost so every layer sees it.
+# Only uploads create a tenant's storage
+app.add_middleware(TenantMiddleware, create_paths=("/api/upload",))
+
+# Global app state (per worker process; shared caches live in core.shared_cache)
 app_start_time = datetime.now()
 
 # Ensure database directory exists
 os.makedirs("db", exist_ok=True)
 
+def _reject_writes_on_reader() -> None:
+    try:
+        reject_writes_on_reader()
+    except SnapshotError as e:
+        raise HTTPException(403, str(e))
+
+async def _publish_snapshot_after_write() -> None:
+    """On the writer, make a change visible to the readers; a failure must not fail the write"""
+    if not is_writer():
+        return
+    try:
+        # The backup copies the whole database, so keep it off the event loop
+        with span("snapshot_publish"):
+            await asyncio.to_thread(publish_snapshot, tenant_path("db/database.db"), tenant_path(SCHEMA_INDEX_PATH))
+    except Exception as e:
+        logger.warning("[WARNING] Snapshot publication failed: %s", str(e))
+
 @app.post("/api/upload", response_model=FileUploadResponse)
-async def upload_file(file: UploadFile = File(...)) -> FileUploadResponse:
-    """Upload and convert .json, .jsonl or .csv file to SQLite table"""
+async def upload_file(
+    file: UploadFile = File(...),
+    storage_mode: str = Form("flatten"),
+    indexed_paths: Optional[str] = Form(None)
+) -> FileUploadResponse:
+    """Upload and convert .json, .jsonl, .csv, .parquet or Arrow IPC file to SQLite table.
+
+    For .jsonl files, storage_mode "json" keeps nested structures as JSON text
+    columns, and indexed_paths (comma-separated, e.g. "user.name,tags.0.id")
+    adds indexed generated columns for hot paths.
+    """
+    _reject_writes_on_reader()
     try:
         # Validate file type
-        if not file.filename.endswith(('.csv', '.json', '.jsonl')):
-            raise HTTPException(400, "Only .csv, .json, and .jsonl files are supported")
+        if not file.filename.endswith(('.csv', '.json', '.jsonl', '.parquet', '.arrow', '.feather', '.ipc')):
+            raise HTTPException(400, "Only .csv, .json, .jsonl, .parquet, and Arrow (.arrow, .feather, .ipc) files are supported")
         
         # Generate table name from filename
         table_name = file.filename.rsplit('.', 1)[0].lower().replace(' ', '_')
         
-        # Read file content
-        content = await file.read()
-        
-        # Convert to SQLite based on file type
-        if file.filename.endswith('.csv'):
-            result = convert_csv_to_sqlite(content, table_name)
-        elif file.filename.endswith('.jsonl'):
-            result = convert_jsonl_to_sqlite(content, table_name)
+        # Convert to SQLite based on file type; conversions run in a worker
+        # thread so a large upload does not block other requests
+        if file.filename.endswith('.json'):
+            # Stream JSON arrays straight from the spooled upload instead of reading it into memory
+            await file.seek(0)
+            with span("file_conversion"):
+                result = await asyncio.to_thread(convert_json_to_sqlite, file.file, table_name)
         else:
-            result = convert_json_to_sqlite(content, table_name)
+            # Read file content
+            content = await file.read()
+            
+            with span("file_conversion"):
+                if file.filename.endswith('.csv'):
+                    result = await asyncio.to_thread(convert_csv_to_sqlite, content, table_name)
+                elif file.filename.endswith('.jsonl'):
+                    paths = [path for path in (indexed_paths or "").split(',') if path.strip()]
+                    result = await asyncio.to_thread(
+                        convert_jsonl_to_sqlite, content, table_name, storage_mode, paths or None
+                    )
+                elif file.filename.endswith('.parquet'):
+                    result = await asyncio.to_thread(convert_parquet_to_sqlite, content, table_name)
+                else:
+                    result = await asyncio.to_thread(convert_arrow_to_sqlite, content, table_name)
+        
+        # Cached results and suggestions for the old data are now stale
+        invalidate_table(result['table_name'])
+        get_random_query_pool().invalidate()
+        
+        # Keep the schema index in sync; a failure here must not fail the upload
+        try:
+            with span("schema_index"):
+                await asyncio.to_thread(index_table, result['table_name'])
+        except Exception as e:
+            logger.warning("[WARNING] Schema index update failed for %s: %s", result['table_name'], str(e))
+        
+        await _publish_snapshot_after_write()
         
         response = FileUploadResponse(
             table_name=result['table_name'],
@@ -95,11 +203,13 @@ async def upload_file(file: UploadFile = File(...)) -> FileUploadResponse:
             row_count=result['row_count'],
             sample_data=result['sample_data']
         )
-        logger.info(f"[SUCCESS] File upload: {response}")
+        logger.info(
+            "[SUCCESS] File upload: table=%s, rows=%d, columns=%d",
+            response.table_name, response.row_count, len(response.table_schema)
+        )
         return response
     except Exception as e:
-        logger.error(f"[ERROR] File upload failed: {str(e)}")
-        logger.error(f"[ERROR] Full traceback:\n{traceback.format_exc()}")
+        logger.error("[ERROR] File upload failed: %s", str(e), exc_info=True)
         return FileUploadResponse(
             table_name="",
             table_schema={},
@@ -112,32 +222,51 @@ async def upload_file(file: UploadFile = File(...)) -> FileUploadResponse:
 async def process_natural_language_query(request: QueryRequest) -> QueryResponse:
     """Process natural language query and return SQL results"""
     try:
-        # Get database schema
-        schema_info = get_database_schema()
+        # Get database schema from the persisted schema index
+        with span("schema"):
+            schema_info = get_indexed_schema()
         
-        # Generate SQL using routing logic
-        sql = generate_sql(request, schema_info)
+        # Generate SQL using routing logic; off the event loop on the LLM executor, since the call may queue for a provider slot
+        sql, source = await to_llm_thread(generate_sql_with_source, request, schema_info)
         
         # Execute SQL query
-        start_time = datetime.now()
-        result = execute_sql_safely(sql)
-        execution_time = (datetime.now() - start_time).total_seconds() * 1000
+        start_ns = time.perf_counter_ns()
+        result = execute_sql_safely(sql, use_cache=not request.bypass_cache)
+        execution_time = (time.perf_counter_ns() - start_ns) / 1e6
+        
+        # Cascade: SQL that fails at execution gets one more try from the large tier
+        if result['error'] and cascade_enabled() and source != TIER_LARGE:
+            record_execution_failure(source)
+            sql, source = await to_llm_thread(generate_sql_with_source, request, schema_info, True)
+            start_ns = time.perf_counter_ns()
+            result = execute_sql_safely(sql, use_cache=not request.bypass_cache)
+            execution_time = (time.perf_counter_ns() - start_ns) / 1e6
         
         if result['error']:
             raise Exception(result['error'])
+        remember_sql(request, schema_info, sql, source)
         
-        response = QueryResponse(
-            sql=sql,
-            results=result['results'],
-            columns=result['columns'],
-            row_count=len(result['results']),
-            execution_time_ms=execution_time
+        with span("response"):
+            response = QueryResponse(
+                sql=sql,
+                results=result['results'],
+                columns=result['columns'],
+                row_count=len(result['results']),
+                execution_time_ms=execution_time
+            )
+        logger.info(
+            "[SUCCESS] Query processed: rows=%d, time=%.2fms", response.row_count, execution_time,
+            extra={'sql': sql}
         )
-        logger.info(f"[SUCCESS] Query processed: SQL={sql}, rows={len(result['results'])}, time={execution_time}ms")
         return response
+    except AdmissionRejected as e:
+        logger.warning("[WARNING] Query shed: %s", str(e))
+        raise HTTPException(429, str(e), headers={"Retry-After": e.retry_after_header})
+    except CircuitOpenError as e:
+        logger.warning("[WARNING] No LLM provider available: %s", str(e))
+        raise HTTPException(503, str(e), headers={"Retry-After": e.retry_after_header})
     except Exception as e:
-        logger.error(f"[ERROR] Query processing failed: {str(e)}")
-        logger.error(f"[ERROR] Full traceback:\n{traceback.format_exc()}")
+        logger.error("[ERROR] Query processing failed: %s", str(e), exc_info=True, extra={'query': request.query})
         return QueryResponse(
             sql="",
             results=[],
@@ -147,11 +276,152 @@ async def process_natural_language_query(request: QueryRequest) -> QueryResponse
             error=str(e)
         )
 
+@app.post("/api/query/batch", response_model=BatchQueryResponse)
+async def process_batch_query(request: BatchQueryRequest) -> BatchQueryResponse:
+    """Process several natural language queries with one schema fetch and concurrent generation"""
+    start = time.perf_counter()
+    try:
+        # One schema fetch shared by every question in the batch
+        schema_info = await asyncio.to_thread(get_indexed_schema)
+        
+        items, unique_queries = await run_batch_queries(
+            request.queries,
+            schema_info,
+            request.llm_provider,
+            request.max_concurrency,
+            not request.bypass_cache
+        )
+        total_time = (time.perf_counter() - start) * 1000
+        
+        failed = sum(1 for item in items if item.error)
+        logger.info(
+            "[SUCCESS] Batch query processed: queries=%d, unique=%d, failed=%d, time=%.2fms",
+            len(items), unique_queries, failed, total_time
+        )
+        return BatchQueryResponse(
+            results=items,
+            unique_queries=unique_queries,
+            total_time_ms=total_time
+        )
+    except Exception as e:
+        logger.error("[ERROR] Batch query processing failed: %s", str(e), exc_info=True)
+        return BatchQueryResponse(
+            results=[],
+            unique_queries=0,
+            total_time_ms=(time.perf_counter() - start) * 1000,
+            error=str(e)
+        )
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _query_event_stream(
+    request: QueryRequest,
+    schema_info: Dict[str, Any],
+    tokens: Iterator[str],
+    source: str,
+    start: float,
+    generation_start: int
+) -> Iterator[str]:
+    """Forward SQL tokens until the statement is complete, run it as soon as it is and stream the rows"""
+    sql = ""
+    try:
+        # Forward tokens until the model has produced a complete statement
+        response_text = ""
+        first_token_ms = None
+        try:
+            for token in tokens:
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                response_text += token
+                end = find_statement_end(response_text)
+                if end is not None:
+                    token = token[:len(token) - (len(response_text) - end)]
+                    response_text = response_text[:end]
+                if token:
+                    yield _sse_event("token", {"text": token})
+                if end is not None:
+                    break
+        finally:
+            tokens.close()
+        # Spans cannot cover a yield, so streamed stages are recorded by hand
+        record_span("llm_generation", time.perf_counter_ns() - generation_start)
+        
+        sql = clean_sql_response(response_text)
+        yield _sse_event("sql", {"sql": sql, "time_to_first_token_ms": first_token_ms})
+        
+        # Execute and stream rows in batches
+        execution_start = time.perf_counter()
+        row_count = 0
+        columns_sent = False
+        for columns, rows in stream_sql_rows(sql, use_cache=not request.bypass_cache):
+            if not columns_sent:
+                yield _sse_event("columns", {"columns": columns})
+                columns_sent = True
+            if rows:
+                row_count += len(rows)
+                yield _sse_event("rows", {"rows": rows})
+        execution_time = (time.perf_counter() - execution_start) * 1000
+        record_span("sql_execution", int(execution_time * 1e6))
+        remember_sql(request, schema_info, sql, source)
+        
+        yield _sse_event("done", {
+            "row_count": row_count,
+            "execution_time_ms": execution_time,
+            "total_time_ms": (time.perf_counter() - start) * 1000
+        })
+        logger.info(
+            "[SUCCESS] Streaming query processed: rows=%d, first_token=%sms, time=%.2fms",
+            row_count, first_token_ms, execution_time,
+            extra={'sql': sql}
+        )
+    except Exception as e:
+        logger.error("[ERROR] Streaming query failed: %s", str(e), exc_info=True, extra={'sql': sql})
+        yield _sse_event("error", {"sql": sql, "error": str(e)})
+
+@app.post("/api/query/stream")
+async def stream_natural_language_query(request: QueryRequest) -> StreamingResponse:
+    """Process natural language query as server-sent events.
+
+    Events: "token" (SQL text as it is generated), "sql" (the complete
+    statement), "columns", "rows" (batches of results), then "done" or "error".
+    A request shed by admission control gets a 429, and one with no LLM
+    provider available a 503, both with Retry-After, before the stream starts.
+    """
+    start = time.perf_counter()
+    try:
+        with span("schema"):
+            schema_info = get_indexed_schema()
+        
+        # Start generation before the response, so it can still be refused; off the event loop on the LLM executor
+        generation_start = time.perf_counter_ns()
+        tokens, source = await to_llm_thread(open_sql_stream, request, schema_info)
+    except AdmissionRejected as e:
+        logger.warning("[WARNING] Streaming query shed: %s", str(e))
+        raise HTTPException(429, str(e), headers={"Retry-After": e.retry_after_header})
+    except CircuitOpenError as e:
+        logger.warning("[WARNING] No LLM provider available: %s", str(e))
+        raise HTTPException(503, str(e), headers={"Retry-After": e.retry_after_header})
+    except Exception as e:
+        logger.error("[ERROR] Streaming query failed: %s", str(e), exc_info=True, extra={'query': request.query})
+        events = iter([_sse_event("error", {"sql": "", "error": str(e)})])
+    else:
+        events = _query_event_stream(request, schema_info, tokens, source, start, generation_start)
+    
+    # Sync generator: Starlette iterates it in a worker thread
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/schema", response_model=DatabaseSchemaResponse)
 async def get_database_schema_endpoint() -> DatabaseSchemaResponse:
     """Get current database schema and table information"""
     try:
-        schema = get_database_schema()
+        with span("schema"):
+            schema = get_database_schema()
         tables = []
         
         for table_name, table_info in schema['tables'].items():
@@ -175,11 +445,10 @@ async def get_database_schema_endpoint() -> DatabaseSchemaResponse:
             tables=tables,
             total_tables=len(tables)
         )
-        logger.info(f"[SUCCESS] Schema retrieved: {len(tables)} tables")
+        logger.info("[SUCCESS] Schema retrieved: %d tables", len(tables))
         return response
     except Exception as e:
-        logger.error(f"[ERROR] Schema retrieval failed: {str(e)}")
-        logger.error(f"[ERROR] Full traceback:\n{traceback.format_exc()}")
+        logger.error("[ERROR] Schema retrieval failed: %s", str(e), exc_info=True)
         return DatabaseSchemaResponse(
             tables=[],
             total_tables=0,
@@ -190,17 +459,17 @@ async def get_database_schema_endpoint() -> DatabaseSchemaResponse:
 async def generate_insights_endpoint(request: InsightsRequest) -> InsightsResponse:
     """Generate statistical insights for table columns"""
     try:
-        insights = generate_insights(request.table_name, request.column_names)
+        with span("insights"):
+            insights = generate_insights(request.table_name, request.column_names)
         response = InsightsResponse(
             table_name=request.table_name,
             insights=insights,
             generated_at=datetime.now()
         )
-        logger.info(f"[SUCCESS] Insights generated for table: {request.table_name}, insights count: {len(insights)}")
+        logger.info("[SUCCESS] Insights generated for table: %s, insights count: %d", request.table_name, len(insights))
         return response
     except Exception as e:
-        logger.error(f"[ERROR] Insights generation failed: {str(e)}")
-        logger.error(f"[ERROR] Full traceback:\n{traceback.format_exc()}")
+        logger.error("[ERROR] Insights generation failed: %s", str(e), exc_info=True)
         return InsightsResponse(
             table_name=request.table_name,
             insights=[],
@@ -212,18 +481,22 @@ async def generate_insights_endpoint(request: InsightsRequest) -> InsightsRespon
 async def generate_random_query_endpoint() -> RandomQueryResponse:
     """Generate a random natural language query based on database schema"""
     try:
-        # Get current database schema
-        schema_info = get_database_schema()
+        # Get current database schema from the persisted schema index
+        with span("schema"):
+            schema_info = get_indexed_schema()
 
-        # Generate random query using LLM
-        query = generate_random_query(schema_info)
+        # Serve a pre-generated suggestion; the pool refills itself in the background
+        with span("random_query"):
+            query = await to_llm_thread(get_random_query, schema_info)
 
         response = RandomQueryResponse(query=query)
-        logger.info(f"[SUCCESS] Random query generated: {query}")
+        logger.info("[SUCCESS] Random query generated: %s", query)
         return response
+    except AdmissionRejected as e:
+        logger.warning("[WARNING] Random query shed: %s", str(e))
+        raise HTTPException(429, str(e), headers={"Retry-After": e.retry_after_header})
     except Exception as e:
-        logger.error(f"[ERROR] Random query generation failed: {str(e)}")
-        logger.error(f"[ERROR] Full traceback:\n{traceback.format_exc()}")
+        logger.error("[ERROR] Random query generation failed: %s", str(e), exc_info=True)
         return RandomQueryResponse(
             query="",
             error=str(e)
@@ -234,11 +507,10 @@ async def health_check() -> HealthCheckResponse:
     """Health check endpoint with database status"""
     try:
         # Check database connection
-        conn = sqlite3.connect("db/database.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = cursor.fetchall()
-        conn.close()
+        with read_target(tenant_path("db/database.db")).pool().connection() as pooled:
+            cursor = pooled.cursor()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            tables = cursor.fetchall()
         
         uptime = (datetime.now() - app_start_time).total_seconds()
         
@@ -246,13 +518,13 @@ async def health_check() -> HealthCheckResponse:
             status="ok",
             database_connected=True,
             tables_count=len(tables),
-            uptime_seconds=uptime
+            uptime_seconds=uptime,
+            worker_pid=os.getpid()
         )
-        logger.info(f"[SUCCESS] Health check: OK, {len(tables)} tables, uptime: {uptime}s")
+        logger.info("[SUCCESS] Health check: OK, %d tables, uptime: %.0fs", len(tables), uptime)
         return response
     except Exception as e:
-        logger.error(f"[ERROR] Health check failed: {str(e)}")
-        logger.error(f"[ERROR] Full traceback:\n{traceback.format_exc()}")
+        logger.error("[ERROR] Health check failed: %s", str(e), exc_info=True)
         return HealthCheckResponse(
             status="error",
             database_connected=False,
@@ -260,9 +532,74 @@ async def health_check() -> HealthCheckResponse:
             uptime_seconds=0
         )
 
+@app.get("/api/statement-cache")
+async def statement_cache_stats():
+    """Connection pool usage, prepared-statement cache hit rate and the hottest SQL"""
+    stats = pool_stats()
+    logger.info("[SUCCESS] Statement cache stats: hit_rate=%s", stats['statements']['hit_rate'])
+    return stats
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Per-endpoint stage latency histograms and cache/pool counters in Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.post("/api/profile", response_model=ProfileWindowResponse)
+async def start_profile_window(request: ProfileWindowRequest) -> ProfileWindowResponse:
+    """Sample all threads for a time window; the profile is written to db/profiles/ when it ends"""
+    if not profiling_enabled():
+        raise HTTPException(403, "Profiling is disabled (set PROFILING=1)")
+    profile_id = start_window_profile(request.seconds, request.interval_ms)
+    if profile_id is None:
+        raise HTTPException(409, "Another profile is already running")
+    logger.info("[SUCCESS] Profile window started: %s for %ss", profile_id, request.seconds)
+    return ProfileWindowResponse(
+        profile_id=profile_id,
+        seconds=request.seconds,
+        folded_path=os.path.join(PROFILE_DIR, f"{profile_id}.folded")
+    )
+
+@app.get("/api/profiles", response_model=ProfileListResponse)
+async def get_profiles() -> ProfileListResponse:
+    """List stored profiles, newest first"""
+    if not profiling_enabled():
+        raise HTTPException(403, "Profiling is disabled (set PROFILING=1)")
+    return ProfileListResponse(profiles=list_profiles())
+
+@app.get("/api/snapshot", response_model=SnapshotResponse)
+async def get_snapshot() -> SnapshotResponse:
+    """Snapshot mode of this process and the newest published snapshot of the tenant's database"""
+    mode = snapshot_mode()
+    snapshot = current_snapshot(tenant_path("db/database.db")) if mode != "off" else None
+    if snapshot is None:
+        return SnapshotResponse(mode=mode)
+    return SnapshotResponse(
+        mode=mode,
+        version=snapshot.version,
+        published_at=snapshot.published_at,
+        database=snapshot.database
+    )
+
+@app.post("/api/snapshot", response_model=SnapshotResponse)
+async def publish_snapshot_endpoint() -> SnapshotResponse:
+    """Publish a snapshot now (writer only), e.g. for the first readers of an existing database"""
+    if not is_writer():
+        raise HTTPException(403, "Snapshots are published by the writer (set SNAPSHOT_MODE=writer)")
+    try:
+        snapshot = publish_snapshot(tenant_path("db/database.db"), tenant_path(SCHEMA_INDEX_PATH))
+    except SnapshotError as e:
+        raise HTTPException(500, str(e))
+    return SnapshotResponse(
+        mode="writer",
+        version=snapshot.version,
+        published_at=snapshot.published_at,
+        database=snapshot.database
+    )
+
 @app.delete("/api/table/{table_name}")
 async def delete_table(table_name: str):
     """Delete a table from the database"""
+    _reject_writes_on_reader()
     try:
         # Validate table name using security module
         try:
@@ -270,7 +607,7 @@ async def delete_table(table_name: str):
         except SQLSecurityError as e:
             raise HTTPException(400, str(e))
         
-        conn = sqlite3.connect("db/database.db")
+        conn = sqlite3.connect(tenant_path("db/database.db"))
         
         # Check if table exists using secure method
         if not check_table_exists(conn, table_name):
@@ -287,16 +624,26 @@ async def delete_table(table_name: str):
         conn.commit()
         conn.close()
         
+        invalidate_table(table_name)
+        get_random_query_pool().invalidate()
+        remove_table_from_index(table_name)
+        await _publish_snapshot_after_write()
+        
         response = {"message": f"Table '{table_name}' deleted successfully"}
-        logger.info(f"[SUCCESS] Table deleted: {table_name}")
+        logger.info("[SUCCESS] Table deleted: %s", table_name)
         return response
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"[ERROR] Table deletion failed: {str(e)}")
-        logger.error(f"[ERROR] Full traceback:\n{traceback.format_exc()}")
+        logger.error("[ERROR] Table deletion failed: %s", str(e), exc_info=True)
         raise HTTPException(500, f"Error deleting table: {str(e)}")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    workers = int(os.environ.get("WORKERS", "1"))
+    if workers > 1:
+        # Production: N worker processes sharing the result and semantic caches (core.shared_cache)
+        os.environ.setdefault("SHARED_CACHE", "1")
+        uvicorn.run("server:app", host="0.0.0.0", port=int(os.environ.get("PORT", "8000")), workers=workers)
+    else:
+        uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
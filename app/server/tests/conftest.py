@@ -0,0 +1,32 @@
+import pytest
+from core import admission, connection_pool, llm_hedging, llm_resilience, query_pool, result_cache, semantic_cache, snapshots, sql_cascade, sql_processor, tracing
+
+
+@pytest.fixture(autouse=True)
+def reset_process_caches():
+    """Process-wide caches must not leak results between tests"""
+    result_cache.reset_result_cache()
+    semantic_cache.reset_semantic_cache()
+    query_pool.reset_random_query_pool()
+    connection_pool.close_all_pools()
+    connection_pool.get_statement_registry().clear()
+    llm_hedging.reset_latency_histograms()
+    tracing.reset_stage_histograms()
+    snapshots.reset_snapshot_state()
+    admission.reset_admission()
+    llm_resilience.reset_resilience()
+    sql_cascade.reset_cascade_stats()
+    sql_processor.clear_sample_description_cache()
+    yield
+    result_cache.reset_result_cache()
+    semantic_cache.reset_semantic_cache()
+    query_pool.reset_random_query_pool()
+    connection_pool.close_all_pools()
+    connection_pool.get_statement_registry().clear()
+    llm_hedging.reset_latency_histograms()
+    tracing.reset_stage_histograms()
+    snapshots.reset_snapshot_state()
+    admission.reset_admission()
+    llm_resilience.reset_resilience()
+    sql_cascade.reset_cascade_stats()
+    sql_processor.clear_sample_description_cache()
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core import tenancy
+from core.admission import (
+    AdmissionMiddleware,
+    AdmissionRejected,
+    ProviderAdmission,
+    TokenBucket,
+    admission_snapshot,
+    get_provider_admission,
+    llm_executor,
+    to_llm_thread
+)
+from core.llm_hedging import timed_call
+from core.tenancy import current_tenant, reset_current_tenant, set_current_tenant
+from core.tracing import render_metrics
+
+
+@pytest.fixture
+def tenants_dir(tmp_path):
+    with patch.object(tenancy, 'TENANTS_DIR', str(tmp_path / "tenants")):
+        yield tmp_path / "tenants"
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware)
+
+    @app.post("/api/query")
+    async def query():
+        return {"ok": True}
+
+    @app.get("/api/schema")
+    async def schema():
+        return {"ok": True}
+
+    return app
+
+
+class TestTokenBucket:
+
+    def test_burst_then_reservations_in_the_future(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        now = bucket.updated
+
+        assert bucket.reserve(1.0, now) == 0.0
+        assert bucket.reserve(1.0, now) == 0.0
+        assert bucket.reserve(1.0, now) == pytest.approx(0.1)
+        # The next caller queues behind the previous reservation
+        assert bucket.reserve(1.0, now) == pytest.approx(0.2)
+
+    def test_reservation_beyond_max_wait_is_refused_without_taking_a_token(self):
+        bucket = TokenBucket(rate=1, burst=1)
+        now = bucket.updated
+        bucket.reserve(0, now)
+
+        assert bucket.reserve(0.5, now) is None
+        assert bucket.time_until_available(now) == pytest.approx(1.0)
+
+    def test_refills_over_time(self):
+        bucket = TokenBucket(rate=10, burst=1)
+        now = bucket.updated
+        bucket.reserve(0, now)
+
+        assert bucket.reserve(0, now + 0.2) == 0.0
+
+
+class TestProviderAdmission:
+
+    def test_rate_limit_queues_then_sheds(self):
+        admission = ProviderAdmission("openai", rate=10, burst=1, max_queue_wait_ms=150)
+        barrier = threading.Barrier(4)
+        outcomes = []
+
+        def call():
+            barrier.wait()
+            start = time.monotonic()
+            try:
+                with admission.admit():
+                    outcomes.append(('admitted', time.monotonic() - start))
+            except AdmissionRejected as e:
+                outcomes.append(('rejected', e.retry_after))
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        waits = sorted(value for outcome, value in outcomes if outcome == 'admitted')
+        retry_afters = [value for outcome, value in outcomes if outcome == 'rejected']
+        # One immediate call, one queued for the next token, the rest shed
+        assert len(waits) == 2 and waits[1] >= 0.09
+        assert len(retry_afters) == 2 and all(value > 0 for value in retry_afters)
+        assert admission.stats()['rejected'] == 2
+
+    def test_concurrency_cap_sheds_after_max_wait(self):
+        admission = ProviderAdmission("anthropic", max_concurrent=1, max_queue_wait_ms=50)
+        entered, release = threading.Event(), threading.Event()
+
+        def hold_slot():
+            with admission.admit():
+                entered.set()
+                release.wait(5)
+
+        holder = threading.Thread(target=hold_slot)
+        holder.start()
+        entered.wait(5)
+        try:
+            assert admission.stats()['in_flight'] == 1
+            with pytest.raises(AdmissionRejected):
+                with admission.admit():
+                    pass
+        finally:
+            release.set()
+            holder.join()
+
+        with admission.admit():
+            pass
+        stats = admission.stats()
+        assert stats['admitted'] == 2
+        assert stats['wait']['count'] == 3
+
+    def test_queue_depth_limit(self):
+        admission = ProviderAdmission("openai", max_queue_depth=0)
+
+        with pytest.raises(AdmissionRejected):
+            with admission.admit():
+                pass
+
+    def test_timed_call_goes_through_admission(self, monkeypatch):
+        monkeypatch.setenv("LLM_MAX_QUEUE_DEPTH", "0")
+
+        with pytest.raises(AdmissionRejected):
+            timed_call('openai', lambda: "SELECT 1")
+        assert get_provider_admission('openai').stats()['rejected'] == 1
+
+
+class TestAdmissionMiddleware:
+
+    def test_over_rate_client_gets_429_with_retry_after(self, monkeypatch):
+        monkeypatch.setenv("CLIENT_RATE_PER_SECOND", "0.5")
+        monkeypatch.setenv("CLIENT_BURST", "1")
+        monkeypatch.setenv("CLIENT_MAX_QUEUE_WAIT_MS", "0")
+        monkeypatch.setenv("CLIENT_ID_TRUSTED_PROXIES", "testclient")
+        client = TestClient(make_app())
+
+        assert client.post("/api/query", headers={"X-Client-ID": "a"}).status_code == 200
+        response = client.post("/api/query", headers={"X-Client-ID": "a"})
+
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "2"
+        # Other clients and endpoints without LLM calls are unaffected
+        assert client.post("/api/query", headers={"X-Client-ID": "b"}).status_code == 200
+        assert client.get("/api/schema", headers={"X-Client-ID": "a"}).status_code == 200
+
+    def test_client_id_header_is_ignored_unless_sent_by_a_trusted_proxy(self, monkeypatch):
+        monkeypatch.setenv("CLIENT_RATE_PER_SECOND", "0.5")
+        monkeypatch.setenv("CLIENT_BURST", "1")
+        monkeypatch.setenv("CLIENT_MAX_QUEUE_WAIT_MS", "0")
+        client = TestClient(make_app())
+
+        assert client.post("/api/query", headers={"X-Client-ID": "a"}).status_code == 200
+        # A fresh id per request does not get a fresh bucket
+        assert client.post("/api/query", headers={"X-Client-ID": "b"}).status_code == 429
+
+    def test_short_bursts_are_queued_instead_of_rejected(self, monkeypatch):
+        monkeypatch.setenv("CLIENT_RATE_PER_SECOND", "20")
+        monkeypatch.setenv("CLIENT_BURST", "1")
+        monkeypatch.setenv("CLIENT_MAX_QUEUE_WAIT_MS", "500")
+        client = TestClient(make_app())
+
+        statuses = [client.post("/api/query").status_code for _ in range(3)]
+
+        assert statuses == [200, 200, 200]
+        assert admission_snapshot()['clients']['wait']['count'] == 3
+
+    def test_no_limit_by_default(self):
+        client = TestClient(make_app())
+
+        assert all(client.post("/api/query").status_code == 200 for _ in range(20))
+
+
+class TestLlmExecutor:
+
+    def test_runs_on_the_llm_executor_with_the_callers_context(self, tenants_dir):
+        os.makedirs(tenants_dir / "sales")
+
+        async def call():
+            token = set_current_tenant("sales")
+            try:
+                return await to_llm_thread(lambda: (threading.current_thread().name, current_tenant()))
+            finally:
+                reset_current_tenant(token)
+
+        thread_name, tenant = asyncio.run(call())
+
+        assert thread_name.startswith("llm-call")
+        assert tenant == "sales"
+
+    def test_executor_holds_every_admitted_and_queued_call(self, monkeypatch):
+        monkeypatch.setenv("LLM_MAX_CONCURRENT", "3")
+        monkeypatch.setenv("LLM_MAX_QUEUE_DEPTH", "5")
+
+        assert llm_executor()._max_workers == 8
+
+
+class TestAdmissionMetrics:
+
+    def test_queue_and_rejections_are_exported(self):
+        with get_provider_admission('openai').admit():
+            pass
+
+        text = render_metrics()
+
+        assert 'nlsql_admission_queue_depth{scope="provider",provider="openai"} 0' in text
+        assert 'nlsql_admission_admitted_total{scope="provider",provider="openai"} 1' in text
+        assert 'nlsql_admission_wait_seconds_count{scope="client"} 0' in text
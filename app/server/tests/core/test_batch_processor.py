@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+from core.batch_processor import normalize_question, run_batch_queries
+
+
+def fake_execute(sql, read_only=False, use_cache=True):
+    assert read_only
+    return {'results': [{'sql': sql}], 'columns': ['sql'], 'error': None}
+
+
+class TestBatchProcessor:
+
+    def test_normalize_question(self):
+        assert normalize_question("  How many   Users? ") == "how many users?"
+
+    @patch('core.batch_processor.execute_sql_safely', side_effect=fake_execute)
+    @patch('core.batch_processor.generate_sql_with_source')
+    def test_results_in_request_order_with_deduplication(self, mock_generate, mock_execute):
+        mock_generate.side_effect = lambda request, schema: (f"SELECT '{request.query}'", "small")
+        schema_info = {'tables': {}}
+
+        items, unique = asyncio.run(run_batch_queries(
+            ["count users", "list orders", "Count  users"], schema_info
+        ))
+
+        assert unique == 2
+        assert [item.query for item in items] == ["count users", "list orders", "Count  users"]
+        assert items[0].sql == items[2].sql == "SELECT 'count users'"
+        assert items[2].deduplicated and not items[0].deduplicated
+        assert items[1].results == [{'sql': "SELECT 'list orders'"}]
+        assert mock_generate.call_count == 2
+        # The schema is shared, not refetched per question
+        assert all(call.args[1] is schema_info for call in mock_generate.call_args_list)
+
+    @patch('core.batch_processor.execute_sql_safely', side_effect=fake_execute)
+    @patch('core.batch_processor.generate_sql_with_source')
+    def test_generation_concurrency_is_bounded(self, mock_generate, mock_execute):
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def slow_generate(request, schema):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.05)
+            with lock:
+                state['active'] -= 1
+            return "SELECT 1", "small"
+
+        mock_generate.side_effect = slow_generate
+
+        items, _ = asyncio.run(run_batch_queries(
+            [f"question {i}" for i in range(8)], {'tables': {}}, max_concurrency=3
+        ))
+
+        assert len(items) == 8
+        assert state['peak'] == 3
+
+    @patch('core.batch_processor.execute_sql_safely', side_effect=fake_execute)
+    @patch('core.batch_processor.generate_sql_with_source')
+    def test_item_errors_do_not_fail_batch(self, mock_generate, mock_execute):
+        def generate(request, schema):
+            if request.query == "bad":
+                raise Exception("Error generating SQL with OpenAI: timeout")
+            return "SELECT 1", "small"
+
+        mock_generate.side_effect = generate
+
+        items, _ = asyncio.run(run_batch_queries(["good", "bad"], {'tables': {}}))
+
+        assert items[0].error is None and items[0].row_count == 1
+        assert items[1].error == "Error generating SQL with OpenAI: timeout"
+        assert items[1].sql == "" and items[1].results == []
@@ -0,0 +1,129 @@
+import sqlite3
+import threading
+import pytest
+from core.connection_pool import ConnectionPool, get_pool, get_statement_registry
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER, name TEXT)")
+    conn.execute("CREATE TABLE orders (id INTEGER, user_id INTEGER)")
+    conn.execute("INSERT INTO users VALUES (1, 'Ann'), (2, 'Bob')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def run(pool, sql):
+    with pool.connection() as pooled:
+        cursor = pooled.cursor()
+        cursor.execute(sql)
+        rows = cursor.fetchall()
+        return rows, pooled.last_tables
+
+
+class TestConnectionPool:
+
+    def test_connections_are_reused(self, db_path):
+        pool = ConnectionPool(db_path, size=2)
+
+        for _ in range(5):
+            run(pool, "SELECT * FROM users")
+
+        stats = pool.stats()
+        assert stats['created'] == 1
+        assert stats['reused'] == 4
+        pool.close()
+
+    def test_statement_cache_hits_are_counted(self, db_path):
+        pool = ConnectionPool(db_path)
+
+        for _ in range(4):
+            run(pool, "SELECT name FROM users")
+
+        stats = get_statement_registry().stats()
+        assert stats['executions'] == 4
+        assert stats['compiles'] == 1
+        assert stats['hit_rate'] == 0.75
+        assert stats['hot_statements'][0] == {
+            'sql': "SELECT name FROM users", 'executions': 4, 'compiles': 1, 'hit_rate': 0.75
+        }
+        pool.close()
+
+    def test_statements_are_recorded_without_bound_values(self, db_path):
+        pool = ConnectionPool(db_path)
+        sql = "SELECT name FROM users WHERE id = ?"
+
+        for user_id in (1, 2):
+            with pool.connection() as pooled:
+                pooled.cursor().execute(sql, (user_id,)).fetchall()
+                assert pooled.last_tables == frozenset({'users'})
+        for order_id in (7, 8):
+            with pool.connection() as pooled:
+                pooled.conn.execute("INSERT INTO orders VALUES (?, ?)", (order_id, 1))
+                pooled.conn.commit()
+
+        statements = get_statement_registry().statements
+        assert statements[sql] == [2, 1]
+        assert statements["INSERT INTO orders VALUES (?, ?)"] == [2, 1]
+        assert not any("(7, 1)" in text or "id = 1" in text for text in statements)
+        pool.close()
+
+    def test_cached_statement_sees_schema_change(self, db_path):
+        pool = ConnectionPool(db_path)
+        run(pool, "SELECT name FROM users")
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("ALTER TABLE users ADD COLUMN email TEXT")
+        conn.execute("INSERT INTO users VALUES (3, 'Cy', 'cy@example.com')")
+        conn.commit()
+        conn.close()
+        rows, tables = run(pool, "SELECT name FROM users")
+
+        assert rows == [('Ann',), ('Bob',), ('Cy',)]
+        assert tables == frozenset({'users'})
+        pool.close()
+
+    def test_tables_read_are_tracked_for_cached_statements(self, db_path):
+        pool = ConnectionPool(db_path)
+        sql = "SELECT u.name FROM users u JOIN orders o ON o.user_id = u.id"
+
+        _, compiled_tables = run(pool, sql)
+        _, cached_tables = run(pool, sql)
+
+        assert compiled_tables == cached_tables == frozenset({'users', 'orders'})
+        pool.close()
+
+    def test_read_only_pool_rejects_writes(self, db_path):
+        pool = ConnectionPool(db_path, read_only=True)
+
+        with pool.connection() as pooled:
+            with pytest.raises(sqlite3.OperationalError):
+                pooled.conn.execute("INSERT INTO users VALUES (3, 'Cy')")
+        pool.close()
+
+    def test_busy_pool_opens_overflow_connections(self, db_path):
+        pool = ConnectionPool(db_path, size=1)
+        barrier = threading.Barrier(3)
+
+        def worker():
+            with pool.connection() as pooled:
+                barrier.wait(timeout=5)
+                pooled.conn.execute("SELECT 1").fetchall()
+
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = pool.stats()
+        assert stats['created'] == 3
+        assert stats['idle'] == 1
+        pool.close()
+
+    def test_pools_are_keyed_by_path_and_mode(self, db_path):
+        assert get_pool(db_path) is get_pool(db_path)
+        assert get_pool(db_path) is not get_pool(db_path, read_only=True)
@@ -1,8 +1,20 @@
+import json
+import sqlite3
 import pytest
+from datetime import date
 from pathlib import Path
 from unittest.mock import patch
 from core import file_processor
-from core.file_processor import convert_csv_to_sqlite, convert_json_to_sqlite, convert_jsonl_to_sqlite, flatten_json_object, discover_jsonl_fields
+from core.file_processor import (
+    convert_csv_to_sqlite,
+    convert_json_to_sqlite,
+    convert_jsonl_to_sqlite,
+    convert_parquet_to_sqlite,
+    convert_arrow_to_sqlite,
+    flatten_json_object,
+    find_wide_lists,
+    discover_jsonl_fields
+)
 
 
 @pytest.fixture
@@ -123,6 +135,47 @@ class TestFileProcessor:
         assert laptop_data['category'] == 'Electronics'
         assert laptop_data['in_stock']
     
+    def test_convert_json_to_sqlite_streams_in_batches(self, tmp_path):
+        """Test streaming a JSON array from a file object with small batches"""
+        records = [{"id": i, "name": f"user{i}"} for i in range(25)]
+        # A column that only appears in a later batch
+        records[23]["Signup Date"] = "2024-01-01"
+        json_path = tmp_path / "users.json"
+        json_path.write_text(json.dumps(records))
+        
+        with patch.object(file_processor, 'DATABASE_PATH', str(tmp_path / "test.db")):
+            with open(json_path, 'rb') as stream:
+                result = convert_json_to_sqlite(stream, "users", batch_size=10)
+        
+        assert result['row_count'] == 25
+        assert result['schema'] == {'id': 'INTEGER', 'name': 'TEXT', 'signup_date': 'TEXT'}
+        assert result['sample_data'][0] == {'id': 0, 'name': 'user0', 'signup_date': None}
+    
+    def test_convert_json_to_sqlite_failed_reupload_keeps_existing_table(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        good = json.dumps([{"id": i} for i in range(10)]).encode()
+        # Malformed element after the 4th object, once two batches have been inserted
+        bad = b'[{"id": 100}, {"id": 101}, {"id": 102}, {"id": 103}, {"id": oops}]'
+
+        with patch.object(file_processor, 'DATABASE_PATH', db_path):
+            convert_json_to_sqlite(good, "t", batch_size=2)
+            with pytest.raises(Exception):
+                convert_json_to_sqlite(bad, "t", batch_size=2)
+
+        conn = sqlite3.connect(db_path)
+        try:
+            assert conn.execute("SELECT COUNT(*), MAX(id) FROM t").fetchone() == (10, 9)
+            tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            assert tables == ['t']
+        finally:
+            conn.close()
+
+    def test_convert_json_to_sqlite_non_object_elements(self):
+        with pytest.raises(Exception) as exc_info:
+            convert_json_to_sqlite(b'[1, 2, 3]', "numbers")
+        
+        assert "JSON must be an array of objects" in str(exc_info.value)
+    
     def test_convert_json_to_sqlite_invalid_json(self):
         # Test with invalid JSON
         json_data = b'invalid json'
@@ -211,6 +264,52 @@ class TestFileProcessor:
         assert flatten_json_object(True) == {"": True}
         assert flatten_json_object(None) == {"": None}
     
+    def test_flatten_json_object_deep_nesting(self):
+        """Test flattening documents deeper than the recursion limit"""
+        depth = 5000
+        obj = "leaf"
+        for _ in range(depth):
+            obj = {"n": obj}
+        
+        flattened = flatten_json_object(obj)
+        
+        assert len(flattened) == 1
+        key, value = next(iter(flattened.items()))
+        assert value == "leaf"
+        assert key.count("__") == depth - 1
+    
+    def test_flatten_json_object_long_list_stored_as_json(self):
+        """Test that lists above the fan-out cap become a single JSON text column"""
+        obj = {"ids": list(range(10000)), "short": [1, 2]}
+        
+        flattened = flatten_json_object(obj)
+        
+        assert set(flattened.keys()) == {"ids", "short_0", "short_1"}
+        assert json.loads(flattened["ids"]) == list(range(10000))
+    
+    def test_wide_list_field_is_json_text_in_every_row(self):
+        """Test that a list too long in one document is stored as JSON text in all of them"""
+        documents = [{"ids": [1, 2]}, {"ids": list(range(100)), "tags": [{"v": list(range(60))}]}]
+        
+        json_lists = find_wide_lists(documents)
+        
+        assert json_lists == {"ids", "tags_0__v"}
+        assert flatten_json_object(documents[0], json_lists=json_lists) == {"ids": "[1,2]"}
+        assert discover_jsonl_fields(
+            b'{"ids": [1, 2]}\n{"ids": ' + json.dumps(list(range(100))).encode() + b'}'
+        ) == {"ids"}
+    
+    def test_flatten_json_object_shared_key_cache(self):
+        """Test that a shared key cache memoizes key paths across documents"""
+        key_cache = {}
+        
+        first = flatten_json_object({"user": {"name": "A"}}, key_cache=key_cache)
+        second = flatten_json_object({"user": {"name": "B"}}, key_cache=key_cache)
+        
+        assert first == {"user__name": "A"}
+        assert second == {"user__name": "B"}
+        assert key_cache[("user", "name")] == "user__name"
+    
     def test_discover_jsonl_fields_basic(self):
         """Test field discovery with basic JSONL content"""
         jsonl_content = b'{"name": "John", "age": 30}\n{"name": "Jane", "age": 25, "city": "NYC"}'
@@ -351,6 +450,15 @@ class TestFileProcessor:
         
         assert "Invalid JSON on line 2" in str(exc_info.value)
     
+    def test_convert_jsonl_to_sqlite_invalid_utf8(self, test_db):
+        """Test JSONL conversion with a line that is not valid UTF-8"""
+        jsonl_data = b'{"name": "ok"}\n{"name": "\xff\xfe"}'
+        
+        with pytest.raises(Exception) as exc_info:
+            convert_jsonl_to_sqlite(jsonl_data, "test_table")
+        
+        assert "Invalid JSON on line 2" in str(exc_info.value)
+    
     def test_convert_jsonl_to_sqlite_empty_file(self, test_db):
         """Test JSONL conversion with empty file"""
         jsonl_data = b''
@@ -371,6 +479,17 @@ class TestFileProcessor:
         
         assert "No valid JSON objects found in JSONL file" in str(exc_info.value)
     
+    def test_convert_jsonl_to_sqlite_wide_list_has_one_column(self, test_db):
+        """Test that a list over the fan-out cap in one line is one JSON text column for every line"""
+        jsonl_data = b'{"name": "A", "ids": [1, 2]}\n{"name": "B", "ids": ' + json.dumps(list(range(60))).encode() + b'}'
+        
+        result = convert_jsonl_to_sqlite(jsonl_data, "wide_lists")
+        
+        assert set(result['schema']) == {'name', 'ids'}
+        rows = {row['name']: row['ids'] for row in result['sample_data']}
+        assert json.loads(rows['A']) == [1, 2]
+        assert json.loads(rows['B']) == list(range(60))
+    
     def test_convert_jsonl_to_sqlite_inconsistent_schema(self, test_db):
         """Test JSONL conversion with inconsistent schema across lines"""
         jsonl_data = b'{"name": "John", "age": 30}\n{"name": "Jane", "city": "NYC", "profile": {"bio": "Engineer"}}'
@@ -396,4 +515,192 @@ class TestFileProcessor:
         assert jane_data is not None
         assert jane_data['age'] is None
         assert jane_data['city'] == 'NYC'
-        assert jane_data['profile__bio'] == 'Engineer'
\ No newline at end of file
+        assert jane_data['profile__bio'] == 'Engineer'
+
+class TestColumnarFileProcessor:
+    """Tests for Parquet and Arrow IPC ingestion"""
+
+    @pytest.fixture
+    def arrow_table(self):
+        pa = pytest.importorskip("pyarrow")
+        return pa.table({
+            'id': pa.array([1, 2, 3], type=pa.int64()),
+            'Full Name': pa.array(['Alice', 'Bob', None]),
+            'price': pa.array([9.5, 20.0, 3.25]),
+            'active': pa.array([True, False, True]),
+            'signup-date': pa.array([date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)]),
+            'tags': pa.array([['a', 'b'], [], None], type=pa.list_(pa.string())),
+        })
+
+    def test_convert_parquet_to_sqlite_multiple_row_groups(self, test_db, arrow_table):
+        pa = pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+
+        sink = pa.BufferOutputStream()
+        pq.write_table(arrow_table, sink, row_group_size=1)
+        parquet_data = sink.getvalue().to_pybytes()
+        assert pq.ParquetFile(pa.BufferReader(parquet_data)).num_row_groups == 3
+
+        result = convert_parquet_to_sqlite(parquet_data, "products.parquet")
+
+        assert result['table_name'] == 'products'
+        assert result['row_count'] == 3
+        assert result['schema'] == {
+            'id': 'INTEGER',
+            'full_name': 'TEXT',
+            'price': 'REAL',
+            'active': 'INTEGER',
+            'signup_date': 'TEXT',
+            'tags': 'TEXT',
+        }
+
+        first = result['sample_data'][0]
+        assert first['id'] == 1
+        assert first['full_name'] == 'Alice'
+        assert first['price'] == 9.5
+        assert first['active'] == 1
+        assert first['signup_date'] == '2024-01-01'
+        assert json.loads(first['tags']) == ['a', 'b']
+        assert result['sample_data'][2]['full_name'] is None
+        assert result['sample_data'][2]['tags'] is None
+
+    def test_convert_arrow_file_and_stream_formats(self, test_db, arrow_table):
+        pa = pytest.importorskip("pyarrow")
+
+        file_sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(file_sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table, max_chunksize=2)
+        stream_sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(stream_sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table, max_chunksize=2)
+
+        for content in (file_sink.getvalue().to_pybytes(), stream_sink.getvalue().to_pybytes()):
+            result = convert_arrow_to_sqlite(content, "events")
+            assert result['table_name'] == 'events'
+            assert result['row_count'] == 3
+            assert result['schema']['id'] == 'INTEGER'
+            assert [row['full_name'] for row in result['sample_data']] == ['Alice', 'Bob', None]
+
+    def test_failed_arrow_reupload_keeps_existing_table(self, tmp_path, arrow_table):
+        pa = pytest.importorskip("pyarrow")
+        db_path = str(tmp_path / "test.db")
+        stream_sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(stream_sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table, max_chunksize=1)
+        content = stream_sink.getvalue().to_pybytes()
+
+        with patch.object(file_processor, 'DATABASE_PATH', db_path):
+            convert_arrow_to_sqlite(content, "events")
+            # Cut off inside the last record batch: the first ones load before the error
+            with pytest.raises(Exception):
+                convert_arrow_to_sqlite(content[:-100], "events")
+
+        conn = sqlite3.connect(db_path)
+        try:
+            assert conn.execute("SELECT COUNT(*) FROM events").fetchone() == (3,)
+            tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            assert tables == ['events']
+        finally:
+            conn.close()
+
+    def test_arrow_columns_differing_only_in_case_are_rejected(self, test_db):
+        pa = pytest.importorskip("pyarrow")
+        table = pa.table({'Name': ['a'], 'name': ['b'], 'id': [1]})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        with pytest.raises(Exception) as exc_info:
+            convert_arrow_to_sqlite(sink.getvalue().to_pybytes(), "people")
+
+        assert "Column names collide after normalization: 'Name', 'name'" in str(exc_info.value)
+
+    def test_convert_parquet_to_sqlite_invalid_content(self, test_db):
+        pytest.importorskip("pyarrow")
+
+        with pytest.raises(Exception) as exc_info:
+            convert_parquet_to_sqlite(b"not a parquet file", "broken")
+
+        assert "Error converting Parquet to SQLite" in str(exc_info.value)
+
+
+class TestJsonStorageMode:
+    """Tests for the JSON1 storage mode of JSONL uploads"""
+
+    @pytest.fixture
+    def shared_db(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        with patch.object(file_processor, 'DATABASE_PATH', db_path):
+            yield db_path
+
+    def test_convert_jsonl_json_mode_keeps_nested_as_json(self, shared_db, test_assets_dir):
+        with open(test_assets_dir / "complex_data.jsonl", 'rb') as f:
+            jsonl_data = f.read()
+
+        flattened = convert_jsonl_to_sqlite(jsonl_data, "flat_events")
+        result = convert_jsonl_to_sqlite(jsonl_data, "json_events", storage_mode="json")
+
+        assert len(result['schema']) < len(flattened['schema'])
+        assert not any('__' in column for column in result['schema'])
+        assert result['row_count'] == flattened['row_count']
+
+    def test_convert_jsonl_json_mode_indexed_paths(self, shared_db):
+        jsonl_data = (
+            b'{"id": 1, "user": {"profile": {"name": "Ann"}}, "tags": [{"name": "x"}]}\n'
+            b'{"id": 2, "user": {"profile": {"name": "Bob"}}, "tags": []}'
+        )
+
+        result = convert_jsonl_to_sqlite(
+            jsonl_data, "events", storage_mode="json", indexed_paths=["user.profile.name", "tags.0.name"]
+        )
+
+        assert 'user__profile__name' in result['schema']
+        assert 'tags_0__name' in result['schema']
+        assert result['sample_data'][0]['user__profile__name'] == 'Ann'
+        assert result['sample_data'][1]['tags_0__name'] is None
+
+        conn = sqlite3.connect(shared_db)
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM events WHERE user__profile__name = 'Bob'"
+        ).fetchall()
+        extracted = conn.execute(
+            "SELECT json_extract(user, '$.profile.name') FROM events ORDER BY id"
+        ).fetchall()
+        conn.close()
+        assert any('idx_events_user__profile__name' in row[-1] for row in plan)
+        assert extracted == [('Ann',), ('Bob',)]
+
+    def test_convert_jsonl_json_mode_mixed_case_keys(self, shared_db):
+        jsonl_data = (
+            b'{"ID": 1, "User": {"Name": "Ann"}}\n'
+            b'{"ID": 2, "user": {"Name": "Bob"}}'
+        )
+
+        result = convert_jsonl_to_sqlite(jsonl_data, "events", storage_mode="json", indexed_paths=["User.Name"])
+
+        assert set(result['schema']) == {'id', 'user', 'user__name'}
+        assert [row['user__name'] for row in result['sample_data']] == ['Ann', 'Bob']
+
+    def test_convert_jsonl_json_mode_rejects_keys_differing_only_in_case(self, shared_db):
+        jsonl_data = b'{"id": 1}\n{"ID": 2, "id": 3}'
+
+        with pytest.raises(Exception) as exc_info:
+            convert_jsonl_to_sqlite(jsonl_data, "events", storage_mode="json")
+        assert "Line 2: Keys collide after normalization: 'ID', 'id'" in str(exc_info.value)
+
+    def test_convert_jsonl_json_mode_invalid_options(self, shared_db):
+        jsonl_data = b'{"id": 1, "user": {"name": "Ann"}}'
+
+        with pytest.raises(Exception) as exc_info:
+            convert_jsonl_to_sqlite(jsonl_data, "events", storage_mode="columns")
+        assert "Unknown storage mode" in str(exc_info.value)
+
+        with pytest.raises(Exception) as exc_info:
+            convert_jsonl_to_sqlite(jsonl_data, "events", indexed_paths=["user.name"])
+        assert "require the 'json' storage mode" in str(exc_info.value)
+
+        with pytest.raises(Exception) as exc_info:
+            convert_jsonl_to_sqlite(
+                jsonl_data, "events", storage_mode="json", indexed_paths=["user.name') --"]
+            )
+        assert "Invalid segment" in str(exc_info.value)
@@ -0,0 +1,33 @@
+import sqlite3
+import pytest
+from unittest.mock import patch
+from core import insights
+from core.connection_pool import get_pool
+from core.insights import generate_insights
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "database.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE orders (id INTEGER, status TEXT)")
+    conn.execute("INSERT INTO orders VALUES (1, 'open'), (2, 'open'), (3, NULL)")
+    conn.commit()
+    conn.close()
+    with patch.object(insights, 'DATABASE_PATH', path):
+        yield path
+
+
+class TestGenerateInsights:
+
+    def test_column_statistics(self, database):
+        status = generate_insights("orders", ["status"])[0]
+
+        assert (status.unique_values, status.null_count) == (1, 1)
+        assert status.most_common == [{"value": "open", "count": 2}]
+
+    def test_connection_is_returned_to_the_pool_on_error(self, database):
+        with pytest.raises(Exception, match="Invalid column name"):
+            generate_insights("orders", ["status; DROP TABLE orders"])
+
+        assert get_pool(database).stats()['idle'] == 1
@@ -0,0 +1,70 @@
+from unittest.mock import patch
+from core.data_models import QueryRequest
+from core.intent_parser import match_intent, parse_intent, resolve_column
+from core.llm_processor import generate_sql
+from benchmarks.eval_intent_parser import DEFAULT_CORPUS, SCHEMA_INFO, evaluate
+
+CATALOG = {
+    'tables': {
+        'orders': {'columns': {'id': 'INTEGER', 'total': 'REAL', 'status': 'TEXT'}, 'row_count': 2},
+        'order_items': {'columns': {'id': 'INTEGER', 'order_id': 'INTEGER'}, 'row_count': 3},
+        'customers': {'columns': {'id': 'INTEGER', 'name': 'TEXT'}, 'row_count': 1},
+    }
+}
+
+
+class TestIntentParser:
+
+    def test_count_phrasings(self):
+        for question in ["How many rows in orders?", "count records in the orders table", "how many orders are there", "count orders"]:
+            assert parse_intent(question, CATALOG) == "SELECT COUNT(*) AS count FROM [orders]", question
+
+    def test_show_resolves_snake_case_and_plurals(self):
+        assert parse_intent("show order items", CATALOG) == "SELECT * FROM [order_items] LIMIT 100"
+        assert parse_intent("List all customer", CATALOG) == "SELECT * FROM [customers] LIMIT 100"
+        assert parse_intent("show first 10 customers", CATALOG) == "SELECT * FROM [customers] LIMIT 10"
+
+    def test_aggregates_and_groups(self):
+        assert parse_intent("average order total", CATALOG) == "SELECT AVG([total]) AS [average_total] FROM [orders]"
+        assert match_intent("number of orders by status", CATALOG).name == 'grouped_count'
+        assert parse_intent("top 2 orders by total", CATALOG) == "SELECT * FROM [orders] ORDER BY [total] DESC LIMIT 2"
+
+    def test_sums_need_a_numeric_column(self):
+        assert parse_intent("total status of orders", CATALOG) is None
+        assert parse_intent("max status", CATALOG) == "SELECT MAX([status]) AS [max_status] FROM [orders]"
+
+    def test_ambiguous_column_is_left_to_the_llm(self):
+        assert resolve_column("id", CATALOG) is None
+        assert resolve_column("id", CATALOG, 'orders') == ('orders', 'id')
+        assert parse_intent("max id", CATALOG) is None
+
+    def test_unknown_names_and_filters_are_left_to_the_llm(self):
+        assert parse_intent("how many invoices", CATALOG) is None
+        assert parse_intent("show orders over 100 dollars", CATALOG) is None
+        assert parse_intent("average order total in 2024", CATALOG) is None
+
+
+class TestIntentParserCorpus:
+
+    def test_no_wrong_answers_on_eval_corpus(self):
+        result = evaluate(DEFAULT_CORPUS, SCHEMA_INFO, repeat=1)
+
+        assert result['wrong'] == []
+        assert result['missed'] == 0
+        assert result['coverage'] > 0.5
+
+
+class TestFastPath:
+
+    @patch('core.llm_processor.generate_sql_with_openai')
+    def test_recognised_question_skips_the_llm(self, mock_openai_func, monkeypatch):
+        monkeypatch.setenv("INTENT_PARSER", "1")
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        mock_openai_func.return_value = "SELECT 1"
+
+        with patch('core.llm_processor.explain_sql') as mock_explain:
+            assert generate_sql(QueryRequest(query="how many orders"), CATALOG) == "SELECT COUNT(*) AS count FROM [orders]"
+            assert generate_sql(QueryRequest(query="orders shipped late"), CATALOG) == "SELECT 1"
+
+        mock_explain.assert_called()
+        mock_openai_func.assert_called_once_with("orders shipped late", CATALOG)
@@ -0,0 +1,127 @@
+import io
+import json
+import pytest
+from core import json_parser
+
+
+@pytest.fixture(params=json_parser.available_parsers())
+def parser_name(request):
+    """Run a test against every installed JSON backend"""
+    original = json_parser.PARSER_NAME
+    json_parser.set_parser(request.param)
+    yield request.param
+    json_parser.set_parser(original)
+
+
+class TestJsonParser:
+
+    def test_loads_bytes_and_str(self, parser_name):
+        document = {"id": 1, "name": "Zoë", "tags": ["a", "b"], "nested": {"ok": True, "none": None}}
+        encoded = json.dumps(document)
+
+        assert json_parser.loads(encoded.encode('utf-8')) == document
+        assert json_parser.loads(encoded) == document
+
+    def test_loads_invalid_json_raises_decode_error(self, parser_name):
+        with pytest.raises(json.JSONDecodeError):
+            json_parser.loads(b'{invalid json}')
+
+    def test_loads_invalid_utf8_raises_decode_error(self, parser_name):
+        with pytest.raises(json.JSONDecodeError):
+            json_parser.loads(b'{"name": "\xff\xfe"}')
+
+    def test_dumps_is_compact_and_round_trips(self, parser_name):
+        value = {"a": [1, 2, {"b": "c"}], "big": 2 ** 70}
+
+        text = json_parser.dumps(value)
+
+        assert ' ' not in text
+        assert json.loads(text) == value
+
+    def test_set_parser_unknown_backend(self):
+        with pytest.raises(ValueError) as exc_info:
+            json_parser.set_parser("yaml")
+
+        assert "not available" in str(exc_info.value)
+
+
+class TestIterJsonArray:
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 4096])
+    def test_yields_elements_across_chunk_boundaries(self, chunk_size):
+        document = [{"id": i, "name": f"é-{i}", "values": [i, i * 1.5]} for i in range(20)] + [12345678]
+        content = b'\xef\xbb\xbf \n' + json.dumps(document, indent=2).encode('utf-8') + b'\n'
+
+        elements = list(json_parser.iter_json_array(io.BytesIO(content), chunk_size=chunk_size))
+
+        assert elements == document
+
+    def test_empty_array(self):
+        assert list(json_parser.iter_json_array(io.BytesIO(b' [ ] '))) == []
+
+    def test_is_lazy(self):
+        stream = io.BytesIO(b'[{"a": 1}, {"a": 2}, {"a": 3}]')
+        elements = json_parser.iter_json_array(stream, chunk_size=12)
+
+        assert next(elements) == {"a": 1}
+        assert stream.tell() < len(stream.getvalue())
+
+    @pytest.mark.parametrize("content, message", [
+        (b'{"a": 1}', "JSON must be an array of objects"),
+        (b'', "JSON must be an array of objects"),
+        (b'[{"a": 1}, {"a": 2}', "Unexpected end of JSON array"),
+        (b'[{"a": 1} {"a": 2}]', "Expected ',' or ']'"),
+        (b'[{"a": 1},]', "Invalid JSON"),
+        (b'[{"a": 1}] trailing', "Unexpected data after JSON array"),
+    ])
+    def test_malformed_documents(self, content, message):
+        with pytest.raises(ValueError) as exc_info:
+            list(json_parser.iter_json_array(io.BytesIO(content), chunk_size=4))
+
+        assert message in str(exc_info.value)
+
+    def test_malformed_element_fails_before_reading_the_rest(self):
+        content = b'[{"a": 1}, {"a": tru}, ' + b', '.join(b'{"a": 2}' for _ in range(10000)) + b']'
+        stream = io.BytesIO(content)
+
+        with pytest.raises(ValueError) as exc_info:
+            list(json_parser.iter_json_array(stream, chunk_size=16))
+
+        assert "Invalid JSON at byte 17" in str(exc_info.value)
+        assert stream.tell() < 100
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 3, 5])
+    def test_tokens_cut_off_by_a_chunk_read_more(self, chunk_size):
+        content = b'[true, false, null, "a\\u00e9\\"b", -12.5e3, {"k": [1e5]}]'
+
+        elements = list(json_parser.iter_json_array(io.BytesIO(content), chunk_size=chunk_size))
+
+        assert elements == [True, False, None, 'a\u00e9"b', -12.5e3, {"k": [1e5]}]
+
+    def test_elements_are_parsed_once_in_batches_from_bytes(self, monkeypatch):
+        parsed = []
+
+        def recording_loads(data):
+            parsed.append(data)
+            return json.loads(data)
+
+        monkeypatch.setattr(json_parser, '_loads', recording_loads)
+        content = b'[{"a": 1}, {"a": {"b": 2}}, {"a": 3}, {"a": 4}]'
+
+        assert list(json_parser.iter_json_array(io.BytesIO(content), chunk_size=30)) == [
+            {"a": 1}, {"a": {"b": 2}}, {"a": 3}, {"a": 4}
+        ]
+        assert parsed == [b'[{"a": 1}, {"a": {"b": 2}}]', b'[{"a": 3}, {"a": 4}]']
+
+    def test_multibyte_characters_split_by_a_chunk(self, parser_name):
+        document = [{"name": "\u00e9\u4e2d\U0001f600" * 50}, "\u00e9"]
+        content = json.dumps(document, ensure_ascii=False).encode('utf-8')
+
+        for chunk_size in (1, 2, 5, 4096):
+            assert list(json_parser.iter_json_array(io.BytesIO(content), chunk_size=chunk_size)) == document
+
+    def test_invalid_utf8_raises(self, parser_name):
+        with pytest.raises(ValueError) as exc_info:
+            list(json_parser.iter_json_array(io.BytesIO(b'[{"a": "\xff"}, 1]'), chunk_size=4))
+
+        assert "Invalid UTF-8" in str(exc_info.value)
@@ -0,0 +1,153 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from core.data_models import QueryRequest
+from core.llm_hedging import (
+    MIN_HEDGE_SAMPLES,
+    generate_sql_hedged,
+    get_latency_histogram,
+    hedge_delay_seconds
+)
+from core.llm_processor import generate_sql
+from core.sql_security import SQLSecurityError
+from core.tenancy import current_tenant, reset_current_tenant, set_current_tenant
+
+
+class FakeProvider:
+    """Local stand-in for an LLM provider with a fixed latency and answer"""
+
+    def __init__(self, sql=None, delay=0.0, error=None):
+        self.sql = sql
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.finished = threading.Event()
+
+    def __call__(self, query_text, schema_info):
+        self.calls += 1
+        try:
+            time.sleep(self.delay)
+            if self.error:
+                raise self.error
+            return self.sql
+        finally:
+            self.finished.set()
+
+
+class TestHedgeDelay:
+
+    def test_hedge_delay_defaults_until_enough_samples(self, monkeypatch):
+        monkeypatch.setenv("LLM_HEDGE_DEFAULT_DELAY_MS", "1500")
+        assert hedge_delay_seconds('openai') == 1.5
+
+        for _ in range(MIN_HEDGE_SAMPLES):
+            get_latency_histogram('openai').record(280)
+        assert hedge_delay_seconds('openai') == 0.3
+
+    def test_hedge_delay_is_clamped(self, monkeypatch):
+        monkeypatch.setenv("LLM_HEDGE_MAX_DELAY_MS", "5000")
+        for _ in range(MIN_HEDGE_SAMPLES):
+            get_latency_histogram('openai').record(59000)
+        assert hedge_delay_seconds('openai') == 5.0
+
+
+class TestGenerateSqlHedged:
+
+    def test_fast_primary_does_not_hedge(self):
+        primary = FakeProvider("SELECT 1")
+        secondary = FakeProvider("SELECT 2")
+
+        result = generate_sql_hedged("q", {}, {'openai': primary, 'anthropic': secondary}, 'openai', 0.5)
+
+        assert result == "SELECT 1"
+        assert secondary.calls == 0
+        assert get_latency_histogram('openai').count == 1
+
+    def test_slow_primary_is_raced(self):
+        primary = FakeProvider("SELECT 1", delay=0.5)
+        secondary = FakeProvider("SELECT 2", delay=0.01)
+
+        start = time.perf_counter()
+        result = generate_sql_hedged("q", {}, {'openai': primary, 'anthropic': secondary}, 'openai', 0.05)
+        elapsed = time.perf_counter() - start
+
+        assert result == "SELECT 2"
+        assert elapsed < 0.4
+        assert secondary.calls == 1
+        # The loser's latency is still recorded once it finishes
+        assert primary.finished.wait(2)
+        time.sleep(0.05)
+        assert get_latency_histogram('openai').count == 1
+
+    def test_primary_error_hedges_immediately(self):
+        primary = FakeProvider(error=RuntimeError("rate limited"))
+        secondary = FakeProvider("SELECT 2")
+
+        start = time.perf_counter()
+        result = generate_sql_hedged("q", {}, {'openai': primary, 'anthropic': secondary}, 'openai', 5.0)
+
+        assert result == "SELECT 2"
+        assert time.perf_counter() - start < 1.0
+
+    def test_invalid_sql_is_skipped(self):
+        primary = FakeProvider("DROP TABLE users")
+        secondary = FakeProvider("SELECT * FROM users", delay=0.05)
+
+        result = generate_sql_hedged("q", {}, {'openai': primary, 'anthropic': secondary}, 'openai', 1.0)
+
+        assert result == "SELECT * FROM users"
+
+    def test_all_providers_failing_raises_last_error(self):
+        primary = FakeProvider(error=RuntimeError("timeout"))
+        secondary = FakeProvider("DELETE FROM users", delay=0.05)
+
+        with pytest.raises(SQLSecurityError):
+            generate_sql_hedged("q", {}, {'openai': primary, 'anthropic': secondary}, 'openai', 1.0)
+
+
+    def test_provider_calls_run_as_the_calling_tenant(self, monkeypatch):
+        monkeypatch.setenv("TENANT_IDS", "sales")
+        tenants = []
+
+        def primary(query_text, schema_info):
+            tenants.append(current_tenant())
+            raise RuntimeError("rate limited")
+
+        def secondary(query_text, schema_info):
+            tenants.append(current_tenant())
+            return "SELECT 1"
+
+        token = set_current_tenant("sales")
+        try:
+            assert generate_sql_hedged("q", {}, {'openai': primary, 'anthropic': secondary}, 'openai', 5.0) == "SELECT 1"
+        finally:
+            reset_current_tenant(token)
+
+        assert tenants == ["sales", "sales"]
+
+class TestGenerateSqlRouting:
+
+    @patch('core.llm_processor.generate_sql_with_anthropic')
+    @patch('core.llm_processor.generate_sql_with_openai')
+    def test_hedging_enabled_with_both_keys(self, mock_openai, mock_anthropic, monkeypatch):
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+        monkeypatch.setenv("LLM_HEDGING", "1")
+        mock_openai.side_effect = RuntimeError("unavailable")
+        mock_anthropic.return_value = "SELECT 1"
+
+        result = generate_sql(QueryRequest(query="q"), {'tables': {}})
+
+        assert result == "SELECT 1"
+        mock_openai.assert_called_once_with("q", {'tables': {}})
+        mock_anthropic.assert_called_once_with("q", {'tables': {}})
+
+    @patch('core.llm_processor.generate_sql_with_openai')
+    def test_single_provider_calls_are_timed(self, mock_openai, monkeypatch):
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+        mock_openai.return_value = "SELECT 1"
+
+        assert generate_sql(QueryRequest(query="q"), {'tables': {}}) == "SELECT 1"
+        assert get_latency_histogram('openai').count == 1
@@ -6,11 +6,18 @@ from core.llm_processor import (
     generate_sql_with_anthropic,
     format_schema_for_prompt,
     generate_sql,
+    remember_sql,
     generate_random_query,
     generate_random_query_with_openai,
-    generate_random_query_with_anthropic
+    generate_random_query_with_anthropic,
+    find_statement_end,
+    open_sql_stream,
+    stream_sql_with_openai,
+    stream_sql_with_anthropic
 )
+from core.admission import AdmissionRejected, get_provider_admission
 from core.data_models import QueryRequest
+from core.llm_resilience import resilience_snapshot
 
 
 class TestLLMProcessor:
@@ -197,6 +204,23 @@ class TestLLMProcessor:
         assert "Row count: 100" in result
         assert "Row count: 50" in result
     
+    def test_format_schema_for_prompt_json_paths(self):
+        # JSON text columns list their paths for json_extract
+        schema_info = {
+            'tables': {
+                'events': {
+                    'columns': {'id': 'INTEGER', 'payload': 'TEXT'},
+                    'row_count': 3,
+                    'json_columns': {'payload': ['$.user.name', '$.tags[*].name']}
+                }
+            }
+        }
+        
+        result = format_schema_for_prompt(schema_info)
+        
+        assert "json_extract(column, '$.path')" in result
+        assert "  - payload: $.user.name, $.tags[*].name" in result
+    
     def test_format_schema_for_prompt_empty(self):
         # Test with empty schema
         schema_info = {'tables': {}}
@@ -290,6 +314,118 @@ class TestLLMProcessor:
             mock_openai_func.assert_called_once_with("Show sales data", schema_info)
 
 
+class TestSQLStreaming:
+
+    @patch('core.llm_processor.OpenAI')
+    def test_stream_sql_with_openai_yields_tokens(self, mock_openai_class):
+        mock_client = MagicMock()
+        mock_openai_class.return_value = mock_client
+
+        chunks = []
+        for text in ["SELECT", None, " * FROM", " users"]:
+            chunk = MagicMock()
+            chunk.choices[0].delta.content = text
+            chunks.append(chunk)
+        mock_stream = MagicMock()
+        mock_stream.__iter__.return_value = iter(chunks)
+        mock_client.chat.completions.create.return_value = mock_stream
+
+        with patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'}):
+            tokens = list(stream_sql_with_openai("Show users", {'tables': {}}))
+
+        assert tokens == ["SELECT", " * FROM", " users"]
+        assert mock_client.chat.completions.create.call_args[1]['stream'] is True
+        assert mock_openai_class.call_args[1]['max_retries'] == 0
+        mock_stream.close.assert_called_once()
+
+    @patch('core.llm_processor.Anthropic')
+    def test_stream_sql_with_anthropic_yields_text_deltas(self, mock_anthropic_class):
+        mock_client = MagicMock()
+        mock_anthropic_class.return_value = mock_client
+
+        events = []
+        for event_type, text in [("message_start", None), ("content_block_delta", "SELECT 1"),
+                                 ("content_block_delta", ";"), ("message_stop", None)]:
+            event = MagicMock()
+            event.type = event_type
+            event.delta.text = text
+            events.append(event)
+        mock_stream = MagicMock()
+        mock_stream.__iter__.return_value = iter(events)
+        mock_client.messages.create.return_value = mock_stream
+
+        with patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'}):
+            tokens = list(stream_sql_with_anthropic("Show one", {'tables': {}}))
+
+        assert tokens == ["SELECT 1", ";"]
+
+    def test_stream_sql_no_api_key(self):
+        with patch.dict(os.environ, {}, clear=True):
+            with pytest.raises(Exception) as exc_info:
+                list(stream_sql_with_openai("q", {'tables': {}}))
+            assert "OPENAI_API_KEY environment variable not set" in str(exc_info.value)
+
+    def test_open_sql_stream_fails_over_before_the_first_token(self, monkeypatch):
+        def failing_stream(query_text, schema_info):
+            raise ConnectionError("connection reset")
+            yield
+
+        def working_stream(query_text, schema_info):
+            yield "SELECT 1"
+            yield ";"
+
+        monkeypatch.setenv("LLM_RETRIES", "0")
+        with patch('core.llm_processor.stream_sql_with_openai', failing_stream), \
+                patch('core.llm_processor.stream_sql_with_anthropic', working_stream), \
+                patch.dict(os.environ, {'OPENAI_API_KEY': 'openai-key', 'ANTHROPIC_API_KEY': 'anthropic-key'}):
+            tokens, source = open_sql_stream(QueryRequest(query="Count users"), {'tables': {}})
+
+        assert list(tokens) == ["SELECT 1", ";"]
+        assert source == "small"
+        assert resilience_snapshot()['openai']['failovers'] == 1
+
+    def test_open_sql_stream_holds_a_call_slot_until_closed(self):
+        def stream(query_text, schema_info):
+            yield "SELECT 1"
+            yield ";"
+
+        environ = {'OPENAI_API_KEY': 'openai-key', 'LLM_MAX_CONCURRENT': '1', 'LLM_MAX_QUEUE_WAIT_MS': '0'}
+        with patch('core.llm_processor.stream_sql_with_openai', stream), \
+                patch.dict(os.environ, environ, clear=True):
+            tokens, _ = open_sql_stream(QueryRequest(query="Count users"), {'tables': {}})
+            assert get_provider_admission('openai').stats()['in_flight'] == 1
+
+            # Shed before any output, so the endpoint can still answer 429
+            with pytest.raises(AdmissionRejected):
+                open_sql_stream(QueryRequest(query="Count users"), {'tables': {}})
+
+            assert next(tokens) == "SELECT 1"
+            tokens.close()
+            assert get_provider_admission('openai').stats()['in_flight'] == 0
+
+    def test_open_sql_stream_serves_semantic_cache_hits(self, monkeypatch):
+        monkeypatch.setenv("SEMANTIC_CACHE", "1")
+        schema_info = {'tables': {'users': {'columns': {'id': 'INTEGER'}, 'row_count': 1}}}
+        request = QueryRequest(query="How many users are there?")
+        remember_sql(request, schema_info, "SELECT COUNT(*) FROM users", "small")
+
+        with patch('core.llm_processor.stream_sql_with_openai') as mock_stream, \
+                patch.dict(os.environ, {'OPENAI_API_KEY': 'openai-key'}):
+            tokens, source = open_sql_stream(request, schema_info)
+            assert list(tokens) == ["SELECT COUNT(*) FROM users"]
+
+        assert source == "semantic_cache"
+        mock_stream.assert_not_called()
+
+    def test_find_statement_end(self):
+        assert find_statement_end("SELECT * FROM users") is None
+        assert find_statement_end("SELECT 1; -- done") == 9
+        assert find_statement_end("SELECT ';' FROM t;") == len("SELECT ';' FROM t;")
+        assert find_statement_end("SELECT 1 -- no;\n") is None
+        assert find_statement_end("```sql\nSELECT 1\n``") is None
+        assert find_statement_end("```sql\nSELECT 1\n```\nExplanation") == len("```sql\nSELECT 1\n")
+
+
 class TestRandomQueryGeneration:
 
     @patch('core.llm_processor.OpenAI')
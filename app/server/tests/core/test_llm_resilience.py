@@ -0,0 +1,213 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from core.data_models import QueryRequest
+from core.llm_processor import generate_sql
+from core.llm_resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    backoff_delay,
+    get_circuit_breaker,
+    is_transient,
+    resilience_snapshot
+)
+from core.tracing import render_metrics
+
+SCHEMA_INFO = {'tables': {'users': {'columns': {'id': 'INTEGER', 'name': 'TEXT'}, 'row_count': 3}}}
+
+
+class FakeProviders(ThreadingHTTPServer):
+    """
+    Local stand-in for both provider APIs. Each path has a queue of scripted
+    faults ("503", "429", "reset", "slow"); once it is empty, requests succeed.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeHandler)
+        self.faults = {'openai': deque(), 'anthropic': deque()}
+        self.calls = {'openai': 0, 'anthropic': 0}
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        provider = 'openai' if self.path.endswith("/chat/completions") else 'anthropic'
+        self.server.calls[provider] += 1
+        fault = self.server.faults[provider].popleft() if self.server.faults[provider] else None
+
+        if fault == "reset":
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        if fault == "slow":
+            time.sleep(1)
+        if fault == "503":
+            self._reply(503, {"error": {"type": "overloaded", "message": "busy"}})
+            return
+        if fault == "429":
+            self._reply(429, {"error": {"type": "rate_limit", "message": "slow down"}}, {"Retry-After": "0.05"})
+            return
+        if fault == "400":
+            self._reply(400, {"error": {"type": "invalid_request", "message": "bad prompt"}})
+            return
+
+        sql = f"SELECT name FROM users -- {provider}"
+        if provider == 'openai':
+            self._reply(200, {
+                "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-4.1-mini",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": sql}}],
+            })
+        else:
+            self._reply(200, {
+                "id": "msg_1", "type": "message", "role": "assistant", "model": "claude-3-haiku-20240307",
+                "content": [{"type": "text", "text": sql}], "stop_reason": "end_turn",
+                "usage": {"input_tokens": 1, "output_tokens": 1},
+            })
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    server = FakeProviders()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_address[1]
+    monkeypatch.setenv("OPENAI_API_KEY", "test-openai")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-anthropic")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{port}/v1")
+    monkeypatch.setenv("ANTHROPIC_BASE_URL", f"http://127.0.0.1:{port}")
+    monkeypatch.setenv("LLM_RETRY_BASE_MS", "10")
+    monkeypatch.setenv("LLM_RETRY_MAX_MS", "100")
+    monkeypatch.delenv("LLM_HEDGING", raising=False)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def ask():
+    return generate_sql(QueryRequest(query="list user names"), SCHEMA_INFO)
+
+
+class TestRetriesAndFailover:
+
+    def test_transient_errors_are_retried_on_the_same_provider(self, providers):
+        providers.faults['openai'].extend(["503", "429"])
+
+        assert ask() == "SELECT name FROM users -- openai"
+        assert providers.calls == {'openai': 3, 'anthropic': 0}
+        assert resilience_snapshot()['openai']['retries'] == 2
+
+    def test_connection_reset_is_retried(self, providers):
+        providers.faults['openai'].append("reset")
+
+        assert ask() == "SELECT name FROM users -- openai"
+        assert providers.calls['openai'] == 2
+
+    def test_fails_over_when_retries_are_exhausted(self, providers):
+        providers.faults['openai'].extend(["503"] * 3)
+
+        assert ask() == "SELECT name FROM users -- anthropic"
+        assert providers.calls == {'openai': 3, 'anthropic': 1}
+        assert resilience_snapshot()['openai']['failovers'] == 1
+
+    def test_timeout_fails_over(self, providers, monkeypatch):
+        monkeypatch.setenv("LLM_TIMEOUT_SECONDS", "0.2")
+        monkeypatch.setenv("LLM_RETRIES", "0")
+        providers.faults['openai'].append("slow")
+
+        assert ask() == "SELECT name FROM users -- anthropic"
+
+    def test_request_errors_are_not_retried(self, providers):
+        providers.faults['openai'].append("400")
+
+        assert ask() == "SELECT name FROM users -- anthropic"
+        assert providers.calls['openai'] == 1
+        assert get_circuit_breaker('openai').failures == 0
+
+
+class TestCircuitBreakerWithProviders:
+
+    def test_open_breaker_skips_the_provider_then_recovers(self, providers, monkeypatch):
+        monkeypatch.setenv("LLM_RETRIES", "0")
+        monkeypatch.setenv("LLM_BREAKER_FAILURES", "2")
+        monkeypatch.setenv("LLM_BREAKER_RESET_SECONDS", "0.2")
+        providers.faults['openai'].extend(["503", "503"])
+
+        ask()
+        ask()
+        assert get_circuit_breaker('openai').state == "open"
+
+        # While open, OpenAI is not called at all
+        assert ask() == "SELECT name FROM users -- anthropic"
+        assert providers.calls['openai'] == 2
+
+        # After the reset timeout one trial call goes through and closes the breaker
+        time.sleep(0.25)
+        assert ask() == "SELECT name FROM users -- openai"
+        assert get_circuit_breaker('openai').state == "closed"
+        assert 'nlsql_llm_circuit_opened_total{provider="openai"} 1' in render_metrics()
+
+    def test_all_breakers_open_fails_fast(self, providers, monkeypatch):
+        monkeypatch.setenv("LLM_RETRIES", "0")
+        monkeypatch.setenv("LLM_BREAKER_FAILURES", "1")
+        providers.faults['openai'].append("503")
+        providers.faults['anthropic'].append("503")
+
+        with pytest.raises(Exception):
+            ask()
+        with pytest.raises(CircuitOpenError) as exc_info:
+            ask()
+        assert exc_info.value.retry_after > 0
+        assert providers.calls == {'openai': 1, 'anthropic': 1}
+
+
+class TestCircuitBreaker:
+
+    def test_half_open_allows_a_single_trial(self):
+        breaker = CircuitBreaker("openai", failure_threshold=1, reset_seconds=0)
+        breaker.record_failure(ConnectionError())
+
+        breaker.before_call()
+        assert breaker.state == "half_open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record_failure(ConnectionError())
+        assert breaker.state == "open"
+
+    def test_transient_classification_follows_wrapped_cause(self):
+        try:
+            try:
+                raise ConnectionResetError("reset by peer")
+            except Exception as e:
+                raise Exception(f"Error generating SQL with OpenAI: {str(e)}")
+        except Exception as wrapped:
+            assert is_transient(wrapped)
+        assert not is_transient(ValueError("OPENAI_API_KEY environment variable not set"))
+
+    def test_backoff_is_jittered_and_capped(self, monkeypatch):
+        monkeypatch.setenv("LLM_RETRY_BASE_MS", "100")
+        monkeypatch.setenv("LLM_RETRY_MAX_MS", "300")
+
+        delays = [backoff_delay(5) for _ in range(50)]
+
+        assert all(0 <= delay <= 0.3 for delay in delays)
+        assert len(set(delays)) > 1
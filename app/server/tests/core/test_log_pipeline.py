@@ -0,0 +1,140 @@
+import io
+import json
+import logging
+import os
+import queue
+import sys
+import pytest
+from unittest.mock import patch
+from core.log_pipeline import (
+    CallSiteSampler,
+    JsonFormatter,
+    LazyQueueHandler,
+    TextFormatter,
+    configure_logging,
+    shutdown_logging
+)
+
+
+def make_record(msg="hello %s", args=("world",), level=logging.INFO, lineno=10, exc_info=None, **extra):
+    record = logging.LogRecord("server", level, "/app/server.py", lineno, msg, args, exc_info)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def root_logger():
+    """Restore the root logger after configure_logging replaced its handlers"""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    shutdown_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+class TestFormatters:
+
+    def test_json_record_with_extra_fields(self):
+        line = JsonFormatter().format(make_record(sql="SELECT 1", rows=3))
+
+        entry = json.loads(line)
+        assert entry['message'] == "hello world"
+        assert entry['level'] == "INFO"
+        assert entry['logger'] == "server"
+        assert entry['sql'] == "SELECT 1"
+        assert entry['rows'] == 3
+
+    def test_fields_are_bounded(self):
+        formatter = JsonFormatter(max_field_chars=10)
+
+        entry = json.loads(formatter.format(make_record(msg="x" * 50, args=(), sql="y" * 50)))
+
+        assert entry['message'] == "x" * 10 + "...[40 more chars]"
+        assert entry['sql'] == "y" * 10 + "...[40 more chars]"
+
+    def test_traceback_keeps_the_end(self):
+        try:
+            raise ValueError("the actual error")
+        except ValueError:
+            record = make_record(level=logging.ERROR, exc_info=sys.exc_info())
+
+        entry = json.loads(JsonFormatter(max_traceback_chars=40).format(record))
+
+        assert entry['exc'].startswith("[")
+        assert entry['exc'].endswith("ValueError: the actual error")
+
+    def test_text_format_reports_sampled_out(self):
+        text = TextFormatter().format(make_record(sampled_out=7))
+
+        assert text == "hello world (7 similar messages sampled out)"
+
+
+class TestCallSiteSampler:
+
+    @patch('core.log_pipeline.time.monotonic', return_value=100.0)
+    def test_drops_beyond_rate_per_call_site(self, mock_monotonic):
+        sampler = CallSiteSampler(per_second=2)
+
+        kept = [sampler.filter(make_record()) for _ in range(5)]
+        other_site = sampler.filter(make_record(lineno=20))
+
+        assert kept == [True, True, False, False, False]
+        assert other_site is True
+        assert sampler.dropped_total == 3
+
+    @patch('core.log_pipeline.time.monotonic')
+    def test_next_emitted_record_reports_dropped_count(self, mock_monotonic):
+        sampler = CallSiteSampler(per_second=1)
+        mock_monotonic.return_value = 100.0
+        sampler.filter(make_record())
+        sampler.filter(make_record())
+        sampler.filter(make_record())
+
+        mock_monotonic.return_value = 101.0
+        record = make_record()
+
+        assert sampler.filter(record) is True
+        assert record.sampled_out == 2
+
+    @patch('core.log_pipeline.time.monotonic', return_value=100.0)
+    def test_warnings_and_errors_are_never_sampled(self, mock_monotonic):
+        sampler = CallSiteSampler(per_second=1)
+
+        assert all(sampler.filter(make_record(level=logging.ERROR)) for _ in range(5))
+
+
+class TestQueueHandler:
+
+    def test_formatting_is_deferred(self):
+        log_queue = queue.Queue()
+        handler = LazyQueueHandler(log_queue)
+
+        handler.handle(make_record())
+
+        record = log_queue.get_nowait()
+        assert record.msg == "hello %s"
+        assert record.args == ("world",)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = LazyQueueHandler(queue.Queue(maxsize=1))
+
+        handler.handle(make_record())
+        handler.handle(make_record())
+
+        assert handler.dropped == 1
+
+    @patch.dict(os.environ, {'LOG_SAMPLE_PER_SECOND': '0'})
+    def test_pipeline_writes_json_lines(self, root_logger):
+        stream = io.StringIO()
+        configure_logging(stream)
+
+        logging.getLogger("server").info("[SUCCESS] Query processed: rows=%d", 5, extra={'sql': "SELECT 1"})
+        shutdown_logging()
+
+        entry = json.loads(stream.getvalue().splitlines()[0])
+        assert entry['message'] == "[SUCCESS] Query processed: rows=5"
+        assert entry['sql'] == "SELECT 1"
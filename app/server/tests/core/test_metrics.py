@@ -0,0 +1,17 @@
+from core.metrics import LatencyHistogram
+
+
+class TestLatencyHistogram:
+
+    def test_percentile_uses_bucket_upper_bound(self):
+        histogram = LatencyHistogram([100, 200, 500])
+        for latency in [50] * 90 + [150] * 5 + [400] * 5:
+            histogram.record(latency)
+
+        assert histogram.count == 100
+        assert histogram.percentile(50) == 100
+        assert histogram.percentile(95) == 200
+        assert histogram.percentile(99) == 500
+
+    def test_empty_histogram_has_no_percentile(self):
+        assert LatencyHistogram([100, 200, 500]).percentile(95) is None
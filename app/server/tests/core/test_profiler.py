@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core import profiler
+from core.profiler import ProfilingMiddleware, SamplingProfiler, list_profiles, start_window_profile
+
+
+def busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def profile_dir(tmp_path):
+    with patch.object(profiler, 'PROFILE_DIR', str(tmp_path / "profiles")):
+        yield tmp_path / "profiles"
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.get("/work")
+    def work():
+        end = time.perf_counter() + 0.05
+        while time.perf_counter() < end:
+            sum(range(1000))
+        return {"ok": True}
+
+    return app
+
+
+class TestSamplingProfiler:
+
+    def test_samples_busy_thread(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,))
+        worker.start()
+        sampler = SamplingProfiler(interval_ms=1)
+
+        sampler.start()
+        time.sleep(0.1)
+        sampler.stop()
+        stop.set()
+        worker.join()
+
+        assert sampler.samples > 0
+        assert any(stack.endswith("test_profiler.py:busy_loop") for stack in sampler.stacks)
+        line = sampler.folded().splitlines()[0]
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) >= 1 and ";" in stack
+
+    def test_idle_threads_are_not_stacks(self):
+        stop = threading.Event()
+        waiter = threading.Thread(target=stop.wait)
+        waiter.start()
+        sampler = SamplingProfiler(interval_ms=1)
+
+        sampler.start()
+        time.sleep(0.05)
+        sampler.stop()
+        stop.set()
+        waiter.join()
+
+        assert sampler.idle_samples > 0
+        assert not any("Event.wait" in stack.rsplit(";", 1)[-1] for stack in sampler.stacks)
+
+    def test_summary_attributes_samples_to_innermost_core_module(self):
+        sampler = SamplingProfiler()
+        sampler.stacks.update({
+            "server.py:upload;core/tracing.py:TracingMiddleware.__call__;core/file_processor.py:convert_csv_to_sqlite;pandas/io/sql.py:to_sql": 3,
+            "server.py:query;core/llm_processor.py:generate_sql": 1,
+        })
+
+        summary = sampler.summary()
+
+        assert summary['core_modules'] == {'file_processor': 0.75, 'llm_processor': 0.25}
+        assert summary['top_functions'][0] == {'function': "pandas/io/sql.py:to_sql", 'self_samples': 3, 'share': 0.75}
+
+
+class TestProfilingMiddleware:
+
+    def test_header_ignored_when_disabled(self, profile_dir):
+        client = TestClient(make_app())
+
+        response = client.get("/work", headers={"X-Profile": "1"})
+
+        assert 'x-profile-id' not in response.headers
+        assert not profile_dir.exists()
+
+    @patch.dict(os.environ, {'PROFILING': '1', 'PROFILE_INTERVAL_MS': '1'})
+    def test_profiles_request_with_header(self, profile_dir):
+        client = TestClient(make_app())
+
+        response = client.get("/work", headers={"X-Profile": "1"})
+
+        profile_id = response.headers['x-profile-id']
+        assert response.json() == {"ok": True}
+        assert (profile_dir / f"{profile_id}.folded").read_text()
+        summary = json.loads((profile_dir / f"{profile_id}.json").read_text())
+        assert summary['trigger'] == "request"
+        assert summary['endpoint'] == "/work"
+        assert list_profiles()[0]['profile_id'] == profile_id
+
+    @patch.dict(os.environ, {'PROFILING': '1'})
+    def test_requests_without_header_are_not_profiled(self, profile_dir):
+        client = TestClient(make_app())
+
+        response = client.get("/work")
+
+        assert 'x-profile-id' not in response.headers
+        assert list_profiles() == []
+
+
+class TestWindowProfile:
+
+    def test_window_writes_profile(self, profile_dir):
+        profile_id = start_window_profile(0.05, interval_ms=1)
+
+        deadline = time.time() + 5
+        # The lock is released once the artifacts are written
+        while profiler._active_lock.locked() and time.time() < deadline:
+            time.sleep(0.01)
+        summary = json.loads((profile_dir / f"{profile_id}.json").read_text())
+        assert summary['trigger'] == "window"
+        assert summary['window_s'] == 0.05
+
+    def test_only_one_profile_at_a_time(self, profile_dir):
+        with patch.object(profiler, '_active_lock', threading.Lock()) as lock:
+            lock.acquire()
+
+            assert start_window_profile(0.05) is None
@@ -0,0 +1,111 @@
+import itertools
+import threading
+from unittest.mock import patch
+from core import query_pool
+from core.query_pool import RandomQueryPool, get_random_query
+from core.tenancy import DEFAULT_TENANT
+
+SCHEMA_INFO = {'tables': {'users': {'columns': {'id': 'INTEGER', 'name': 'TEXT'}, 'row_count': 3}}}
+OTHER_SCHEMA = {'tables': {'orders': {'columns': {'id': 'INTEGER'}, 'row_count': 1}}}
+
+
+def counting_generator():
+    counter = itertools.count()
+    return lambda schema_info: f"{next(iter(schema_info['tables']))} question {next(counter)}"
+
+
+class TestRandomQueryPool:
+
+    def test_refills_to_size_in_background(self):
+        pool = RandomQueryPool(counting_generator(), size=5, low_watermark=2)
+
+        assert pool.take(SCHEMA_INFO) is None
+        pool.wait_idle(timeout=5)
+
+        assert pool.stats()['available'] == 5
+        assert pool.take(SCHEMA_INFO) == "users question 0"
+        assert pool.stats()['hits'] == 1
+
+    def test_refill_triggered_below_watermark(self):
+        generator = counting_generator()
+        pool = RandomQueryPool(generator, size=4, low_watermark=2)
+        pool.warm(SCHEMA_INFO)
+        pool.wait_idle(timeout=5)
+
+        pool.take(SCHEMA_INFO)
+        pool.take(SCHEMA_INFO)
+        pool.take(SCHEMA_INFO)
+        pool.wait_idle(timeout=5)
+
+        assert pool.stats()['available'] == 4
+
+    def test_schema_change_drops_suggestions(self):
+        pool = RandomQueryPool(counting_generator(), size=3, low_watermark=1)
+        pool.warm(SCHEMA_INFO)
+        pool.wait_idle(timeout=5)
+
+        assert pool.take(OTHER_SCHEMA) is None
+        pool.wait_idle(timeout=5)
+        assert pool.take(OTHER_SCHEMA).startswith("orders question")
+
+    def test_refill_for_stale_schema_is_discarded(self):
+        release = threading.Event()
+
+        def slow_generator(schema_info):
+            release.wait(5)
+            return "stale question"
+
+        pool = RandomQueryPool(slow_generator, size=3, low_watermark=1)
+        pool.warm(SCHEMA_INFO)
+        pool.invalidate()
+        release.set()
+        pool.wait_idle(timeout=5)
+
+        assert pool.stats()['available'] == 0
+
+    def test_failing_generator_stops_refill(self):
+        calls = []
+
+        def failing_generator(schema_info):
+            calls.append(1)
+            raise Exception("rate limited")
+
+        pool = RandomQueryPool(failing_generator, size=3, low_watermark=1)
+        pool.warm(SCHEMA_INFO)
+        pool.wait_idle(timeout=5)
+
+        assert len(calls) == query_pool.MAX_REFILL_FAILURES
+        assert pool.stats()['available'] == 0
+
+
+    def test_repeated_or_empty_suggestions_stop_refill(self):
+        answers = iter(["same question", "same question", "", "same question", "never reached"])
+        calls = []
+
+        def repeating_generator(schema_info):
+            calls.append(1)
+            return next(answers)
+
+        pool = RandomQueryPool(repeating_generator, size=3, low_watermark=1)
+        pool.warm(SCHEMA_INFO)
+        pool.wait_idle(timeout=5)
+
+        assert len(calls) == 1 + query_pool.MAX_REFILL_FAILURES
+        assert pool.stats()['available'] == 1
+
+class TestGetRandomQuery:
+
+    @patch('core.query_pool.generate_random_query', return_value="direct question")
+    def test_falls_back_to_direct_generation_when_empty(self, mock_generate):
+        pool = RandomQueryPool(counting_generator(), size=2, low_watermark=1)
+        with patch.dict(query_pool._pools, {DEFAULT_TENANT: pool}):
+            assert get_random_query(SCHEMA_INFO) == "direct question"
+            query_pool.get_random_query_pool().wait_idle(timeout=5)
+            assert get_random_query(SCHEMA_INFO) == "users question 0"
+
+        mock_generate.assert_called_once_with(SCHEMA_INFO)
+
+    @patch('core.query_pool.generate_random_query', return_value="Upload data to start exploring")
+    def test_empty_schema_is_not_pooled(self, mock_generate):
+        assert get_random_query({'tables': {}}) == "Upload data to start exploring"
+        assert query_pool.get_random_query_pool().stats()['misses'] == 0
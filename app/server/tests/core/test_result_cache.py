@@ -0,0 +1,144 @@
+import sqlite3
+import pytest
+from unittest.mock import patch
+from core.result_cache import (
+    ResultCache,
+    get_result_cache,
+    invalidate_table,
+    is_cacheable,
+    normalize_sql
+)
+from core.connection_pool import get_statement_registry
+from core.sql_processor import execute_sql_safely, stream_sql_rows
+
+
+def executions(sql):
+    """Times SQLite actually ran this statement"""
+    return get_statement_registry().statements.get(sql, [0, 0])[0]
+
+
+@pytest.fixture
+def cached_db(tmp_path):
+    """File database; every execute_sql_safely call opens a fresh connection to it"""
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE users (id INTEGER, name TEXT)")
+    conn.execute("CREATE TABLE orders (id INTEGER, user_id INTEGER)")
+    conn.execute("INSERT INTO users VALUES (1, 'Ann'), (2, 'Bob')")
+    conn.execute("INSERT INTO orders VALUES (1, 1)")
+    conn.commit()
+    conn.close()
+
+    real_connect = sqlite3.connect
+    with patch('core.sql_processor.sqlite3.connect') as mock_connect:
+        mock_connect.side_effect = lambda *args, **kwargs: real_connect(db_path)
+        yield db_path
+
+
+class TestResultCache:
+
+    def test_normalize_sql(self):
+        assert normalize_sql("SELECT  *\n FROM users ;") == "SELECT * FROM users"
+        assert normalize_sql("SELECT 'a  b' FROM t") == "SELECT 'a  b' FROM t"
+
+    def test_is_cacheable(self):
+        assert is_cacheable("SELECT * FROM users")
+        assert not is_cacheable("SELECT * FROM users ORDER BY RANDOM()")
+        assert not is_cacheable("SELECT * FROM events WHERE day = date('now')")
+
+    def test_repeat_query_skips_sqlite(self, cached_db):
+        first = execute_sql_safely("SELECT * FROM users")
+        second = execute_sql_safely("SELECT *   FROM users;")
+
+        assert first == second
+        assert executions("SELECT * FROM users") == 1
+        assert get_result_cache().stats()['hits'] == 1
+
+    def test_callers_cannot_mutate_cached_results(self, cached_db):
+        first = execute_sql_safely("SELECT * FROM users")
+        first['results'].append({'id': 3, 'name': 'Eve'})
+        first['columns'].append('extra')
+
+        second = execute_sql_safely("SELECT * FROM users")
+        second['results'][0]['name'] = 'Changed'
+
+        third = execute_sql_safely("SELECT * FROM users")
+        assert third['results'] == [{'id': 1, 'name': 'Ann'}, {'id': 2, 'name': 'Bob'}]
+        assert third['columns'] == ['id', 'name']
+        assert executions("SELECT * FROM users") == 1
+
+    def test_table_change_invalidates_only_dependent_queries(self, cached_db):
+        join = "SELECT u.name FROM users u JOIN orders o ON o.user_id = u.id"
+
+        execute_sql_safely(join)
+        execute_sql_safely("SELECT * FROM users")
+        invalidate_table('orders')
+        execute_sql_safely(join)
+        execute_sql_safely("SELECT * FROM users")
+
+        # The join was re-executed, the users-only query was served from cache
+        assert executions(join) == 2
+        assert executions("SELECT * FROM users") == 1
+
+    def test_tables_known_when_statement_is_already_prepared(self, cached_db):
+        sql = "SELECT name FROM users WHERE id IN (SELECT user_id FROM orders)"
+
+        execute_sql_safely(sql)
+        invalidate_table('orders')
+        # Re-executed from the pooled connection's statement cache, without recompiling
+        execute_sql_safely(sql)
+        invalidate_table('orders')
+        execute_sql_safely(sql)
+
+        assert executions(sql) == 3
+        assert get_statement_registry().statements[sql][1] == 1
+
+    def test_streamed_rows_share_the_cache(self, cached_db):
+        streamed = list(stream_sql_rows("SELECT * FROM users", batch_size=1))
+        result = execute_sql_safely("SELECT * FROM users")
+        again = list(stream_sql_rows("SELECT * FROM users", batch_size=1))
+
+        assert streamed == again
+        assert [row for _, rows in again for row in rows] == result['results']
+        assert executions("SELECT * FROM users") == 1
+        assert get_result_cache().stats()['hits'] == 2
+
+    def test_stream_stopped_early_is_not_cached(self, cached_db):
+        rows = stream_sql_rows("SELECT * FROM users", batch_size=1)
+        next(rows)
+        rows.close()
+        list(stream_sql_rows("SELECT * FROM users", use_cache=False))
+
+        assert get_result_cache().stats()['entries'] == 0
+        assert executions("SELECT * FROM users") == 2
+
+    def test_bypass_and_errors_are_not_cached(self, cached_db):
+        execute_sql_safely("SELECT * FROM users", use_cache=False)
+        execute_sql_safely("SELECT * FROM users", use_cache=False)
+        first = execute_sql_safely("SELECT * FROM missing")
+        second = execute_sql_safely("SELECT * FROM missing")
+
+        assert executions("SELECT * FROM users") == 2
+        assert first['error'] and second['error']
+        assert get_result_cache().stats()['entries'] == 0
+
+    def test_lru_eviction_within_memory_budget(self):
+        cache = ResultCache(max_bytes=3000)
+        result = {'results': [{'id': i} for i in range(5)], 'columns': ['id'], 'error': None}
+
+        for i in range(10):
+            cache.put(f"SELECT {i}", result, {'t'}, {})
+            cache.get("SELECT 0")
+
+        stats = cache.stats()
+        assert stats['bytes'] <= 3000
+        assert stats['evictions'] > 0
+        assert cache.get("SELECT 0") is not None
+        assert cache.get("SELECT 1") is None
+
+    def test_oversized_result_is_not_cached(self):
+        cache = ResultCache(max_bytes=100)
+        result = {'results': [{'id': i} for i in range(100)], 'columns': ['id'], 'error': None}
+
+        assert cache.put("SELECT id FROM t", result, {'t'}, {}) is False
+        assert cache.get("SELECT id FROM t") is None
@@ -0,0 +1,138 @@
+import sqlite3
+import pytest
+from unittest.mock import patch
+from core import schema_index
+from core.schema_index import SchemaIndex, get_indexed_schema, index_table, remove_table_from_index
+from core.schema_selector import get_catalog, question_terms, schema_fingerprint, select_schema_for_prompt
+
+
+@pytest.fixture
+def index_paths(tmp_path):
+    """Point the index at a temporary database and index file"""
+    db_path = str(tmp_path / "test.db")
+    index_path = str(tmp_path / "schema_index.json")
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE customers (id INTEGER, name TEXT, country TEXT)")
+    conn.execute("INSERT INTO customers VALUES (1, 'Ann', 'Japan'), (2, 'Bob', 'Germany')")
+    conn.execute("CREATE TABLE orders (id INTEGER, customer_id INTEGER, revenue REAL)")
+    conn.execute("INSERT INTO orders VALUES (1, 1, 9.5)")
+    conn.commit()
+    conn.close()
+
+    with patch.object(schema_index, 'DATABASE_PATH', db_path), \
+            patch.object(schema_index, 'SCHEMA_INDEX_PATH', index_path):
+        schema_index.reset_schema_index()
+        yield db_path, index_path
+    schema_index.reset_schema_index()
+
+
+class TestSchemaIndex:
+
+    def test_search_ranks_by_bm25(self):
+        index = SchemaIndex(path=None)
+        index.update_table('customers', {
+            'columns': {'id': 'INTEGER', 'name': 'TEXT', 'country': 'TEXT'},
+            'row_count': 2,
+            'sample_values': {'country': ['Japan']},
+        })
+        index.update_table('orders', {
+            'columns': {'id': 'INTEGER', 'customer_id': 'INTEGER', 'revenue': 'REAL'},
+            'row_count': 1,
+        })
+        index.update_table('audit_log', {'columns': {'message': 'TEXT'}, 'row_count': 0})
+
+        ranked = index.search(question_terms("total revenue per customer"))
+        assert [name for name, _ in ranked][:2] == ['orders', 'customers']
+        assert ranked[-1] == ('audit_log', 0.0)
+
+        assert index.search(question_terms("people living in Japan"))[0][0] == 'customers'
+
+    def test_remove_and_rank_coverage(self):
+        index = SchemaIndex(path=None)
+        index.update_table('orders', {'columns': {'revenue': 'REAL'}, 'row_count': 1})
+        version = index.version
+
+        assert index.remove_table('orders')
+        assert not index.remove_table('orders')
+        assert index.version == version + 1
+        assert index.postings == {}
+        assert index.rank({'revenue'}, ['orders']) is None
+
+    def test_catalog_is_keyed_by_index_version_without_hashing(self):
+        index = SchemaIndex(path=None)
+        index.update_table('orders', {'columns': {'revenue': 'REAL'}, 'row_count': 1})
+        schema = index.schema()
+
+        with patch('core.schema_selector.json.dumps') as mock_dumps:
+            assert index.schema() is schema
+            assert get_catalog(index.schema()) is get_catalog(schema)
+            mock_dumps.assert_not_called()
+
+        index.update_table('orders', {'columns': {'revenue': 'REAL', 'discount': 'REAL'}, 'row_count': 1})
+        assert schema_fingerprint(index.schema()) != schema_fingerprint(schema)
+        assert schema_fingerprint(SchemaIndex(path=None).schema()) != schema_fingerprint(SchemaIndex(path=None).schema())
+
+    def test_persisted_round_trip(self, index_paths):
+        _, index_path = index_paths
+
+        index_table('customers')
+        index_table('orders')
+        loaded = SchemaIndex.load(index_path)
+
+        assert set(loaded.tables) == {'customers', 'orders'}
+        assert loaded.tables['customers']['sample_values'] == {'name': ['Ann', 'Bob'], 'country': ['Japan', 'Germany']}
+        assert loaded.search({'revenue'})[0][0] == 'orders'
+
+        remove_table_from_index('orders')
+        assert set(SchemaIndex.load(index_path).tables) == {'customers'}
+
+    def test_get_indexed_schema_syncs_with_database(self, index_paths):
+        db_path, _ = index_paths
+
+        schema = get_indexed_schema()
+        assert set(schema['tables']) == {'customers', 'orders'}
+        assert schema['tables']['orders']['row_count'] == 1
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("DROP TABLE orders")
+        conn.execute("CREATE TABLE products (id INTEGER, price REAL)")
+        conn.commit()
+        conn.close()
+
+        assert set(get_indexed_schema()['tables']) == {'customers', 'products'}
+
+    def test_sync_redescribes_only_tables_whose_definition_changed(self, index_paths):
+        db_path, index_path = index_paths
+        get_indexed_schema()
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("ALTER TABLE orders ADD COLUMN status TEXT")
+        conn.commit()
+        conn.close()
+
+        with patch.object(schema_index, 'describe_table', wraps=schema_index.describe_table) as describe:
+            schema = get_indexed_schema()
+            assert [call.args[1] for call in describe.call_args_list] == ['orders']
+            assert 'status' in schema['tables']['orders']['columns']
+
+            describe.reset_mock()
+            get_indexed_schema()
+            describe.assert_not_called()
+
+        assert 'status' in SchemaIndex.load(index_path).signatures['orders']
+
+    def test_used_as_ranker_for_prompt_selection(self):
+        index = SchemaIndex(path=None)
+        schema_info = {'tables': {}}
+        for i in range(20):
+            schema_info['tables'][f"log_{i}"] = {'columns': {'message': 'TEXT'}, 'row_count': 0}
+        schema_info['tables']['invoices'] = {'columns': {'amount_due': 'REAL'}, 'row_count': 3}
+        for table_name, table_info in schema_info['tables'].items():
+            index.update_table(table_name, table_info)
+
+        result = select_schema_for_prompt(
+            schema_info, "unpaid amount due", token_budget=50, top_k=1, ranker=index.rank
+        )
+
+        assert result.startswith("Table: invoices")
@@ -0,0 +1,89 @@
+import copy
+import pytest
+from core.schema_selector import (
+    question_terms,
+    render_table,
+    schema_fingerprint,
+    select_schema_for_prompt,
+    get_catalog,
+)
+
+
+@pytest.fixture
+def large_schema():
+    """A catalog too big for a small prompt budget"""
+    tables = {}
+    for i in range(30):
+        tables[f"audit_log_{i}"] = {
+            'columns': {'id': 'INTEGER', 'message': 'TEXT', 'level': 'TEXT'},
+            'row_count': 10,
+        }
+    tables['customers'] = {
+        'columns': {'id': 'INTEGER', 'name': 'TEXT', 'country': 'TEXT'},
+        'row_count': 100,
+        'sample_values': {'country': ['Germany', 'Japan']},
+    }
+    tables['orders'] = {
+        'columns': {'id': 'INTEGER', 'customer_id': 'INTEGER', 'total_revenue': 'REAL'},
+        'row_count': 1000,
+    }
+    tables['events'] = {
+        'columns': {f"payload_field_{i}": 'TEXT' for i in range(200)},
+        'row_count': 5,
+    }
+    tables['events']['columns']['user_id'] = 'INTEGER'
+    tables['events']['columns']['device_browser'] = 'TEXT'
+    return {'tables': tables}
+
+
+class TestSchemaSelector:
+
+    def test_question_terms_drop_stopwords_and_stem(self):
+        assert question_terms("Show me the top 5 customers by revenue") == {'5', 'customer', 'revenue'}
+
+    def test_small_schema_rendered_in_full(self):
+        schema_info = {'tables': {'users': {'columns': {'id': 'INTEGER'}, 'row_count': 3}}}
+
+        result = select_schema_for_prompt(schema_info, "count users")
+
+        assert result == render_table('users', schema_info['tables']['users'])
+
+    def test_selects_relevant_tables_under_budget(self, large_schema):
+        result = select_schema_for_prompt(large_schema, "top 5 customers by total revenue", token_budget=300)
+
+        assert "Table: customers" in result
+        assert "Table: orders" in result
+        assert "Table: audit_log_0" not in result
+        assert "other tables omitted" in result
+        assert len(result) < len(get_catalog(large_schema).full_text) / 10
+
+    def test_sample_values_drive_ranking(self, large_schema):
+        result = select_schema_for_prompt(large_schema, "who lives in Japan", token_budget=200, top_k=1)
+
+        assert "Table: customers" in result
+        assert "Table: orders" not in result
+
+    def test_wide_table_trimmed_to_relevant_columns(self, large_schema):
+        result = select_schema_for_prompt(
+            large_schema, "events grouped by device browser", token_budget=300, max_columns=5
+        )
+
+        assert "Table: events" in result
+        assert "  - user_id (INTEGER)" in result
+        assert "  - device_browser (TEXT)" in result
+        assert "more columns not shown" in result
+
+    def test_catalog_cached_per_schema_version(self, large_schema):
+        first = get_catalog(large_schema)
+        assert get_catalog(large_schema) is first
+
+        large_schema['tables']['orders']['row_count'] = 2000
+        assert get_catalog(large_schema) is not first
+
+    def test_fingerprint_tracks_schema_changes(self, large_schema):
+        equal = copy.deepcopy(large_schema)
+        equal['tables'] = dict(reversed(list(equal['tables'].items())))
+        assert schema_fingerprint(equal) == schema_fingerprint(large_schema)
+
+        equal['tables']['orders']['columns']['discount'] = 'REAL'
+        assert schema_fingerprint(equal) != schema_fingerprint(large_schema)
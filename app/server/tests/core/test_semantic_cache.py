@@ -0,0 +1,141 @@
+import os
+from unittest.mock import patch
+from core.data_models import QueryRequest
+from core.llm_processor import generate_sql, generate_sql_with_source, remember_sql
+from core.semantic_cache import (
+    SemanticCache,
+    get_semantic_cache,
+    question_key_terms,
+    schema_structure_fingerprint
+)
+from benchmarks.eval_semantic_cache import DEFAULT_PAIRS, evaluate
+
+SCHEMA_INFO = {
+    'tables': {
+        'customers': {'columns': {'id': 'INTEGER', 'name': 'TEXT', 'revenue': 'REAL'}, 'row_count': 10}
+    }
+}
+
+
+class TestSemanticCache:
+
+    def test_question_key_terms_fold_synonyms_and_filler(self):
+        assert question_key_terms("show me the 5 biggest customers by revenue") == ['5', 'top', 'customer', 'revenue']
+
+    def test_near_duplicate_question_hits(self):
+        cache = SemanticCache(threshold=0.85)
+        cache.store("top 5 customers by revenue", SCHEMA_INFO, "SELECT name FROM customers ORDER BY revenue DESC LIMIT 5")
+
+        match = cache.lookup("show me the 5 biggest customers by revenue", SCHEMA_INFO)
+
+        assert match is not None
+        assert match.sql.endswith("LIMIT 5")
+        assert match.similarity >= 0.85
+
+    def test_guard_terms_must_match(self):
+        cache = SemanticCache(threshold=0.5)
+        cache.store("top 5 customers by revenue", SCHEMA_INFO, "SELECT 1")
+
+        assert cache.lookup("top 10 customers by revenue", SCHEMA_INFO) is None
+        assert cache.lookup("bottom 5 customers by revenue", SCHEMA_INFO) is None
+
+    def test_literal_values_must_match(self):
+        schema = {'tables': {'orders': {'columns': {'id': 'INTEGER', 'state': 'TEXT', 'carrier': 'TEXT'}}}}
+        cache = SemanticCache(threshold=0.5)
+        cache.store("orders from california", schema, "SELECT * FROM orders WHERE state = 'CA'")
+        cache.store("orders shipped with dhl", schema, "SELECT * FROM orders WHERE carrier = 'DHL'")
+
+        assert cache.lookup("orders from texas", schema) is None
+        assert cache.lookup("orders shipped with ups", schema) is None
+        assert cache.lookup("show me the orders from California", schema) is not None
+
+    def test_swapped_subject_and_object_miss(self):
+        schema = {'tables': {
+            'orders': {'columns': {'id': 'INTEGER', 'customer_id': 'INTEGER'}},
+            'customers': {'columns': {'id': 'INTEGER', 'name': 'TEXT'}},
+        }}
+        cache = SemanticCache(threshold=0.5)
+        cache.store("number of orders per customer", schema, "SELECT customer_id, COUNT(*) FROM orders GROUP BY customer_id")
+
+        assert cache.lookup("number of customers per order", schema) is None
+        assert cache.lookup("how many orders per customer", schema) is not None
+
+    def test_schema_structure_scopes_entries(self):
+        cache = SemanticCache()
+        cache.store("top 5 customers by revenue", SCHEMA_INFO, "SELECT 1")
+
+        more_rows = {'tables': {'customers': dict(SCHEMA_INFO['tables']['customers'], row_count=99)}}
+        new_column = {'tables': {'customers': {'columns': {'id': 'INTEGER'}, 'row_count': 10}}}
+
+        assert schema_structure_fingerprint(more_rows) == schema_structure_fingerprint(SCHEMA_INFO)
+        assert cache.lookup("top 5 customers by revenue", more_rows) is not None
+        assert cache.lookup("top 5 customers by revenue", new_column) is None
+
+    def test_entries_are_scoped_by_tenant(self):
+        cache = SemanticCache()
+        cache.store("top 5 customers by revenue", SCHEMA_INFO, "SELECT 1", scope="sales")
+
+        assert cache.lookup("top 5 customers by revenue", SCHEMA_INFO, scope="hr") is None
+        assert cache.lookup("top 5 customers by revenue", SCHEMA_INFO, scope="sales") is not None
+
+    def test_entries_are_bounded(self):
+        cache = SemanticCache(max_entries=2)
+        for i in range(3):
+            cache.store(f"customers in region {i}", SCHEMA_INFO, f"SELECT {i}")
+
+        assert cache.stats()['entries'] == 2
+        assert cache.lookup("customers in region 0", SCHEMA_INFO) is None
+
+    def test_default_threshold_has_no_false_hits_on_eval_corpus(self):
+        assert evaluate(DEFAULT_PAIRS, 0.85)['false_hits'] == 0
+
+
+class TestGenerateSqlSemanticCache:
+
+    @patch('core.llm_processor.generate_sql_with_openai')
+    def test_near_duplicate_skips_llm_call(self, mock_openai_func):
+        mock_openai_func.return_value = "SELECT name FROM customers ORDER BY revenue DESC LIMIT 5"
+
+        with patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key', 'SEMANTIC_CACHE': '1'}, clear=True):
+            request = QueryRequest(query="top 5 customers by revenue")
+            first, source = generate_sql_with_source(request, SCHEMA_INFO)
+            remember_sql(request, SCHEMA_INFO, first, source)
+            second = generate_sql(QueryRequest(query="show me the 5 biggest customers by revenue"), SCHEMA_INFO)
+
+        assert first == second
+        mock_openai_func.assert_called_once()
+        assert get_semantic_cache().stats()['hits'] == 1
+
+    @patch('core.llm_processor.generate_sql_with_openai')
+    def test_sql_is_not_cached_until_remembered(self, mock_openai_func):
+        mock_openai_func.return_value = "SELECT missing FROM customers"
+
+        with patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key', 'SEMANTIC_CACHE': '1'}, clear=True):
+            generate_sql(QueryRequest(query="count customers"), SCHEMA_INFO)
+            generate_sql(QueryRequest(query="count customers"), SCHEMA_INFO)
+
+        assert mock_openai_func.call_count == 2
+        assert get_semantic_cache().stats()['entries'] == 0
+
+    @patch('core.llm_processor.generate_sql_with_openai')
+    def test_bypass_and_disabled_cache_call_llm(self, mock_openai_func):
+        mock_openai_func.return_value = "SELECT 1"
+        request = QueryRequest(query="count customers")
+
+        with patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key', 'SEMANTIC_CACHE': '1'}, clear=True):
+            remember_sql(request, SCHEMA_INFO, *generate_sql_with_source(request, SCHEMA_INFO))
+            generate_sql(QueryRequest(query="count customers", bypass_cache=True), SCHEMA_INFO)
+        with patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key', 'SEMANTIC_CACHE': '0'}, clear=True):
+            generate_sql(request, SCHEMA_INFO)
+        with patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'}, clear=True):
+            generate_sql(request, SCHEMA_INFO)
+
+        assert mock_openai_func.call_count == 4
+
+    def test_rejected_and_rule_based_sql_is_not_cached(self, monkeypatch):
+        monkeypatch.setenv("SEMANTIC_CACHE", "1")
+        request = QueryRequest(query="remove customers")
+        remember_sql(request, SCHEMA_INFO, "DROP TABLE customers", "small")
+        remember_sql(request, SCHEMA_INFO, "SELECT COUNT(*) AS count FROM [customers]", "rules")
+
+        assert get_semantic_cache().stats()['entries'] == 0
@@ -0,0 +1,210 @@
+import multiprocessing
+import sqlite3
+import pytest
+from unittest.mock import patch
+from core import schema_index
+from core.result_cache import get_result_cache, reset_result_cache
+from core.schema_index import SchemaIndex, get_schema_index, reset_schema_index
+from core.semantic_cache import get_semantic_cache, reset_semantic_cache
+from core.shared_cache import (
+    SharedResultCache,
+    SharedSemanticCache,
+    SharedStore,
+    reset_shared_store
+)
+
+SCHEMA_INFO = {
+    'tables': {
+        'customers': {'columns': {'id': 'INTEGER', 'name': 'TEXT', 'revenue': 'REAL'}, 'row_count': 10}
+    }
+}
+
+RESULT = {'results': [{'id': 1, 'name': 'Ann'}], 'columns': ['id', 'name'], 'error': None}
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "shared_cache.db")
+
+
+@pytest.fixture
+def shared_env(monkeypatch, store_path):
+    monkeypatch.setenv("SHARED_CACHE", "1")
+    monkeypatch.setenv("SHARED_CACHE_PATH", store_path)
+    reset_result_cache()
+    reset_semantic_cache()
+    reset_shared_store()
+    yield
+    reset_result_cache()
+    reset_semantic_cache()
+    reset_shared_store()
+
+
+def _other_worker_bumps(store_path, queue):
+    """Runs in a separate process, like another uvicorn worker"""
+    cache = SharedResultCache(SharedStore(store_path), 1024 * 1024)
+    queue.put(cache.get("SELECT * FROM users", scope="default") is not None)
+    cache.bump_table_version("users", "default")
+    cache.shared.close()
+
+
+class TestSharedResultCache:
+
+    def test_singleton_is_shared_when_enabled(self, shared_env):
+        assert isinstance(get_result_cache(), SharedResultCache)
+        assert isinstance(get_semantic_cache(), SharedSemanticCache)
+
+    def test_entry_is_visible_to_another_store(self, store_path):
+        first = SharedResultCache(SharedStore(store_path), 1024 * 1024)
+        second = SharedResultCache(SharedStore(store_path), 1024 * 1024)
+
+        first.put("SELECT *  FROM users;", RESULT, {'users'}, first.table_version_snapshot("default"), scope="default")
+
+        assert second.get("SELECT * FROM users", scope="default") == RESULT
+        assert second.get("SELECT * FROM users", scope="other") is None
+
+    def test_table_version_bump_invalidates_for_every_store(self, store_path):
+        first = SharedResultCache(SharedStore(store_path), 1024 * 1024)
+        second = SharedResultCache(SharedStore(store_path), 1024 * 1024)
+        first.put("SELECT * FROM users", RESULT, {'users'}, first.table_version_snapshot("default"), scope="default")
+
+        second.bump_table_version("users", "default")
+
+        assert first.get("SELECT * FROM users", scope="default") is None
+        assert first.stats()['entries'] == 0
+
+    def test_invalidation_across_processes(self, store_path):
+        cache = SharedResultCache(SharedStore(store_path), 1024 * 1024)
+        cache.put("SELECT * FROM users", RESULT, {'users'}, cache.table_version_snapshot("default"), scope="default")
+
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        process = context.Process(target=_other_worker_bumps, args=(store_path, queue))
+        process.start()
+        process.join(30)
+
+        assert queue.get(timeout=5) is True
+        assert cache.get("SELECT * FROM users", scope="default") is None
+
+    def test_evicts_least_recently_used_beyond_budget(self, store_path):
+        cache = SharedResultCache(SharedStore(store_path), 200)
+        for i in range(5):
+            cache.put(f"SELECT {i}", RESULT, set(), {}, scope="default")
+
+        stats = cache.stats()
+        assert stats['bytes'] <= 200
+        assert stats['evictions'] > 0
+        assert cache.get("SELECT 4", scope="default") == RESULT
+        assert cache.get("SELECT 0", scope="default") is None
+
+    def test_blob_results_are_not_cached(self, store_path):
+        cache = SharedResultCache(SharedStore(store_path), 1024 * 1024)
+        blob = {'results': [{'data': b'\x00\x01'}], 'columns': ['data'], 'error': None}
+
+        assert cache.put("SELECT data FROM files", blob, {'files'}, {}, scope="default") is False
+
+
+    def test_locked_file_skips_the_store(self, store_path):
+        cache = SharedResultCache(SharedStore(store_path), 1024 * 1024)
+        cache.shared.connection().execute("PRAGMA busy_timeout = 0")
+        other = sqlite3.connect(store_path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            assert cache.put("SELECT 1", RESULT, {'users'}, {}, scope="default") is False
+        finally:
+            other.execute("ROLLBACK")
+            other.close()
+
+        assert cache.put("SELECT 1", RESULT, {'users'}, {}, scope="default") is True
+
+    def test_unavailable_file_is_a_miss(self, store_path):
+        cache = SharedResultCache(SharedStore(store_path), 1024 * 1024)
+        cache.put("SELECT 1", RESULT, {'users'}, {}, scope="default")
+
+        with patch.object(cache.shared, 'connection', side_effect=sqlite3.OperationalError("database is locked")):
+            assert cache.get("SELECT 1", scope="default") is None
+            versions = cache.table_version_snapshot("default")
+            assert versions is None
+            assert cache.put("SELECT 2", RESULT, {'users'}, versions, scope="default") is False
+
+        assert cache.misses == 1
+        assert cache.get("SELECT 1", scope="default") == RESULT
+
+    def test_stats_survive_an_unavailable_file(self, store_path):
+        cache = SharedResultCache(SharedStore(store_path), 1024 * 1024)
+        cache.put("SELECT 1", RESULT, {'users'}, {}, scope="default")
+        entries = cache.stats()['entries']
+
+        with patch.object(cache.shared, 'connection', side_effect=sqlite3.OperationalError("database is locked")):
+            assert cache.stats()['entries'] == entries == 1
+
+
+class TestSharedSemanticCache:
+
+    def test_question_stored_by_one_worker_hits_in_another(self, store_path):
+        first = SharedSemanticCache(SharedStore(store_path), 0.85)
+        second = SharedSemanticCache(SharedStore(store_path), 0.85)
+
+        first.store("top 5 customers by revenue", SCHEMA_INFO, "SELECT name FROM customers ORDER BY revenue DESC LIMIT 5")
+        match = second.lookup("show me the 5 biggest customers by revenue", SCHEMA_INFO)
+
+        assert match is not None
+        assert match.sql == "SELECT name FROM customers ORDER BY revenue DESC LIMIT 5"
+        assert second.last_id == 1
+
+    def test_other_schema_misses(self, store_path):
+        first = SharedSemanticCache(SharedStore(store_path), 0.85)
+        second = SharedSemanticCache(SharedStore(store_path), 0.85)
+        first.store("top 5 customers by revenue", SCHEMA_INFO, "SELECT 1")
+
+        assert second.lookup("top 5 customers by revenue", {'tables': {}}) is None
+
+    def test_other_tenant_misses(self, store_path):
+        first = SharedSemanticCache(SharedStore(store_path), 0.85)
+        second = SharedSemanticCache(SharedStore(store_path), 0.85)
+        first.store("top 5 customers by revenue", SCHEMA_INFO, "SELECT 1", scope="sales")
+
+        assert second.lookup("top 5 customers by revenue", SCHEMA_INFO, scope="hr") is None
+        assert second.lookup("top 5 customers by revenue", SCHEMA_INFO, scope="sales") is not None
+
+
+    def test_locked_file_keeps_the_question_local(self, store_path):
+        cache = SharedSemanticCache(SharedStore(store_path), 0.85)
+        cache.shared.connection().execute("PRAGMA busy_timeout = 0")
+        other = sqlite3.connect(store_path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            cache.store("top 5 customers by revenue", SCHEMA_INFO, "SELECT 1")
+        finally:
+            other.execute("ROLLBACK")
+            other.close()
+
+        assert cache.lookup("top 5 customers by revenue", SCHEMA_INFO).sql == "SELECT 1"
+        assert SharedSemanticCache(SharedStore(store_path), 0.85).lookup("top 5 customers by revenue", SCHEMA_INFO) is None
+
+    def test_unavailable_file_falls_back_to_the_local_index(self, store_path):
+        cache = SharedSemanticCache(SharedStore(store_path), 0.85)
+        cache.store("top 5 customers by revenue", SCHEMA_INFO, "SELECT 1")
+
+        with patch.object(cache.shared, 'connection', side_effect=sqlite3.OperationalError("database is locked")):
+            assert cache.lookup("top 5 customers by revenue", SCHEMA_INFO).sql == "SELECT 1"
+            cache.store("top 10 customers by revenue", SCHEMA_INFO, "SELECT 2")
+            assert cache.lookup("top 10 customers by revenue", SCHEMA_INFO).sql == "SELECT 2"
+
+class TestSchemaIndexReload:
+
+    def test_index_saved_by_another_process_is_reloaded(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "schema_index.json")
+        monkeypatch.setattr(schema_index, 'SCHEMA_INDEX_PATH', path)
+        monkeypatch.setattr(schema_index, 'DATABASE_PATH', str(tmp_path / "database.db"))
+        reset_schema_index()
+        loaded = get_schema_index()
+        assert loaded.tables == {}
+
+        # Another worker writes the file through its own SchemaIndex instance
+        other = SchemaIndex(path)
+        other.update_table("users", {'columns': {'id': 'INTEGER'}, 'row_count': 1})
+        other.save()
+
+        assert "users" in get_schema_index().tables
+        reset_schema_index()
@@ -0,0 +1,205 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from core import schema_index, snapshots, sql_processor
+from core.connection_pool import pool_stats
+from core.schema_index import SchemaIndex, get_indexed_schema, reset_schema_index
+from core.snapshots import (
+    LOCK_NAME,
+    POINTER_NAME,
+    SnapshotError,
+    current_snapshot,
+    publish_snapshot,
+    read_target,
+    reject_writes_on_reader,
+    snapshot_dir
+)
+from core.sql_processor import execute_sql_safely
+
+
+def create_people(path, names):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS people (name TEXT)")
+    conn.executemany("INSERT INTO people VALUES (?)", [(name,) for name in names])
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "database.db")
+    create_people(path, ["ada", "grace"])
+    with patch.object(sql_processor, 'DATABASE_PATH', path), \
+         patch.object(schema_index, 'DATABASE_PATH', path), \
+         patch.object(schema_index, 'SCHEMA_INDEX_PATH', str(tmp_path / "schema_index.json")):
+        reset_schema_index()
+        yield path
+    reset_schema_index()
+
+
+@pytest.fixture
+def reader(monkeypatch):
+    monkeypatch.setenv("SNAPSHOT_MODE", "reader")
+    monkeypatch.setenv("SNAPSHOT_POLL_SECONDS", "0")
+
+
+class TestPublishSnapshot:
+    def test_publish_copies_database_and_swaps_pointer(self, database, tmp_path):
+        snapshot = publish_snapshot(database, str(tmp_path / "missing_index.json"))
+
+        assert snapshot.version == 1
+        assert snapshot.database == os.path.join(snapshot_dir(database), "00000001.db")
+        conn = sqlite3.connect(snapshot.database)
+        assert conn.execute("SELECT COUNT(*) FROM people").fetchone()[0] == 2
+        conn.close()
+        with open(os.path.join(snapshot_dir(database), POINTER_NAME)) as f:
+            assert json.load(f)['version'] == 1
+
+    def test_versions_increase_and_old_snapshots_are_pruned(self, database, tmp_path, monkeypatch):
+        monkeypatch.setenv("SNAPSHOT_RETAIN", "2")
+        monkeypatch.setenv("SNAPSHOT_PRUNE_GRACE_SECONDS", "0")
+        monkeypatch.setenv("SNAPSHOT_POLL_SECONDS", "0")
+        for _ in range(4):
+            snapshot = publish_snapshot(database, str(tmp_path / "missing_index.json"))
+
+        assert snapshot.version == 4
+        assert sorted(name for name in os.listdir(snapshot_dir(database)) if name.endswith(".db")) == [
+            "00000003.db", "00000004.db"
+        ]
+
+    def test_superseded_snapshots_outlive_the_grace_period(self, database, tmp_path, monkeypatch):
+        monkeypatch.setenv("SNAPSHOT_RETAIN", "1")
+        monkeypatch.setenv("SNAPSHOT_PRUNE_GRACE_SECONDS", "60")
+        for _ in range(3):
+            publish_snapshot(database, str(tmp_path / "missing_index.json"))
+        directory = snapshot_dir(database)
+
+        # Readers polling the old pointer can still open snapshots 1 and 2
+        assert sorted(name for name in os.listdir(directory) if name.endswith(".db")) == [
+            "00000001.db", "00000002.db", "00000003.db"
+        ]
+
+        # Once snapshot 2 was published more than the grace period ago, snapshot 1 goes
+        old = time.time() - 120
+        os.utime(os.path.join(directory, "00000002.db"), (old, old))
+        publish_snapshot(database, str(tmp_path / "missing_index.json"))
+
+        assert sorted(name for name in os.listdir(directory) if name.endswith(".db")) == [
+            "00000002.db", "00000003.db", "00000004.db"
+        ]
+
+    def test_schema_index_is_published_with_the_database(self, database, tmp_path):
+        index_path = str(tmp_path / "schema_index.json")
+        with open(index_path, "w") as f:
+            json.dump({'version': 1, 'tables': {}}, f)
+
+        snapshot = publish_snapshot(database, index_path)
+
+        assert os.path.exists(snapshot.schema_index)
+
+    @pytest.mark.skipif(snapshots.fcntl is None, reason="file locks need fcntl")
+    def test_publication_waits_for_the_lock_held_by_another_writer(self, database, tmp_path):
+        directory = snapshot_dir(database)
+        os.makedirs(directory)
+        published = []
+        # A separate open file description behaves like another worker process
+        with open(os.path.join(directory, LOCK_NAME), "a") as lock_file:
+            snapshots.fcntl.flock(lock_file.fileno(), snapshots.fcntl.LOCK_EX)
+            writer = threading.Thread(
+                target=lambda: published.append(publish_snapshot(database, str(tmp_path / "missing_index.json")))
+            )
+            writer.start()
+            writer.join(0.2)
+            assert writer.is_alive()
+            assert not os.path.exists(os.path.join(directory, POINTER_NAME))
+            snapshots.fcntl.flock(lock_file.fileno(), snapshots.fcntl.LOCK_UN)
+        writer.join(5)
+
+        assert published[0].version == 1
+
+    def test_missing_database_raises(self, tmp_path):
+        with pytest.raises(SnapshotError):
+            publish_snapshot(str(tmp_path / "absent.db"), str(tmp_path / "index.json"))
+
+
+class TestReadTarget:
+    def test_primary_when_snapshots_are_off(self, database):
+        publish_snapshot(database, "unused.json")
+
+        target = read_target(database)
+
+        assert target.database == database
+        assert target.snapshot is None
+
+    def test_reader_without_snapshot_reads_primary_read_only(self, database, reader):
+        target = read_target(database)
+
+        assert target.snapshot is None
+        assert target.pool().read_only
+
+    def test_reader_uses_immutable_snapshot(self, database, reader):
+        snapshot = publish_snapshot(database, "unused.json")
+
+        target = read_target(database)
+        pool = target.pool()
+
+        assert target.snapshot == snapshot
+        assert pool.immutable and pool.read_only
+        assert target.cache_scope("default") == "default@1"
+
+    def test_pointer_is_polled_at_most_every_poll_interval(self, database, monkeypatch):
+        monkeypatch.setenv("SNAPSHOT_POLL_SECONDS", "3600")
+        publish_snapshot(database, "unused.json")
+        assert current_snapshot(database).version == 1
+
+        publish_snapshot(database, "unused.json")
+
+        assert current_snapshot(database).version == 1
+
+    def test_switching_snapshot_closes_the_old_pool(self, database, reader):
+        first = publish_snapshot(database, "unused.json")
+        read_target(database).pool()
+        publish_snapshot(database, "unused.json")
+
+        read_target(database)
+
+        assert first.database not in [pool['database'] for pool in pool_stats()['pools']]
+
+    def test_reject_writes_on_reader(self, reader):
+        with pytest.raises(SnapshotError):
+            reject_writes_on_reader()
+
+
+class TestReaderQueries:
+    def test_queries_see_published_data_only(self, database, reader):
+        publish_snapshot(database, "unused.json")
+        create_people(database, ["linus"])
+
+        before = execute_sql_safely("SELECT name FROM people ORDER BY name")
+        publish_snapshot(database, "unused.json")
+        after = execute_sql_safely("SELECT name FROM people ORDER BY name")
+
+        assert [row['name'] for row in before['results']] == ["ada", "grace"]
+        assert [row['name'] for row in after['results']] == ["ada", "grace", "linus"]
+
+    def test_writes_fail_on_snapshots(self, database, reader):
+        publish_snapshot(database, "unused.json")
+
+        result = execute_sql_safely("INSERT INTO people VALUES ('eve')", use_cache=False)
+
+        assert result['error']
+
+    def test_indexed_schema_does_not_write_the_published_index(self, database, reader, tmp_path):
+        index_path = str(tmp_path / "schema_index.json")
+        SchemaIndex(index_path).save()
+        snapshot = publish_snapshot(database, index_path)
+        mtime = os.stat(snapshot.schema_index).st_mtime_ns
+
+        schema = get_indexed_schema()
+
+        assert 'people' in schema['tables']
+        assert os.stat(snapshot.schema_index).st_mtime_ns == mtime
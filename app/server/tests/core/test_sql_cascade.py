@@ -0,0 +1,109 @@
+import sqlite3
+import pytest
+from unittest.mock import patch
+from core import sql_processor
+from core.data_models import QueryRequest
+from core.llm_processor import generate_sql_with_source
+from core.sql_cascade import cascade_snapshot, run_cascade
+from core.sql_processor import explain_sql
+from core.sql_security import SQLSecurityError
+from core.tracing import render_metrics
+
+SCHEMA_INFO = {
+    'tables': {
+        'orders': {'columns': {'id': 'INTEGER', 'total': 'REAL'}, 'row_count': 2},
+        'order_items': {'columns': {'id': 'INTEGER', 'order_id': 'INTEGER'}, 'row_count': 3},
+        'customers': {'columns': {'id': 'INTEGER', 'name': 'TEXT'}, 'row_count': 1},
+    }
+}
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "database.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, total REAL);
+        CREATE TABLE order_items (id INTEGER PRIMARY KEY, order_id INTEGER);
+        CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT);
+        INSERT INTO orders (total) VALUES (10), (20);
+    """)
+    conn.close()
+    with patch.object(sql_processor, 'DATABASE_PATH', path):
+        yield path
+
+
+@pytest.fixture
+def cascade_env(monkeypatch, database):
+    monkeypatch.setenv("LLM_CASCADE", "1")
+    monkeypatch.setenv("SEMANTIC_CACHE", "0")
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    monkeypatch.delenv("LLM_HEDGING", raising=False)
+
+
+class TestExplainSql:
+
+    def test_prepares_without_running(self, database):
+        explain_sql("SELECT * FROM orders")
+
+    def test_unknown_column_fails(self, database):
+        with pytest.raises(sqlite3.Error):
+            explain_sql("SELECT missing FROM orders")
+
+    def test_validation_runs_first(self, database):
+        with pytest.raises(SQLSecurityError):
+            explain_sql("DROP TABLE orders")
+
+
+class TestCascade:
+
+    def test_trivial_question_never_reaches_a_model(self, cascade_env):
+        with patch('core.llm_processor.generate_sql_with_openai') as mock_openai:
+            sql, source = generate_sql_with_source(QueryRequest(query="how many orders"), SCHEMA_INFO)
+
+        assert (sql, source) == ("SELECT COUNT(*) AS count FROM [orders]", "rules")
+        mock_openai.assert_not_called()
+
+    def test_small_model_answer_is_used_when_it_explains(self, cascade_env):
+        with patch('core.llm_processor.generate_sql_with_openai', return_value="SELECT SUM(total) FROM orders") as mock_openai:
+            sql, source = generate_sql_with_source(QueryRequest(query="total order value"), SCHEMA_INFO)
+
+        assert (sql, source) == ("SELECT SUM(total) FROM orders", "small")
+        mock_openai.assert_called_once_with("total order value", SCHEMA_INFO)
+
+    def test_escalates_to_large_model_when_explain_fails(self, cascade_env, monkeypatch):
+        monkeypatch.setenv("LLM_LARGE_OPENAI_MODEL", "big-model")
+        answers = {'gpt-4.1-mini': "SELECT SUM(amount) FROM orders", 'big-model': "SELECT SUM(total) FROM orders"}
+
+        def fake_openai(query_text, schema_info, model="gpt-4.1-mini"):
+            return answers[model]
+
+        with patch('core.llm_processor.generate_sql_with_openai', side_effect=fake_openai) as mock_openai:
+            sql, source = generate_sql_with_source(QueryRequest(query="total order value"), SCHEMA_INFO)
+
+        assert (sql, source) == ("SELECT SUM(total) FROM orders", "large")
+        assert mock_openai.call_count == 2
+        stats = cascade_snapshot()
+        assert stats['small'] == {'attempts': 1, 'accepted': 0, 'rejected': 1, 'execution_failures': 0}
+        assert stats['large']['accepted'] == 1
+        assert 'nlsql_cascade_accepted_total{tier="large"} 1' in render_metrics()
+
+    def test_escalate_skips_cheaper_tiers(self, cascade_env):
+        with patch('core.llm_processor.generate_sql_with_openai', return_value="SELECT COUNT(*) FROM orders") as mock_openai:
+            sql, source = generate_sql_with_source(QueryRequest(query="how many orders"), SCHEMA_INFO, escalate=True)
+
+        assert source == "large"
+        assert mock_openai.call_args.kwargs == {'model': "gpt-4.1"}
+
+    def test_disabled_cascade_goes_to_the_small_model(self, cascade_env, monkeypatch):
+        monkeypatch.delenv("LLM_CASCADE")
+        with patch('core.llm_processor.generate_sql_with_openai', return_value="SELECT 1") as mock_openai:
+            assert generate_sql_with_source(QueryRequest(query="how many orders"), SCHEMA_INFO) == ("SELECT 1", "small")
+        mock_openai.assert_called_once()
+
+    def test_last_sql_is_returned_when_no_tier_passes(self):
+        def reject(sql):
+            raise sqlite3.OperationalError("no such table")
+
+        assert run_cascade([("small", lambda: "SELECT 1"), ("large", lambda: "SELECT 2")], reject) == ("SELECT 2", "large")
@@ -1,7 +1,9 @@
 import pytest
 import sqlite3
 from unittest.mock import patch
-from core.sql_processor import execute_sql_safely, get_database_schema
+from core.sql_processor import execute_sql_safely, get_database_schema, collect_json_paths, describe_table, stream_sql_rows
+from core.sql_security import SQLSecurityError
+from core import sql_processor
 
 
 @pytest.fixture
@@ -50,6 +52,22 @@ def test_db():
 
 class TestSQLProcessor:
     
+    def test_stream_sql_rows_batches(self, test_db):
+        batches = list(stream_sql_rows("SELECT name, age FROM users ORDER BY age", batch_size=2))
+        
+        assert [columns for columns, _ in batches] == [['name', 'age'], ['name', 'age']]
+        assert batches[0][1] == [{'name': 'John', 'age': 25}, {'name': 'Jane', 'age': 30}]
+        assert batches[1][1] == [{'name': 'Bob', 'age': 35}]
+    
+    def test_stream_sql_rows_no_results_yields_columns(self, test_db):
+        batches = list(stream_sql_rows("SELECT name FROM users WHERE age > 100"))
+        
+        assert batches == [(['name'], [])]
+    
+    def test_stream_sql_rows_rejects_dangerous_sql(self):
+        with pytest.raises(SQLSecurityError):
+            list(stream_sql_rows("DROP TABLE users"))
+    
     def test_execute_sql_safely_valid_select(self, test_db):
         sql_query = "SELECT * FROM users WHERE age > 25"
         result = execute_sql_safely(sql_query)
@@ -146,6 +164,46 @@ class TestSQLProcessor:
         assert products_table['columns'] == expected_columns
         assert products_table['row_count'] == 2
     
+    def test_get_database_schema_json_columns(self, test_db):
+        # JSON text columns are described by their paths
+        test_db.execute("CREATE TABLE events (id INTEGER, payload TEXT)")
+        test_db.execute(
+            "INSERT INTO events VALUES (1, ?)",
+            ('{"user": {"name": "Ann"}, "tags": [{"name": "a"}, {"name": "b"}]}',)
+        )
+        test_db.commit()
+        
+        result = get_database_schema()
+        
+        events_table = result['tables']['events']
+        assert events_table['json_columns'] == {'payload': ['$.user.name', '$.tags[*].name']}
+        assert 'json_columns' not in result['tables']['users']
+    
+    def test_sample_description_is_reused_until_the_table_changes(self, tmp_path):
+        conn = sqlite3.connect(str(tmp_path / "test.db"))
+        conn.execute("CREATE TABLE events (id INTEGER, payload TEXT)")
+        conn.execute("INSERT INTO events VALUES (1, '{\"user\": {\"name\": \"Ann\"}}')")
+        conn.commit()
+        
+        with patch('core.sql_processor._describe_sample_rows', wraps=sql_processor._describe_sample_rows) as describe:
+            first = describe_table(conn, "events")
+            first['json_columns']['payload'].append('$.changed')
+            second = describe_table(conn, "events")
+            conn.execute("INSERT INTO events VALUES (2, '{\"city\": \"Oslo\"}')")
+            conn.commit()
+            third = describe_table(conn, "events")
+        
+        assert describe.call_count == 2
+        assert second['json_columns'] == {'payload': ['$.user.name']}
+        assert third['json_columns'] == {'payload': ['$.user.name', '$.city']}
+        conn.close()
+    
+    def test_collect_json_paths_limit(self):
+        documents = [{f"k{i}": i for i in range(10)}, [1, {"a": None}]]
+        
+        assert collect_json_paths(documents, max_paths=3) == ['$.k0', '$.k1', '$.k2']
+        assert collect_json_paths(documents)[-2:] == ['$[*]', '$[*].a']
+    
     def test_get_database_schema_empty_database(self):
         # Test with empty in-memory database
         with patch('core.sql_processor.sqlite3.connect') as mock_connect:
@@ -0,0 +1,169 @@
+import os
+import sqlite3
+import pytest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core import connection_pool, sql_processor, tenancy
+from core.connection_pool import get_pool
+from core.result_cache import get_result_cache, invalidate_table
+from core.sql_processor import execute_sql_safely
+from core.tenancy import (
+    DEFAULT_TENANT,
+    TenantError,
+    TenantMiddleware,
+    current_tenant,
+    reset_current_tenant,
+    set_current_tenant,
+    tenant_path,
+    validate_tenant
+)
+
+
+@pytest.fixture
+def tenants_dir(tmp_path):
+    with patch.object(tenancy, 'TENANTS_DIR', str(tmp_path / "tenants")), \
+            patch.dict(os.environ, {'TENANT_IDS': '*'}):
+        yield tmp_path / "tenants"
+
+
+@pytest.fixture
+def tenant():
+    """Run the test body as a given tenant"""
+    tokens = []
+
+    def switch(name):
+        tokens.append(set_current_tenant(name))
+
+    yield switch
+    for token in reversed(tokens):
+        reset_current_tenant(token)
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(TenantMiddleware, create_paths=("/api/upload",))
+
+    @app.get("/api/whoami")
+    async def whoami():
+        return {"tenant": current_tenant(), "database": tenant_path("db/database.db")}
+
+    @app.post("/api/upload")
+    async def upload():
+        return {"database": tenant_path("db/database.db", create=True)}
+
+    return app
+
+
+def create_people(path, names):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE people (name TEXT)")
+    conn.executemany("INSERT INTO people VALUES (?)", [(name,) for name in names])
+    conn.commit()
+    conn.close()
+
+
+class TestTenantPaths:
+
+    def test_default_tenant_keeps_default_path(self):
+        assert current_tenant() == DEFAULT_TENANT
+        assert tenant_path("db/database.db") == "db/database.db"
+
+    def test_other_tenants_get_own_directory(self, tenants_dir, tenant):
+        tenant("sales")
+
+        path = tenant_path("db/schema_index.json")
+
+        assert path == str(tenants_dir / "sales" / "schema_index.json")
+        assert not os.path.exists(tenants_dir / "sales")
+        assert tenant_path("db/database.db", create=True) == str(tenants_dir / "sales" / "database.db")
+        assert os.path.isdir(tenants_dir / "sales")
+
+    @pytest.mark.parametrize("tenant_id", ["../etc", "Sales", "", "a" * 64, "a/b"])
+    def test_malformed_ids_are_rejected(self, tenant_id):
+        with pytest.raises(TenantError):
+            validate_tenant(tenant_id)
+
+    @patch.dict(os.environ, {'TENANT_IDS': 'sales, hr'})
+    def test_allowlist(self):
+        assert validate_tenant("hr") == "hr"
+        assert validate_tenant(DEFAULT_TENANT) == DEFAULT_TENANT
+        with pytest.raises(TenantError):
+            validate_tenant("marketing")
+
+    def test_without_allowlist_only_existing_tenants_are_accepted(self, tenants_dir):
+        os.makedirs(tenants_dir / "sales")
+        with patch.dict(os.environ):
+            del os.environ['TENANT_IDS']
+
+            assert validate_tenant("sales") == "sales"
+            assert validate_tenant(DEFAULT_TENANT) == DEFAULT_TENANT
+            with pytest.raises(TenantError):
+                validate_tenant("marketing")
+
+
+class TestTenantMiddleware:
+
+    def test_header_selects_tenant(self, tenants_dir):
+        os.makedirs(tenants_dir / "sales")
+        response = TestClient(make_app()).get("/api/whoami", headers={"X-Tenant-ID": "sales"})
+
+        assert response.json()['tenant'] == "sales"
+        assert response.json()['database'] == str(tenants_dir / "sales" / "database.db")
+
+    def test_path_prefix_selects_tenant(self, tenants_dir):
+        os.makedirs(tenants_dir / "hr")
+        response = TestClient(make_app()).get("/t/hr/api/whoami")
+
+        assert response.json()['tenant'] == "hr"
+
+    def test_no_tenant_uses_default(self):
+        response = TestClient(make_app()).get("/api/whoami")
+
+        assert response.json() == {"tenant": DEFAULT_TENANT, "database": "db/database.db"}
+
+    def test_invalid_tenant_is_rejected(self):
+        client = TestClient(make_app())
+
+        assert client.get("/api/whoami", headers={"X-Tenant-ID": "../x"}).status_code == 400
+        assert client.get("/t/BAD/api/whoami").status_code == 400
+
+    def test_tenant_without_storage_is_not_found_until_it_uploads(self, tenants_dir):
+        client = TestClient(make_app())
+
+        response = client.get("/api/whoami", headers={"X-Tenant-ID": "sales"})
+        assert response.status_code == 404
+        assert not os.path.exists(tenants_dir / "sales")
+
+        assert client.post("/t/sales/api/upload").status_code == 200
+        assert client.get("/api/whoami", headers={"X-Tenant-ID": "sales"}).status_code == 200
+
+
+class TestTenantIsolation:
+
+    def test_queries_and_cache_are_per_tenant(self, tenants_dir, tmp_path, tenant):
+        default_db = str(tmp_path / "default.db")
+        create_people(default_db, ["Ann"])
+        with patch.object(sql_processor, 'DATABASE_PATH', default_db):
+            assert execute_sql_safely("SELECT COUNT(*) AS n FROM people")['results'] == [{'n': 1}]
+
+            tenant("sales")
+            create_people(tenant_path(default_db, create=True), ["Bob", "Cy"])
+            # Same SQL text, different tenant: not served from the default tenant's cache entry
+            assert execute_sql_safely("SELECT COUNT(*) AS n FROM people")['results'] == [{'n': 2}]
+
+            invalidate_table("people")
+            assert get_result_cache().table_version_snapshot("sales") == {'people': 1}
+            assert get_result_cache().table_version_snapshot(DEFAULT_TENANT) == {}
+
+    @patch.dict(os.environ, {'SQLITE_MAX_POOLS': '2'})
+    def test_least_recently_used_pools_are_closed(self, tmp_path):
+        paths = [str(tmp_path / f"{name}.db") for name in ("a", "b", "c")]
+        first = get_pool(paths[0])
+        get_pool(paths[1])
+        get_pool(paths[0])
+        get_pool(paths[2])
+
+        open_pools = [pool['database'] for pool in connection_pool.pool_stats()['pools']]
+        assert open_pools == [paths[0], paths[2]]
+        assert get_pool(paths[0]) is first
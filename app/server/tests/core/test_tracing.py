@@ -0,0 +1,136 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core.tracing import (
+    Trace,
+    TracingMiddleware,
+    _current_trace,
+    finish_trace,
+    record_span,
+    render_metrics,
+    span,
+    stage_latency_snapshot
+)
+
+
+def threaded_stage():
+    with span("threaded"):
+        pass
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        with span("lookup"):
+            pass
+        # Spans in worker threads belong to the request
+        await asyncio.to_thread(threaded_stage)
+        return {"id": item_id}
+
+    return app
+
+
+class TestSpans:
+
+    def test_span_outside_request_is_noop(self):
+        with span("anything"):
+            pass
+        record_span("anything", 1000)
+
+        assert stage_latency_snapshot() == {}
+
+    def test_spans_are_recorded_on_current_trace(self):
+        trace = Trace()
+        token = _current_trace.set(trace)
+        try:
+            with span("schema"):
+                pass
+            record_span("llm_generation", 5_000_000)
+        finally:
+            _current_trace.reset(token)
+
+        assert [stage for stage, _ in trace.spans] == ["schema", "llm_generation"]
+        assert trace.spans[1][1] == 5_000_000
+
+    def test_span_records_on_exception(self):
+        trace = Trace()
+        token = _current_trace.set(trace)
+        try:
+            with pytest.raises(ValueError):
+                with span("sql_execution"):
+                    raise ValueError("boom")
+        finally:
+            _current_trace.reset(token)
+
+        assert trace.spans[0][0] == "sql_execution"
+
+    def test_finish_trace_fills_histograms(self):
+        trace = Trace()
+        trace.spans = [("schema", 2_000_000), ("schema", 3_000_000)]
+
+        finish_trace("/api/query", trace, 10_000_000)
+
+        snapshot = stage_latency_snapshot()
+        assert snapshot[("/api/query", "schema")]['count'] == 2
+        assert snapshot[("/api/query", "schema")]['sum_ms'] == 5.0
+        assert snapshot[("/api/query", "request")]['sum_ms'] == 10.0
+
+
+class TestTracingMiddleware:
+
+    def test_request_is_traced_by_route_template(self):
+        client = TestClient(make_app())
+
+        client.get("/items/1")
+        client.get("/items/2")
+
+        snapshot = stage_latency_snapshot()
+        assert set(snapshot) == {
+            ("/items/{item_id}", "request"),
+            ("/items/{item_id}", "lookup"),
+            ("/items/{item_id}", "threaded"),
+        }
+        assert snapshot[("/items/{item_id}", "request")]['count'] == 2
+
+    def test_unmatched_paths_are_not_recorded(self):
+        client = TestClient(make_app())
+
+        assert client.get("/missing").status_code == 404
+        assert stage_latency_snapshot() == {}
+
+    @patch.dict('os.environ', {'TRACING': '0'})
+    def test_disabled_tracing_records_nothing(self):
+        client = TestClient(make_app())
+
+        assert client.get("/items/1").json() == {"id": 1}
+        assert stage_latency_snapshot() == {}
+
+
+class TestRenderMetrics:
+
+    def test_histogram_is_cumulative_in_seconds(self):
+        trace = Trace()
+        trace.spans = [("schema", 200_000), ("schema", 20_000_000)]
+        finish_trace("/api/query", trace, 30_000_000)
+
+        lines = render_metrics().splitlines()
+
+        labels = 'endpoint="/api/query",stage="schema"'
+        assert "# TYPE nlsql_stage_duration_seconds histogram" in lines
+        assert f'nlsql_stage_duration_seconds_bucket{{{labels},le="0.0001"}} 0' in lines
+        assert f'nlsql_stage_duration_seconds_bucket{{{labels},le="0.00025"}} 1' in lines
+        assert f'nlsql_stage_duration_seconds_bucket{{{labels},le="0.025"}} 2' in lines
+        assert f'nlsql_stage_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+        assert f'nlsql_stage_duration_seconds_count{{{labels}}} 2' in lines
+        assert f'nlsql_stage_duration_seconds_sum{{{labels}}} 0.020200' in lines
+
+    def test_cache_counters_are_exported(self):
+        text = render_metrics()
+
+        assert 'nlsql_cache_hits_total{cache="result"} 0' in text
+        assert 'nlsql_sqlite_statement_compiles_total 0' in text
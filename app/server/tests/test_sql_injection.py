@@ -257,14 +257,14 @@ class TestFileProcessorSecurity:
 class TestInsightsSecurity:
     """Test insights module with security enhancements"""
     
-    @patch('core.insights.sqlite3.connect')
+    @patch('core.sql_processor.sqlite3.connect')
     def test_generate_insights_validates_table_name(self, mock_connect):
         """Test that table names are validated"""
         with pytest.raises(Exception) as exc_info:
             generate_insights("users'; DROP TABLE users; --")
         assert "Invalid" in str(exc_info.value)
     
-    @patch('core.insights.sqlite3.connect')
+    @patch('core.sql_processor.sqlite3.connect')
     def test_generate_insights_validates_column_names(self, mock_connect):
         """Test that column names are validated"""
         mock_conn = MagicMock()